@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Benchmark del envío fiable de uno a todos (src/broadcast.py).
+# Un emisor manda un archivo de --size-mb a --receivers receptores en un bus en
+# memoria; cada receptor pierde por su cuenta un --loss de los fragmentos. Se
+# cuentan las tramas de datos que el emisor pone en el segmento (primera pasada
+# + reparaciones broadcast y unicast) y se comparan con las que costaría
+# repetir el envío unicast a cada receptor (receptores x fragmentos, sin contar
+# las retransmisiones de ese modo). No necesita root ni interfaz real.
+#
+# Ejemplos:
+#   python bench/bench_broadcast.py
+#   python bench/bench_broadcast.py --receivers 30 --size-mb 20 --loss 0.02
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import broadcast
+import transport
+
+MAC_SENDER = b'\x02\x00\x00\x00\x00\x01'
+
+
+class Counting(transport.Transport):
+    # Cuenta las tramas de datos broadcast y unicast que salen del emisor
+    def __init__(self, inner):
+        self.inner = inner
+        self.mac = inner.mac
+        self.frames = {'broadcast': 0, 'unicast': 0}
+
+    def send(self, frame):
+        if frame[14 + 7] == protocolo.MSG_BCAST_DATA:
+            self.frames['broadcast' if frame[:6] == broadcast.BROADCAST_MAC else 'unicast'] += 1
+        self.inner.send(frame)
+
+    def recv(self, buffer_size=1600):
+        return self.inner.recv(buffer_size)
+
+
+def pump(link, node, stop, loss, seed):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        if payload[7] == protocolo.MSG_BCAST_DATA and rng.random() < loss:
+            continue
+        node.handle_packet(src, payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Coste en el cable del broadcast fiable')
+    parser.add_argument('--receivers', type=int, default=30)
+    parser.add_argument('--size-mb', type=float, default=5.0)
+    parser.add_argument('--loss', type=float, default=0.01, help='pérdida por receptor (0..1)')
+    args = parser.parse_args()
+
+    bus = transport.MemoryBus()
+    stop = threading.Event()
+    port = bus.attach(MAC_SENDER, maxsize=65536)
+    port.settimeout(0.05)
+    wire = Counting(port)
+    sender = broadcast.Broadcast(wire, MAC_SENDER, lambda *a: True).start()
+    nodes = [sender]
+    threading.Thread(target=pump, args=(port, sender, stop, 0.0, 0), daemon=True).start()
+    done = []
+    macs = []
+    for i in range(args.receivers):
+        mac = bytes([2, 0, 0, 0, 1, i])
+        link = bus.attach(mac, maxsize=65536)
+        link.settimeout(0.05)
+        node = broadcast.Broadcast(link, mac, lambda *a: done.append(a[0]) or True).start()
+        nodes.append(node)
+        threading.Thread(target=pump, args=(link, node, stop, args.loss, i + 1), daemon=True).start()
+        macs.append(mac)
+
+    data = os.urandom(int(args.size_mb * 1024 * 1024))
+    frags = -(-len(data) // sender.max_payload())
+    start = time.monotonic()
+    failed = sender.send(data, macs)
+    elapsed = time.monotonic() - start
+    stop.set()
+    for node in nodes:
+        node.stop()
+    sent = sum(wire.frames.values())
+    print(f"receivers={args.receivers} file={args.size_mb}MB frags={frags} loss={args.loss:.1%} "
+          f"time={elapsed:.2f}s ok={args.receivers - len(failed)}/{args.receivers}")
+    print(f"broadcast: {sent} data frames ({sent / frags:.3f}x file; repairs "
+          f"{wire.frames['broadcast'] - frags} broadcast + {wire.frames['unicast']} unicast)")
+    print(f"unicast to each: >= {frags * args.receivers} data frames ({args.receivers}x file)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Benchmark de latencia de chat durante una transferencia grande.
+# El nodo A envía un archivo a B por un enlace emulado (ImpairedTransport con
+# ancho de banda limitado y una cola de salida profunda como la qdisc de una
+# NIC) y, a la vez, un chat cada --chat-ms. Se mide cuánto tarda cada chat en
+# llegar a B, con y sin el planificador TX (src/scheduler.py) delante del enlace.
+# No necesita root ni interfaz real.
+#
+# Ejemplos:
+#   python bench/bench_chat_latency.py                       (1 GB a 100 Mbit, tarda ~90 s por modo)
+#   python bench/bench_chat_latency.py --size-mb 32 --rate-mbit 50
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import file_transfer
+import scheduler
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+
+
+def pump(link, ft_s, ft_r, latencies, done, stop):
+    # Bucle receptor mínimo: ACKs al emisor, fragmentos al receptor y chats medidos
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, body = protocolo.unpack_header(payload)
+        if hdr['msg_type'] == protocolo.MSG_ACK and ft_s is not None:
+            ft_s.receive_ack(payload)
+        elif hdr['msg_type'] == protocolo.MSG_FILE_CHUNK and ft_r is not None:
+            if ft_r.receive_fragment(payload, src):
+                done.set()
+        elif hdr['msg_type'] == protocolo.MSG_CHAT:
+            sent = float(body[:hdr['payload_len']].decode().split()[1])
+            latencies.append(time.monotonic() - sent)
+
+
+def run(mode, args):
+    a, b = transport.queue_pair(MAC_A, MAC_B)
+    rate = args.rate_mbit * 1e6
+    # "NIC" de cada nodo: ancho de banda fijo y cola profunda (txqueuelen)
+    nic_a = transport.ImpairedTransport(a, rate_bps=rate, queue_limit=args.nic_queue, block=True)
+    nic_b = transport.ImpairedTransport(b, rate_bps=rate, queue_limit=args.nic_queue, block=True)
+    if mode == 'scheduler':
+        # Ritmo algo por debajo del enlace: la cola se forma en el planificador
+        tx_a = scheduler.TxScheduler(nic_a, rate_bps=rate * 0.97)
+        tx_b = scheduler.TxScheduler(nic_b, rate_bps=rate * 0.97)
+    else:
+        tx_a, tx_b = nic_a, nic_b
+    for link in (a, b):
+        link.settimeout(0.05)
+
+    ft_s = file_transfer.FileTransfer(tx_a, MAC_B, MAC_A)
+    ft_s.window = args.window
+    ft_s.timeout = args.rto
+    ft_r = file_transfer.FileReceiver(tx_b, None, MAC_B)
+    latencies = []
+    done, stop = threading.Event(), threading.Event()
+    threads = [threading.Thread(target=pump, args=(a, ft_s, None, latencies, done, stop), daemon=True),
+               threading.Thread(target=pump, args=(b, None, ft_r, latencies, done, stop), daemon=True)]
+    for t in threads:
+        t.start()
+
+    data = os.urandom(args.size_mb * 1024 * 1024)
+    sender = threading.Thread(target=ft_s.send_file, args=(data,), daemon=True)
+    start = time.monotonic()
+    sender.start()
+    chats = 0
+    while not done.is_set() and time.monotonic() - start < args.max_seconds:
+        ft_s.send_chat_message(f"ping {time.monotonic():.6f}")
+        chats += 1
+        done.wait(args.chat_ms / 1000.0)
+    elapsed = time.monotonic() - start
+    time.sleep(0.5)
+    stop.set()
+    ft_s.stop()
+    tx_a.close()
+    tx_b.close()
+
+    lat = sorted(latencies)
+    pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] * 1000 if lat else float('nan')
+    print(f"{mode:<9} chats={len(lat)}/{chats} p50={pct(0.5):7.1f}ms p99={pct(0.99):7.1f}ms "
+          f"max={pct(1.0):7.1f}ms transfer={len(data) / 1e6 / elapsed:6.2f}MB/s complete={done.is_set()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia de chat con una transferencia concurrente')
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--rate-mbit', type=float, default=100.0)
+    parser.add_argument('--nic-queue', type=int, default=1000, help='tramas en la cola de salida de la NIC')
+    parser.add_argument('--window', type=int, default=256, help='ventana de la transferencia (fragmentos)')
+    parser.add_argument('--rto', type=float, default=2.0)
+    parser.add_argument('--chat-ms', type=float, default=50.0, help='intervalo entre chats')
+    parser.add_argument('--max-seconds', type=float, default=600.0)
+    parser.add_argument('--mode', choices=('both', 'direct', 'scheduler'), default='both')
+    args = parser.parse_args()
+    for mode in ('direct', 'scheduler'):
+        if args.mode in ('both', mode):
+            run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
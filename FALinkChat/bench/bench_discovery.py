@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Simulación de descubrimiento con muchos nodos en un mismo segmento (bus en memoria,
+# reloj simulado, sin hilos). Compara tramas de discovery por minuto entre:
+#   - legacy: cada DISCOVERY periódico pide REPLY a todos, todos responden al
+#     instante y solo los REPLY refrescan
+#   - passive: los DISCOVERY periódicos son anuncios, cualquier trama refresca al
+#     emisor, solo se sondea a los vecinos callados y las respuestas a DISCOVERY
+#     broadcast se suprimen (retardo, deduplicación, filtro de conocidos, agregación)
+# Opcionalmente cada nodo envía chat a vecinos al azar (--chat-per-min) o pulsa
+# Connect (DISCOVERY con FLAG_SOLICIT, --connect-per-min).
+#
+# Ejemplos:
+#   python bench/bench_discovery.py --nodes 200 --minutes 10
+#   python bench/bench_discovery.py --nodes 500 --minutes 3 --connect-per-min 1
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import discovery
+import transport
+
+DISCOVERY_TYPES = (protocolo.MSG_DISCOVERY, protocolo.MSG_REPLY)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LegacyDiscovery(discovery.Discovery):
+    # Comportamiento anterior: todos los DISCOVERY exigen respuesta inmediata de todos
+    def send_discovery(self, solicit=True, dst_mac=discovery.BROADCAST_MAC):
+        super().send_discovery(True, dst_mac)
+
+    def _schedule_reply(self, peer_mac, bloom=None):
+        self._send_reply(peer_mac)
+
+
+def simulate(mode, n, minutes, chat_per_min, connect_per_min, seed):
+    rng = random.Random(seed)
+    clock = Clock()
+    bus = transport.MemoryBus()
+    cls = LegacyDiscovery if mode == 'legacy' else discovery.Discovery
+    nodes = []
+    for i in range(n):
+        mac = bytes([2, 0, 0, 0, i >> 8, i & 0xff])
+        port = bus.attach(mac, maxsize=0)
+        port.settimeout(0)
+        disc = cls(port, mac, clock=clock)
+        # Arranques repartidos en el primer intervalo
+        disc._next_discovery = rng.uniform(0, discovery.DISCOVERY_INTERVAL)
+        nodes.append((port, disc))
+
+    per_minute = []
+    for second in range(int(minutes * 60)):
+        clock.now = float(second)
+        for port, disc in nodes:
+            disc.tick()
+            if connect_per_min and rng.random() < connect_per_min / 60.0:
+                disc.send_discovery(solicit=True)
+            if chat_per_min and rng.random() < chat_per_min / 60.0:
+                peers = disc.get_neighbors()
+                if peers:
+                    hdr = protocolo.pack_header(0, 1, 0, 0, protocolo.MSG_CHAT, 4)
+                    port.send(network.build_ethernet_frame(rng.choice(peers), port.mac,
+                                                           network.ETH_P_CUSTOM, hdr + b'hola'))
+        # Entregar todo lo encolado (las respuestas pueden generar más tramas)
+        pending = True
+        while pending:
+            pending = False
+            for port, disc in nodes:
+                while not port._rx.empty():
+                    pending = True
+                    dst, src, _, payload = network.unpack_ethernet_frame(port._rx.get_nowait())
+                    hdr, _ = protocolo.unpack_header(payload)
+                    t = hdr['msg_type']
+                    if t in DISCOVERY_TYPES:
+                        disc.handle_packet(src, payload, dst)
+                    elif mode == 'passive':
+                        disc.observe(src)
+        if second % 60 == 59:
+            per_minute.append(sum(disc.sent_discovery + disc.sent_replies + disc.sent_probes
+                                  for _, disc in nodes))
+    known = sum(len(d.get_neighbors()) for _, d in nodes) / float(n)
+    minute_deltas = [b - a for a, b in zip([0] + per_minute, per_minute)]
+    replies = sum(d.sent_replies for _, d in nodes)
+    return minute_deltas, known, replies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Coste del descubrimiento con N nodos simulados')
+    parser.add_argument('--nodes', type=int, default=200)
+    parser.add_argument('--minutes', type=float, default=10)
+    parser.add_argument('--chat-per-min', type=float, default=0.0)
+    parser.add_argument('--connect-per-min', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    results = {}
+    for mode in ('legacy', 'passive'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            per_min, known, replies = simulate(mode, args.nodes, args.minutes, args.chat_per_min,
+                                               args.connect_per_min, args.seed)
+        # El primer minuto incluye el arranque; la media estable es del resto
+        steady = per_min[1:] or per_min
+        results[mode] = sum(steady) / len(steady)
+        print(f"{mode:8s} nodes={args.nodes} discovery_frames/min (steady)={results[mode]:.0f} "
+              f"first_min={per_min[0]} replies_total={replies} avg_neighbors_known={known:.1f}")
+    if results['passive']:
+        print(f"reduction: {results['legacy'] / results['passive']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Benchmark del envío de un mismo archivo a varios destinos por unicast.
+# Compara el CPU del emisor (time.process_time) enviando --size-mb a
+# --dests destinos con un send_file independiente por destino frente a
+# FileTransfer.send_fanout, que codifica cada fragmento (payload, CRC,
+# header) una sola vez y por destino solo pone la MAC y el file_id.
+# Se mide por separado:
+# - encode: solo el montaje de las tramas de todos los destinos
+# - send: el envío completo con un transporte que confirma cada fragmento al
+#   instante (incluye ventana, ACKs y candados, que no cambian con fan-out)
+# No necesita root ni interfaz real.
+#
+# Ejemplos:
+#   python bench/bench_fanout.py
+#   python bench/bench_fanout.py --dests 16 --size-mb 32
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import protocolo
+import file_transfer
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+
+
+class AckingTransport(transport.Transport):
+    # Confirma cada fragmento en cuanto se envía (receptor ideal e instantáneo)
+    def __init__(self):
+        self.mac = MAC_A
+        self.ft = None
+        self.frames = 0
+
+    def send(self, frame):
+        self.frames += 1
+        hdr, _ = protocolo.unpack_header(frame[14:24])
+        body = protocolo.pack_ack_window(1 << 20)
+        self.ft.receive_ack(protocolo.pack_header(hdr['file_id'], 1, hdr['frag_index'], 0,
+                                                  protocolo.MSG_ACK, len(body)) + body)
+
+
+def encode(data, dests, fanout):
+    # CPU de montar todas las tramas de todos los destinos, sin enviarlas
+    shared = file_transfer.SharedFrames(len(dests)) if fanout else None
+    flights = [file_transfer._Flight(i + 1, mac, MAC_A, data, file_transfer.MAX_PAYLOAD,
+                                     protocolo.MSG_FILE_CHUNK, 1, shared=shared) for i, mac in enumerate(dests)]
+    start = time.process_time()
+    for i in range(flights[0].total):
+        for flight in flights:
+            flight.frame(i)
+    return time.process_time() - start, flights[0].total * len(dests)
+
+
+def run(data, dests, fanout):
+    wire = AckingTransport()
+    ft = file_transfer.FileTransfer(wire, None, MAC_A)
+    wire.ft = ft
+    start = time.process_time()
+    if fanout:
+        failed = ft.send_fanout(data, dests)
+    else:
+        failed = [mac for mac in dests if not ft.send_file(data, mac)]
+    cpu = time.process_time() - start
+    ft.stop()
+    assert not failed
+    return cpu, wire.frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU del emisor: un envío por destino frente a fan-out')
+    parser.add_argument('--dests', type=int, default=8)
+    parser.add_argument('--size-mb', type=float, default=8.0)
+    args = parser.parse_args()
+
+    data = os.urandom(int(args.size_mb * 1024 * 1024))
+    dests = [bytes([2, 0, 0, 0, 2, i]) for i in range(args.dests)]
+    print(f"dests={args.dests} file={args.size_mb}MB")
+    for stage, fn in (('encode', encode), ('send', run)):
+        for name, fanout in (('per-destination', False), ('fan-out', True)):
+            cpu, frames = fn(data, dests, fanout)
+            print(f"{stage:6s} {name:16s} frames={frames} cpu={cpu:.2f}s "
+                  f"({cpu / args.dests * 1000:.0f} ms/dest, {cpu / frames * 1e6:.2f} us/frame)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# Benchmark de muchas transferencias concurrentes desde un nodo.
+# Un emisor encola --files archivos para cada uno de --peers vecinos en el
+# TransferManager (src/transfer_manager.py); todo sale por el planificador TX y
+# un enlace emulado con ancho de banda fijo. Se mide el throughput agregado
+# (debería quedarse cerca del enlace sin importar cuántos haya en cola) y el
+# número máximo de hilos del proceso (no crece con las transferencias en cola).
+# No necesita root ni interfaz real.
+#
+# Ejemplos:
+#   python bench/bench_many_transfers.py
+#   python bench/bench_many_transfers.py --peers 10 --files 50 --size-kb 256 --rate-mbit 200
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import file_transfer
+import scheduler
+import transfer_manager
+import transport
+
+MAC_SENDER = b'\x02\x00\x00\x00\x00\x01'
+
+
+def pump(link, ft_s, ft_r, stop):
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        if hdr['msg_type'] == protocolo.MSG_ACK and ft_s is not None:
+            ft_s.receive_ack(payload)
+        elif hdr['msg_type'] == protocolo.MSG_FILE_CHUNK and ft_r is not None:
+            ft_r.receive_fragment(payload, src)
+
+
+def run(args, files):
+    bus = transport.MemoryBus()
+    rate = args.rate_mbit * 1e6
+    port = bus.attach(MAC_SENDER, maxsize=65536)
+    port.settimeout(0.05)
+    tx = scheduler.TxScheduler(transport.ImpairedTransport(port, rate_bps=rate, queue_limit=64, block=True))
+    ft_s = file_transfer.FileTransfer(tx, None, MAC_SENDER)
+    stop = threading.Event()
+    threads = [threading.Thread(target=pump, args=(port, ft_s, None, stop), daemon=True)]
+    peers = []
+    for i in range(args.peers):
+        mac = bytes([2, 0, 0, 0, 1, i])
+        link = bus.attach(mac, maxsize=65536)
+        link.settimeout(0.05)
+        ft_r = file_transfer.FileReceiver(link, None, mac)
+        threads.append(threading.Thread(target=pump, args=(link, None, ft_r, stop), daemon=True))
+        peers.append(mac)
+    for t in threads:
+        t.start()
+
+    mgr = transfer_manager.TransferManager(ft_s, args.max_active, args.max_per_peer).start()
+    data = os.urandom(args.size_kb * 1024)
+    total = files * len(peers)
+    finished = []
+    all_done = threading.Event()
+
+    def on_done(tid, ok, error):
+        finished.append(ok)
+        if len(finished) == total:
+            all_done.set()
+
+    start = time.monotonic()
+    tid = 0
+    for mac in peers:
+        for _ in range(files):
+            tid += 1
+            mgr.submit(tid, mac, len(data), lambda: data, on_done=on_done)
+    threads_peak = threading.active_count()
+    while not all_done.wait(0.1):
+        threads_peak = max(threads_peak, threading.active_count())
+    elapsed = time.monotonic() - start
+    stop.set()
+    mgr.stop()
+    ft_s.stop()
+    tx.close()
+    mb = total * len(data) / 1e6
+    print(f"queued={total:>4} ({len(peers)} peers x {files}) time={elapsed:6.2f}s "
+          f"goodput={mb * 8 / elapsed:6.1f}Mbit ({mb * 8 / elapsed / args.rate_mbit:5.1%} of link) "
+          f"ok={sum(finished)}/{total} threads={threads_peak}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput con muchas transferencias en cola')
+    parser.add_argument('--peers', type=int, default=10)
+    parser.add_argument('--files', type=int, nargs='+', default=[1, 5, 50], help='archivos por vecino (varias pasadas)')
+    parser.add_argument('--size-kb', type=int, default=64)
+    parser.add_argument('--rate-mbit', type=float, default=100.0)
+    parser.add_argument('--max-active', type=int, default=transfer_manager.MAX_ACTIVE)
+    parser.add_argument('--max-per-peer', type=int, default=transfer_manager.MAX_PER_PEER)
+    args = parser.parse_args()
+    for files in args.files:
+        run(args, files)
+
+
+if __name__ == '__main__':
+    main()
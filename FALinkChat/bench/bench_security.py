@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Benchmark del coste de la capa de seguridad (src/security.py).
+# Compara tres modos sobre el mismo camino: sin seguridad, solo autenticación
+# (BLAKE2b) y autenticación + cifrado. Mide:
+#   - por trama: tramas/s de send+recv de SecureTransport sobre un par en memoria
+#   - extremo a extremo: goodput de una transferencia FileTransfer/FileReceiver
+# No necesita root ni interfaz real.
+#
+# Ejemplos:
+#   python bench/bench_security.py
+#   python bench/bench_security.py --frames 50000 --size-kb 4096
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import file_transfer
+import security
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+KEY = bytes(range(32))
+MODES = (('plain', None), ('mac', False), ('mac+enc', True))
+
+
+def make_pair(encrypt):
+    a, b = transport.queue_pair(MAC_A, MAC_B)
+    if encrypt is not None:
+        a = security.SecureTransport(a, KEY, encrypt=encrypt)
+        b = security.SecureTransport(b, KEY, encrypt=encrypt)
+    for link in (a, b):
+        link.settimeout(0.05)
+    return a, b
+
+
+def per_frame(encrypt, frames, size):
+    # Tramas de tamaño máximo (cabe la sobrecarga de la capa en la MTU)
+    a, b = make_pair(encrypt)
+    body = os.urandom(size - 14 - getattr(a, 'overhead', 0))
+    frame = MAC_B + MAC_A + b'\x88\xb5' + body
+    start = time.perf_counter()
+    for _ in range(frames):
+        a.send(frame)
+        if not b.recv():
+            raise RuntimeError("trama perdida")
+    return frames / (time.perf_counter() - start)
+
+
+def pump(link, ft_s, ft_r, done, stop):
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        if hdr['msg_type'] == protocolo.MSG_ACK:
+            ft_s.receive_ack(payload)
+        elif hdr['msg_type'] == protocolo.MSG_FILE_CHUNK:
+            if ft_r.receive_fragment(payload, src):
+                done.set()
+
+
+def transfer(encrypt, size_kb):
+    a, b = make_pair(encrypt)
+    ft_s = file_transfer.FileTransfer(a, b.mac, a.mac)
+    ft_r = file_transfer.FileReceiver(b, None, b.mac)
+    done, stop = threading.Event(), threading.Event()
+    for link in (a, b):
+        threading.Thread(target=pump, args=(link, ft_s, ft_r, done, stop), daemon=True).start()
+    data = os.urandom(size_kb * 1024)
+    start = time.monotonic()
+    ft_s.send_file(data)
+    done.wait(60)
+    elapsed = time.monotonic() - start
+    stop.set()
+    ft_s.stop()
+    return done.is_set(), len(data) / 1e6 / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Coste de autenticar/cifrar las tramas de Link-Chat')
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--frame-size', type=int, default=1500)
+    parser.add_argument('--size-kb', type=int, default=2048)
+    args = parser.parse_args()
+
+    base_fps = base_goodput = None
+    for name, encrypt in MODES:
+        fps = per_frame(encrypt, args.frames, args.frame_size)
+        complete, goodput = transfer(encrypt, args.size_kb)
+        base_fps = base_fps or fps
+        base_goodput = base_goodput or goodput
+        print(f"{name:<8} frames/s={fps:>9.0f} ({fps / base_fps:6.1%})  "
+              f"transfer={goodput:7.2f}MB/s ({goodput / base_goodput:6.1%}) complete={complete}")
+    print(f"overhead por trama: {security.OVERHEAD} bytes "
+          f"(payload por fragmento {file_transfer.MAX_PAYLOAD} -> {file_transfer.MAX_PAYLOAD - security.OVERHEAD})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Benchmark de la memoria del emisor (FileTransfer) con datos en vuelo.
+# Se lanzan --transfers envíos a la vez con ventana --window hacia un
+# transporte que descarta todo (nunca llegan ACKs ni vencen los timeouts), así
+# todas las ventanas quedan llenas. Con tracemalloc se mide lo que ocupa el
+# estado del emisor (sin contar los datos de origen) y se reporta por MB en vuelo.
+# No necesita root ni interfaz real.
+#
+# Ejemplos:
+#   python bench/bench_sender_memory.py
+#   python bench/bench_sender_memory.py --transfers 16 --window 256 --size-mb 64
+import argparse
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import file_transfer
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+
+
+class SinkTransport(transport.Transport):
+    # Transporte que descarta las tramas y cuenta cuántas se enviaron
+    def __init__(self):
+        self.mac = MAC_A
+        self.frames = 0
+
+    def send(self, frame):
+        self.frames += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memoria del emisor por MB en vuelo')
+    parser.add_argument('--transfers', type=int, default=8)
+    parser.add_argument('--window', type=int, default=256)
+    parser.add_argument('--size-mb', type=int, default=16, help='tamaño de cada archivo')
+    args = parser.parse_args()
+
+    sink = SinkTransport()
+    ft = file_transfer.FileTransfer(sink, MAC_B, MAC_A)
+    ft.window = args.window
+    ft.timeout = 3600
+    sources = [os.urandom(args.size_mb * 1024 * 1024) for _ in range(args.transfers)]
+    expected = args.transfers * args.window
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for data in sources:
+        threading.Thread(target=ft.send_file, args=(data,), daemon=True).start()
+    deadline = time.time() + 60
+    while sink.frames < expected and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    ft.stop()
+
+    in_flight = sink.frames * ft.max_payload() / 1e6
+    print(f"transfers={args.transfers} window={args.window} file={args.size_mb}MB "
+          f"in_flight={in_flight:.1f}MB sender_state={used / 1e6:.2f}MB "
+          f"-> {used / 1e6 / in_flight:.3f} MB per in-flight MB")
+
+
+if __name__ == '__main__':
+    main()
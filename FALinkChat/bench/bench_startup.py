@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# Benchmark de arranque: cuánto tarda un proceso nuevo en importar los puntos de
+# entrada y en emitir su primera trama.
+# - Importación: ejecuta `python -X importtime -c "import <módulo>"` para main,
+#   engine y daemon, y muestra el tiempo acumulado y los módulos más costosos.
+#   Comprueba además que importar main no carga tkinter (la GUI se carga en
+#   main.load_gui()).
+# - Primera trama: lanza un proceso que arranca engine.Engine sobre un
+#   transport.UdpTransport en loopback y mide, desde el lanzamiento, cuándo llega
+#   su primer DISCOVERY al puerto UDP de este proceso (arranque en frío real:
+#   intérprete + imports + motor). Objetivo: TARGET_FIRST_FRAME_MS de mediana.
+#
+# Ejemplos:
+#   python bench/bench_startup.py
+#   python bench/bench_startup.py --runs 20 --top 15
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SRC = os.path.join(ROOT, 'src')
+sys.path.insert(0, SRC)
+
+import transport
+
+# Objetivo de arranque en frío hasta la primera trama enviada (mediana)
+TARGET_FIRST_FRAME_MS = 150.0
+
+CHILD = '''
+import sys, time
+sys.path.insert(0, {src!r})
+import engine, transport
+sock = transport.UdpTransport(b'\\x02\\x00\\x00\\x00\\x0f\\x01', 0, peers=[('127.0.0.1', {port})])
+engine.Engine(sock=sock).start()
+time.sleep(10)
+'''
+
+
+def import_times(module):
+    # Devuelve (total_us, [(self_us, nombre)], nombres importados) de `import module`
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                         cwd=SRC, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative), name.rstrip()))
+    total = next(c for s, c, n in reversed(rows) if n.strip() == module)
+    return total, sorted(((s, n.strip()) for s, c, n in rows), reverse=True), {n.strip() for s, c, n in rows}
+
+
+def first_frame(timeout=10.0):
+    # Segundos desde el lanzamiento del proceso hijo hasta recibir su primera trama
+    listener = transport.UdpTransport(b'\x02\x00\x00\x00\x0f\x02', 0)
+    listener.settimeout(0.05)
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, '-c', CHILD.format(src=SRC, port=listener.addr[1])])
+    try:
+        while time.perf_counter() - start < timeout:
+            if listener.recv():
+                return time.perf_counter() - start
+        return None
+    finally:
+        child.kill()
+        child.wait()
+        listener.close()
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description='Tiempo de arranque de los puntos de entrada de Link-Chat')
+    parser.add_argument('--runs', type=int, default=10, help='arranques en frío a medir')
+    parser.add_argument('--top', type=int, default=8, help='módulos más costosos a mostrar')
+    args = parser.parse_args()
+
+    for module in ('main', 'engine', 'daemon'):
+        total, rows, names = import_times(module)
+        gui = 'tkinter' in names
+        print(f"import {module}: {total / 1000:.1f}ms tkinter={'yes' if gui else 'no'}")
+        for self_us, name in rows[:args.top]:
+            print(f"    {self_us / 1000:6.2f}ms {name}")
+
+    samples = [first_frame() for _ in range(args.runs)]
+    ok = [s for s in samples if s is not None]
+    if not ok:
+        print("first_frame: no se recibió ninguna trama")
+        return 1
+    median = statistics.median(ok) * 1000
+    print(f"first_frame: runs={len(ok)}/{args.runs} median={median:.1f}ms min={min(ok) * 1000:.1f}ms "
+          f"max={max(ok) * 1000:.1f}ms target={TARGET_FIRST_FRAME_MS:.0f}ms "
+          f"{'OK' if median <= TARGET_FIRST_FRAME_MS else 'OVER'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_bench())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Benchmark de throughput sostenido de un stream (src/stream.py) frente a
+# FileTransfer.send_file con los mismos datos y el mismo enlace simulado.
+# El stream no conoce el tamaño de antemano: se escribe en bloques de
+# --chunk-kb y el receptor lee en paralelo. No necesita root ni interfaz real.
+#
+# Ejemplos:
+#   python bench/bench_stream.py
+#   python bench/bench_stream.py --size-mb 32 --loss 0.01 --delay-ms 2 --rate-mbit 100
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import file_transfer
+import stream
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+
+
+def pump(link, handlers, stop):
+    # Bucle receptor mínimo: despacha por tipo de mensaje
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        handler = handlers.get(hdr['msg_type'])
+        if handler is not None:
+            handler(src, payload)
+
+
+def make_links(args):
+    a, b = transport.queue_pair(MAC_A, MAC_B)
+    a.settimeout(0.05)
+    b.settimeout(0.05)
+    impair = dict(loss=args.loss, delay=args.delay_ms / 1000.0,
+                  rate_bps=args.rate_mbit * 1e6 if args.rate_mbit else None)
+    if any(impair.values()):
+        return a, b, transport.ImpairedTransport(a, seed=1, **impair), transport.ImpairedTransport(b, seed=2, **impair)
+    return a, b, a, b
+
+
+def run_file(data, args):
+    a, b, tx_a, tx_b = make_links(args)
+    ft_s = file_transfer.FileTransfer(tx_a, MAC_B, MAC_A)
+    ft_r = file_transfer.FileReceiver(tx_b, None, MAC_B)
+    done, stop = threading.Event(), threading.Event()
+
+    def on_chunk(src, payload):
+        if ft_r.receive_fragment(payload, src):
+            done.set()
+
+    threading.Thread(target=pump, args=(a, {protocolo.MSG_ACK: lambda src, p: ft_s.receive_ack(p)}, stop), daemon=True).start()
+    threading.Thread(target=pump, args=(b, {protocolo.MSG_FILE_CHUNK: on_chunk}, stop), daemon=True).start()
+    start = time.monotonic()
+    ok = ft_s.send_file(data) and done.wait(30)
+    elapsed = time.monotonic() - start
+    stop.set()
+    ft_s.stop()
+    return ok, elapsed
+
+
+def run_stream(data, args):
+    a, b, tx_a, tx_b = make_links(args)
+    ha, hb = stream.StreamHub(tx_a, MAC_A).start(), stream.StreamHub(tx_b, MAC_B).start()
+    stop = threading.Event()
+    types = (protocolo.MSG_STREAM_OPEN, protocolo.MSG_STREAM_DATA, protocolo.MSG_STREAM_ACK)
+    threading.Thread(target=pump, args=(a, dict.fromkeys(types, ha.handle_packet), stop), daemon=True).start()
+    threading.Thread(target=pump, args=(b, dict.fromkeys(types, hb.handle_packet), stop), daemon=True).start()
+    listener = hb.listen()
+    received = [0]
+
+    def reader():
+        s = listener.accept(5)
+        while True:
+            chunk = s.recv()
+            if not chunk:
+                break
+            received[0] += len(chunk)
+        s.close()
+
+    t = threading.Thread(target=reader)
+    t.start()
+    start = time.monotonic()
+    s = ha.open(MAC_B)
+    step = args.chunk_kb * 1024
+    for off in range(0, len(data), step):
+        s.send(data[off:off + step])
+    s.close()
+    t.join(30)
+    elapsed = time.monotonic() - start
+    stop.set()
+    ha.stop()
+    hb.stop()
+    return received[0] == len(data), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput: stream frente a send_file')
+    parser.add_argument('--size-mb', type=float, default=16.0)
+    parser.add_argument('--chunk-kb', type=int, default=64, help='tamaño de cada escritura en el stream')
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--delay-ms', type=float, default=0.0)
+    parser.add_argument('--rate-mbit', type=float, default=0.0)
+    args = parser.parse_args()
+
+    data = os.urandom(int(args.size_mb * 1024 * 1024))
+    for name, fn in (('send_file', run_file), ('stream', run_stream)):
+        ok, elapsed = fn(data, args)
+        print(f"{name:10s} {args.size_mb}MB ok={ok} time={elapsed:.2f}s throughput={len(data) / elapsed / 1e6:.1f}MB/s")
+
+
+if __name__ == '__main__':
+    main()
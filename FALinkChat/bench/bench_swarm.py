@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Benchmark de la descarga multi-origen (src/swarm.py): el mismo contenido
+# descargado de un solo vecino frente a --holders vecinos a la vez. Cada
+# vecino tiene su propio enlace de subida limitado (--rate-mbit, y el primero
+# --fast veces más rápido) sobre un segmento simulado (transport.MemoryBus),
+# así que el tiempo con un solo origen lo fija su enlace y con varios debería
+# acercarse al de la suma de todos. Muestra además los bytes que aportó cada
+# vecino (el reparto sigue al throughput medido). No necesita root ni interfaz real.
+#
+# Ejemplos:
+#   python bench/bench_swarm.py
+#   python bench/bench_swarm.py --size-mb 32 --holders 4 --rate-mbit 50 --fast 3
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import stream
+import swarm
+import transport
+
+MAC_FETCH = b'\x02\x00\x00\x00\x00\x0a'
+SWARM_TYPES = (protocolo.MSG_SWARM_QUERY, protocolo.MSG_SWARM_HAVE)
+
+
+def pump(link, node, stop):
+    # Bucle receptor mínimo: anuncios al swarm y el resto al hub de streams
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        if hdr['msg_type'] in SWARM_TYPES:
+            node.handle_packet(src, payload)
+        else:
+            node.streams.handle_packet(src, payload)
+
+
+def run(data, holders, args):
+    bus = transport.MemoryBus()
+    stop = threading.Event()
+    nodes = []
+
+    def node(mac, rate_bps=None):
+        port = bus.attach(mac, maxsize=65536)
+        port.settimeout(0.05)
+        link = transport.ImpairedTransport(port, rate_bps=rate_bps, delay=args.delay_ms / 1000.0,
+                                           block=True) if rate_bps else port
+        n = swarm.Swarm(link, mac, stream.StreamHub(link, mac).start(), piece_size=args.piece_kb * 1024).start()
+        threading.Thread(target=pump, args=(port, n, stop), daemon=True).start()
+        nodes.append((n, link))
+        return n
+
+    macs = []
+    for k in range(holders):
+        mac = bytes([2, 0, 0, 0, 1, k])
+        rate = args.rate_mbit * 1e6 * (args.fast if k == 0 else 1)
+        root = node(mac, rate).share(data)
+        macs.append(mac)
+    fetcher = node(MAC_FETCH)
+    fetcher.query(root)
+    stats = {}
+    start = time.monotonic()
+    ok = fetcher.fetch(root, peers=macs, stats=stats) == data
+    elapsed = time.monotonic() - start
+    stop.set()
+    for n, link in nodes:
+        n.stop()
+        n.streams.stop()
+        link.close()
+    return ok, elapsed, [stats.get(mac, 0) for mac in macs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Descarga de un solo origen frente a varios (swarm)')
+    parser.add_argument('--size-mb', type=float, default=16.0)
+    parser.add_argument('--holders', type=int, default=3)
+    parser.add_argument('--rate-mbit', type=float, default=40.0, help='subida de cada vecino')
+    parser.add_argument('--fast', type=float, default=2.0, help='factor de velocidad del primer vecino')
+    parser.add_argument('--delay-ms', type=float, default=1.0)
+    parser.add_argument('--piece-kb', type=int, default=swarm.PIECE_SIZE // 1024)
+    args = parser.parse_args()
+
+    data = os.urandom(int(args.size_mb * 1024 * 1024))
+    for holders in (1, args.holders):
+        ok, elapsed, shares = run(data, holders, args)
+        split = ' '.join(f"{b / len(data) * 100:.0f}%" for b in shares)
+        print(f"holders={holders} {args.size_mb}MB ok={ok} time={elapsed:.2f}s "
+              f"throughput={len(data) / elapsed / 1e6:.1f}MB/s split=[{split}]")
+
+
+if __name__ == '__main__':
+    main()
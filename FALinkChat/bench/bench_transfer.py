@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Benchmark de throughput de FileTransfer/FileReceiver sobre transportes simulados.
+# No necesita root ni interfaz real: usa el bus en memoria o el túnel UDP en loopback
+# y, opcionalmente, degradación (pérdida, retardo, jitter, reordenamiento, ancho de banda).
+#
+# Ejemplos:
+#   python bench/bench_transfer.py --size-kb 512
+#   python bench/bench_transfer.py --transport udp --loss 0.02 --delay-ms 5 --rate-mbit 50
+#   python bench/bench_transfer.py --links 2 --rate-mbit 40   (bonding: 2 enlaces de 40 Mbit)
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import file_transfer
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+
+
+def pump(link, ft_s, ft_r, done, stop):
+    # Bucle receptor mínimo: ACKs al emisor, fragmentos al receptor
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        if hdr['msg_type'] == protocolo.MSG_ACK and ft_s is not None:
+            ft_s.receive_ack(payload)
+        elif hdr['msg_type'] == protocolo.MSG_FILE_CHUNK and ft_r is not None:
+            if ft_r.receive_fragment(payload, src):
+                done.set()
+
+
+def make_links(kind):
+    if kind == 'udp':
+        a = transport.UdpTransport(MAC_A, 0)
+        b = transport.UdpTransport(MAC_B, 0, peers=[a.addr])
+        a.add_peer(b.addr)
+        return a, b
+    return transport.queue_pair(MAC_A, MAC_B)
+
+
+def make_bond(args, impair):
+    # Un par de nodos con `links` enlaces cada uno; enlace i en su propio segmento
+    links_a, links_b = [], []
+    for i in range(args.links):
+        if args.transport == 'udp':
+            la = transport.UdpTransport(bytes([2, 0, 0, 0, i, 0x0a]), 0)
+            lb = transport.UdpTransport(bytes([2, 0, 0, 0, i, 0x0b]), 0, peers=[la.addr])
+            la.add_peer(lb.addr)
+        else:
+            bus = transport.MemoryBus()
+            la, lb = bus.attach(bytes([2, 0, 0, 0, i, 0x0a])), bus.attach(bytes([2, 0, 0, 0, i, 0x0b]))
+        links_a.append(transport.ImpairedTransport(la, block=True, queue_limit=16, **impair))
+        links_b.append(transport.ImpairedTransport(lb, block=True, queue_limit=16, **impair))
+    a, b = transport.BondedTransport(links_a), transport.BondedTransport(links_b)
+    a.learn_peer(b.mac, b.discovery_tlvs())
+    b.learn_peer(a.mac, a.discovery_tlvs())
+    return a, b
+
+
+def run(args):
+    impair = dict(loss=args.loss, delay=args.delay_ms / 1000.0, jitter=args.jitter_ms / 1000.0,
+                  reorder=args.reorder, rate_bps=args.rate_mbit * 1e6 if args.rate_mbit else None,
+                  seed=args.seed)
+    if args.links > 1:
+        # La degradación ya va dentro de cada enlace del bonding
+        a, b = make_bond(args, impair)
+        tx_a, tx_b = a, b
+    else:
+        a, b = make_links(args.transport)
+        # La degradación se aplica en ambos sentidos (datos y ACKs)
+        tx_a = transport.ImpairedTransport(a, **impair)
+        tx_b = transport.ImpairedTransport(b, **impair)
+    for link in (a, b):
+        link.settimeout(0.05)
+
+    ft_s = file_transfer.FileTransfer(tx_a, b.mac, a.mac)
+    ft_s.timeout = args.rto
+    ft_r = file_transfer.FileReceiver(tx_b, None, b.mac)
+    done, stop = threading.Event(), threading.Event()
+    threads = [threading.Thread(target=pump, args=(a, ft_s, None, done, stop), daemon=True),
+               threading.Thread(target=pump, args=(b, None, ft_r, done, stop), daemon=True)]
+    for t in threads:
+        t.start()
+
+    data = os.urandom(args.size_kb * 1024)
+    start = time.monotonic()
+    ft_s.send_file(data)
+    done.wait(30)
+    elapsed = time.monotonic() - start
+    stop.set()
+    ft_s.stop()
+
+    mb = len(data) / 1e6
+    print(f"transport={args.transport} links={args.links} size={mb:.2f}MB loss={args.loss} "
+          f"delay={args.delay_ms}ms jitter={args.jitter_ms}ms reorder={args.reorder} "
+          f"rate={args.rate_mbit or 'inf'}Mbit")
+    print(f"  complete={done.is_set()} time={elapsed:.3f}s goodput={mb / elapsed:.3f}MB/s")
+    if args.links > 1:
+        share = ' '.join(f"{n}" for n in tx_a.tx_frames)
+        print(f"  frames_per_link={share}")
+    else:
+        print(f"  frames_tx={tx_a.sent + tx_b.sent} frames_dropped={tx_a.dropped + tx_b.dropped}")
+    tx_a.close()
+    tx_b.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput de Link-Chat bajo degradación emulada')
+    parser.add_argument('--transport', choices=('memory', 'udp'), default='memory')
+    parser.add_argument('--size-kb', type=int, default=256)
+    parser.add_argument('--links', type=int, default=1, help='enlaces en bonding (rate por enlace)')
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--delay-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--reorder', type=float, default=0.0)
+    parser.add_argument('--rate-mbit', type=float, default=0.0)
+    parser.add_argument('--rto', type=float, default=0.2, help='timeout de retransmisión (s)')
+    parser.add_argument('--seed', type=int, default=None)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
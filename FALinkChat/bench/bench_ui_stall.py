@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Benchmark de fluidez de la GUI: mide cuánto se bloquea el bucle de eventos de Tk
+# mientras se pulsa Connect repetidamente con N vecinos simulados en un bus en memoria.
+# Un latido `after(10 ms)` registra su retraso respecto a lo previsto; el peor
+# retraso y el p99 son el tiempo de bloqueo (stall) del hilo de la GUI.
+# Con --legacy se reproduce el Connect anterior (sleep de 0.6 s en el hilo de Tk).
+# Con --flood N además se inyectan N mensajes de chat por segundo en la GUI (como
+# si llegaran del motor) para medir el renderizado por lotes y el scrollback acotado.
+# Requiere un DISPLAY para crear la ventana; sin él el benchmark se omite.
+#
+# Ejemplos:
+#   python bench/bench_ui_stall.py --peers 20 --seconds 10
+#   python bench/bench_ui_stall.py --legacy
+#   python bench/bench_ui_stall.py --flood 10000 --seconds 5
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import network
+import protocolo
+import discovery
+import engine
+import transport
+
+BEAT_MS = 10
+LEGACY_WAIT_SECONDS = 0.6
+
+
+def peer_loop(port, disc, stop):
+    # Vecino simulado: solo atiende discovery (responde a DISCOVERY)
+    while not stop.is_set():
+        frame = port.recv()
+        if not frame:
+            continue
+        dst, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        if hdr['msg_type'] in (protocolo.MSG_DISCOVERY, protocolo.MSG_REPLY):
+            disc.handle_packet(src, payload, dst)
+
+
+def legacy_connect(main, disc_obj):
+    # Connect anterior: envía, duerme en el hilo de Tk y lista lo recibido
+    main.ui_add_message("Enviando discovery...")
+    disc_obj.send_discovery()
+    time.sleep(LEGACY_WAIT_SECONDS)
+    for m in disc_obj.get_neighbors():
+        main.ui_add_message("  - " + main.mac_bytes_to_str(m))
+
+
+def flood_loop(main, rate, stop):
+    # Chat entrante a ritmo fijo, entregado por el mismo camino que el motor
+    start = time.perf_counter()
+    i = 0
+    while not stop.is_set():
+        if time.perf_counter() - start < i / rate:
+            time.sleep(0.0005)
+            continue
+        main.on_engine_event({'event': 'chat', 'from': '02:00:00:00:0f:0f', 'text': f"flood {i}"})
+        i += 1
+
+
+def run(args):
+    import main
+    root = main.load_gui().root
+    bus = transport.MemoryBus()
+    stop = threading.Event()
+    eng = engine.Engine(sock=bus.attach(b'\x02\x00\x00\x00\x00\x01'))
+    eng.subscribe(main.on_engine_event)
+    eng.start()
+    disc_obj = eng.disc
+    for i in range(args.peers):
+        mac = bytes([2, 0, 0, 1, i >> 8, i & 0xff])
+        port = bus.attach(mac)
+        port.settimeout(0.05)
+        threading.Thread(target=peer_loop, args=(port, discovery.Discovery(port, mac), stop),
+                         daemon=True).start()
+
+    stalls = []
+    expected = [time.monotonic() + BEAT_MS / 1000.0]
+    presses = [0]
+
+    def beat():
+        now = time.monotonic()
+        stalls.append(max(0.0, now - expected[0]))
+        expected[0] = now + BEAT_MS / 1000.0
+        root.after(BEAT_MS, beat)
+
+    def press():
+        presses[0] += 1
+        if args.legacy:
+            legacy_connect(main, disc_obj)
+        else:
+            main.on_connect_pressed(eng)
+        root.after(int(args.press_every * 1000), press)
+
+    if args.flood:
+        threading.Thread(target=flood_loop, args=(main, args.flood, stop), daemon=True).start()
+    root.after(BEAT_MS, beat)
+    root.after(main.GUI_POLL_MS, main.gui_poller)
+    root.after(200, press)
+    root.after(int(args.seconds * 1000), root.quit)
+    root.mainloop()
+    stop.set()
+    eng.stop()
+    return stalls, presses[0], len(main.neighbors) if not args.legacy else len(disc_obj.get_neighbors())
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description='Bloqueo del bucle de eventos de la GUI al pulsar Connect')
+    parser.add_argument('--peers', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--press-every', type=float, default=1.0, help='segundos entre pulsaciones de Connect')
+    parser.add_argument('--flood', type=float, default=0, help='mensajes de chat por segundo inyectados en la GUI')
+    parser.add_argument('--legacy', action='store_true', help='Connect anterior con sleep en el hilo de Tk')
+    args = parser.parse_args()
+    if not os.environ.get('DISPLAY'):
+        print("skip: no hay DISPLAY para crear la ventana de Tk")
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        stalls, presses, known = run(args)
+    stalls.sort()
+    p99 = stalls[int(len(stalls) * 0.99) - 1] if stalls else 0.0
+    print(f"mode={'legacy' if args.legacy else 'async'} peers={args.peers} presses={presses} "
+          f"neighbors_shown={known} flood={args.flood:.0f}/s")
+    print(f"  beats={len(stalls)} max_stall={max(stalls or [0]) * 1000:.1f}ms p99_stall={p99 * 1000:.1f}ms "
+          f"total_stall={sum(stalls):.3f}s")
+
+
+if __name__ == '__main__':
+    main_bench()
@@ -0,0 +1,400 @@
+# src/broadcast.py
+# Este módulo implementa el envío fiable de uno a todos (chat y archivos) con
+# una sola transmisión de cada fragmento, en lugar de repetir el envío unicast
+# a cada vecino (500 MB a 30 vecinos serían 15 GB en el segmento)
+# Funcionamiento:
+# - El emisor manda cada fragmento una vez a BROADCAST_MAC (MSG_BCAST_DATA)
+# - Al terminar envía un POLL (MSG_BCAST_POLL) por el mismo flujo del
+#   planificador TX, así sale detrás de los datos y no se adelanta a ellos
+# - Cada receptor contesta al POLL con DONE (MSG_BCAST_DONE, unicast) si tiene
+#   todo, o con un NACK (MSG_BCAST_NACK, broadcast) con los tramos que le faltan
+#   tras un retardo aleatorio. Los NACK son agregados (hasta NACK_MAX_RANGES
+#   tramos por trama) y se suprimen: quien oye un NACK ajeno que cubre sus
+#   huecos no manda el suyo, la reparación le llegará igual
+# - El emisor reenvía los fragmentos pedidos: en broadcast si faltan varios
+#   receptores, en unicast (y con POLL unicast) si solo queda uno
+# - Se repite hasta que todos los receptores esperados confirman o pasan
+#   MAX_IDLE_ROUNDS rondas seguidas sin ninguna respuesta
+# Con dst_mac = una MAC de grupo (transport.group_mac) el envío va solo a los
+# miembros del grupo: datos, POLL y reparaciones en multicast, que la NIC de
+# los demás nodos descarta. Los NACK siguen yendo a broadcast para que el
+# emisor los oiga aunque no sea miembro (son pocos y se suprimen).
+# El coste en el cable es ~1x el tamaño del archivo más las reparaciones, sin
+# importar cuántos receptores haya. Los receptores no confirman fragmento a
+# fragmento, de modo que este modo no usa la ventana de FileTransfer.
+# Un envío admite como máximo 0xffff fragmentos (max_size(), ~96 MB).
+
+import collections
+import heapq
+import itertools
+import random
+import struct
+import threading
+import time
+import protocolo
+import network
+import file_transfer
+import log
+import metrics
+
+# Dirección MAC de broadcast (todo el LAN)
+BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
+
+# Retardo aleatorio máximo antes de enviar un NACK (supresión entre receptores)
+NACK_DELAY = 0.05
+# Tramos (inicio, cantidad) como máximo en un NACK; el resto, en la siguiente ronda
+NACK_MAX_RANGES = 64
+NACK_RANGE_FMT = '!HH'
+NACK_RANGE_SIZE = struct.calcsize(NACK_RANGE_FMT)
+# Espera del emisor entre POLL y reparación (recoge los NACK de la ronda)
+POLL_INTERVAL = 0.25
+# Rondas seguidas sin NACK ni DONE nuevos antes de dar por perdidos a los que faltan
+MAX_IDLE_ROUNDS = 8
+# Envíos terminados que el receptor recuerda para contestar DONE a POLL tardíos
+DONE_MEMORY = 256
+# Segundos sin DATA ni POLL tras los que el receptor descarta una recepción a
+# medias (el emisor murió o se rindió): libera los fragmentos guardados
+INCOMING_IDLE = 60.0
+
+REPAIRS = metrics.counter('linkchat_bcast_repairs_total', 'Fragmentos reenviados por NACK en broadcast fiable', label='mode')
+NACKS = metrics.counter('linkchat_bcast_nacks_total', 'NACK de broadcast fiable enviados o suprimidos', label='action')
+
+
+def pack_nack(origin, ranges):
+    # Payload de un NACK: MAC del emisor original + tramos (inicio, cantidad)
+    return origin + b''.join(struct.pack(NACK_RANGE_FMT, s, n) for s, n in ranges)
+
+
+def unpack_nack(payload):
+    # Devuelve (origen, [(inicio, cantidad), ...]) o None si no es válido
+    if len(payload) < 6:
+        return None
+    body = payload[6:]
+    ranges = [struct.unpack_from(NACK_RANGE_FMT, body, off)
+              for off in range(0, len(body) - NACK_RANGE_SIZE + 1, NACK_RANGE_SIZE)]
+    return bytes(payload[:6]), ranges
+
+
+def to_ranges(indices):
+    # Índices ordenados -> tramos (inicio, cantidad)
+    out = []
+    for i in indices:
+        if out and out[-1][0] + out[-1][1] == i:
+            out[-1][1] += 1
+        else:
+            out.append([i, 1])
+    return [tuple(r) for r in out]
+
+
+class _Outgoing:
+    # Envío en curso: origen, receptores esperados y lo recogido en la ronda
+    def __init__(self, bid, data, frag_size, text, receivers, dst):
+        self.bid = bid
+        self.dst = dst
+        self.data = memoryview(data).cast('B') if len(data) else b''
+        self.frag_size = frag_size
+        self.total = max(1, -(-len(data) // frag_size))
+        self.flags = protocolo.FLAG_TEXT if text else 0
+        self.receivers = set(receivers)
+        self.done = set()
+        self.missing = set()
+        self.heard = False
+
+
+class _Incoming:
+    # Recepción en curso de un envío broadcast ajeno
+    def __init__(self, total, flags, group, now):
+        self.total = total
+        self.group = group
+        self.text = bool(flags & protocolo.FLAG_TEXT)
+        self.parts = [None] * total
+        self.have = 0
+        # NACK programado: índices que aún pedimos (None si no hay ninguno)
+        self.nack = None
+        # Última trama del emisor (para descartarla si queda abandonada)
+        self.seen = now
+
+
+class Broadcast:
+    # Emisor y receptor de broadcast fiable sobre un transporte:
+    # - send(data, receivers, text, progress, dst_mac): bloquea hasta que los
+    #   receptores esperados confirman o se agotan las rondas; devuelve los que
+    #   no confirmaron. dst_mac es BROADCAST_MAC o la MAC de un grupo
+    # - handle_packet(src_mac, payload, dst_mac): MSG_BCAST_* desde el hilo receptor
+    # - deliver(origen, id, datos, texto, grupo) se llama con cada envío completo
+    #   (grupo: MAC del grupo o None si fue a todos) y devuelve True si lo
+    #   aceptó (si no, se reintenta con el siguiente POLL)
+    # - start()/stop(): hilo que envía los NACK cuando vence su retardo y
+    #   descarta las recepciones abandonadas (incoming_idle)
+
+    def __init__(self, transport, src_mac, deliver, clock=time.monotonic, rng=None):
+        self.transport = transport
+        self.src_mac = src_mac
+        self.deliver = deliver
+        self.clock = clock
+        self.poll_interval = POLL_INTERVAL
+        self.max_idle_rounds = MAX_IDLE_ROUNDS
+        self.incoming_idle = INCOMING_IDLE
+        self._rng = rng or random.Random()
+        self.lock = threading.Lock()
+        self._cond = threading.Condition(self.lock)
+        # Identificadores de envío (16 bits) con arranque aleatorio para no
+        # chocar con los de una ejecución anterior del mismo nodo
+        self._ids = itertools.count(self._rng.randrange(1, 0xffff))
+        self._out = {}
+        # Recepciones: (origen, id) -> _Incoming; terminadas, en orden de llegada
+        self._in = {}
+        self._done = collections.OrderedDict()
+        # NACK programados: heap de (instante, origen, id)
+        self._nacks = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='bcast-nack', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def max_payload(self):
+        return file_transfer.MAX_PAYLOAD - getattr(self.transport, 'overhead', 0)
+
+    def max_size(self):
+        # Bytes como máximo en un envío (el índice de fragmento es de 16 bits);
+        # por encima, el llamador debe enviar por unicast
+        return 0xffff * self.max_payload()
+
+    # Emisor
+
+    def _frame(self, out, i, dst_mac, flags=0):
+        payload = protocolo.append_crc(bytes(out.data[i * out.frag_size:(i + 1) * out.frag_size]))
+        header = protocolo.pack_header(out.bid, out.total, i, out.flags | flags, protocolo.MSG_BCAST_DATA, len(payload))
+        return network.build_ethernet_frame(dst_mac, self.src_mac, network.ETH_P_CUSTOM, header + payload)
+
+    def _poll(self, out, rnd, dst_mac):
+        header = protocolo.pack_header(out.bid, out.total, rnd & 0xffff, out.flags, protocolo.MSG_BCAST_POLL, 0)
+        network.send_frame(self.transport, network.build_ethernet_frame(dst_mac, self.src_mac, network.ETH_P_CUSTOM, header))
+
+    def send(self, data, receivers, text=False, progress=None, dst_mac=BROADCAST_MAC):
+        if len(data) > self.max_size():
+            raise ValueError("demasiados fragmentos para un envío broadcast")
+        with self.lock:
+            bid = next(self._ids) % 0xffff + 1
+            out = self._out[bid] = _Outgoing(bid, data, self.max_payload(), text, receivers, dst_mac)
+        if progress is not None:
+            progress.update(frags=out.total, acked=0)
+        try:
+            # Una sola transmisión de cada fragmento para todo el segmento (o grupo)
+            for i in range(out.total):
+                network.send_frame(self.transport, self._frame(out, i, out.dst))
+                if progress is not None:
+                    progress['acked'] = i + 1
+            idle, rnd = 0, 0
+            while not self._stop.is_set():
+                with self.lock:
+                    pending = out.receivers - out.done
+                if not pending:
+                    break
+                # Un solo receptor pendiente: sondeo y reparación unicast
+                dst = next(iter(pending)) if len(pending) == 1 else out.dst
+                self._poll(out, rnd, dst)
+                rnd += 1
+                deadline = self.clock() + self.poll_interval
+                with self._cond:
+                    while not out.receivers <= out.done and not self._stop.is_set():
+                        left = deadline - self.clock()
+                        if left <= 0:
+                            break
+                        self._cond.wait(left)
+                    missing, out.missing = sorted(out.missing), set()
+                    heard, out.heard = out.heard, False
+                    pending = out.receivers - out.done
+                idle = 0 if heard else idle + 1
+                if idle >= self.max_idle_rounds:
+                    break
+                if missing and pending:
+                    dst = next(iter(pending)) if len(pending) == 1 else out.dst
+                    if dst != out.dst:
+                        mode = 'unicast'
+                    else:
+                        mode = 'broadcast' if dst == BROADCAST_MAC else 'multicast'
+                    for i in missing:
+                        network.send_frame(self.transport, self._frame(out, i, dst, protocolo.FLAG_RETRANS))
+                    REPAIRS.inc(len(missing), mode)
+            with self.lock:
+                failed = sorted(out.receivers - out.done)
+            if failed:
+                log.warning('bcast', "envío %d sin confirmar por %d receptores", bid, len(failed))
+            return failed
+        finally:
+            with self.lock:
+                self._out.pop(bid, None)
+
+    def _on_nack(self, src_mac, hdr, body):
+        parsed = unpack_nack(body[:hdr['payload_len']])
+        if parsed is None:
+            return
+        origin, ranges = parsed
+        key = (origin, hdr['file_id'])
+        with self._cond:
+            if origin == self.src_mac:
+                out = self._out.get(hdr['file_id'])
+                if out is None:
+                    return
+                for start, n in ranges:
+                    out.missing.update(i for i in range(start, min(start + n, out.total)))
+                out.heard = True
+                return
+            # NACK de otro receptor: lo que pide también nos llegará a nosotros
+            inc = self._in.get(key)
+            if inc is None or inc.nack is None:
+                return
+            for start, n in ranges:
+                inc.nack.difference_update(range(start, start + n))
+            if not inc.nack:
+                inc.nack = None
+                NACKS.inc(1, 'suppressed')
+
+    def _on_done(self, src_mac, hdr):
+        with self._cond:
+            out = self._out.get(hdr['file_id'])
+            if out is None or src_mac in out.done:
+                return
+            out.done.add(src_mac)
+            out.heard = True
+            self._cond.notify_all()
+
+    # Receptor
+
+    def handle_packet(self, src_mac, payload, dst_mac=BROADCAST_MAC):
+        hdr, body = protocolo.unpack_header(payload)
+        typ = hdr['msg_type']
+        # Grupo del envío: solo lo indican las tramas multicast (no las reparaciones unicast)
+        group = dst_mac if dst_mac[0] & 0x01 and dst_mac != BROADCAST_MAC else None
+        if typ == protocolo.MSG_BCAST_DATA:
+            self._on_data(src_mac, hdr, body, group)
+        elif typ == protocolo.MSG_BCAST_POLL:
+            self._on_poll(src_mac, hdr, group)
+        elif typ == protocolo.MSG_BCAST_NACK:
+            self._on_nack(src_mac, hdr, body)
+        elif typ == protocolo.MSG_BCAST_DONE:
+            self._on_done(src_mac, hdr)
+
+    def _incoming(self, key, hdr, group):
+        # Buffer de la recepción (se crea con el primer DATA o POLL); None si ya
+        # terminó o el header no es coherente. Llamar con self.lock tomado.
+        if key in self._done:
+            return None
+        inc = self._in.get(key)
+        if inc is None:
+            if hdr['total_frags'] == 0:
+                return None
+            inc = self._in[key] = _Incoming(hdr['total_frags'], hdr['flags'], group, self.clock())
+        elif inc.total != hdr['total_frags']:
+            return None
+        inc.seen = self.clock()
+        if group is not None:
+            inc.group = group
+        return inc
+
+    def _on_data(self, src_mac, hdr, body, group=None):
+        ok, part = protocolo.verify_and_strip_crc(body[:hdr['payload_len']])
+        if not ok:
+            file_transfer.CRC_FAILURES.inc()
+            return
+        key = (src_mac, hdr['file_id'])
+        i = hdr['frag_index']
+        with self.lock:
+            inc = self._incoming(key, hdr, group)
+            if inc is None or i >= inc.total or inc.parts[i] is not None:
+                return
+            inc.parts[i] = bytes(part)
+            inc.have += 1
+            if inc.nack is not None:
+                inc.nack.discard(i)
+            complete = inc.have == inc.total
+        if complete:
+            self._complete(key, inc)
+
+    def _complete(self, key, inc):
+        # Entrega el envío completo; si se acepta se confirma con DONE
+        if not self.deliver(key[0], key[1], b''.join(inc.parts), inc.text, inc.group):
+            return
+        with self.lock:
+            if self._in.pop(key, None) is None:
+                return
+            self._done[key] = True
+            while len(self._done) > DONE_MEMORY:
+                self._done.popitem(last=False)
+        self._send_done(key)
+
+    def _send_done(self, key):
+        header = protocolo.pack_header(key[1], 0, 0, 0, protocolo.MSG_BCAST_DONE, 0)
+        network.send_frame(self.transport, network.build_ethernet_frame(key[0], self.src_mac, network.ETH_P_CUSTOM, header))
+
+    def _on_poll(self, src_mac, hdr, group=None):
+        key = (src_mac, hdr['file_id'])
+        with self.lock:
+            if key in self._done:
+                # Nuestro DONE se perdió: se repite
+                inc, missing = None, None
+            else:
+                inc = self._incoming(key, hdr, group)
+                if inc is None:
+                    return
+                missing = [i for i, p in enumerate(inc.parts) if p is None]
+                if missing and inc.nack is None:
+                    inc.nack = set(missing)
+                    heapq.heappush(self._nacks, (self.clock() + self._rng.uniform(0, NACK_DELAY), key))
+                    self._wakeup.set()
+        if inc is None:
+            self._send_done(key)
+        elif not missing:
+            # Completo pero sin entregar (etapa de escritura llena): reintento
+            self._complete(key, inc)
+
+    def _flush_nacks(self, now):
+        # Envía los NACK cuyo retardo venció y que no fueron suprimidos
+        due = []
+        with self.lock:
+            while self._nacks and self._nacks[0][0] <= now:
+                key = heapq.heappop(self._nacks)[1]
+                inc = self._in.get(key)
+                if inc is None or inc.nack is None:
+                    continue
+                due.append((key, to_ranges(sorted(inc.nack))[:NACK_MAX_RANGES]))
+                inc.nack = None
+            wait = self._nacks[0][0] - now if self._nacks else 1.0
+        for (origin, bid), ranges in due:
+            body = pack_nack(origin, ranges)
+            header = protocolo.pack_header(bid, 0, 0, 0, protocolo.MSG_BCAST_NACK, len(body))
+            try:
+                network.send_frame(self.transport, network.build_ethernet_frame(
+                    BROADCAST_MAC, self.src_mac, network.ETH_P_CUSTOM, header + body))
+                NACKS.inc(1, 'sent')
+            except Exception as e:
+                log.error('bcast', "error sending nack: %s", e)
+        return wait
+
+    def _expire(self, now):
+        # Descarta las recepciones sin actividad desde hace incoming_idle segundos
+        with self.lock:
+            stale = [key for key, inc in self._in.items() if now - inc.seen > self.incoming_idle]
+            for key in stale:
+                del self._in[key]
+        for origin, bid in stale:
+            log.warning('bcast', "envío %d de %s abandonado a medias", bid, log.mac(origin))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._expire(self.clock())
+            wait = self._flush_nacks(self.clock())
+            self._wakeup.wait(min(wait, 1.0))
+            self._wakeup.clear()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# src/daemon.py
+# Este módulo ejecuta Link-Chat como demonio sin interfaz gráfica
+# Solo arranca el motor de red (engine.Engine) y expone una API de control local
+# en un socket UNIX, para que scripts y herramientas manejen el nodo (envíos
+# masivos, automatización) sin Tkinter. Nunca importa la GUI.
+# Protocolo: JSON delimitado por saltos de línea. Cada línea es una petición
+# {"cmd": ..., ...} y recibe una línea de respuesta {"ok": true, ...} o
+# {"ok": false, "error": "..."}. Comandos:
+#   ping                                -> {"mac": ..., "iface": ...}
+#   neighbors                           -> {"neighbors": [{"mac", "rtt", ...}]}
+#   discover                            -> fuerza una ronda de DISCOVERY
+#   chat {"text", "to"?, "broadcast"?, "group"?} -> {"to": [macs]}
+#   send {"path", "to"?, "broadcast"?, "group"?} -> {"ids": [...]} (archivo o carpeta)
+#   join {"group"} / leave {"group"}    -> entra o sale del grupo con ese nombre
+#   groups                              -> {"groups": [{"name", "mac", "members"}]}
+#   share {"path", "name"?}             -> {"root": hex} comparte el archivo (swarm)
+#   fetch {"root", "path"?}             -> {"path": ...} lo descarga de todos los
+#                                          vecinos que lo tienen (bloquea hasta acabar)
+#   content                             -> {"content": [{"root", "name", "size", "holders", ...}]}
+#   transfers {"ids"?}                  -> {"transfers": [...]}
+#   metrics                             -> {"text": instantánea de metrics}
+#   history {"peer"?, "limit"?, "query"?} -> {"messages": [...]} últimos mensajes
+#                                          (o los que contienen las palabras de query)
+#   subscribe                           -> {"ok": true} y después una línea por
+#                                          evento del motor hasta cerrar la conexión
+# "to" es una lista de MACs 'aa:bb:..'; si se omite se usan todos los vecinos.
+# Con "broadcast": true el envío sale una sola vez para todos los destinos
+# (broadcast fiable, un id de transferencia por archivo). Con "group" va a los
+# miembros del grupo por su MAC multicast (los demás nodos la filtran en la NIC).
+# El socket se crea con permisos 0600 (solo el usuario actual).
+# El cliente de línea de comandos es src/lcctl.py.
+#
+# Ejemplos:
+#   python src/daemon.py --iface eth0 --out-dir /srv/linkchat
+#   LINKCHAT_CONTROL=/run/linkchat.ctl python src/daemon.py
+#   python src/daemon.py --iface eth0 --psk-file /etc/linkchat.key   (tramas firmadas y cifradas)
+
+import argparse
+import json
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import engine
+import history
+import log
+import metrics
+
+# Eventos pendientes por suscriptor antes de descartar (cliente lento)
+SUBSCRIBER_QUEUE = 1024
+
+
+def default_socket_path():
+    # Socket por defecto: LINKCHAT_CONTROL o /tmp/linkchat-<uid>.ctl
+    import tempfile
+    return os.environ.get('LINKCHAT_CONTROL') or os.path.join(
+        tempfile.gettempdir(), f"linkchat-{os.getuid()}.ctl")
+
+
+class ControlServer:
+    # API de control sobre un socket UNIX: un hilo por conexión, peticiones y
+    # respuestas en JSON por líneas. Los errores de una petición se devuelven
+    # al cliente y no afectan al motor ni a otras conexiones.
+
+    def __init__(self, eng, path=None):
+        self.engine = eng
+        self.path = path or default_socket_path()
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # El socket nace con permisos 0600: con chmod después del bind quedaría
+        # un momento abierto a otros usuarios
+        old = os.umask(0o177)
+        try:
+            self._sock.bind(self.path)
+        finally:
+            os.umask(old)
+        self._sock.listen(16)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _run(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            with conn, conn.makefile('rwb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        req = json.loads(line)
+                        if not isinstance(req, dict):
+                            raise ValueError("la petición debe ser un objeto JSON")
+                        if req.get('cmd') == 'subscribe':
+                            self._stream_events(f)
+                            return
+                        reply = dict(self.handle(req), ok=True)
+                    except Exception as e:
+                        reply = {'ok': False, 'error': str(e)}
+                    f.write(json.dumps(reply).encode('utf-8') + b'\n')
+                    f.flush()
+        except OSError:
+            pass
+
+    def handle(self, req):
+        # Ejecuta una petición y devuelve el dict de respuesta (sin 'ok')
+        cmd = req.get('cmd')
+        eng = self.engine
+        if cmd == 'ping':
+            return {'mac': engine.mac_bytes_to_str(eng.src_mac), 'iface': eng.iface}
+        if cmd == 'neighbors':
+            return {'neighbors': eng.neighbors()}
+        if cmd == 'discover':
+            eng.discover()
+            return {}
+        if cmd == 'chat':
+            text = req.get('text')
+            if not isinstance(text, str) or not text:
+                raise ValueError("falta 'text'")
+            return {'to': eng.send_chat(text, req.get('to'), bool(req.get('broadcast')), req.get('group'))}
+        if cmd == 'send':
+            path = req.get('path')
+            if not path:
+                raise ValueError("falta 'path'")
+            bcast = bool(req.get('broadcast'))
+            if os.path.isdir(path):
+                return {'ids': eng.send_folder(path, req.get('to'), broadcast=bcast, group=req.get('group'))}
+            return {'ids': eng.send_file(path, req.get('to'), broadcast=bcast, group=req.get('group'))}
+        if cmd in ('join', 'leave'):
+            group = req.get('group')
+            if not group:
+                raise ValueError("falta 'group'")
+            if cmd == 'join':
+                return {'mac': eng.join_group(group)}
+            eng.leave_group(group)
+            return {}
+        if cmd == 'groups':
+            return {'groups': eng.groups()}
+        if cmd == 'share':
+            path = req.get('path')
+            if not path:
+                raise ValueError("falta 'path'")
+            return {'root': eng.share(path, req.get('name'))}
+        if cmd == 'fetch':
+            root = req.get('root')
+            if not root:
+                raise ValueError("falta 'root'")
+            return {'path': eng.fetch(root, req.get('path'))}
+        if cmd == 'content':
+            return {'content': eng.content()}
+        if cmd == 'transfers':
+            return {'transfers': eng.transfers(req.get('ids'))}
+        if cmd == 'metrics':
+            return {'text': metrics.render()}
+        if cmd == 'history':
+            if eng.history is None:
+                raise ValueError("historial desactivado")
+            limit = int(req.get('limit') or 50)
+            if req.get('query'):
+                return {'messages': eng.history.search(req['query'], req.get('peer'), limit)}
+            return {'messages': eng.history.tail(limit, req.get('peer'))}
+        raise ValueError(f"comando desconocido: {cmd}")
+
+    def _stream_events(self, f):
+        # Envía cada evento del motor como una línea JSON hasta que el cliente
+        # cierre. Los eventos pasan por una cola acotada: un cliente lento pierde
+        # eventos pero nunca bloquea los hilos de red.
+        events = queue.Queue(SUBSCRIBER_QUEUE)
+
+        def on_event(event):
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                pass
+
+        self.engine.subscribe(on_event)
+        try:
+            f.write(b'{"ok": true}\n')
+            f.flush()
+            while self._sock is not None:
+                try:
+                    event = events.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                f.write(json.dumps(event).encode('utf-8') + b'\n')
+                f.flush()
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.engine.unsubscribe(on_event)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Nodo Link-Chat sin interfaz gráfica')
+    parser.add_argument('--iface', default=None, help='interfaz (o varias separadas por coma para bonding)')
+    parser.add_argument('--bond', action='store_true', help='usar todas las interfaces activas')
+    parser.add_argument('--socket', default=None, help='socket de control (por defecto %s)' % default_socket_path())
+    parser.add_argument('--out-dir', default=None, help='carpeta para los archivos recibidos')
+    parser.add_argument('--history', default=None, help='carpeta del historial de chat (por defecto %s)' % history.default_directory())
+    parser.add_argument('--no-history', action='store_true', help='no guardar el historial de chat')
+    parser.add_argument('--psk-file', default=None, help='archivo con la clave compartida en hex (o LINKCHAT_PSK / LINKCHAT_PASSWORD)')
+    parser.add_argument('--no-encrypt', action='store_true', help='autenticar las tramas sin cifrarlas')
+    parser.add_argument('--tx-rate-mbit', type=float, default=None, help='ritmo de emisión (velocidad del enlace) para que el chat adelante a los archivos')
+    parser.add_argument('--no-metrics', action='store_true', help='no abrir el endpoint de métricas')
+    args = parser.parse_args(argv)
+
+    iface = ','.join(engine.detect_up_ifaces()) if args.bond else args.iface
+    chat_history = None if args.no_history else history.History(args.history)
+    if args.psk_file:
+        with open(args.psk_file) as f:
+            key = bytes.fromhex(f.read().strip())
+    else:
+        key = engine.configured_key()
+    eng = engine.Engine(iface, out_dir=args.out_dir, history=chat_history, key=key,
+                        encrypt=not args.no_encrypt,
+                        tx_rate=args.tx_rate_mbit * 1e6 if args.tx_rate_mbit else None).start()
+    if key is not None:
+        log.info('daemon', "tramas autenticadas%s", '' if args.no_encrypt else ' y cifradas')
+    log.info('daemon', "interface: %s local MAC: %s", eng.iface, log.mac(eng.src_mac))
+    log.install_dump_signal()
+
+    metrics_server = None
+    if not args.no_metrics:
+        metrics.gauge('linkchat_queue_depth', 'Elementos en cola por etapa', label='stage',
+                      fn=eng.queue_depths)
+        try:
+            metrics_server = metrics.MetricsServer().start()
+        except OSError as e:
+            log.warning('daemon', "metrics endpoint no disponible: %s", e)
+
+    server = ControlServer(eng, args.socket).start()
+    log.info('daemon', "control: %s", server.path)
+
+    # SIGTERM y SIGINT terminan limpiamente
+    done = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: done.set())
+    while not done.wait(1.0):
+        pass
+
+    server.stop()
+    if metrics_server is not None:
+        metrics_server.stop()
+    eng.stop()
+    if chat_history is not None:
+        chat_history.close()
+    log.info('daemon', "Finalizado correctamente.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
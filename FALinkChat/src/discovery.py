@@ -6,93 +6,542 @@
 # - Mantenimiento de lista de vecinos activos
 # - Limpieza automática de nodos inactivos
 # - Uso de broadcast Ethernet para búsqueda
+# - Descubrimiento periódico en segundo plano con intervalo aleatorizado (jitter)
+# - Tabla de vecinos indexada por instante de caducidad (heap) y eventos join/leave
+# - Aprendizaje pasivo: cualquier trama Link-Chat válida refresca a su emisor, y solo
+#   se sondea activamente (DISCOVERY unicast) a los vecinos que llevan tiempo callados
+# - Supresión de tormentas: respuestas con retardo aleatorio proporcional a la población,
+#   una sola respuesta por solicitante en cada ventana, filtro de Bloom de vecinos ya
+#   conocidos y REPLY agregados que responden en nombre de otros vecinos
+# - Estadísticas de enlace por vecino (RTT, jitter, pérdida, ancho de banda) que
+#   rellena prober.LinkProber, y listado de vecinos ordenado por calidad
 
+import collections
+import hashlib
+import heapq
+import math
+import random
+import struct
+import threading
 import time
 import protocolo
 import network
+import log
+import metrics
 
 # Dirección MAC de broadcast: FF:FF:FF:FF:FF:FF
 # Cuando se usa esta dirección, la trama llega a todos los equipos de la red local
 BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
 
+# Segundos sin noticias de un vecino antes de darlo por desaparecido
+NEIGHBOR_TTL = 300
+# Intervalo medio entre DISCOVERY periódicos y su variación relativa (+/- 25 %).
+# El jitter evita que todos los nodos arrancados a la vez emitan sincronizados.
+DISCOVERY_INTERVAL = 30.0
+DISCOVERY_JITTER = 0.25
+# Segundos de silencio tras los que se sondea a un vecino con un DISCOVERY unicast,
+# y cada cuánto se repite el sondeo mientras siga callado (hasta caducar)
+PROBE_AFTER = 90.0
+PROBE_RETRY = 30.0
+# Supresión de tormentas de REPLY ante un DISCOVERY broadcast:
+# - REPLY_SLOT: segundos de retardo máximo por vecino conocido (la ventana de
+#   respuesta crece con la población), acotado por REPLY_BACKOFF_MAX
+# - REPLY_DEDUP_WINDOW: un mismo solicitante solo obtiene una respuesta por ventana
+# - Con más de REPLY_SMALL_POPULATION vecinos solo responde una fracción de nodos,
+#   unos REPLY_AGGREGATORS por cada MAX_AGGREGATE vecinos, y cada REPLY lista hasta
+#   MAX_AGGREGATE vecinos recientes (el solicitante aprende el resto por agregación
+#   o de forma pasiva con el siguiente anuncio de cada nodo)
+REPLY_SLOT = 0.002
+REPLY_BACKOFF_MAX = 1.0
+REPLY_DEDUP_WINDOW = 2.0
+REPLY_SMALL_POPULATION = 16
+REPLY_AGGREGATORS = 4
+MAX_AGGREGATE = 200
+# Tamaño máximo del filtro de Bloom de vecinos conocidos (bytes) y número de hashes
+BLOOM_MAX_BYTES = 1024
+BLOOM_HASHES = 3
+# Tamaño de referencia para comparar la calidad de los enlaces con los vecinos
+QUALITY_REF_BYTES = 65536
+
+# Métricas de descubrimiento (las tramas por tipo las cuenta network)
+PROBES_SENT = metrics.counter('linkchat_discovery_probes_total', 'DISCOVERY unicast a vecinos callados')
+REPLIES_SUPPRESSED = metrics.counter('linkchat_discovery_replies_suppressed_total',
+                                     'REPLY no enviados por supresión de tormentas', label='reason')
+NEIGHBOR_EVENTS = metrics.counter('linkchat_neighbor_events_total', 'Altas y bajas de vecinos', label='event')
+
+
+def _bloom_positions(mac, nbits):
+    # Posiciones de bit de una MAC en un filtro de `nbits` bits
+    digest = hashlib.blake2b(mac, digest_size=2 * BLOOM_HASHES).digest()
+    return [int.from_bytes(digest[2 * i:2 * i + 2], 'big') % nbits for i in range(BLOOM_HASHES)]
+
+
+def bloom_build(macs):
+    # Filtro de Bloom con ~8 bits por MAC (potencia de 2 entre 64 y BLOOM_MAX_BYTES bytes)
+    nbytes = 64
+    while nbytes < len(macs) and nbytes < BLOOM_MAX_BYTES:
+        nbytes *= 2
+    bits = bytearray(nbytes)
+    for mac in macs:
+        for pos in _bloom_positions(mac, nbytes * 8):
+            bits[pos >> 3] |= 1 << (pos & 7)
+    return bytes(bits)
+
+
+def bloom_contains(bloom, mac):
+    # Puede dar falsos positivos (nunca falsos negativos)
+    if not bloom:
+        return False
+    return all(bloom[pos >> 3] & (1 << (pos & 7)) for pos in _bloom_positions(mac, len(bloom) * 8))
+
 class Discovery:
     # Esta clase maneja el protocolo de descubrimiento:
     # - Envía mensajes broadcast para encontrar otros nodos
     # - Procesa respuestas de otros nodos
     # - Mantiene una tabla actualizada de vecinos
     # - Limpia automáticamente nodos que ya no responden
+    # Tabla de vecinos:
+    # - self.neighbors guarda la información de cada vecino (último contacto)
+    # - self._expiry es un heap (instante, mac) con una sola entrada por vecino;
+    #   refrescar un vecino solo actualiza last_seen (O(1)) y, al llegar su entrada
+    #   a la cima del heap, se decide según el silencio del vecino: reinsertar,
+    #   sondearlo o eliminarlo. Así el trabajo es incremental: solo se tocan los
+    #   vecinos que llevan callados más de `probe_after` segundos.
+    # - observe(mac) lo llama el hilo receptor con el origen de cualquier trama
+    #   válida (chat, fragmento, ACK...): el tráfico normal mantiene viva la tabla
+    #   sin REPLYs. Los DISCOVERY periódicos hacen de anuncio (heartbeat): solo
+    #   responden los nodos que aún no conocían al emisor, salvo que el DISCOVERY
+    #   lleve FLAG_SOLICIT (Connect del usuario, arranque o sondeo unicast).
+    # - Los DISCOVERY broadcast llevan un filtro de Bloom de los vecinos conocidos:
+    #   quien ya aparece en él no responde. El resto programa su REPLY con un
+    #   retardo aleatorio escalado a la población (self._replies, procesado en tick),
+    #   responde una sola vez por solicitante en la ventana de deduplicación y, en
+    #   segmentos grandes, solo una fracción de nodos responde: sus REPLY incluyen
+    #   la lista de vecinos recientes (TLV_NEIGHBORS), respondiendo por los demás.
+    #   Los sondeos unicast se responden siempre y sin retardo.
+    # - get_neighbors() devuelve una lista precalculada que solo se reconstruye
+    #   cuando cambia la membresía, así leerla cada segundo no cuesta nada
+    # - subscribe(callback) notifica callback('join'|'leave', mac) en cada alta/baja
+    # - Grupos multicast: join_group/leave_group apuntan el transporte a la MAC
+    #   del grupo y la anuncian en cada DISCOVERY/REPLY (TLV_GROUPS, con un
+    #   anuncio inmediato al cambiar). self.members es la tabla de miembros por
+    #   grupo (solo vecinos vivos), que usan los envíos a un grupo
+    # - Cada DISCOVERY/REPLY anuncia la MTU propia (TLV_MTU); peer_mtu(mac) da la
+    #   negociada con un vecino, con la que FileTransfer elige el tamaño de fragmento
+    # - start() lanza un hilo que envía DISCOVERY periódicos con jitter y procesa
+    #   las caducidades; tick(now) hace ese mismo trabajo de forma síncrona
 
-    def __init__(self, sock, src_mac):
-        # Socket raw para enviar/recibir tramas Ethernet
-        self.sock = sock
+    def __init__(self, transport, src_mac, ttl=NEIGHBOR_TTL, interval=DISCOVERY_INTERVAL,
+                 probe_after=None, clock=time.time):
+        # Transporte para enviar/recibir tramas Ethernet (ver transport.py)
+        self.transport = transport
         # MAC address de este nodo
         self.src_mac = src_mac
         # Diccionario de vecinos descubiertos
         # Clave: MAC address del vecino
         # Valor: Diccionario con información del vecino (timestamp último contacto)
         self.neighbors = {}
+        self.ttl = ttl
+        self.interval = interval
+        self.probe_after = probe_after if probe_after is not None else min(PROBE_AFTER, ttl / 2.0)
+        self.probe_retry = min(PROBE_RETRY, self.probe_after / 3.0)
+        # Contadores de tramas de discovery emitidas (para medir su coste)
+        self.sent_discovery = 0
+        self.sent_replies = 0
+        self.sent_probes = 0
+        # Reloj inyectable para poder simular el paso del tiempo en pruebas
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._expiry = []
+        # Lista de vecinos servida por get_neighbors (None = hay que reconstruirla)
+        self._snapshot = []
+        self._subscribers = []
+        self._rng = random.Random()
+        self._next_discovery = 0.0
+        # REPLY pendientes: heap (instante de envío, mac) y últimas respuestas
+        # por solicitante (en orden de inserción) para deduplicar
+        self._replies = []
+        self._answered = collections.OrderedDict()
+        # Grupos propios (MACs multicast) y miembros conocidos: grupo -> set de MACs
+        self.groups = set()
+        self.members = {}
+        # MTU propia que se anuncia en cada DISCOVERY/REPLY
+        self.mtu = getattr(transport, 'mtu', network.ETH_MTU)
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
 
-    def send_discovery(self):
+    def send_discovery(self, solicit=True, dst_mac=BROADCAST_MAC):
         # Envía mensaje de descubrimiento:
-        # 1. Crea un mensaje tipo DISCOVERY sin payload
-        # 2. Lo envía a la dirección de broadcast
-        # 3. Todos los nodos en la red local lo recibirán
-        # 4. Los nodos responderán con un mensaje REPLY
-        
-        # Crear header tipo DISCOVERY (sin payload)
-        header = protocolo.pack_header(
-            file_id=0,
-            total_frags=0,
-            frag_index=0,
-            flags=0,
-            msg_type=protocolo.MSG_DISCOVERY,
-            payload_len=0
-        )
-        frame = network.build_ethernet_frame(
-            BROADCAST_MAC,  # Broadcast a toda la red local
-            self.src_mac,
-            network.ETH_P_CUSTOM,
-            header
-        )
-        network.send_frame(self.sock, frame)
-
-    def handle_packet(self, src_mac, payload):
+        # 1. Crea un mensaje tipo DISCOVERY (con los TLV que anuncie el transporte)
+        # 2. Lo envía a la dirección de broadcast (o unicast si es un sondeo)
+        # 3. Todos los nodos en la red local lo recibirán y nos registrarán
+        # 4. Con solicit=True todos responden con REPLY; sin él solo los que no
+        #    nos conocían (el resto ya nos aprendió al recibir la trama)
+        flags = protocolo.FLAG_SOLICIT if solicit else 0
+        extra = []
+        if dst_mac == BROADCAST_MAC:
+            with self.lock:
+                known = list(self.neighbors.keys())
+            if known:
+                extra.append((protocolo.TLV_KNOWN_BLOOM, bloom_build(known)))
+        frame = self._build_control(dst_mac, protocolo.MSG_DISCOVERY, flags, extra)
+        network.send_frame(self.transport, frame)
+        if dst_mac == BROADCAST_MAC:
+            self.sent_discovery += 1
+        else:
+            self.sent_probes += 1
+            PROBES_SENT.inc()
+
+    def join_group(self, mac):
+        # Se une al grupo en el transporte y lo anuncia sin esperar al siguiente DISCOVERY
+        with self.lock:
+            if mac in self.groups:
+                return
+            self.groups.add(mac)
+        hook = getattr(self.transport, 'join', None)
+        if hook:
+            hook(mac)
+        self.send_discovery(solicit=False)
+
+    def leave_group(self, mac):
+        with self.lock:
+            if mac not in self.groups:
+                return
+            self.groups.discard(mac)
+        hook = getattr(self.transport, 'leave', None)
+        if hook:
+            hook(mac)
+        self.send_discovery(solicit=False)
+
+    def group_members(self, mac):
+        # Vecinos vivos que anuncian el grupo
+        with self.lock:
+            return sorted(self.members.get(mac, ()))
+
+    def _learn_groups(self, mac, value):
+        # Actualiza los grupos anunciados por un vecino (TLV_GROUPS ausente = ninguno)
+        groups = frozenset(value[i:i + 6] for i in range(0, len(value) - len(value) % 6, 6))
+        with self.lock:
+            info = self.neighbors.get(mac)
+            if info is None:
+                return
+            old = info.get("groups", frozenset())
+            if old == groups:
+                return
+            info["groups"] = groups
+            self._set_member(mac, old - groups, False)
+            self._set_member(mac, groups - old, True)
+
+    def _learn_mtu(self, mac, value):
+        # MTU anunciada por el vecino (sin TLV_MTU queda sin MTU: nodo antiguo)
+        if value is None or len(value) < 2:
+            return
+        with self.lock:
+            info = self.neighbors.get(mac)
+            if info is not None:
+                info['mtu'] = struct.unpack('!H', value[:2])[0]
+
+    def peer_mtu(self, mac):
+        # MTU negociada con el vecino (la menor de las dos) o None si no la
+        # anunció: entonces solo entiende fragmentos de tamaño fijo
+        with self.lock:
+            info = self.neighbors.get(mac)
+            mtu = info.get('mtu') if info is not None else None
+        return None if mtu is None else min(self.mtu, mtu)
+
+    def _set_member(self, mac, groups, present):
+        # Llamar con self.lock tomado
+        for g in groups:
+            if present:
+                self.members.setdefault(g, set()).add(mac)
+            else:
+                members = self.members.get(g)
+                if members is not None:
+                    members.discard(mac)
+                    if not members:
+                        del self.members[g]
+
+    def _build_control(self, dst_mac, msg_type, flags=0, extra_tlvs=()):
+        # Construye una trama DISCOVERY/REPLY: los TLV (siempre TLV_MTU y, según
+        # el caso, las MAC de todos los enlaces en modo bonding, el filtro de
+        # vecinos conocidos, la lista agregada o los grupos) van como contenido
+        # de un mensaje con CRC (protocolo.pack_message)
+        hook = getattr(self.transport, 'discovery_tlvs', None)
+        tlvs = (hook() if hook else []) + list(extra_tlvs)
+        tlvs.append((protocolo.TLV_MTU, struct.pack('!H', self.mtu)))
+        if self.groups:
+            tlvs.append((protocolo.TLV_GROUPS, b''.join(sorted(self.groups))))
+        body = protocolo.pack_message(msg_type, 0, protocolo.pack_tlvs(tlvs), flags=flags, total_frags=0)
+        return network.build_ethernet_frame(dst_mac, self.src_mac, network.ETH_P_CUSTOM, body)
+
+    def _read_tlvs(self, src_mac, hdr, payload):
+        # Extrae los TLV de un DISCOVERY/REPLY y se los pasa al transporte para que
+        # aprenda del vecino. Devuelve (mac, tlvs): la MAC con la que identificar al
+        # vecino (la principal anunciada en TLV_MACS o, si no hay, la de origen)
+        # y un diccionario tipo -> valor con los TLV recibidos.
+        if hdr['payload_len'] == 0:
+            return src_mac, {}
+        _, content = protocolo.unpack_message(payload)
+        tlvs = protocolo.unpack_tlvs(content)
+        hook = getattr(self.transport, 'learn_peer', None)
+        if hook:
+            hook(src_mac, tlvs)
+        fields = dict(tlvs)
+        macs = fields.get(protocolo.TLV_MACS, b'')
+        return (macs[:6] if len(macs) >= 6 else src_mac), fields
+
+    def handle_packet(self, src_mac, payload, dst_mac=None):
         # Procesa mensajes de descubrimiento:
-        # - Si recibe DISCOVERY: responde con REPLY al emisor
-        # - Si recibe REPLY: actualiza tabla de vecinos
+        # - Si recibe DISCOVERY: responde con REPLY al emisor (ver supresión arriba)
+        # - Si recibe REPLY: actualiza tabla de vecinos, incluidos los agregados
         # Este sistema permite mantener una lista actualizada
         # de nodos activos en la red
+        # dst_mac (opcional) distingue un sondeo unicast de un DISCOVERY broadcast
         
         hdr, _ = protocolo.unpack_header(payload)
+        # Si el mensaje trae TLVs con CRC inválido, unpack_message lanza ValueError
+        peer_mac, fields = self._read_tlvs(src_mac, hdr, payload)
 
         if hdr["msg_type"] == protocolo.MSG_DISCOVERY:
-            # Recibimos discovery, responder con mensaje REPLY unicast
-            reply_hdr = protocolo.pack_header(
-                file_id=0,
-                total_frags=0,
-                frag_index=0,
-                flags=0,
-                msg_type=protocolo.MSG_REPLY,
-                payload_len=0
-            )
-            reply_frame = network.build_ethernet_frame(
-                src_mac,        # Enviar a quien pidió discovery
-                self.src_mac,
-                network.ETH_P_CUSTOM,
-                reply_hdr
-            )
-            network.send_frame(self.sock, reply_frame)
+            # Quien envía un DISCOVERY está vivo: lo registramos. Respondemos con
+            # REPLY unicast si lo pide explícitamente o si no lo conocíamos (para
+            # que él también nos aprenda); si ya lo conocíamos, es un heartbeat.
+            known = peer_mac in self.neighbors
+            self.touch(peer_mac)
+            self._learn_groups(peer_mac, fields.get(protocolo.TLV_GROUPS, b''))
+            self._learn_mtu(peer_mac, fields.get(protocolo.TLV_MTU))
+            if dst_mac is not None and not dst_mac[0] & 0x01:
+                # Sondeo unicast: nadie más responde, no hay tormenta posible
+                self._send_reply(peer_mac)
+            elif protocolo.is_flag_set(hdr['flags'], protocolo.FLAG_SOLICIT) or not known:
+                self._schedule_reply(peer_mac, fields.get(protocolo.TLV_KNOWN_BLOOM))
 
         elif hdr["msg_type"] == protocolo.MSG_REPLY:
             # Vecino responde, actualizamos tabla de vecinos con timestamp
-            self.neighbors[src_mac] = {"last_seen": time.time()}
+            self.touch(peer_mac)
+            self._learn_groups(peer_mac, fields.get(protocolo.TLV_GROUPS, b''))
+            self._learn_mtu(peer_mac, fields.get(protocolo.TLV_MTU))
+            # REPLY agregado: el vecino responde también por los que él conoce
+            listed = fields.get(protocolo.TLV_NEIGHBORS, b'')
+            for i in range(0, len(listed) - len(listed) % 6, 6):
+                mac = listed[i:i + 6]
+                if mac != self.src_mac:
+                    self.touch(mac)
+
+    def _schedule_reply(self, peer_mac, bloom=None):
+        # Decide si (y cuándo) responder a un DISCOVERY broadcast de peer_mac
+        if bloom_contains(bloom, self.src_mac):
+            # El solicitante ya nos conoce: nuestra respuesta no le aporta nada
+            REPLIES_SUPPRESSED.inc(1, 'bloom')
+            return
+        now = self.clock()
+        with self.lock:
+            # Deduplicación: una respuesta por solicitante y ventana
+            while self._answered and next(iter(self._answered.values())) <= now - REPLY_DEDUP_WINDOW:
+                self._answered.popitem(last=False)
+            if peer_mac in self._answered:
+                REPLIES_SUPPRESSED.inc(1, 'dedup')
+                return
+            self._answered[peer_mac] = now
+            population = len(self.neighbors)
+        if population <= REPLY_SMALL_POPULATION:
+            if population <= 1:
+                # Segmento mínimo: responder ya
+                self._send_reply(peer_mac)
+                return
+        else:
+            # Segmento grande: responde solo una fracción (agregadores)
+            share = REPLY_AGGREGATORS * math.ceil(population / float(MAX_AGGREGATE)) / float(population)
+            if self._rng.random() >= share:
+                REPLIES_SUPPRESSED.inc(1, 'aggregated')
+                return
+        delay = self._rng.uniform(0, min(REPLY_BACKOFF_MAX, REPLY_SLOT * population))
+        with self.lock:
+            heapq.heappush(self._replies, (now + delay, peer_mac))
+        self._wakeup.set()
+
+    def _send_reply(self, peer_mac):
+        # REPLY unicast con la lista agregada de vecinos recientes (sin el destinatario)
+        now = self.clock()
+        with self.lock:
+            fresh = [m for m, info in self.neighbors.items()
+                     if m != peer_mac and now - info["last_seen"] < self.probe_after]
+        if len(fresh) > MAX_AGGREGATE:
+            fresh = self._rng.sample(fresh, MAX_AGGREGATE)
+        extra = [(protocolo.TLV_NEIGHBORS, b''.join(fresh))] if fresh else []
+        reply_frame = self._build_control(peer_mac, protocolo.MSG_REPLY, extra_tlvs=extra)
+        network.send_frame(self.transport, reply_frame)
+        self.sent_replies += 1
+
+    def _flush_replies(self, now):
+        # Envía los REPLY cuyo retardo aleatorio ya venció
+        due = []
+        with self.lock:
+            while self._replies and self._replies[0][0] <= now:
+                due.append(heapq.heappop(self._replies)[1])
+        for mac in due:
+            try:
+                self._send_reply(mac)
+            except Exception as e:
+                log.error('discovery', "error sending reply: %s", e)
+
+    def observe(self, mac):
+        # Aprendizaje pasivo desde el hilo receptor: el origen de cualquier trama
+        # Link-Chat válida es un vecino vivo (se ignoran la MAC propia y las de grupo)
+        if mac == self.src_mac or mac[0] & 0x01:
+            return
+        self.touch(mac)
+
+    def touch(self, mac, now=None):
+        # Registra actividad de un vecino: lo da de alta si es nuevo o solo
+        # actualiza su último contacto (la entrada del heap se corrige al caducar)
+        now = self.clock() if now is None else now
+        with self.lock:
+            info = self.neighbors.get(mac)
+            if info is not None:
+                info["last_seen"] = now
+                return
+            self.neighbors[mac] = {"last_seen": now}
+            heapq.heappush(self._expiry, (now + self.probe_after, mac))
+            self._snapshot = None
+        self._notify('join', mac)
+
+    def expire(self, now=None):
+        # Procesa solo las entradas del heap ya vencidas, según el silencio del vecino:
+        # - Menos de probe_after: se refrescó entretanto, se reinserta para más tarde
+        # - Entre probe_after y ttl: se le sondea con un DISCOVERY unicast (cada
+        #   probe_retry segundos como mucho) y se reinserta
+        # - Más de ttl: se elimina de la tabla y se emite 'leave'
+        # Cuando nada ha vencido el coste es mirar la cima del heap.
+        now = self.clock() if now is None else now
+        gone = []
+        probes = []
+        with self.lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, mac = heapq.heappop(self._expiry)
+                info = self.neighbors.get(mac)
+                if info is None:
+                    continue
+                silent = now - info["last_seen"]
+                if silent < self.probe_after:
+                    heapq.heappush(self._expiry, (info["last_seen"] + self.probe_after, mac))
+                elif silent < self.ttl:
+                    if now - info.get("probed", 0.0) >= self.probe_retry:
+                        info["probed"] = now
+                        probes.append(mac)
+                    deadline = min(info["last_seen"] + self.ttl, now + self.probe_retry)
+                    heapq.heappush(self._expiry, (deadline, mac))
+                else:
+                    del self.neighbors[mac]
+                    self._set_member(mac, info.get("groups", ()), False)
+                    self._snapshot = None
+                    gone.append(mac)
+        for mac in probes:
+            try:
+                self.send_discovery(solicit=True, dst_mac=mac)
+            except Exception as e:
+                log.error('discovery', "error probing neighbor: %s", e)
+        for mac in gone:
+            self._notify('leave', mac)
+        return gone
+
+    def subscribe(self, callback):
+        # callback(evento, mac) con evento 'join' o 'leave'. Se invoca desde el
+        # hilo que detecta el cambio (receptor o discovery): debe ser rápido,
+        # por ejemplo encolar el evento para la GUI.
+        self._subscribers.append(callback)
+
+    def _notify(self, event, mac):
+        NEIGHBOR_EVENTS.inc(1, event)
+        for cb in list(self._subscribers):
+            try:
+                cb(event, mac)
+            except Exception as e:
+                log.error('discovery', "subscriber error: %s", e)
+
+    def tick(self, now=None):
+        # Trabajo periódico: caducar vecinos y, si toca, enviar un DISCOVERY.
+        # Devuelve los segundos hasta el próximo trabajo pendiente.
+        now = self.clock() if now is None else now
+        self._flush_replies(now)
+        self.expire(now)
+        if now >= self._next_discovery:
+            try:
+                # Anuncio periódico; solo pedimos respuesta a todos si aún no
+                # conocemos a nadie (p. ej. al arrancar)
+                self.send_discovery(solicit=not self.neighbors)
+            except Exception as e:
+                log.error('discovery', "error sending discovery: %s", e)
+            jitter = self._rng.uniform(-DISCOVERY_JITTER, DISCOVERY_JITTER)
+            self._next_discovery = now + self.interval * (1 + jitter)
+        wake = self._next_discovery
+        with self.lock:
+            if self._expiry:
+                wake = min(wake, self._expiry[0][0])
+            if self._replies:
+                wake = min(wake, self._replies[0][0])
+        return max(0.0, wake - now)
+
+    def start(self):
+        # Lanza el descubrimiento continuo en un hilo daemon
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = self.tick()
+            # Despertamos al menos cada segundo, o antes si se programa un REPLY
+            self._wakeup.wait(min(wait, 1.0))
+            self._wakeup.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
 
     def get_neighbors(self):
         # Sistema de mantenimiento de vecinos:
-        # 1. Elimina nodos no vistos en los últimos 5 minutos
+        # 1. Procesa las caducidades pendientes (vecinos no vistos en `ttl` segundos)
         # 2. Esto evita mantener nodos que ya no están activos
-        # 3. Asegura que la lista de vecinos está actualizada
-        # 4. Retorna solo los nodos que están respondiendo
-        tiempo_actual = time.time()
-        self.neighbors = {mac: info for mac, info in self.neighbors.items() if tiempo_actual - info["last_seen"] < 300}
-        return list(self.neighbors.keys())
+        # 3. Devuelve la lista de vecinos activos precalculada; solo se reconstruye
+        #    tras un alta o una baja. La lista es compartida: no modificarla.
+        self.expire()
+        with self.lock:
+            if self._snapshot is None:
+                self._snapshot = list(self.neighbors.keys())
+            return self._snapshot
+
+    def update_stats(self, mac, **stats):
+        # Guarda en la entrada del vecino las medidas de calidad del enlace
+        # (rtt, rttvar, jitter, loss, bw) que calcula prober.LinkProber
+        with self.lock:
+            info = self.neighbors.get(mac)
+            if info is not None:
+                info.update(stats)
+
+    def get_info(self, mac):
+        # Copia de la entrada del vecino (last_seen y estadísticas) o None
+        with self.lock:
+            info = self.neighbors.get(mac)
+            return dict(info) if info is not None else None
+
+    def get_neighbors_by_quality(self):
+        # Vecinos activos ordenados del mejor al peor enlace según quality_key
+        neighbors = self.get_neighbors()
+        with self.lock:
+            infos = [(mac, dict(self.neighbors.get(mac, {}))) for mac in neighbors]
+        return [mac for mac, info in sorted(infos, key=lambda item: quality_key(item[1]))]
+
+
+def quality_key(info):
+    # Clave de ordenación (menor es mejor): segundos estimados para entregar
+    # QUALITY_REF_BYTES teniendo en cuenta RTT, ancho de banda y pérdida.
+    # Los vecinos todavía sin medir quedan al final.
+    rtt = info.get("rtt")
+    if rtt is None:
+        return float('inf')
+    bw = info.get("bw")
+    cost = rtt + (QUALITY_REF_BYTES / bw if bw else 0.0)
+    loss = min(info.get("loss", 0.0), 0.99)
+    return cost / (1.0 - loss)
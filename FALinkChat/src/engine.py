@@ -0,0 +1,746 @@
+# src/engine.py
+# Este módulo reúne el motor de red de Link-Chat sin ninguna dependencia de la GUI
+# Lo usan tanto la aplicación Tkinter (main.py) como el demonio sin interfaz
+# (daemon.py), de modo que ambos comparten exactamente el mismo camino de datos:
+# - Apertura del transporte (socket raw, bonding o cualquier transport.Transport)
+# - Hilo receptor que despacha cada trama a discovery, prober, emisor y pipeline
+# - Pipeline de recepción (reensamblado, escritura a disco y notificación)
+# - Planificador de transmisión (scheduler.TxScheduler): el chat adelanta a los archivos
+# - Envío de chats, archivos y carpetas con un registro de transferencias
+#   (estado, tamaño, duración, goodput y, en curso, avance y ETA) consultable en
+#   cualquier momento; transfer_manager.TransferManager reparte los envíos
+#   entre vecinos con límites de concurrencia
+# - Historial de chat opcional (history.History) con los mensajes recibidos y enviados
+# - Capa de seguridad opcional (security.SecureTransport) con una clave compartida
+# - Envíos a varios vecinos en broadcast fiable (broadcast.Broadcast): cada
+#   fragmento sale una sola vez para todos, con reparación por NACK
+# - Grupos con nombre (canales de equipo): MAC multicast por grupo
+#   (transport.group_mac), membresía en la NIC y tabla de miembros en discovery
+# - Streams de bytes ordenados y con control de flujo (stream.StreamHub) para
+#   tuberías continuas entre nodos (ver lcat.py)
+# - Descarga multi-origen (swarm.Swarm): un archivo compartido se identifica por
+#   su raíz Merkle y se descarga por piezas de todos los vecinos que lo tienen
+# - Eventos para suscriptores como dicts listos para serializar en JSON:
+#     {'event': 'chat', 'from': 'aa:bb:..', 'text': '...'} (+ 'group': nombre si fue a un grupo)
+#     {'event': 'file', 'from': 'aa:bb:..', 'path': '/ruta/received_...bin'}
+#     {'event': 'neighbor', 'action': 'join' | 'leave', 'mac': 'aa:bb:..'}
+#     {'event': 'transfer', 'id': 3, 'state': 'done' | 'failed', ...}
+#     {'event': 'error', 'message': '...'}
+# Las MACs se exponen siempre como texto 'aa:bb:cc:dd:ee:ff'.
+
+import collections
+import fcntl
+import itertools
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import protocolo
+import network
+import file_transfer
+import discovery
+import transport
+import prober
+import scheduler
+import transfer_manager
+import pipeline
+import history
+import broadcast
+import stream
+import swarm
+import log
+import metrics
+
+# Dirección MAC de broadcast (todo el LAN)
+BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
+
+# Transferencias terminadas que se recuerdan para transfers()
+TRANSFER_HISTORY = 1024
+
+# Estados de una transferencia
+QUEUED = 'queued'
+SENDING = 'sending'
+DONE = 'done'
+FAILED = 'failed'
+
+# Tipos de mensaje del broadcast fiable (broadcast.Broadcast)
+BCAST_TYPES = (protocolo.MSG_BCAST_DATA, protocolo.MSG_BCAST_POLL,
+               protocolo.MSG_BCAST_NACK, protocolo.MSG_BCAST_DONE)
+# Tipos de mensaje de los streams (stream.StreamHub)
+STREAM_TYPES = (protocolo.MSG_STREAM_OPEN, protocolo.MSG_STREAM_DATA, protocolo.MSG_STREAM_ACK)
+# Tipos de mensaje de los anuncios de contenido (swarm.Swarm)
+SWARM_TYPES = (protocolo.MSG_SWARM_QUERY, protocolo.MSG_SWARM_HAVE)
+
+# Errores inesperados del bucle receptor
+RX_LOOP_ERRORS = metrics.counter('linkchat_rx_loop_errors_total', 'Excepciones capturadas en el hilo receptor')
+
+
+def mac_str_to_bytes(mac_str: str) -> bytes:
+    """
+    Convierte una MAC en formato 'aa:bb:cc:dd:ee:ff' a 6 bytes.
+    Útil para cuando el usuario introduce MACs en forma textual.
+    """
+    return bytes(int(x, 16) for x in mac_str.split(':'))
+
+def mac_bytes_to_str(mac_bytes: bytes) -> str:
+    """
+    Convierte 6 bytes de MAC a su representación textual con ':'.
+    """
+    return ':'.join(f'{b:02x}' for b in mac_bytes)
+
+def get_interface_mac(iface: str) -> bytes:
+    """
+    Obtener la dirección MAC asociada a la interfaz `iface` en Linux.
+    - Crea un socket UDP solo para obtener un file descriptor (no envía UDP).
+    - Llama a ioctl(SIOCGIFHWADDR) para pedir al kernel la dirección hardware.
+    - Extrae los 6 bytes de la MAC del buffer devuelto (offset 18:24).
+    Nota: esta implementación asume Linux y layout del struct ifreq.
+    """
+    # Creamos socket (AF_INET, SOCK_DGRAM) únicamente para usar su fileno()
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # Preparar el buffer estilo ifreq con el nombre de la interfaz (max 15 chars)
+    # struct.pack('256s', ...) crea 256 bytes donde los primeros contienen el nombre.
+    info = fcntl.ioctl(s.fileno(), 0x8927, struct.pack('256s', bytes(iface[:15], 'utf-8')))
+    # Los 6 bytes de la MAC están en info[18:24] según layout de ifreq/ifr_hwaddr en Linux.
+    return info[18:24]
+
+def detect_up_ifaces():
+    """
+    Devuelve todas las interfaces no-loopback cuyo 'operstate' sea 'up'
+    (en el orden de /sys/class/net). Se usa para el modo bonding (--bond).
+    """
+    ups = []
+    try:
+        for ifname in sorted(os.listdir('/sys/class/net')):
+            if ifname == 'lo':
+                continue
+            try:
+                with open(f'/sys/class/net/{ifname}/operstate', 'r') as f:
+                    if f.read().strip() == 'up':
+                        ups.append(ifname)
+            except Exception:
+                continue
+    except Exception:
+        pass
+    return ups
+
+def detect_default_iface():
+    """
+    Intentar detectar automáticamente una interfaz de red valida cuando no
+    se especifica por argumento. Estrategia:
+      1) Recorre /sys/class/net buscando la primera interfaz que no sea 'lo'
+         y cuyo archivo 'operstate' diga 'up'.
+      2) Si no encuentra ninguna 'up', devuelve la primera interfaz distinta
+         de 'lo' (fallback).
+      3) Si no hay interfaces válidas, lanza RuntimeError.
+    NOTA: esta función está orientada a entornos Linux que exponen /sys/class/net.
+    """
+    # Intentamos detectar la primera interfaz 'up' (excluyendo loopback)
+    try:
+        for ifname in os.listdir('/sys/class/net'):
+            if ifname == 'lo':
+                continue
+            try:
+                with open(f'/sys/class/net/{ifname}/operstate', 'r') as f:
+                    if f.read().strip() != 'up':
+                        # si el estado no es 'up' seguimos buscando
+                        continue
+            except Exception:
+                # si hay cualquier problema leyendo el archivo (p. ej. permisos),
+                # saltamos esta interfaz
+                continue
+            # devolvemos la primera interfaz no-loopback que esté 'up'
+            return ifname
+    except Exception:
+        # si listar '/sys/class/net' falla (p. ej. no existe), caemos al fallback
+        pass
+
+    # fallback: devolvemos la primera interfaz que no sea 'lo' (aunque no esté 'up')
+    try:
+        for ifname in os.listdir('/sys/class/net'):
+            if ifname != 'lo':
+                return ifname
+    except Exception:
+        pass
+
+    # si todo falla, pedimos al usuario que especifique --iface
+    raise RuntimeError("No se pudo detectar interfaz automáticamente; usa --iface")
+
+
+def _read(path):
+    # Contenido de un archivo a enviar: mapeado en memoria (el emisor lee cada
+    # fragmento al enviarlo o reenviarlo y el sistema operativo gestiona las
+    # páginas); los archivos vacíos no se pueden mapear
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Inicialización de la red y creación de objetos principales
+def configured_key():
+    """
+    Clave de la capa de seguridad configurada en el entorno (LINKCHAT_PSK en hex
+    o LINKCHAT_PASSWORD), o None si no hay. El módulo security solo se importa
+    si hay clave, para no retrasar el arranque de los nodos sin autenticación.
+    """
+    if not (os.environ.get('LINKCHAT_PSK') or os.environ.get('LINKCHAT_PASSWORD')):
+        return None
+    import security
+    return security.key_from_env()
+
+
+def start_network(iface, sock=None, key=None, encrypt=True, tx_rate=None):
+    """
+    Inicializar la capa de enlace:
+      - abre el transporte: por defecto un transport.RawTransport (socket raw
+        AF_PACKET) sobre la interfaz indicada; se puede pasar cualquier otro
+        transporte en `sock` (memoria, UDP loopback, con degradación...) para
+        probar o medir sin root ni interfaz real
+      - con `key`, lo envuelve en security.SecureTransport: todas las tramas
+        se autentican (y se cifran si `encrypt`); ver src/security.py
+      - encima pone scheduler.TxScheduler: un único hilo emisor con prioridades
+        (ACK > chat > discovery > archivos) y reparto justo entre transferencias;
+        `tx_rate` (bits/s) fija el ritmo de emisión si se conoce el enlace
+      - obtiene la MAC local
+      - instancia discovery.Discovery (clase para buscar vecinos)
+      - instancia FileTransfer (emisor) y FileReceiver (receptor)
+      - instancia prober.LinkProber (sondas de eco por vecino), cuyas medidas
+        usa el emisor para elegir ventana y timeout de cada transferencia
+      - conecta el emisor con la MTU que negocia discovery con cada vecino:
+        el tamaño de fragmento se adapta a ella y a la pérdida observada
+    Devuelve: sock, src_mac, disc_obj, ft_sender, ft_receiver, link_prober
+    (sock es el transporte usado por todos los objetos)
+    """
+    # Crear transporte raw (AF_PACKET) para enviar/recibir tramas Ethernet.
+    # Con varias interfaces ("eth0,eth1") se abre un socket por interfaz y se
+    # agrupan en modo bonding: la MAC de la primera identifica al nodo.
+    if sock is None:
+        ifaces = [i for i in iface.split(',') if i]
+        links = [transport.RawTransport(i, mac=get_interface_mac(i)) for i in ifaces]
+        sock = links[0] if len(links) == 1 else transport.BondedTransport(links)
+    # La capa de seguridad va por encima del bonding: firma con la MAC principal
+    # y el bonding ya la restaura al recibir por cualquier enlace
+    if key is not None:
+        import security
+        sock = security.SecureTransport(sock, key, encrypt=encrypt)
+    # Todas las tramas salen por el planificador (hilo emisor con prioridades)
+    sock = scheduler.TxScheduler(sock, rate_bps=tx_rate)
+    # El hilo receptor despierta periódicamente para poder comprobar stop_event
+    sock.settimeout(0.5)
+    # MAC local (6 bytes) con la que emite el transporte
+    src_mac = sock.mac
+
+    # Instanciamos objetos de uso: discovery, file transfer sender y receptor
+    disc = discovery.Discovery(sock, src_mac)
+    ft_s = file_transfer.FileTransfer(sock, BROADCAST_MAC, src_mac)
+    ft_r = file_transfer.FileReceiver(sock, None, src_mac)
+    link_prober = prober.LinkProber(sock, src_mac, disc)
+    ft_s.link_stats = link_prober
+    # Tamaño de fragmento por vecino: límite de la MTU negociada en discovery
+    ft_s.peer_mtu = disc.peer_mtu
+    return sock, src_mac, disc, ft_s, ft_r, link_prober
+
+
+# Hilo receptor: lee tramas L2 y las despacha a módulos (discovery, chat, file)
+def receiver_thread_fn(sock, disc_obj, ft_s, rx_pipeline, stop_event, link_prober=None, bcast=None, streams=None,
+                       swarm=None):
+    """
+    Bucle que corre en un hilo (daemon) y recibe tramas Ethernet del transporte `sock`:
+      - desempaqueta Ethernet (dst, src, ethertype, payload)
+      - filtra por ethertype del protocolo Link-Chat
+      - desempaqueta header del protocolo y despacha por tipo de mensaje:
+        DISCOVERY / REPLY -> disc_obj.handle_packet
+        (el resto de tipos además refrescan al emisor con disc_obj.observe)
+        CHAT -> rx_pipeline.post (etapa de notificación)
+        FILE_CHUNK -> rx_pipeline.submit_fragment (CRC + ACK aquí; reensamblado,
+                      escritura a disco y notificación en sus propias etapas)
+        ACK -> ft_s.receive_ack (confirmar fragmentos)
+        ECHO_REQ / ECHO_REPLY -> link_prober.handle_packet (calidad de enlace)
+        BCAST_* -> bcast.handle_packet (broadcast fiable: datos, POLL, NACK, DONE)
+        STREAM_* -> streams.handle_packet (streams de bytes)
+        SWARM_* -> swarm.handle_packet (anuncios y búsquedas de contenido)
+    stop_event es un threading.Event que permite salir limpiamente.
+    """
+    # Buffer de recepción a la medida de la MTU del transporte (jumbo frames)
+    buffer_size = getattr(sock, 'mtu', network.ETH_MTU) + network.RECV_MARGIN
+    while not stop_event.is_set():
+        try:
+            # Recibe una trama desde el transporte; bloquea hasta que llegue algo o venza el timeout
+            frame = network.receive_frame(sock, buffer_size)
+            if not frame:
+                # Si no hay datos (timeout del transporte), repetir
+                continue
+            # Desempaquetado L2
+            try:
+                dst_mac, src_mac, ethertype, payload = network.unpack_ethernet_frame(frame)
+            except Exception as e:
+                # Si la trama está mal formada, la ignoramos y seguimos
+                log.warning('rx', "Error unpack_ethernet_frame: %s", e)
+                continue
+
+            # Debug L2 (categoría 'rx'): con la categoría desactivada no se
+            # formatea nada, solo se consulta el flag una vez por trama
+            rx_debug = log.enabled('rx')
+            if rx_debug:
+                log.debug('rx', "L2 dst=%s src=%s etype=0x%04x len=%d",
+                          log.mac(dst_mac), log.mac(src_mac), ethertype, len(frame))
+
+            # Procesar solo tramas con el EtherType que usa Link-Chat
+            if ethertype != network.ETH_P_CUSTOM:
+                continue
+            # Multicast de un grupo al que no pertenecemos (transportes sin
+            # filtro en la NIC): se descarta sin mirar el contenido
+            if dst_mac[0] & 0x01 and dst_mac != BROADCAST_MAC and dst_mac not in disc_obj.groups:
+                continue
+
+            # Desempaquetado del header del protocolo (capa Link-Chat)
+            try:
+                hdr, body = protocolo.unpack_header(payload)
+            except Exception as e:
+                log.warning('rx', "Error unpacking header: %s", e)
+                continue
+
+            # Debug header: ver el tipo y metadatos básicos
+            if rx_debug:
+                log.debug('rx', "hdr msg_type=%d file_id=%d frag_index=%d",
+                          hdr['msg_type'], hdr['file_id'], hdr['frag_index'])
+
+            # Aprendizaje pasivo de vecinos: cualquier trama Link-Chat válida
+            # (chat, fragmento, ACK) refresca a su emisor en la tabla de discovery.
+            # DISCOVERY/REPLY lo hacen dentro de handle_packet.
+            if hdr['msg_type'] not in (protocolo.MSG_DISCOVERY, protocolo.MSG_REPLY):
+                disc_obj.observe(src_mac)
+
+            # Dispatch por tipo de mensaje
+            if hdr['msg_type'] in (protocolo.MSG_DISCOVERY, protocolo.MSG_REPLY):
+                # Mensajes de descubrimiento: pasar al objeto discovery para que responda
+                try:
+                    disc_obj.handle_packet(src_mac, payload, dst_mac)
+                except Exception as e:
+                    log.error('discovery', "handle_packet error: %s", e)
+
+            elif hdr['msg_type'] == protocolo.MSG_CHAT:
+                # Mensaje de chat: decodificar texto y pasarlo a la etapa de notificación
+                try:
+                    text = body.decode('utf-8', errors='replace')
+                except Exception:
+                    text = repr(body)
+                rx_pipeline.post(('chat', src_mac, text))
+
+            elif hdr['msg_type'] == protocolo.MSG_FILE_CHUNK:
+                # Fragmento de archivo: camino rápido del pipeline (validar y
+                # confirmar). El reensamblado y la escritura en disco ocurren en
+                # otros hilos y nunca retrasan los ACKs de otras transferencias.
+                rx_pipeline.submit_fragment(payload, src_mac)
+
+            elif hdr['msg_type'] == protocolo.MSG_ACK:
+                # ACK de fragmento: notificar al emisor para que elimine fragmento pendiente
+                ft_s.receive_ack(payload)
+
+            elif hdr['msg_type'] in (protocolo.MSG_ECHO_REQ, protocolo.MSG_ECHO_REPLY):
+                # Sondas de eco: responder o actualizar RTT/pérdida/ancho de banda del vecino
+                if link_prober is not None:
+                    link_prober.handle_packet(src_mac, payload)
+
+            elif hdr['msg_type'] in BCAST_TYPES:
+                # Broadcast fiable: fragmentos para todos y su control de pérdidas
+                if bcast is not None:
+                    bcast.handle_packet(src_mac, payload, dst_mac)
+
+            elif hdr['msg_type'] in STREAM_TYPES:
+                # Streams de bytes: apertura, segmentos y sus ACK
+                if streams is not None:
+                    streams.handle_packet(src_mac, payload)
+
+            elif hdr['msg_type'] in SWARM_TYPES:
+                # Swarm: quién tiene cada contenido (las piezas van por streams)
+                if swarm is not None:
+                    swarm.handle_packet(src_mac, payload)
+
+        except Exception as e:
+            # Capturamos excepciones de alto nivel para no matar el hilo; pequeño sleep evita bucle caliente.
+            log.error('rx', "receiver_thread_fn exception: %s", e)
+            RX_LOOP_ERRORS.inc()
+            time.sleep(0.01)
+
+
+class Engine:
+    # Nodo Link-Chat completo sin GUI:
+    # - start()/stop(): arranca y detiene pipeline, hilo receptor, discovery y prober
+    # - subscribe(cb): cb(evento) con los dicts descritos en la cabecera; se invoca
+    #   desde hilos de red, así que debe ser rápido (encolar y volver)
+    # - neighbors()/discover(): tabla de vecinos (mejor enlace primero)
+    # - send_chat/send_file/send_folder: envíos en segundo plano a uno o varios
+    #   destinos (por defecto todos los vecinos); los archivos devuelven ids de
+    #   transferencia consultables con transfers(); se encolan en self.manager y
+    #   se ejecutan como mucho transfer_manager.MAX_ACTIVE a la vez. Con
+    #   broadcast=True se envían una sola vez para todos los destinos
+    #   (self.bcast): una transferencia por archivo, fallida si algún destino
+    #   no confirma (los archivos mayores que bcast.max_size() van por
+    #   unicast). Con group='nombre' el envío va a los miembros del grupo
+    #   por su MAC multicast. Sin broadcast, las transferencias de un mismo
+    #   archivo a varios destinos comparten la codificación de los fragmentos
+    #   (file_transfer.SharedFrames)
+    # - join_group/leave_group/groups(): grupos propios y sus miembros
+    # - open_stream(mac, puerto)/listen(puerto): streams de bytes (stream.Stream)
+    # - share(path)/fetch(raíz)/content(): compartir y descargar archivos desde
+    #   varios vecinos a la vez (swarm.Swarm)
+
+    def __init__(self, iface=None, sock=None, out_dir=None, fsync=pipeline.FSYNC_ALWAYS, history=None,
+                 key=None, encrypt=True, tx_rate=None):
+        if sock is None:
+            iface = iface or detect_default_iface()
+        self.iface = iface
+        self.sock, self.src_mac, self.disc, self.ft_s, self.ft_r, self.prober = start_network(iface, sock, key, encrypt, tx_rate)
+        self.pipeline = pipeline.ReceivePipeline(self.ft_r, self._on_receive, out_dir=out_dir, fsync=fsync)
+        self.bcast = broadcast.Broadcast(self.sock, self.src_mac, self._on_broadcast)
+        self.streams = stream.StreamHub(self.sock, self.src_mac)
+        self.swarm = swarm.Swarm(self.sock, self.src_mac, self.streams)
+        # Envíos de archivos: cola por vecino con límites de concurrencia
+        self.manager = transfer_manager.TransferManager(self.ft_s)
+        self.disc.subscribe(self._on_neighbor)
+        # Historial de chat (history.History) o None; lo cierra quien lo creó
+        self.history = history
+        self._subscribers = []
+        # Registro de transferencias: id -> dict (ver _submit)
+        self._transfers = collections.OrderedDict()
+        # Nombres de los grupos propios y de los usados para enviar: MAC -> nombre
+        self._group_names = {}
+        self._ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.pipeline.start()
+        self.manager.start()
+        self.bcast.start()
+        self.streams.start()
+        self.swarm.start()
+        self._thread = threading.Thread(target=receiver_thread_fn, name='receiver', daemon=True,
+                                        args=(self.sock, self.disc, self.ft_s, self.pipeline, self._stop, self.prober,
+                                              self.bcast, self.streams, self.swarm))
+        self._thread.start()
+        # Descubrimiento continuo y sondas de eco en segundo plano
+        self.disc.start()
+        self.prober.start()
+        metrics.gauge('linkchat_neighbors', 'Vecinos en la tabla de discovery', fn=lambda: len(self.disc.neighbors))
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.disc.stop()
+        self.prober.stop()
+        self.manager.stop()
+        self.bcast.stop()
+        self.swarm.stop()
+        self.streams.stop()
+        self.ft_s.stop()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        self.pipeline.stop()
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+    # Eventos
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        try:
+            self._subscribers.remove(callback)
+        except ValueError:
+            pass
+
+    def _emit(self, event):
+        for cb in list(self._subscribers):
+            try:
+                cb(event)
+            except Exception as e:
+                log.error('engine', "subscriber error: %s", e)
+
+    def _on_receive(self, event):
+        # Etapa de notificación del pipeline: ('chat', mac, texto[, grupo]) o ('file', mac, ruta)
+        typ, mac, data, *group = event
+        if typ == 'chat' and self.history is not None:
+            self.history.append(mac_bytes_to_str(mac), data, history.IN)
+        event = {'event': typ, 'from': mac_bytes_to_str(mac), ('text' if typ == 'chat' else 'path'): data}
+        if group:
+            event['group'] = group[0]
+        self._emit(event)
+
+    def _on_broadcast(self, mac, bid, data, text, group):
+        # Envío broadcast (o de grupo) completo: el chat va a notificación y los
+        # archivos a la etapa de escritura; False si la etapa está llena (se reintentará)
+        if text:
+            text = data.decode('utf-8', errors='replace')
+            if group is None:
+                return self.pipeline.post(('chat', mac, text))
+            return self.pipeline.post(('chat', mac, text, self._group_names.get(group, group.hex())))
+        return self.pipeline.submit_file(mac, f"g{group.hex()}-{bid}" if group else f"b{bid}", data)
+
+    def _on_neighbor(self, event, mac):
+        self._emit({'event': 'neighbor', 'action': event, 'mac': mac_bytes_to_str(mac)})
+
+    # Vecinos
+
+    def discover(self):
+        # Fuerza una ronda de DISCOVERY inmediata (las respuestas llegan como eventos)
+        self.disc.send_discovery()
+
+    def queue_depths(self):
+        # Elementos en cola por etapa: pipeline de recepción y clases del planificador TX
+        depths = {name: st['depth'] for name, st in self.pipeline.stats().items() if 'depth' in st}
+        depths.update(('tx_' + cls, n) for cls, n in self.sock.depth().items())
+        return depths
+
+    def neighbors(self):
+        # Vecinos activos, mejor enlace primero, con sus medidas de calidad
+        out = []
+        for mac in self.disc.get_neighbors_by_quality():
+            info = self.disc.get_info(mac) or {}
+            entry = {k: v for k, v in info.items() if isinstance(v, (int, float))}
+            entry['mac'] = mac_bytes_to_str(mac)
+            out.append(entry)
+        return out
+
+    def _destinations(self, dsts):
+        # None: todos los vecinos actuales; si no, MACs en texto o en bytes
+        if dsts is None:
+            return list(self.disc.get_neighbors())
+        return [d if isinstance(d, bytes) else mac_str_to_bytes(d) for d in dsts]
+
+    # Streams
+
+    def open_stream(self, dst, port=stream.DEFAULT_PORT, timeout=stream.OPEN_TIMEOUT):
+        # Stream conectado con el vecino `dst` (MAC en texto o bytes)
+        return self.streams.open(dst if isinstance(dst, bytes) else mac_str_to_bytes(dst), port, timeout)
+
+    def listen(self, port=stream.DEFAULT_PORT):
+        return self.streams.listen(port)
+
+    # Swarm
+
+    def share(self, path, name=None):
+        # Comparte el archivo con los vecinos; devuelve su raíz en hex
+        return self.swarm.share(_read(path), name or os.path.basename(path)).hex()
+
+    def fetch(self, root, path=None):
+        # Descarga el contenido `root` (hex) de todos los vecinos que lo anuncian
+        # y devuelve la ruta; por defecto se guarda en out_dir con su nombre
+        root = bytes.fromhex(root)
+        peers = self.swarm.query(root)
+        if path is None:
+            name = os.path.basename(self.swarm.name(root) or '') or root.hex()[:16]
+            path = os.path.join(self.pipeline.out_dir, name)
+        return self.swarm.fetch(root, path, peers)
+
+    def content(self):
+        # Contenidos conocidos: propios y anunciados por vecinos
+        return [{'root': c['root'].hex(), 'name': c['name'], 'size': c['size'], 'shared': c['shared'],
+                 'holders': [mac_bytes_to_str(m) for m in c['holders']]} for c in self.swarm.catalog()]
+
+    # Grupos
+
+    def _group(self, name):
+        mac = transport.group_mac(name)
+        self._group_names[mac] = name
+        return mac
+
+    def join_group(self, name):
+        # Se une al grupo: la NIC acepta su MAC multicast y discovery lo anuncia
+        self.disc.join_group(self._group(name))
+        return mac_bytes_to_str(transport.group_mac(name))
+
+    def leave_group(self, name):
+        self.disc.leave_group(transport.group_mac(name))
+
+    def groups(self):
+        # Grupos propios con su MAC y los vecinos miembros
+        out = []
+        for mac in sorted(self.disc.groups):
+            out.append({'name': self._group_names.get(mac, mac.hex()), 'mac': mac_bytes_to_str(mac),
+                        'members': [mac_bytes_to_str(m) for m in self.disc.group_members(mac)]})
+        return out
+
+    # Envíos
+
+    def send_chat(self, text, dsts=None, broadcast=False, group=None):
+        # Envía el texto a cada destino en un hilo propio (o, con broadcast, una
+        # sola vez para todos en un único hilo; con group, a los miembros del
+        # grupo por su MAC multicast); devuelve los destinos
+        if group is not None:
+            gmac = self._group(group)
+            dests = self.disc.group_members(gmac)
+            if self.history is not None:
+                self.history.append('#' + group, text, history.OUT)
+            if dests:
+                threading.Thread(target=self._broadcast_chat, args=(text, dests, gmac), daemon=True).start()
+            return [mac_bytes_to_str(m) for m in dests]
+        dests = self._destinations(dsts)
+        if broadcast and dests:
+            for mac in dests:
+                if self.history is not None:
+                    self.history.append(mac_bytes_to_str(mac), text, history.OUT)
+            threading.Thread(target=self._broadcast_chat, args=(text, dests), daemon=True).start()
+            return [mac_bytes_to_str(m) for m in dests]
+
+        def send_to(mac):
+            try:
+                if not self.ft_s.send_chat_message(text, mac):
+                    self._emit({'event': 'error', 'message': f"chat a {mac_bytes_to_str(mac)} incompleto"})
+            except Exception as e:
+                self._emit({'event': 'error', 'message': f"Error enviando a {mac_bytes_to_str(mac)}: {e}"})
+
+        for mac in dests:
+            if self.history is not None:
+                self.history.append(mac_bytes_to_str(mac), text, history.OUT)
+            threading.Thread(target=send_to, args=(mac,), daemon=True).start()
+        return [mac_bytes_to_str(m) for m in dests]
+
+    def _broadcast_chat(self, text, dests, dst_mac=BROADCAST_MAC):
+        try:
+            failed = self.bcast.send(text.encode('utf-8'), dests, text=True, dst_mac=dst_mac)
+        except Exception as e:
+            self._emit({'event': 'error', 'message': f"Error enviando chat broadcast: {e}"})
+            return
+        for mac in failed:
+            self._emit({'event': 'error', 'message': f"chat a {mac_bytes_to_str(mac)} incompleto"})
+
+    def _broadcast_sender(self, dests):
+        # Envío para TransferManager: una transmisión broadcast (o al grupo
+        # `mac`) para todos los destinos; falla (con los que faltan en el error)
+        # si alguno no confirma
+        def send(data, mac, progress=None):
+            failed = self.bcast.send(data, dests, progress=progress, dst_mac=mac)
+            if failed:
+                raise RuntimeError("sin confirmar: " + ', '.join(mac_bytes_to_str(m) for m in failed))
+            return True
+        return send
+
+    def _shared_sender(self, dests):
+        # Envío unicast para TransferManager que comparte con los demás destinos
+        # del mismo archivo los fragmentos ya codificados (None con un solo destino)
+        if len(dests) < 2:
+            return None
+        shared = file_transfer.SharedFrames(len(dests))
+
+        def send(data, mac, progress=None):
+            return self.ft_s.send_file(data, mac, progress=progress, shared=shared)
+        return send
+
+    def _fanout(self, dsts, broadcast, group):
+        # Destino de un envío de archivos: (MAC del envío único, destinos) para
+        # broadcast o grupo, o (None, destinos) para un envío por destino
+        if group is not None:
+            gmac = self._group(group)
+            return gmac, self.disc.group_members(gmac)
+        dests = self._destinations(dsts)
+        return (BROADCAST_MAC if broadcast else None), dests
+
+    def send_file(self, path, dsts=None, data=None, name=None, broadcast=False, group=None):
+        # Encola el archivo `path` (o los bytes `data`) para cada destino.
+        # Devuelve la lista de ids de transferencia (uno por destino, o uno solo
+        # para todos con broadcast o group).
+        name = name or os.path.basename(path)
+        if data is None:
+            size = os.path.getsize(path)
+            load = lambda: _read(path)
+        else:
+            size = len(data)
+            load = lambda: data
+        fanout, dests = self._fanout(dsts, broadcast, group)
+        # Por encima de bcast.max_size() el envío único no cabe: va por unicast
+        if fanout is not None and size <= self.bcast.max_size():
+            return [self._submit(fanout, name, size, load, self._broadcast_sender(dests))] if dests else []
+        send = self._shared_sender(dests)
+        ids = []
+        for mac in dests:
+            ids.append(self._submit(mac, name, size, load, send))
+        return ids
+
+    def send_folder(self, path, dsts=None, broadcast=False, group=None):
+        # Encola todos los archivos regulares de la carpeta (recursivo, en orden
+        # alfabético) para cada destino. Cada archivo se lee al empezar su envío.
+        # Devuelve los ids de transferencia.
+        files = []
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for fname in sorted(filenames):
+                full = os.path.join(dirpath, fname)
+                if os.path.isfile(full):
+                    files.append(full)
+        fanout, dests = self._fanout(dsts, broadcast, group)
+        ids = []
+        if fanout is not None:
+            if not dests:
+                return []
+            # Los archivos que no caben en un envío único van por unicast
+            send, limit = self._broadcast_sender(dests), self.bcast.max_size()
+            ids = [self._submit(fanout, os.path.relpath(full, path), os.path.getsize(full),
+                                lambda full=full: _read(full), send)
+                   for full in files if os.path.getsize(full) <= limit]
+            files = [full for full in files if os.path.getsize(full) > limit]
+        sends = [self._shared_sender(dests) for _ in files]
+        for mac in dests:
+            for full, send in zip(files, sends):
+                ids.append(self._submit(mac, os.path.relpath(full, path), os.path.getsize(full),
+                                        lambda full=full: _read(full), send))
+        return ids
+
+    def _submit(self, mac, name, size, load, send=None):
+        with self.lock:
+            tid = next(self._ids)
+            self._transfers[tid] = {'id': tid, 'to': mac_bytes_to_str(mac), 'name': name, 'size': size,
+                                    'state': QUEUED, 'started': None, 'finished': None, 'goodput': None}
+            # Olvidar las transferencias terminadas más antiguas
+            while len(self._transfers) > TRANSFER_HISTORY:
+                oldest = next(iter(self._transfers))
+                if self._transfers[oldest]['state'] not in (DONE, FAILED):
+                    break
+                del self._transfers[oldest]
+        self.manager.submit(tid, mac, size, load, self._transfer_started, self._transfer_done, send)
+        return tid
+
+    def _transfer_started(self, tid):
+        with self.lock:
+            rec = self._transfers.get(tid)
+            if rec is not None:
+                rec['state'] = SENDING
+                rec['started'] = time.time()
+
+    def _transfer_done(self, tid, ok, error):
+        with self.lock:
+            rec = self._transfers.get(tid)
+            if rec is None:
+                return
+            rec['finished'] = time.time()
+            rec['state'] = DONE if ok else FAILED
+            elapsed = rec['finished'] - rec['started']
+            if ok and elapsed > 0:
+                rec['goodput'] = rec['size'] / elapsed
+            if error:
+                rec['error'] = error
+            event = dict(rec, event='transfer')
+        self._emit(event)
+
+    def transfers(self, ids=None):
+        # Copia del registro de transferencias (todas o solo las pedidas); las
+        # que están en curso llevan 'sent', 'rate' (bytes/s) y 'eta' (segundos)
+        with self.lock:
+            if ids is None:
+                out = [dict(r) for r in self._transfers.values()]
+            else:
+                out = [dict(self._transfers[i]) for i in ids if i in self._transfers]
+        for rec in out:
+            if rec['state'] == SENDING:
+                p = self.manager.progress(rec['id'])
+                if p and 'sent' in p:
+                    rec.update(sent=p['sent'], rate=p['rate'], eta=p['eta'])
+        return out
@@ -7,10 +7,72 @@
 # - Sistema de reenvíos automáticos
 # - Soporte para archivos y mensajes de chat
 # - Manejo de fragmentos desordenados
+# - Tamaño de fragmento por vecino según su MTU y la pérdida observada
+#   (FragmentSizer); esos fragmentos llevan su offset y se colocan por posición
+import array
+import collections
+import math
+import random
+import struct
 import time
 import threading
 import protocolo
 import network
+import log
+import metrics
+
+# Métricas de envío y recepción (ver metrics.py)
+RETRANSMISSIONS = metrics.counter('linkchat_retransmissions_total', 'Fragmentos reenviados por timeout')
+ABANDONED = metrics.counter('linkchat_fragments_abandoned_total', 'Fragmentos abandonados tras max_retransmissions')
+ACK_RTT = metrics.histogram('linkchat_ack_rtt_seconds', 'Tiempo envío-ACK de fragmentos no retransmitidos')
+TRANSFERS = metrics.counter('linkchat_transfers_total', 'Transferencias (archivos y chats largos) terminadas')
+TRANSFER_BYTES = metrics.counter('linkchat_transfer_bytes_total', 'Bytes de datos enviados en transferencias')
+GOODPUT = metrics.histogram('linkchat_transfer_goodput_bytes_per_second', 'Goodput por transferencia',
+                            buckets=metrics.RATE_BUCKETS)
+RX_MALFORMED = metrics.counter('linkchat_rx_malformed_total', 'Fragmentos descartados por header o longitud')
+CRC_FAILURES = metrics.counter('linkchat_crc_failures_total', 'Fragmentos descartados por CRC incorrecto')
+RX_DUPLICATES = metrics.counter('linkchat_rx_duplicates_total', 'Fragmentos duplicados recibidos')
+FILES_RECEIVED = metrics.counter('linkchat_files_received_total', 'Transferencias reensambladas por completo')
+ZERO_WINDOW_PROBES = metrics.counter('linkchat_zero_window_probes_total', 'Fragmentos enviados como sonda con ventana del receptor a cero')
+RX_THROTTLED = metrics.counter('linkchat_rx_throttled_total', 'Fragmentos rechazados por falta de memoria en el receptor')
+
+# Payload máximo de un fragmento sin capas extra: 1500 (MTU) - 10 (header Link-Chat)
+# - 4 (CRC) - 14 de margen; las capas que envuelven el transporte (p. ej.
+# security.SecureTransport) anuncian su sobrecarga en transport.overhead
+MAX_PAYLOAD = 1472
+
+# Fragmentos de tamaño variable (total_frags = 0 en el header): delante de los
+# datos, dentro del CRC, va su posición en bytes dentro de la transferencia.
+# Un receptor antiguo los descarta (frag_index fuera de rango) en vez de
+# reensamblarlos mal, y solo se envían a vecinos que anuncian su MTU
+OFFSET_FMT = '!Q'
+OFFSET_SIZE = struct.calcsize(OFFSET_FMT)
+# Tamaño mínimo de fragmento por mucha pérdida que haya
+MIN_FRAGMENT = 256
+# Bytes de cada trama que no son datos: Ethernet (cabecera, FCS, preámbulo e
+# IFG), header Link-Chat, CRC y offset
+FRAME_OVERHEAD = 14 + 4 + 20 + protocolo.LINK_HDR_SIZE + 4 + OFFSET_SIZE
+# Peso de cada fragmento en la media de pérdida por vecino (~64 fragmentos)
+LOSS_ALPHA = 1.0 / 64
+
+# Memoria que el receptor dedica a datos pendientes de procesar (fragmentos en
+# cola de reensamblado y archivos completos esperando a escribirse en disco).
+# Lo que queda libre se anuncia a los emisores como ventana en cada ACK.
+RX_BUDGET = 64 * 1024 * 1024
+# Tras anunciar ventana cero, el receptor avisa cuando vuelve a haber al menos
+# esta fracción del presupuesto libre (actualización de ventana)
+WINDOW_UPDATE_FRACTION = 0.25
+
+# Fragmentos codificados que SharedFrames guarda a la vez esperando a que los
+# envíe el resto de destinos (~1.5 KB cada uno); si un destino va muy por
+# detrás, lo que no cabe se vuelve a montar a partir del CRC ya calculado
+SHARED_FRAMES = 4096
+
+
+def payload_for_mtu(mtu):
+    # Payload máximo de un fragmento (sin offset ni capas extra) para una MTU
+    return MAX_PAYLOAD + mtu - network.ETH_MTU
+
 
 def fragment_data(data, max_payload_size):
     # Divide los datos completos en fragmentos de tamaño máximo especificado.
@@ -18,6 +80,250 @@ def fragment_data(data, max_payload_size):
     return [data[i:i+max_payload_size] for i in range(0, len(data), max_payload_size)]
 
 
+# Estados de cada fragmento en _Flight.state
+_PENDING, _IN_FLIGHT, _DONE = 0, 1, 2
+
+
+class _Flight:
+    # Estado de una transferencia en curso con memoria acotada:
+    # - el origen (bytes o mmap) se lee por fragmento con un memoryview; las
+    #   tramas se construyen al enviarlas y se reconstruyen al reenviarlas
+    # - por fragmento solo hay un instante de envío (array de doubles, 8 bytes),
+    #   un contador de reintentos y un estado (bytearray, 1 byte cada uno)
+    # - base/next delimitan el tramo enviado y aún no confirmado del todo, que
+    #   es lo único que recorre el hilo de retransmisiones
+    # - con `shared` (SharedFrames) la parte común de cada trama se codifica
+    #   una sola vez para todos los destinos del mismo archivo
+    # - con frag_size=None los fragmentos son de tamaño variable: se cortan al
+    #   enviarlos (cut) con el tamaño del momento y bounds guarda sus límites;
+    #   los reenvíos repiten el mismo tramo
+    __slots__ = ('file_id', 'dst_mac', 'src_mac', 'data', 'size', 'frag_size', 'bounds', 'total', 'msg_type',
+                 'rto', 'progress', 'sent_at', 'retries', 'state', 'outstanding', 'base', 'next', 'lost',
+                 'rwnd', 'last_send', 'shared', 'head')
+
+    def __init__(self, file_id, dst_mac, src_mac, data, frag_size, msg_type, rto, progress=None, shared=None):
+        self.file_id = file_id
+        self.dst_mac = dst_mac
+        self.src_mac = src_mac
+        self.data = memoryview(data).cast('B') if len(data) else b''
+        self.size = len(data)
+        self.frag_size = frag_size
+        if frag_size is None:
+            # bounds[i] es el offset del fragmento i y bounds[i + 1] su final
+            self.bounds = array.array('Q', [0])
+            self.total = 0
+        else:
+            self.bounds = None
+            self.total = -(-len(data) // frag_size)
+        self.msg_type = msg_type
+        self.rto = rto
+        self.progress = progress
+        if progress is not None:
+            progress.update(frags=self.total, acked=0, acked_bytes=0)
+        self.sent_at = array.array('d', bytes(8 * self.total))
+        self.retries = bytearray(self.total)
+        self.state = bytearray(self.total)
+        self.outstanding = 0
+        self.base = 0
+        self.next = 0
+        self.lost = 0
+        # Ventana anunciada por el receptor (None hasta el primer ACK que la traiga)
+        self.rwnd = None
+        self.last_send = 0.0
+        self.shared = shared
+        # Con `shared`: MAC destino, MAC origen, EtherType y file_id de este destino
+        self.head = None
+
+    def more(self, i):
+        # True si el fragmento i existe o, con tamaño variable, queda algo por cortar
+        return i < self.total or (self.bounds is not None and self.bounds[-1] < self.size)
+
+    def cut(self, frag_size):
+        # Corta el siguiente fragmento de tamaño variable (hasta frag_size bytes)
+        self.bounds.append(min(self.size, self.bounds[-1] + frag_size))
+        self.total += 1
+        self.sent_at.append(0.0)
+        self.retries.append(0)
+        self.state.append(_PENDING)
+        if self.progress is not None:
+            self.progress['frags'] = self.total
+
+    def span(self, i):
+        # Tramo [inicio, fin) de los datos que lleva el fragmento i
+        if self.bounds is None:
+            return i * self.frag_size, min(self.size, (i + 1) * self.frag_size)
+        return self.bounds[i], self.bounds[i + 1]
+
+    def index(self, frag_index):
+        # Fragmento al que se refiere un ACK. Con tamaño variable el campo de 16
+        # bits da la vuelta (no hay límite de fragmentos): se resuelve dentro
+        # del tramo enviado, que send_file nunca deja pasar de 65535 (wraps)
+        if self.bounds is None:
+            return frag_index
+        return self.base + ((frag_index - self.base) & 0xffff)
+
+    def wraps(self, i):
+        # True si enviar el fragmento i dejaría el tramo [base, i] sin poder
+        # distinguirse con 16 bits: hay que esperar a que avance base
+        return self.bounds is not None and i - self.base >= 0xffff
+
+    def flags(self, i):
+        flags = 0
+        # Marcamos el primer y último fragmento para que el receptor
+        # sepa cuándo comienza y termina un archivo
+        if i == 0:
+            flags = protocolo.set_flag(flags, protocolo.FLAG_IS_FIRST)
+        if self.span(i)[1] == self.size:
+            flags = protocolo.set_flag(flags, protocolo.FLAG_IS_LAST)
+        return flags
+
+    def frame(self, i):
+        # Trama Ethernet completa del fragmento i (mismo contenido en cada reenvío)
+        if self.shared is not None:
+            packet = self.shared.frame(self, i)
+            if packet is not None:
+                return packet
+        flags = self.flags(i)
+        start, end = self.span(i)
+        # 1. Fragmento + CRC para detectar errores
+        # 2. Encabezado con metadata (id, número de fragmento, flags); con tamaño
+        #    variable, total_frags = 0 y el offset va delante de los datos
+        if self.bounds is None:
+            payload_with_crc = protocolo.append_crc(bytes(self.data[start:end]))
+            header = protocolo.pack_header(self.file_id, self.total, i, flags, self.msg_type, len(payload_with_crc))
+        else:
+            payload_with_crc = protocolo.append_crc(struct.pack(OFFSET_FMT, start) + self.data[start:end])
+            header = protocolo.pack_header(self.file_id, 0, i & 0xffff, flags, self.msg_type, len(payload_with_crc))
+        # 3. Trama Ethernet completa (direcciones MAC + payload)
+        return network.build_ethernet_frame(self.dst_mac, self.src_mac, network.ETH_P_CUSTOM, header + payload_with_crc)
+
+    def sent(self, i, now):
+        self.state[i] = _IN_FLIGHT
+        self.sent_at[i] = now
+        self.last_send = now
+        self.outstanding += 1
+        self.next = max(self.next, i + 1)
+
+    def done(self, i):
+        self.state[i] = _DONE
+        self.outstanding -= 1
+        while self.base < self.next and self.state[self.base] == _DONE:
+            self.base += 1
+
+
+class SharedFrames:
+    # Codificación única de un archivo que se envía por unicast a varios destinos
+    # (uno por _Flight, cada uno con su ventana, ACKs y reintentos):
+    # - la parte común de cada trama (header sin file_id, payload y CRC) se
+    #   monta la primera vez que un destino envía el fragmento; los demás solo
+    #   anteponen su MAC destino y su file_id (una concatenación, sin CRC ni
+    #   struct por destino)
+    # - cada parte común se libera cuando la han enviado los `fanout` destinos;
+    #   como mucho se guardan `limit` a la vez. Los CRC (4 bytes por fragmento)
+    #   se conservan, así los reenvíos y los destinos rezagados no lo recalculan
+    # - cada destino lee el payload de sus propios datos: vale con que todos
+    #   envíen el mismo contenido, aunque cada uno lo tenga en su mmap
+    # - encoded: partes comunes montadas (para pruebas y benchmarks)
+
+    def __init__(self, fanout, limit=SHARED_FRAMES):
+        self.fanout = fanout
+        self.limit = limit
+        self.lock = threading.Lock()
+        # (total, frag_size, msg_type, src_mac) del primer envío; un _Flight
+        # con otra fragmentación no comparte tramas
+        self._layout = None
+        self._crcs = None
+        self._known = None
+        self._taken = None
+        self._tails = {}
+        self.encoded = 0
+
+    def frame(self, flight, i):
+        # Trama del fragmento i para `flight`, o None si no comparte fragmentación
+        layout = (flight.total, flight.frag_size, flight.msg_type, flight.src_mac)
+        if flight.head is None:
+            flight.head = flight.dst_mac + flight.src_mac + struct.pack('!HH', network.ETH_P_CUSTOM, flight.file_id)
+        with self.lock:
+            if self._layout is None:
+                self._layout = layout
+                self._crcs = array.array('I', bytes(4 * flight.total))
+                self._known = bytearray(flight.total)
+                self._taken = array.array('H', bytes(2 * flight.total))
+            elif self._layout != layout:
+                return None
+            tail = self._tails.get(i)
+            if tail is None:
+                tail = self._encode(flight, i)
+            if flight.state[i] == _PENDING:
+                # Primer envío de este destino: cuando lo hayan enviado todos
+                # la parte común ya no hace falta
+                self._taken[i] += 1
+                if self._taken[i] >= self.fanout:
+                    self._tails.pop(i, None)
+                elif i not in self._tails and len(self._tails) < self.limit:
+                    self._tails[i] = tail
+        return flight.head + tail
+
+    def _encode(self, flight, i):
+        # Parte común de la trama i (header desde total_frags, payload y CRC);
+        # llamar con self.lock tomado
+        payload = flight.data[i * flight.frag_size:(i + 1) * flight.frag_size]
+        if not self._known[i]:
+            self._crcs[i] = protocolo.crc32_bytes(payload)
+            self._known[i] = 1
+        self.encoded += 1
+        header = protocolo.pack_header(0, flight.total, i, flight.flags(i), flight.msg_type, len(payload) + 4)
+        return b''.join((header[2:], payload, struct.pack('!I', self._crcs[i])))
+
+
+class FragmentSizer:
+    # Tamaño de fragmento por vecino según la pérdida observada:
+    # - record(mac, length, lost): resultado de cada fragmento (ACK al primer
+    #   intento o timeout) con la longitud con la que se envió
+    # - size(mac, limit): tamaño para el siguiente fragmento, como mucho limit
+    #   (lo que permite la MTU negociada)
+    # Modelo: cada byte de la trama se pierde con la misma probabilidad, así
+    # que una pérdida p con tramas de L bytes equivale a a = -ln(1-p)/L por byte.
+    # La eficiencia con D bytes de datos es D/(D+H) * e^(-a(D+H)), con
+    # H = FRAME_OVERHEAD, y es máxima con D + H = H/2 + sqrt(H²/4 + H/a): sin
+    # pérdida se usa todo el límite y, cuanta más pérdida, fragmentos más
+    # pequeños (un fragmento perdido cuesta menos de reenviar). La pérdida es
+    # una media móvil (media simple en las primeras 1/alpha muestras, para que
+    # un vecino nuevo converja rápido), así que el tamaño vuelve a crecer en
+    # cuanto el enlace queda limpio.
+
+    def __init__(self, min_size=MIN_FRAGMENT, alpha=LOSS_ALPHA):
+        self.min_size = min_size
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        # MAC -> [pérdida media, longitud media de trama, muestras]
+        self._peers = {}
+
+    def record(self, mac, length, lost):
+        length += FRAME_OVERHEAD
+        with self.lock:
+            st = self._peers.get(mac)
+            if st is None:
+                st = self._peers[mac] = [0.0, float(length), 0]
+            st[2] += 1
+            alpha = max(self.alpha, 1.0 / st[2])
+            st[0] += alpha * ((1.0 if lost else 0.0) - st[0])
+            st[1] += alpha * (length - st[1])
+
+    def loss(self, mac):
+        st = self._peers.get(mac)
+        return st[0] if st is not None else 0.0
+
+    def size(self, mac, limit):
+        st = self._peers.get(mac)
+        if st is None or st[0] < 1e-4:
+            return limit
+        a = -math.log1p(-min(st[0], 0.9)) / st[1]
+        h = FRAME_OVERHEAD
+        best = h / 2 + math.sqrt(h * h / 4 + h / a) - h
+        return int(max(self.min_size, min(limit, best)))
+
+
 class FileTransfer:
     # Esta clase maneja el envío confiable de archivos y mensajes:
     # - Fragmenta archivos grandes en tramas pequeñas
@@ -25,127 +331,195 @@ class FileTransfer:
     # - Usa números de secuencia (file_id) para identificar cada transferencia
     # - Mantiene un hilo dedicado para gestionar retransmisiones
     
-    def __init__(self, sock, dst_mac, src_mac):
-        # Socket raw que usaremos para enviar paquetes Ethernet
-        self.sock = sock
+    def __init__(self, transport, dst_mac, src_mac):
+        # Transporte por el que enviamos las tramas Ethernet (socket raw o
+        # cualquier implementación de transport.Transport)
+        self.transport = transport
         # MAC destino para la transferencia
         self.dst_mac = dst_mac
         # MAC origen de esta máquina (se usará en la trama)
         self.src_mac = src_mac
-        # Identificador único incremental de cada archivo o mensaje que enviamos
-        self.next_file_id = 1
-        # Diccionario para almacenar fragmentos enviados pendientes de confirmación
-        # Clave: (file_id, frag_index)
-        # Valor: (paquete completo, tiempo del último envío, contador de retransmisiones)
-        self.sent_fragments = {}
+        # Identificador incremental de cada archivo o mensaje que enviamos, con
+        # arranque aleatorio: tras un reinicio los nuevos ids no coinciden con
+        # los que el receptor recuerda como terminados (FileReceiver._done)
+        self.next_file_id = random.randrange(1, 0xffff)
+        # Transferencias en curso: file_id -> _Flight (estado compacto por
+        # fragmento; las tramas no se guardan, se reconstruyen al reenviarlas)
+        self._flights = {}
         # Candado para proteger acceso concurrente desde posibles hilos
         self.lock = threading.Lock()
+        # Condición asociada al candado: se notifica cada vez que un fragmento
+        # deja de estar pendiente (ACK recibido o abandonado)
+        self._acked = threading.Condition(self.lock)
+        # Tamaño de la ventana deslizante: fragmentos en vuelo por transferencia.
+        # Con varios fragmentos en vuelo el enlace no queda ocioso esperando cada ACK
+        self.window = 32
         # Tiempo en segundos para considerar que un fragmento necesita retransmisión
         self.timeout = 2
         # Límite máximo de reintentos por fragmento antes de abandonarlo
         self.max_retransmissions = 8
+        # Estimador de calidad de enlace opcional (prober.LinkProber): si está
+        # presente, cada transferencia arranca con ventana y timeout a medida del
+        # vecino y al terminar se le informa del goodput obtenido
+        self.link_stats = None
+        # MTU negociada con cada vecino (discovery.Discovery.peer_mtu) o None:
+        # con ella los archivos van en fragmentos de tamaño variable elegidos
+        # por self.sizer; sin ella (o si el vecino no anunció MTU) tamaño fijo
+        self.peer_mtu = None
+        self.sizer = FragmentSizer()
         # Bandera para controlar ciclo del hilo de retransmisiones
         self.running = True
         # Hilo daemon que revisa periódicamente si hay fragmentos que reenviar
         self._retrans_thread = threading.Thread(target=self.retransmit_check_loop, daemon=True)
         self._retrans_thread.start()
 
-    def send_file(self, data, dst_mac=None, msg_type=protocolo.MSG_FILE_CHUNK):
+    def max_payload(self):
+        # Payload por fragmento descontando la sobrecarga del transporte (cabecera
+        # y tag de seguridad...) para que la trama completa no pase la MTU
+        return MAX_PAYLOAD - getattr(self.transport, 'overhead', 0)
+
+    def send_file(self, data, dst_mac=None, msg_type=protocolo.MSG_FILE_CHUNK, progress=None, shared=None):
         # Permite especificar MAC destino por llamada, si no usa la dada en self
+        # `data` puede ser bytes o cualquier objeto con protocolo buffer (p. ej. un
+        # mmap del archivo): los fragmentos se leen de ahí al enviarlos y al
+        # reenviarlos, sin copiar el archivo ni guardar las tramas construidas.
+        # `progress` (dict opcional) se rellena con 'frags' y 'acked' (fragmentos
+        # confirmados) mientras dura el envío, para mostrar avance y ETA.
+        # `shared` (SharedFrames) comparte la codificación con los envíos del
+        # mismo archivo a otros destinos (ver send_fanout)
         dst_mac = dst_mac or self.dst_mac
         if dst_mac is None:
             raise ValueError("dst_mac no especificado para send_file")
 
         # Asigna un id único para esta transferencia para diferenciar archivos/mensajes
-        file_id = self.next_file_id
-        self.next_file_id += 1  # Incremento para siguiente envío
+        with self.lock:
+            file_id = self.next_file_id
+            # Incremento para siguiente envío (el campo es de 16 bits y 0 lo usa el chat)
+            self.next_file_id = self.next_file_id % 0xffff + 1
 
         # Define tamaño máximo de payload para evitar pasar MTU Ethernet
-        max_payload = 1472
-        # Fragmenta los datos en pedazos pequeños según max_payload
-        fragments = fragment_data(data, max_payload)
-        total_frags = len(fragments)
+        max_payload = self.max_payload()
+        # Fragmentos de tamaño variable si el vecino anunció su MTU: el límite
+        # sale de la MTU negociada y el tamaño de cada uno de la pérdida
+        # observada. Los envíos con `shared` mantienen el tamaño fijo para que
+        # todos los destinos compartan las mismas tramas
+        mtu = None
+        if self.peer_mtu is not None and shared is None and msg_type == protocolo.MSG_FILE_CHUNK:
+            mtu = self.peer_mtu(dst_mac)
+        if mtu is not None:
+            frag_limit = max(MIN_FRAGMENT, max_payload + mtu - network.ETH_MTU - OFFSET_SIZE)
+            frag_size = self.sizer.size(dst_mac, frag_limit)
+        else:
+            frag_size = max_payload
+
+        # Ventana y timeout iniciales: por defecto los globales, o los estimados
+        # para este vecino a partir de RTT y ancho de banda medidos
+        window, rto = self.window, self.timeout
+        if self.link_stats is not None:
+            window, rto = self.link_stats.initial_params(dst_mac, frag_size, window, rto)
+        flight = _Flight(file_id, dst_mac, self.src_mac, data, None if mtu is not None else frag_size,
+                         msg_type, rto, progress, shared)
+        with self.lock:
+            self._flights[file_id] = flight
+        start = time.time()
 
         # Envía cada fragmento con encabezado, flags y CRC
         # El proceso de fragmentación es necesario porque Ethernet tiene un límite
         # de tamaño máximo por trama (MTU). Dividimos archivos grandes en partes
         # más pequeñas y las enviamos una por una con control de errores
-        for i, frag in enumerate(fragments):
-            flags = 0
-            # Marcamos el primer y último fragmento para que el receptor
-            # sepa cuándo comienza y termina un archivo
-            if i == 0:
-                flags = protocolo.set_flag(flags, protocolo.FLAG_IS_FIRST)
-            if i == total_frags - 1:
-                flags = protocolo.set_flag(flags, protocolo.FLAG_IS_LAST)
-
-            # Proceso de construcción del paquete:
-            # 1. Añadir CRC al fragmento para detectar errores
-            payload_with_crc = protocolo.append_crc(frag)  # payload + 4 bytes CRC
-            # 2. Crear encabezado con metadata (id, número de fragmento, flags)
-            header = protocolo.pack_header(file_id, total_frags, i, flags, msg_type, len(payload_with_crc))
-            # 3. Ensamblar trama Ethernet completa (direcciones MAC + payload)
-            packet = network.build_ethernet_frame(dst_mac, self.src_mac, network.ETH_P_CUSTOM, header + payload_with_crc)
-
-            # DEBUG EMISOR: longitud, crc calculado y primeros bytes
-            try:
-                crc_calc = protocolo.crc32_bytes(frag)
-            except Exception:
-                crc_calc = None
-            print(f"[EMIT] file_id={file_id} frag={i}/{total_frags} payload_len={len(payload_with_crc)} crc_calc={('0x%08x'%crc_calc) if crc_calc is not None else None} first16={payload_with_crc[:16].hex()} total_packet_len={len(packet)}")
-
-            key = (file_id, i)
-            with self.lock:
-                # inicializar registro del fragmento con contador 0
-                self.sent_fragments[key] = (packet, time.time(), 0)
-
-            sent_ok = False
-            # ciclo hasta recibir ACK (o hasta exceder retransmisiones)
-            while not sent_ok:
-                try:
-                    network.send_frame(self.sock, packet)
-                except Exception as e:
-                    print(f"[FileTransfer] error sending packet {key}: {e}")
-
-                start_time = time.time()
-                while time.time() - start_time < self.timeout:
-                    with self.lock:
-                        if key not in self.sent_fragments:
-                            sent_ok = True
-                            break
-                    time.sleep(0.05)
+        # Con tamaño variable cada fragmento se corta justo antes de enviarlo,
+        # con el tamaño que corresponde a la pérdida medida hasta ese momento
+        i = 0
+        while flight.more(i):
+            if i == flight.total:
+                with self.lock:
+                    flight.cut(self.sizer.size(dst_mac, frag_limit))
+            packet = flight.frame(i)
 
-                if sent_ok:
-                    break
+            # DEBUG EMISOR (categoría 'tx'): solo se formatea si está activada
+            if log.enabled('tx'):
+                log.debug('tx', "file_id=%d frag=%d/%d total_packet_len=%d crc=0x%s",
+                          file_id, i, flight.total, len(packet), packet[-4:].hex())
 
-                # si timeout sin ACK, gestionar reintentos
-                with self.lock:
-                    pkt, last_send, retrans = self.sent_fragments.get(key, (packet, time.time(), 0))
-                    if retrans >= self.max_retransmissions:
-                        # abandonar fragmento 
-                        print(f"[FileTransfer] fragment {key} excedió reintentos ({retrans}). Abandonando fragmento.")
-                        if key in self.sent_fragments:
-                            del self.sent_fragments[key]
-                        sent_ok = True
+            with self.lock:
+                # Ventana deslizante: no más de `window` fragmentos de este archivo
+                # pendientes de ACK a la vez, ni más de los que el receptor dice
+                # poder aceptar (rwnd); esperamos a que los ACKs abran hueco
+                # Con tamaño variable, además, el tramo en vuelo no puede pasar
+                # de 65535 fragmentos aunque la ventana lo permita (un fragmento
+                # atascado en base mientras se confirman los siguientes)
+                while self.running:
+                    limit = window if flight.rwnd is None else min(window, flight.rwnd)
+                    if flight.wraps(i):
+                        self._acked.wait(rto)
+                        continue
+                    if flight.outstanding < limit:
                         break
-                    else:
-                        # actualizar contador y reintentar inmediatamente
-                        self.sent_fragments[key] = (pkt, time.time(), retrans + 1)
-                        try:
-                            network.send_frame(self.sock, pkt)
-                        except Exception as e:
-                            print(f"[FileTransfer] error re-sending {key}: {e}")
-                        # luego volver al bucle esperar ACK
-
+                    # Ventana cero sin nada en vuelo: nadie nos va a mandar un ACK.
+                    # Si tampoco llega la actualización de ventana, cada RTO se
+                    # envía el siguiente fragmento como sonda
+                    if limit == 0 and flight.outstanding == 0 and time.time() - flight.last_send >= flight.rto:
+                        ZERO_WINDOW_PROBES.inc()
+                        break
+                    self._acked.wait(rto)
+                flight.sent(i, time.time())
 
-    def send_chat_message(self, message_text):
+            try:
+                network.send_frame(self.transport, packet)
+            except Exception as e:
+                log.error('transfer', "error sending packet %s: %s", (file_id, i), e)
+            i += 1
+
+        # Esperar a que todos los fragmentos se confirmen (o se abandonen);
+        # las retransmisiones las gestiona retransmit_check_loop
+        with self.lock:
+            while flight.outstanding > 0 and self.running:
+                self._acked.wait(rto)
+            self._flights.pop(file_id, None)
+        elapsed = time.time() - start
+        TRANSFERS.inc()
+        TRANSFER_BYTES.inc(len(data))
+        if elapsed > 0:
+            GOODPUT.observe(len(data) / elapsed)
+        if self.link_stats is not None:
+            self.link_stats.record_transfer(dst_mac, len(data), elapsed)
+        # True solo si el receptor confirmó todos los fragmentos
+        return flight.lost == 0 and self.running
+
+    def send_fanout(self, data, dst_macs, msg_type=protocolo.MSG_FILE_CHUNK):
+        # Envía los mismos datos por unicast a varios destinos a la vez, con los
+        # fragmentos codificados una sola vez (SharedFrames). Cada destino tiene
+        # su propio file_id, ventana y reintentos. Devuelve los destinos que no
+        # confirmaron todo.
+        shared = SharedFrames(len(dst_macs))
+        results = {}
+
+        def run(mac):
+            results[mac] = self.send_file(data, mac, msg_type, shared=shared)
+
+        threads = [threading.Thread(target=run, args=(mac,), daemon=True) for mac in dst_macs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return [mac for mac in dst_macs if not results.get(mac)]
+
+    def _forget(self, flight, i):
+        # Da por terminado un fragmento pendiente (confirmado o abandonado) y
+        # despierta a los envíos que esperan hueco en la ventana. Llamar con self.lock tomado.
+        flight.done(i)
+        self._acked.notify_all()
+
+    def send_chat_message(self, message_text, dst_mac=None):
         # Sistema de mensajes de chat:
         # - Reutiliza el mismo mecanismo que los archivos
         # - Mensajes cortos: envío directo sin fragmentar
         # - Mensajes largos: usa fragmentación automática
         # - Usa MSG_CHAT para identificar que es un mensaje
+        # dst_mac permite elegir el destino por llamada (envíos concurrentes)
+        dst_mac = dst_mac or self.dst_mac
         data = message_text.encode('utf-8')
-        max_payload = 1472
+        max_payload = self.max_payload()
         # Si mensaje es pequeño, envía en un solo paquete sin fragmentar
         if len(data) <= max_payload:
             header = protocolo.pack_header(
@@ -156,25 +530,47 @@ class FileTransfer:
                 msg_type=protocolo.MSG_CHAT,
                 payload_len=len(data)
             )
-            packet = network.build_ethernet_frame(self.dst_mac, self.src_mac, network.ETH_P_CUSTOM, header + data)
-            network.send_frame(self.sock, packet)
-        else:
-            # Para mensajes largos, utiliza fragmentación igual que archivos, pero tipo chat
-            self.send_file(data, msg_type=protocolo.MSG_CHAT)
+            packet = network.build_ethernet_frame(dst_mac, self.src_mac, network.ETH_P_CUSTOM, header + data)
+            network.send_frame(self.transport, packet)
+            return True
+        # Para mensajes largos, utiliza fragmentación igual que archivos, pero tipo chat
+        return self.send_file(data, dst_mac, msg_type=protocolo.MSG_CHAT)
 
     def receive_ack(self, ack_packet):
         # Procesa un paquete ACK recibido para eliminar fragmentos confirmados
         try:
-            hdr, _ = protocolo.unpack_header(ack_packet)
+            hdr, body = protocolo.unpack_header(ack_packet)
         except Exception:
             return  # Paquete no válido, ignorar
         if hdr['msg_type'] == protocolo.MSG_ACK:
-            key = (hdr['file_id'], hdr['frag_index'])
+            rwnd = protocolo.unpack_ack_window(body[:hdr['payload_len']])
             with self.lock:
-                # Si el fragmento estaba pendiente, se marca como confirmado y se elimina
-                if key in self.sent_fragments:
-                    del self.sent_fragments[key]
-                    # Se puede hacer print para debugging: ACK recibido
+                flight = self._flights.get(hdr['file_id'])
+                if flight is None:
+                    return
+                i = flight.index(hdr['frag_index'])
+                if rwnd is not None:
+                    # Ventana nueva: puede desbloquear al emisor
+                    flight.rwnd = rwnd
+                    self._acked.notify_all()
+                if i >= flight.total or flight.state[i] != _IN_FLIGHT:
+                    return
+                if hdr['flags'] & protocolo.FLAG_WINDOW:
+                    # El receptor no tenía sitio para el fragmento: no es una
+                    # pérdida, se reenviará como sonda sin gastar reintentos
+                    flight.sent_at[i] = time.time()
+                    flight.retries[i] = 0
+                    return
+                # Solo cuenta si el fragmento estaba pendiente (los ACK duplicados se ignoran)
+                # RTT de ACK solo para fragmentos sin retransmitir (algoritmo de Karn)
+                start, end = flight.span(i)
+                if flight.retries[i] == 0:
+                    ACK_RTT.observe(time.time() - flight.sent_at[i])
+                    self.sizer.record(flight.dst_mac, end - start, False)
+                if flight.progress is not None:
+                    flight.progress['acked'] += 1
+                    flight.progress['acked_bytes'] += end - start
+                self._forget(flight, i)
 
     def retransmit_check_loop(self):
         # Mecanismo de retransmisión automática:
@@ -185,70 +581,126 @@ class FileTransfer:
         # Este mecanismo garantiza la entrega incluso si hay pérdida de paquetes
         while self.running:
             now = time.time()
+            # Las tramas a reenviar se recogen con el candado tomado y se envían
+            # después: un envío lento no frena los ACKs ni a los emisores
+            resend = []
             with self.lock:
-                for key, (packet, send_time, retrans) in list(self.sent_fragments.items()):
-                    # Si pasó el tiempo de espera sin ACK, se revisa reintentos
-                    if now - send_time > self.timeout:
-                        if retrans >= self.max_retransmissions:
-                            # Si se superó el máximo, se elimina fragmento para evitar bloqueo
-                            print(f"[FileTransfer] fragment {key} excedió reintentos ({retrans})")
-                            del self.sent_fragments[key]
+                for flight in list(self._flights.values()):
+                    # Solo se recorre el tramo [base, next): fragmentos ya enviados
+                    # desde el primero sin confirmar
+                    for i in range(flight.base, flight.next):
+                        # Si pasó el tiempo de espera sin ACK, se revisa reintentos
+                        if flight.state[i] != _IN_FLIGHT or now - flight.sent_at[i] <= flight.rto:
+                            continue
+                        if flight.retries[i] >= self.max_retransmissions:
+                            # Si se superó el máximo, se abandona el fragmento para evitar bloqueo
+                            log.warning('transfer', "fragment %s excedió reintentos (%d)",
+                                        (flight.file_id, i), flight.retries[i])
+                            ABANDONED.inc()
+                            flight.lost += 1
+                            self._forget(flight, i)
                             continue
-                        try:
-                            # Reenvía fragmento por socket raw
-                            network.send_frame(self.sock, packet)
-                        except Exception as e:
-                            print(f"[FileTransfer] error re-sending {key}: {e}")
+                        resend.append((flight, i))
+                        start, end = flight.span(i)
+                        self.sizer.record(flight.dst_mac, end - start, True)
                         # Actualiza tiempo y contador de reintentos
-                        self.sent_fragments[key] = (packet, now, retrans + 1)
-            # Pausa breve para no consumir CPU excesivamente
-            time.sleep(0.5)
+                        flight.sent_at[i] = now
+                        flight.retries[i] = min(255, flight.retries[i] + 1)
+                        RETRANSMISSIONS.inc()
+                shortest = min([self.timeout] + [f.rto for f in self._flights.values()])
+            for flight, i in resend:
+                try:
+                    # Reconstruye el fragmento desde el origen y lo reenvía
+                    network.send_frame(self.transport, flight.frame(i))
+                except Exception as e:
+                    log.error('transfer', "error re-sending %s: %s", (flight.file_id, i), e)
+            # Pausa breve para no consumir CPU excesivamente (proporcional al timeout)
+            time.sleep(min(0.5, shortest / 4))
 
     def stop(self):
         self.running = False
+        with self.lock:
+            self._acked.notify_all()
 
 
 class FileReceiver:
     # Esta clase implementa la recepción y reensamblado de archivos:
     # - Recibe fragmentos en cualquier orden
-    # - Los almacena en buffers organizados por file_id
+    # - Los almacena en buffers organizados por (MAC emisor, file_id)
     # - Verifica la integridad de cada fragmento con CRC
     # - Reensambla el archivo cuando recibe todos los fragmentos
     # - Envía confirmaciones (ACK) al emisor
-    
-    def __init__(self, sock, dst_mac, src_mac):
-        # Almacena referencias a socket y direcciones MAC para respuesta ACK
-        self.sock = sock
+    # La recepción se divide en dos pasos que pipeline.ReceivePipeline ejecuta en
+    # hilos distintos: accept_fragment (parseo y CRC, camino rápido antes del ACK)
+    # y store_fragment (reensamblado). receive_fragment hace ambos seguidos.
+    # Control de flujo: reserve()/release() llevan la cuenta de los bytes
+    # pendientes de procesar (cola de reensamblado, archivos por escribir) y
+    # cada ACK anuncia window() = fragmentos que caben aún en `budget`. Sin
+    # sitio, el fragmento se rechaza con un ACK FLAG_WINDOW (no lo confirma) y,
+    # cuando se libera memoria, se manda una actualización de ventana a los
+    # emisores que vieron ventana cero. Los buffers de reensamblado abiertos no
+    # cuentan: un archivo tiene que estar entero en memoria para completarse y
+    # limitarlos podría bloquear todas las transferencias a medias.
+    # Los fragmentos de tamaño variable (total_frags = 0) se colocan por su
+    # offset, así una misma transferencia puede mezclar tamaños.
+
+    # Transferencias completadas que se recuerdan para no volver a abrir un
+    # buffer con los duplicados tardíos (retransmisiones cuyo ACK se perdió):
+    # como mucho DONE_MEMORY y durante DONE_TTL segundos, más que lo que tarda
+    # el emisor en agotar sus reintentos
+    DONE_MEMORY = 256
+    DONE_TTL = 60.0
+
+    def __init__(self, transport, dst_mac, src_mac, budget=RX_BUDGET):
+        # Almacena referencias al transporte y direcciones MAC para respuesta ACK
+        self.transport = transport
         self.dst_mac = dst_mac
         self.src_mac = src_mac
+        # Presupuesto de memoria pendiente y bytes reservados ahora mismo
+        self.budget = budget
+        self.pending = 0
+        # Fragmento más grande que puede llegar (MTU propia): unidad de la ventana
+        self.frag_max = payload_for_mtu(getattr(transport, 'mtu', network.ETH_MTU))
+        # Emisores que recibieron ventana cero: (MAC, file_id)
+        self._starved = set()
         # Sistema de buffers para reensamblar archivos:
-        # - Usa un diccionario donde la clave es el file_id
-        # - Cada buffer es una lista del tamaño total de fragmentos
+        # - Usa un diccionario donde la clave es (MAC emisor, file_id): dos
+        #   emisores pueden usar el mismo file_id a la vez
+        # - Cada buffer es [lista de fragmentos, fragmentos que faltan]
         # - Los fragmentos no recibidos se marcan como None
+        # - Con tamaño variable: [{offset: datos}, bytes recibidos, tamaño total
+        #   (None hasta que llega el último fragmento)]
         # - Permite recibir fragmentos en cualquier orden
         self.buffers = {}
+        # Terminadas: (MAC emisor, file_id) -> instante en que se completaron
+        self._done = collections.OrderedDict()
+        # Candado de los buffers (el reensamblado puede ir en otro hilo)
+        self.lock = threading.Lock()
 
-    def receive_fragment(self, packet, src_mac):
-        # Este método implementa la lógica de recepción de fragmentos:
+    def accept_fragment(self, packet, src_mac):
+        # Camino rápido de la recepción:
         # 1. Desempaqueta y valida el encabezado
         # 2. Verifica el CRC para detectar errores de transmisión
-        # 3. Almacena el fragmento en el buffer correspondiente
-        # 4. Envía ACK al emisor para confirmar recepción correcta
-        # 5. Si recibió todos los fragmentos, reensambla y retorna el archivo completo
+        # Devuelve (src_mac, file_id, frag_index, total_frags, payload) o None
+        # si el fragmento no es válido; los de tamaño variable añaden
+        # (offset, es_el_último). No toca los buffers ni envía el ACK.
         try:
             hdr, remainder = protocolo.unpack_header(packet)
         except Exception as e:
-            print(f"[FileReceiver] unpack_header error: {e}")
+            log.warning('rx', "unpack_header error: %s", e)
+            RX_MALFORMED.inc()
             return None
 
         payload_len = hdr.get('payload_len', None)
         if payload_len is None:
-            print("[FileReceiver] header sin payload_len válido. Fragmento descartado.")
+            log.warning('rx', "header sin payload_len válido. Fragmento descartado.")
+            RX_MALFORMED.inc()
             return None
 
         remainder_len = len(remainder)
         if remainder_len < payload_len:
-            print(f"[FileReceiver] Fragmento truncado (remainder_len={remainder_len} < payload_len={payload_len}). Descartado.")
+            log.warning('rx', "Fragmento truncado (remainder_len=%d < payload_len=%d). Descartado.", remainder_len, payload_len)
+            RX_MALFORMED.inc()
             return None
 
         payload_with_crc = remainder[:payload_len]
@@ -267,58 +719,179 @@ class FileReceiver:
             payload = b''
             crc_calc = None
 
-        # debug receptor
-        print(f"[RECV] file_id={hdr['file_id']} frag={hdr['frag_index']}/{hdr['total_frags']} payload_len={payload_len} remainder_len={remainder_len} crc_received={('0x%08x'%crc_received) if crc_received is not None else None} crc_calc={('0x%08x'%crc_calc) if crc_calc is not None else None} first16={payload_with_crc[:16].hex()}")
+        # debug receptor (categoría 'rx'): solo se formatea si está activada
+        if log.enabled('rx'):
+            log.debug('rx', "file_id=%d frag=%d/%d payload_len=%d remainder_len=%d crc_received=%s crc_calc=%s first16=%s",
+                      hdr['file_id'], hdr['frag_index'], hdr['total_frags'], payload_len, remainder_len,
+                      crc_received, crc_calc, payload_with_crc[:16].hex())
 
-        valid_crc, _ = protocolo.verify_and_strip_crc(payload_with_crc)
-        if not valid_crc:
-            print("CRC incorrecto. Fragmento descartado.")
+        if crc_received is None or crc_received != crc_calc:
+            log.warning('rx', "CRC incorrecto. Fragmento descartado.")
+            CRC_FAILURES.inc()
             return None
 
-        file_id = hdr['file_id']
-        frag_index = hdr['frag_index']
-        total_frags = hdr['total_frags']
-
-        if file_id not in self.buffers:
-            # inicializa la lista con tamaño total_frags
-            self.buffers[file_id] = [None] * total_frags
-
-        # evitar duplicados
-        if self.buffers[file_id][frag_index] is not None:
-            # reenviar ACK por si el emisor lo necesita
-            self.send_ack(file_id, frag_index, src_mac)
+        if hdr['total_frags'] == 0:
+            # Fragmento de tamaño variable: la posición va delante de los datos
+            if len(payload) < OFFSET_SIZE:
+                log.warning('rx', "Fragmento sin offset. Descartado.")
+                RX_MALFORMED.inc()
+                return None
+            offset = struct.unpack_from(OFFSET_FMT, payload)[0]
+            return (src_mac, hdr['file_id'], hdr['frag_index'], 0, payload[OFFSET_SIZE:], offset,
+                    protocolo.is_flag_set(hdr['flags'], protocolo.FLAG_IS_LAST))
+
+        if hdr['frag_index'] >= hdr['total_frags']:
+            log.warning('rx', "frag_index fuera de rango. Fragmento descartado.")
+            RX_MALFORMED.inc()
             return None
 
-        self.buffers[file_id][frag_index] = payload
+        return (src_mac, hdr['file_id'], hdr['frag_index'], hdr['total_frags'], payload)
+
+    def store_fragment(self, src_mac, file_id, frag_index, total_frags, payload, offset=None, last=False):
+        # Reensamblado: guarda el fragmento en el buffer de su transferencia y,
+        # si ya están todos, devuelve los datos completos (si no, None)
+        key = (src_mac, file_id)
+        if offset is not None:
+            return self._store_at(key, offset, payload, last)
+        with self.lock:
+            if self._is_done(key):
+                RX_DUPLICATES.inc()
+                return None
+            buf = self.buffers.get(key)
+            if buf is None or len(buf[0]) != total_frags:
+                # inicializa la lista con tamaño total_frags
+                buf = self.buffers[key] = [[None] * total_frags, total_frags]
+
+            # evitar duplicados
+            if buf[0][frag_index] is not None:
+                RX_DUPLICATES.inc()
+                return None
+
+            buf[0][frag_index] = payload
+            buf[1] -= 1
+
+            # si ya tenemos todos los fragmentos, ensamblar y devolver
+            if buf[1] == 0:
+                del self.buffers[key]
+                self._mark_done(key)
+                FILES_RECEIVED.inc()
+                return b''.join(buf[0])
 
-        # enviar ACK de confirmación
-        self.send_ack(file_id, frag_index, src_mac)
+        return None
 
-        # si ya tenemos todos los fragmentos, ensamblar y devolver
-        if None not in self.buffers[file_id]:
-            complete_data = b''.join(self.buffers[file_id])
-            del self.buffers[file_id]
-            return complete_data
+    def _is_done(self, key):
+        # True si la transferencia terminó hace menos de DONE_TTL segundos.
+        # Llamar con self.lock tomado.
+        when = self._done.get(key)
+        if when is None:
+            return False
+        if time.monotonic() - when > self.DONE_TTL:
+            del self._done[key]
+            return False
+        return True
+
+    def _mark_done(self, key):
+        # Llamar con self.lock tomado
+        self._done[key] = time.monotonic()
+        while len(self._done) > self.DONE_MEMORY:
+            self._done.popitem(last=False)
+
+    def _store_at(self, key, offset, payload, last):
+        # Reensamblado por posición: el archivo está completo cuando se conoce
+        # su tamaño (final del último fragmento) y han llegado todos sus bytes
+        with self.lock:
+            if self._is_done(key):
+                RX_DUPLICATES.inc()
+                return None
+            buf = self.buffers.get(key)
+            if buf is None or not isinstance(buf[0], dict):
+                buf = self.buffers[key] = [{}, 0, None]
+            parts = buf[0]
+            if offset in parts:
+                RX_DUPLICATES.inc()
+                return None
+            end = offset + len(payload)
+            if (buf[2] is not None and end > buf[2]) or (last and buf[1] > end):
+                log.warning('rx', "Fragmento fuera del tamaño del archivo. Descartado.")
+                RX_MALFORMED.inc()
+                return None
+            if last:
+                buf[2] = end
+            parts[offset] = payload
+            buf[1] += len(payload)
+            if buf[2] is None or buf[1] < buf[2]:
+                return None
+            del self.buffers[key]
+            self._mark_done(key)
+        # Los tramos tienen que encajar uno tras otro sin huecos ni solapes
+        pos = 0
+        for o in sorted(parts):
+            if o != pos:
+                log.warning('rx', "Fragmentos solapados en %s. Transferencia descartada.", key)
+                RX_MALFORMED.inc()
+                return None
+            pos += len(parts[o])
+        FILES_RECEIVED.inc()
+        return b''.join(parts[o] for o in sorted(parts))
+
+    def window(self):
+        # Fragmentos que aún caben en el presupuesto de memoria pendiente
+        return max(0, self.budget - self.pending) // self.frag_max
+
+    def reserve(self, n):
+        with self.lock:
+            self.pending += n
+
+    def release(self, n):
+        # Libera memoria pendiente; si vuelve a haber sitio suficiente avisa a
+        # los emisores que estaban parados por ventana cero
+        with self.lock:
+            self.pending -= n
+            if not self._starved or self.budget - self.pending < self.budget * WINDOW_UPDATE_FRACTION:
+                return
+            starved, self._starved = self._starved, set()
+        for mac, file_id in starved:
+            self.send_ack(file_id, protocolo.NO_FRAGMENT, mac, protocolo.FLAG_WINDOW)
+
+    def reject_fragment(self, file_id, frag_index, dst_mac):
+        # Sin sitio para el fragmento: se descarta y se avisa con ventana cero
+        # (ACK FLAG_WINDOW, que no confirma el fragmento)
+        RX_THROTTLED.inc()
+        self.send_ack(file_id, frag_index, dst_mac, protocolo.FLAG_WINDOW)
 
-        return None
+    def receive_fragment(self, packet, src_mac):
+        # Recepción completa en el hilo que llama:
+        # 1. Valida encabezado y CRC (accept_fragment)
+        # 2. Envía ACK al emisor para confirmar recepción correcta (también para
+        #    duplicados, por si el emisor perdió el ACK anterior)
+        # 3. Si recibió todos los fragmentos, reensambla y retorna el archivo completo
+        frag = self.accept_fragment(packet, src_mac)
+        if frag is None:
+            return None
+        self.send_ack(frag[1], frag[2], src_mac)
+        return self.store_fragment(*frag)
 
-    def send_ack(self, file_id, frag_index, dst_mac):
+    def send_ack(self, file_id, frag_index, dst_mac, flags=0):
         # Sistema de confirmación (ACK):
         # - Confirma al emisor que un fragmento llegó correctamente
-        # - Los ACKs son pequeños y no llevan payload
+        # - Los ACKs son pequeños: su payload es solo la ventana anunciada (4 bytes)
         # - Incluyen el file_id y frag_index para identificar el fragmento
+        # - Con FLAG_WINDOW solo anuncian ventana (fragmento rechazado o actualización)
         # - Son fundamentales para la confiabilidad del protocolo
-        flags = 0
         msg_type = protocolo.MSG_ACK
-        payload_len = 0
         total_frags = 0
+        window = self.window()
+        if window == 0:
+            with self.lock:
+                self._starved.add((dst_mac, file_id))
+        payload = protocolo.pack_ack_window(window)
 
-        header = protocolo.pack_header(file_id, total_frags, frag_index, flags, msg_type, payload_len)
+        header = protocolo.pack_header(file_id, total_frags, frag_index, flags, msg_type, len(payload))
 
         ack_packet = network.build_ethernet_frame(
             dst_mac,          # A quien responder
             self.src_mac,     # MAC local del receptor (emisor del ACK)
             network.ETH_P_CUSTOM,
-            header
+            header + payload
         )
-        network.send_frame(self.sock, ack_packet)
\ No newline at end of file
+        network.send_frame(self.transport, ack_packet)
\ No newline at end of file
@@ -0,0 +1,343 @@
+# src/history.py
+# Este módulo guarda el historial de chat en disco para recargarlo y buscar en él
+# Características:
+# - Registro de solo anexado, rotado en segmentos (seg-000001.log, ...) con una
+#   línea JSON por mensaje: {"t": hora, "peer": "aa:bb:..", "dir": "in"|"out", "text": ...}
+# - Índice de offsets compacto por segmento (seg-000001.idx, 18 bytes por mensaje:
+#   hora, offset y MAC del vecino) que se carga al abrir sin releer los mensajes;
+#   si falta la cola del índice (cierre brusco) se reconstruye desde el segmento
+# - Búsqueda O(log n) por hora, global o por vecino, y lectura de cualquier tramo
+#   con un seek directo al offset de cada mensaje
+# - Índice de palabras para search(), construido la primera vez que se busca y
+#   mantenido después con cada anexado
+# - Anexados con buffer: append() solo encola en memoria y un hilo escribe por
+#   lotes cada FLUSH_INTERVAL, así el camino de recepción no espera al disco
+# - HistoryWindow: cargador perezoso para la GUI, que solo lee los mensajes de
+#   la ventana visible y pide los anteriores al llegar arriba
+
+import array
+import bisect
+import collections
+import json
+import os
+import re
+import struct
+import threading
+import time
+import log
+
+# Tamaño máximo de cada segmento antes de rotar al siguiente
+SEGMENT_BYTES = 4 * 1024 * 1024
+# Cada cuánto escribe el hilo de fondo los mensajes encolados (segundos)
+FLUSH_INTERVAL = 0.5
+# Mensajes encolados que adelantan la escritura sin esperar al intervalo
+FLUSH_RECORDS = 512
+
+# Sentido de un mensaje
+IN = 'in'
+OUT = 'out'
+
+# Entrada del índice de offsets: hora (double), offset en el segmento, MAC
+_INDEX = struct.Struct('!dI6s')
+_WORD = re.compile(r'\w+')
+
+
+def default_directory():
+    # Carpeta por defecto: LINKCHAT_HISTORY o ~/.local/share/linkchat/history
+    return os.environ.get('LINKCHAT_HISTORY') or os.path.join(
+        os.path.expanduser('~'), '.local', 'share', 'linkchat', 'history')
+
+
+def words(text):
+    # Palabras normalizadas (minúsculas) de un texto para el índice de búsqueda
+    return {w.lower() for w in _WORD.findall(text)}
+
+
+def _peer_bytes(peer):
+    return bytes.fromhex(peer.replace(':', ''))[:6].ljust(6, b'\0')
+
+
+def _peer_str(raw):
+    return ':'.join(f'{b:02x}' for b in raw)
+
+
+class History:
+    # Historial persistente de mensajes de chat:
+    # - append(peer, text, direction) encola (O(1), no toca el disco)
+    # - count/seek/read/tail sobre la secuencia global (peer=None) o la de un
+    #   vecino; las posiciones son índices dentro de esa secuencia
+    # - search(consulta) devuelve los mensajes que contienen todas las palabras
+    # Las consultas escriben antes lo pendiente, así que ven todo lo anexado.
+
+    def __init__(self, directory=None, segment_bytes=SEGMENT_BYTES, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory or default_directory()
+        os.makedirs(self.directory, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        # Protege el índice en memoria y los lectores abiertos
+        self.lock = threading.Lock()
+        # Serializa las escrituras (hilo de fondo y flush explícitos)
+        self._write_lock = threading.Lock()
+        self._pending = collections.deque()
+        # Índice global en arrays compactos: hora, segmento y offset por mensaje
+        self._times = array.array('d')
+        self._segs = array.array('I')
+        self._offs = array.array('I')
+        # Índice por vecino: MAC 'aa:bb:..' -> números de mensaje (crecientes)
+        self._by_peer = {}
+        # Índice de palabras (None hasta la primera búsqueda)
+        self._words = None
+        self._readers = {}
+        self._seg = 0
+        self._log = None
+        self._idx = None
+        self._size = 0
+        self._load()
+        self._wakeup = threading.Event()
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name='history', daemon=True)
+        self._thread.start()
+
+    # Apertura: índices existentes y recuperación de colas sin indexar
+
+    def _path(self, seg, ext):
+        return os.path.join(self.directory, f"seg-{seg:06d}.{ext}")
+
+    def _load(self):
+        segs = sorted(int(name[4:10]) for name in os.listdir(self.directory)
+                      if name.startswith('seg-') and name.endswith('.log'))
+        for seg in segs:
+            self._load_segment(seg)
+        self._open_segment(segs[-1] if segs else 1)
+
+    def _load_segment(self, seg):
+        entries, raw = [], b''
+        try:
+            with open(self._path(seg, 'idx'), 'rb') as f:
+                raw = f.read()
+            entries = [_INDEX.unpack_from(raw, i) for i in range(0, len(raw) - len(raw) % _INDEX.size, _INDEX.size)]
+        except OSError:
+            pass
+        with open(self._path(seg, 'log'), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # Los mensajes posteriores a la última entrada del índice se
+            # reindexan leyéndolos; una línea incompleta final se descarta
+            pos = 0
+            if entries:
+                f.seek(entries[-1][1])
+                f.readline()
+                pos = f.tell()
+            f.seek(pos)
+            recovered = []
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    rec = json.loads(line)
+                    recovered.append((float(rec['t']), pos, _peer_bytes(rec['peer'])))
+                except (ValueError, KeyError, TypeError):
+                    log.warning('history', "registro ilegible en seg %d offset %d", seg, pos)
+                pos += len(line)
+        if pos < size:
+            with open(self._path(seg, 'log'), 'r+b') as f:
+                f.truncate(pos)
+        if recovered or len(raw) != len(entries) * _INDEX.size:
+            # Índice con cola parcial o incompleto: se completa en disco
+            with open(self._path(seg, 'idx'), 'ab') as f:
+                f.truncate(len(entries) * _INDEX.size)
+                f.write(b''.join(_INDEX.pack(*e) for e in recovered))
+        for t, off, peer in entries + recovered:
+            self._index(t, seg, off, _peer_str(peer))
+
+    def _open_segment(self, seg):
+        if self._log is not None:
+            self._log.close()
+            self._idx.close()
+        self._seg = seg
+        self._log = open(self._path(seg, 'log'), 'ab')
+        self._idx = open(self._path(seg, 'idx'), 'ab')
+        self._size = self._log.tell()
+
+    def _index(self, t, seg, off, peer):
+        # Llamar con self.lock tomado (o durante la carga). Las horas del índice
+        # nunca retroceden, para que la búsqueda binaria sea válida aunque el
+        # reloj del sistema se ajuste hacia atrás.
+        if self._times and t < self._times[-1]:
+            t = self._times[-1]
+        n = len(self._times)
+        self._times.append(t)
+        self._segs.append(seg)
+        self._offs.append(off)
+        self._by_peer.setdefault(peer, array.array('I')).append(n)
+        return n
+
+    # Escritura
+
+    def append(self, peer, text, direction=IN, t=None):
+        # Encola un mensaje; lo escribe el hilo de fondo
+        self._pending.append({'t': t if t is not None else time.time(), 'peer': peer,
+                              'dir': direction, 'text': text})
+        if len(self._pending) >= FLUSH_RECORDS:
+            self._wakeup.set()
+
+    def _run(self):
+        while self.running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.error('history', "error escribiendo el historial: %s", e)
+
+    def flush(self):
+        # Escribe en disco los mensajes encolados y los añade a los índices
+        with self._write_lock:
+            if not self._pending:
+                return
+            batch = []
+            while self._pending:
+                batch.append(self._pending.popleft())
+            lines, entries, added = [], [], []
+            for rec in batch:
+                line = json.dumps(rec, ensure_ascii=False).encode('utf-8') + b'\n'
+                if self._size and self._size + len(line) > self.segment_bytes:
+                    self._write(lines, entries)
+                    lines, entries = [], []
+                    self._open_segment(self._seg + 1)
+                lines.append(line)
+                entries.append(_INDEX.pack(rec['t'], self._size, _peer_bytes(rec['peer'])))
+                added.append((rec, self._seg, self._size))
+                self._size += len(line)
+            self._write(lines, entries)
+            with self.lock:
+                for rec, seg, off in added:
+                    n = self._index(rec['t'], seg, off, rec['peer'])
+                    if self._words is not None:
+                        for w in words(rec['text']):
+                            self._words.setdefault(w, array.array('I')).append(n)
+
+    def _write(self, lines, entries):
+        # El índice se escribe después del segmento: una entrada del índice
+        # siempre apunta a un mensaje completo
+        if lines:
+            self._log.write(b''.join(lines))
+            self._log.flush()
+            self._idx.write(b''.join(entries))
+            self._idx.flush()
+
+    # Lectura
+
+    def _sequence(self, peer):
+        if peer is None:
+            return range(len(self._times))
+        return self._by_peer.get(peer, array.array('I'))
+
+    def count(self, peer=None):
+        self.flush()
+        with self.lock:
+            return len(self._sequence(peer))
+
+    def seek(self, t, peer=None):
+        # Posición del primer mensaje con hora >= t (O(log n))
+        self.flush()
+        with self.lock:
+            seq = self._sequence(peer)
+            return bisect.bisect_left(seq, t, key=self._times.__getitem__)
+
+    def read(self, start, n, peer=None):
+        # Mensajes en las posiciones [start, start + n) de la secuencia
+        self.flush()
+        with self.lock:
+            seq = self._sequence(peer)
+            numbers = list(seq[max(0, start):max(0, start + n)])
+            return [self._record(i) for i in numbers]
+
+    def tail(self, n, peer=None):
+        # Los últimos n mensajes (global o de un vecino), del más antiguo al más nuevo
+        total = self.count(peer)
+        return self.read(max(0, total - n), n, peer)
+
+    def search(self, query, peer=None, limit=50):
+        # Mensajes que contienen todas las palabras de la consulta, el más
+        # reciente primero
+        self.flush()
+        wanted = words(query)
+        if not wanted:
+            return []
+        with self.lock:
+            if self._words is None:
+                self._build_words()
+            postings = [self._words.get(w) for w in wanted]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            hits = set(postings[0])
+            for p in postings[1:]:
+                hits.intersection_update(p)
+            if peer is not None:
+                hits.intersection_update(self._by_peer.get(peer, ()))
+            return [self._record(i) for i in sorted(hits, reverse=True)[:limit]]
+
+    def _build_words(self):
+        # Primera búsqueda: recorre todos los segmentos una vez. Llamar con self.lock tomado.
+        self._words = {}
+        for n in range(len(self._times)):
+            for w in words(self._record(n)['text']):
+                self._words.setdefault(w, array.array('I')).append(n)
+
+    def _record(self, n):
+        # Lee el mensaje número n con un seek directo. Llamar con self.lock tomado.
+        seg = self._segs[n]
+        f = self._readers.get(seg)
+        if f is None:
+            f = self._readers[seg] = open(self._path(seg, 'log'), 'rb')
+        f.seek(self._offs[n])
+        rec = json.loads(f.readline())
+        rec['n'] = n
+        return rec
+
+    def close(self):
+        self.running = False
+        self._wakeup.set()
+        self._thread.join(2.0)
+        self.flush()
+        with self.lock:
+            for f in self._readers.values():
+                f.close()
+            self._readers.clear()
+        self._log.close()
+        self._idx.close()
+
+
+class HistoryWindow:
+    # Cargador perezoso para la GUI: mantiene la posición del primer mensaje
+    # mostrado y solo lee del historial las páginas que se van a mostrar
+    # - latest(): la última página (al abrir la ventana)
+    # - older(): la página anterior a lo ya mostrado (al llegar arriba del todo)
+    # - skip_to(t): lo anterior a t ya no se muestra (scrollback recortado)
+
+    def __init__(self, history, page=200, peer=None):
+        self.history = history
+        self.page = page
+        self.peer = peer
+        self.start = None
+
+    def latest(self):
+        total = self.history.count(self.peer)
+        self.start = max(0, total - self.page)
+        return self.history.read(self.start, total - self.start, self.peer)
+
+    def skip_to(self, t):
+        # La GUI recortó lo anterior a la hora t: older() recargará desde ahí
+        self.start = self.history.seek(t, self.peer)
+
+    def has_older(self):
+        return bool(self.start)
+
+    def older(self):
+        if not self.start:
+            return []
+        first = max(0, self.start - self.page)
+        records = self.history.read(first, self.start - first, self.peer)
+        self.start = first
+        return records
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# src/lcat.py
+# Tubería de bytes entre dos nodos sin IP, al estilo de netcat, sobre un stream
+# Link-Chat (stream.py): lo que entra por stdin sale por el stdout del otro
+# extremo, en orden y con control de flujo (si el receptor no lee, el emisor
+# se frena). Arranca su propio motor (engine.Engine), así que necesita root
+# (CAP_NET_RAW) como la GUI y el demonio.
+# - Con stdin agotado se cierra la escritura (el otro lado lee fin de datos) y
+#   se sigue recibiendo hasta que el otro extremo cierre la suya
+# - Cuando el otro extremo termina, lcat deja de leer stdin, cierra y sale
+# Los registros van a stderr: stdout solo lleva los datos del stream.
+#
+# Ejemplos:
+#   python src/lcat.py --iface eth0 -l > backup.tar            (receptor)
+#   tar c datos | python src/lcat.py --iface eth0 02:00:00:00:00:0b
+#   journalctl -f | python src/lcat.py 02:00:00:00:00:0b --port 7
+
+import argparse
+import sys
+import threading
+import engine
+import stream
+
+# Bytes leídos de stdin (o pedidos al stream) por llamada
+CHUNK = 64 * 1024
+
+
+def pump(s, inp, out):
+    # Copia inp -> stream en un hilo y stream -> out en el hilo actual hasta que
+    # el otro extremo cierre; devuelve los bytes recibidos
+    errors = []
+
+    def upload():
+        read = getattr(inp, 'read1', inp.read)
+        try:
+            while True:
+                data = read(CHUNK)
+                if not data:
+                    break
+                s.send(data)
+            s.shutdown()
+        except OSError as e:
+            # Stream cortado (o cerrado porque el otro extremo terminó antes)
+            if s.state != stream.CLOSED:
+                errors.append(e)
+
+    threading.Thread(target=upload, name='lcat-stdin', daemon=True).start()
+    received = 0
+    while True:
+        data = s.recv(CHUNK)
+        if not data:
+            break
+        out.write(data)
+        out.flush()
+        received += len(data)
+    s.close()
+    if errors:
+        raise errors[0]
+    return received
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='stdin/stdout por un stream Link-Chat (sin IP)')
+    parser.add_argument('mac', nargs='?', help='MAC del nodo al que conectarse (sin -l)')
+    parser.add_argument('-l', '--listen', action='store_true', help='esperar una conexión entrante')
+    parser.add_argument('--port', type=int, default=stream.DEFAULT_PORT)
+    parser.add_argument('--iface', default=None, help='interfaz (o varias separadas por coma para bonding)')
+    parser.add_argument('--psk-file', default=None, help='archivo con la clave compartida en hex (o LINKCHAT_PSK / LINKCHAT_PASSWORD)')
+    parser.add_argument('--no-encrypt', action='store_true', help='autenticar las tramas sin cifrarlas')
+    parser.add_argument('--timeout', type=float, default=stream.OPEN_TIMEOUT, help='espera máxima de la conexión (s)')
+    args = parser.parse_args(argv)
+    if args.listen == bool(args.mac):
+        parser.error('indicar una MAC o -l')
+
+    if args.psk_file:
+        with open(args.psk_file) as f:
+            key = bytes.fromhex(f.read().strip())
+    else:
+        key = engine.configured_key()
+    eng = engine.Engine(args.iface, key=key, encrypt=not args.no_encrypt).start()
+    try:
+        if args.listen:
+            with eng.listen(args.port) as listener:
+                s = listener.accept()
+        else:
+            s = eng.open_stream(args.mac, args.port, args.timeout)
+        pump(s, sys.stdin.buffer, sys.stdout.buffer)
+    except OSError as e:
+        print(f"lcat: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        eng.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
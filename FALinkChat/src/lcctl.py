@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# src/lcctl.py
+# CLI para manejar un nodo Link-Chat en modo demonio (src/daemon.py)
+# Habla con la API de control del socket UNIX (JSON por líneas) y permite
+# automatizar envíos masivos desde scripts. Sale con código 0 si todo fue bien.
+#
+# Ejemplos:
+#   python src/lcctl.py neighbors
+#   python src/lcctl.py chat "hola a todos"
+#   python src/lcctl.py send ./dataset --to 02:00:00:00:00:0b --wait
+#   python src/lcctl.py send video.mp4 --broadcast --wait   (una transmisión para todos)
+#   python src/lcctl.py join equipo && python src/lcctl.py chat "hola" --group equipo
+#   python src/lcctl.py share iso.img && python src/lcctl.py fetch 3fa9...   (en otro nodo)
+#   python src/lcctl.py transfers
+#   python src/lcctl.py history --peer 02:00:00:00:00:0b reunión
+#   python src/lcctl.py events
+
+import argparse
+import json
+import socket
+import sys
+import time
+import daemon
+
+# Intervalo de consulta del estado con --wait (segundos)
+POLL_INTERVAL = 0.5
+
+
+def connect(path=None, timeout=10.0):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    s.connect(path or daemon.default_socket_path())
+    return s
+
+
+def request(path, req, timeout=10.0):
+    # Envía una petición y devuelve la respuesta; lanza RuntimeError si el
+    # demonio responde con un error
+    s = connect(path, timeout)
+    try:
+        f = s.makefile('rwb')
+        f.write(json.dumps(req).encode('utf-8') + b'\n')
+        f.flush()
+        line = f.readline()
+    finally:
+        s.close()
+    if not line:
+        raise RuntimeError("el demonio cerró la conexión")
+    reply = json.loads(line)
+    if not reply.get('ok'):
+        raise RuntimeError(reply.get('error', 'error desconocido'))
+    return reply
+
+
+def events(path):
+    # Generador de eventos del demonio (una conexión 'subscribe' abierta)
+    s = connect(path, None)
+    try:
+        f = s.makefile('rwb')
+        f.write(b'{"cmd": "subscribe"}\n')
+        f.flush()
+        f.readline()
+        for line in f:
+            yield json.loads(line)
+    finally:
+        s.close()
+
+
+def _print_transfer(t):
+    rate = f" {t['goodput'] / 1e6:.2f}MB/s" if t.get('goodput') else ''
+    if t['state'] == 'sending' and t.get('sent') is not None:
+        # En curso: porcentaje confirmado, velocidad actual y tiempo restante
+        pct = 100.0 * t['sent'] / t['size'] if t['size'] else 100.0
+        rate = f" {pct:.0f}%"
+        if t.get('rate'):
+            rate += f" {t['rate'] / 1e6:.2f}MB/s"
+        if t.get('eta') is not None:
+            rate += f" ETA {t['eta']:.0f}s"
+    print(f"{t['id']:>5} {t['state']:<8} {t['to']} {t['size']:>10} {t['name']}{rate}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Control de un nodo Link-Chat sin GUI')
+    parser.add_argument('--socket', default=None, help='socket de control (por defecto %s)' % daemon.default_socket_path())
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('ping', help='comprobar que el demonio responde')
+    sub.add_parser('neighbors', help='vecinos (mejor enlace primero)')
+    sub.add_parser('discover', help='forzar una ronda de descubrimiento')
+    p = sub.add_parser('chat', help='enviar un mensaje de chat')
+    p.add_argument('text')
+    p.add_argument('--to', action='append', help='MAC destino (repetible; por defecto todos)')
+    p.add_argument('--broadcast', action='store_true', help='una sola transmisión para todos los destinos')
+    p.add_argument('--group', default=None, help='enviar a los miembros de este grupo')
+    p = sub.add_parser('send', help='enviar un archivo o una carpeta')
+    p.add_argument('path')
+    p.add_argument('--to', action='append', help='MAC destino (repetible; por defecto todos)')
+    p.add_argument('--broadcast', action='store_true', help='una sola transmisión para todos los destinos')
+    p.add_argument('--group', default=None, help='enviar a los miembros de este grupo')
+    p.add_argument('--wait', action='store_true', help='esperar a que terminen las transferencias')
+    p = sub.add_parser('join', help='unirse a un grupo')
+    p.add_argument('group')
+    p = sub.add_parser('leave', help='salir de un grupo')
+    p.add_argument('group')
+    sub.add_parser('groups', help='grupos propios y sus miembros')
+    p = sub.add_parser('share', help='compartir un archivo para descargas multi-origen')
+    p.add_argument('path')
+    p.add_argument('--name', default=None, help='nombre anunciado (por defecto el del archivo)')
+    p = sub.add_parser('fetch', help='descargar un contenido de todos los vecinos que lo tienen')
+    p.add_argument('root', help='raíz del contenido en hex (ver share y content)')
+    p.add_argument('--path', default=None, help='destino (por defecto el directorio de recepción)')
+    sub.add_parser('content', help='contenidos compartidos y anunciados')
+    p = sub.add_parser('transfers', help='estado de las transferencias')
+    p.add_argument('ids', nargs='*', type=int)
+    p = sub.add_parser('history', help='últimos mensajes de chat o búsqueda por palabras')
+    p.add_argument('query', nargs='*')
+    p.add_argument('--peer', default=None, help='solo los mensajes con este vecino')
+    p.add_argument('--limit', type=int, default=50)
+    sub.add_parser('events', help='mostrar los eventos del nodo (JSON por línea)')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.cmd == 'events':
+            for event in events(args.socket):
+                print(json.dumps(event), flush=True)
+            return 0
+        if args.cmd == 'ping':
+            reply = request(args.socket, {'cmd': 'ping'})
+            print(f"{reply['mac']} ({reply['iface']})")
+        elif args.cmd == 'neighbors':
+            for n in request(args.socket, {'cmd': 'neighbors'})['neighbors']:
+                rtt = f" rtt={n['rtt'] * 1000:.1f}ms" if n.get('rtt') is not None else ''
+                print(n['mac'] + rtt)
+        elif args.cmd == 'discover':
+            request(args.socket, {'cmd': 'discover'})
+        elif args.cmd == 'chat':
+            reply = request(args.socket, {'cmd': 'chat', 'text': args.text, 'to': args.to,
+                                            'broadcast': args.broadcast, 'group': args.group})
+            if not reply['to']:
+                print("lcctl: no hay vecinos", file=sys.stderr)
+                return 1
+        elif args.cmd == 'send':
+            ids = request(args.socket, {'cmd': 'send', 'path': args.path, 'to': args.to,
+                                          'broadcast': args.broadcast, 'group': args.group})['ids']
+            if not ids:
+                print("lcctl: nada que enviar (sin vecinos o carpeta vacía)", file=sys.stderr)
+                return 1
+            if not args.wait:
+                print(' '.join(str(i) for i in ids))
+                return 0
+            while True:
+                ts = request(args.socket, {'cmd': 'transfers', 'ids': ids})['transfers']
+                if all(t['state'] in ('done', 'failed') for t in ts):
+                    break
+                time.sleep(POLL_INTERVAL)
+            for t in ts:
+                _print_transfer(t)
+            return 0 if all(t['state'] == 'done' for t in ts) else 1
+        elif args.cmd in ('join', 'leave'):
+            reply = request(args.socket, {'cmd': args.cmd, 'group': args.group})
+            if args.cmd == 'join':
+                print(reply['mac'])
+        elif args.cmd == 'groups':
+            for g in request(args.socket, {'cmd': 'groups'})['groups']:
+                print(f"#{g['name']} {g['mac']} " + (' '.join(g['members']) or '(sin miembros)'))
+        elif args.cmd == 'share':
+            print(request(args.socket, {'cmd': 'share', 'path': args.path, 'name': args.name}, None)['root'])
+        elif args.cmd == 'fetch':
+            # Sin límite de tiempo: la respuesta llega al terminar la descarga
+            print(request(args.socket, {'cmd': 'fetch', 'root': args.root, 'path': args.path}, None)['path'])
+        elif args.cmd == 'content':
+            for c in request(args.socket, {'cmd': 'content'})['content']:
+                where = 'local' if c['shared'] else ' '.join(c['holders']) or '(sin vecinos)'
+                print(f"{c['root']} {c['size']:>10} {c['name']} {where}")
+        elif args.cmd == 'history':
+            reply = request(args.socket, {'cmd': 'history', 'peer': args.peer, 'limit': args.limit,
+                                          'query': ' '.join(args.query)})
+            for m in reply['messages']:
+                arrow = '<-' if m['dir'] == 'in' else '->'
+                print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(m['t']))} {arrow} {m['peer']}: {m['text']}")
+        elif args.cmd == 'transfers':
+            for t in request(args.socket, {'cmd': 'transfers', 'ids': args.ids or None})['transfers']:
+                _print_transfer(t)
+    except (OSError, RuntimeError) as e:
+        print(f"lcctl: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# src/lcstat.py
+# CLI para consultar las métricas de un nodo Link-Chat en ejecución
+# Lee la instantánea del socket UNIX de metrics.MetricsServer (o de un archivo
+# escrito con metrics.write_snapshot) y la muestra filtrada. Con --watch repite
+# la consulta y, con --rate, muestra los contadores como incrementos por segundo.
+#
+# Ejemplos:
+#   python src/lcstat.py
+#   python src/lcstat.py --grep frames_ --watch 1 --rate
+#   python src/lcstat.py --file /var/tmp/linkchat.metrics
+
+import argparse
+import sys
+import time
+import metrics
+
+
+def parse(text):
+    # Devuelve ([(muestra, valor)], {nombre: tipo}) a partir del formato de texto
+    samples, types = [], {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ', 3)
+            types[name] = kind
+        elif line and not line.startswith('#'):
+            key, _, value = line.rpartition(' ')
+            samples.append((key, float(value)))
+    return samples, types
+
+
+def _kind(key, types):
+    base = key.split('{', 1)[0]
+    for suffix in ('', '_bucket', '_sum', '_count'):
+        if suffix and base.endswith(suffix):
+            base = base[:-len(suffix)]
+            break
+    return types.get(base, '')
+
+
+def read(args):
+    if args.file:
+        with open(args.file) as f:
+            return f.read()
+    return metrics.fetch(args.socket)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Métricas de un nodo Link-Chat')
+    parser.add_argument('--socket', default=None, help='socket UNIX del nodo (por defecto %s)' % metrics.default_socket_path())
+    parser.add_argument('--file', default=None, help='leer una instantánea escrita en archivo')
+    parser.add_argument('--grep', default='', help='mostrar solo las muestras que contengan este texto')
+    parser.add_argument('--watch', type=float, default=0, help='repetir cada N segundos')
+    parser.add_argument('--rate', action='store_true', help='con --watch, contadores como incremento/s')
+    args = parser.parse_args(argv)
+
+    previous, last = None, None
+    while True:
+        try:
+            text = read(args)
+        except OSError as e:
+            print(f"lcstat: no se pudo leer las métricas: {e}", file=sys.stderr)
+            return 1
+        now = time.monotonic()
+        samples, types = parse(text)
+        if args.watch:
+            print(time.strftime('--- %H:%M:%S'))
+        for key, value in samples:
+            if args.grep not in key:
+                continue
+            if args.rate and previous is not None and _kind(key, types) in ('counter', 'histogram'):
+                delta = (value - previous.get(key, 0.0)) / max(now - last, 1e-9)
+                print(f"{key} {delta:.2f}/s")
+            else:
+                print(f"{key} {metrics.format_value(value)}")
+        if not args.watch:
+            return 0
+        previous, last = dict(samples), now
+        sys.stdout.flush()
+        time.sleep(args.watch)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
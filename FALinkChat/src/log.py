@@ -0,0 +1,205 @@
+# src/log.py
+# Este módulo implementa el registro (logging) de Link-Chat
+# Características:
+# - Niveles DEBUG < INFO < WARNING < ERROR con un umbral global para INFO y superiores
+# - Categorías (rx, tx, transfer, discovery, prober, pipeline, main...): los
+#   mensajes DEBUG solo se emiten si su categoría está activada
+# - Formato diferido estilo %: el texto solo se construye si el mensaje se emite,
+#   y mac() envuelve una MAC para formatearla solo en ese caso. En los caminos
+#   calientes se comprueba antes enabled(categoría), que es una consulta a un set
+# - Límite de mensajes por segundo y muestreo (1 de cada N) por categoría; los
+#   mensajes suprimidos se cuentan y se indican en el siguiente que se emite
+# - Buffer circular en memoria con los últimos registros aceptados (sin formatear)
+#   que se puede volcar a demanda con dump() o con la señal SIGUSR1
+# Configuración con la variable de entorno LINKCHAT_LOG, por ejemplo:
+#   LINKCHAT_LOG=info                 (por defecto)
+#   LINKCHAT_LOG=debug:rx,transfer    (DEBUG solo para esas categorías)
+#   LINKCHAT_LOG=debug:all
+
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+# Capacidad del buffer circular de registros
+RING_SIZE = 2048
+# Límite por defecto de mensajes emitidos por segundo y categoría
+DEFAULT_RATE = 50.0
+
+# Estado global del registro
+level = INFO
+_debug_categories = set()
+_all_debug = False
+_ring = collections.deque(maxlen=RING_SIZE)
+_lock = threading.Lock()
+# Límite por categoría: categoría -> [tokens, último relleno, suprimidos]
+_buckets = {}
+_rates = {}
+# Muestreo por categoría: categoría -> [N, contador]
+_samples = {}
+# Destino de los mensajes emitidos (None: sys.stderr en el momento de escribir)
+stream = None
+
+
+class mac:
+    # Envoltorio de una MAC (6 bytes) que solo se convierte a 'aa:bb:..' si el
+    # mensaje llega a formatearse
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __str__(self):
+        return ':'.join(f'{b:02x}' for b in self.raw)
+
+
+def configure(spec=None):
+    # Aplica una especificación "nivel[:cat1,cat2]" (ver cabecera del módulo)
+    global level, _all_debug
+    if spec:
+        name, _, cats = spec.partition(':')
+        level = {v.lower(): k for k, v in LEVEL_NAMES.items()}.get(name.strip().lower(), INFO)
+        _debug_categories.clear()
+        _all_debug = False
+        for cat in filter(None, (c.strip() for c in cats.split(','))):
+            if cat == 'all':
+                _all_debug = True
+            else:
+                _debug_categories.add(cat)
+        if level == DEBUG and not cats:
+            _all_debug = True
+
+
+def enable(category, on=True):
+    # Activa o desactiva los mensajes DEBUG de una categoría
+    if on:
+        _debug_categories.add(category)
+    else:
+        _debug_categories.discard(category)
+
+
+def enabled(category, lvl=DEBUG):
+    # ¿Se aceptaría un mensaje de este nivel y categoría? Comprobación barata
+    # para proteger los mensajes de depuración de los caminos calientes.
+    # DEBUG depende solo de las categorías activadas; el resto, del umbral global.
+    if lvl <= DEBUG:
+        return _all_debug or category in _debug_categories
+    return lvl >= level
+
+
+def set_rate(category, per_second):
+    # Máximo de mensajes por segundo emitidos para la categoría (None: sin límite)
+    with _lock:
+        if per_second is None:
+            _rates.pop(category, None)
+        else:
+            _rates[category] = float(per_second)
+        _buckets.pop(category, None)
+
+
+def set_sampling(category, every):
+    # Emite solo 1 de cada `every` mensajes aceptados de la categoría
+    with _lock:
+        if every and every > 1:
+            _samples[category] = [every, 0]
+        else:
+            _samples.pop(category, None)
+
+
+def _admit(category, now):
+    # Muestreo y límite de tasa. Devuelve (emitir, suprimidos desde el último)
+    with _lock:
+        sample = _samples.get(category)
+        if sample is not None:
+            sample[1] += 1
+            if sample[1] % sample[0]:
+                return False, 0
+        rate = _rates.get(category, DEFAULT_RATE)
+        bucket = _buckets.get(category)
+        if bucket is None:
+            bucket = _buckets[category] = [rate, now, 0]
+        bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            bucket[2] += 1
+            return False, 0
+        bucket[0] -= 1.0
+        suppressed, bucket[2] = bucket[2], 0
+        return True, suppressed
+
+
+def _format(record):
+    ts, lvl, category, msg, args = record
+    try:
+        text = msg % args if args else msg
+    except Exception:
+        text = f"{msg} {args!r}"
+    stamp = time.strftime('%H:%M:%S', time.localtime(ts)) + f".{int(ts * 1000) % 1000:03d}"
+    return f"{stamp} {LEVEL_NAMES.get(lvl, lvl)} [{category}] {text}"
+
+
+def log(lvl, category, msg, *args):
+    # Registro genérico; msg se formatea con % y args solo si se emite o se vuelca
+    if not enabled(category, lvl):
+        return
+    now = time.time()
+    record = (now, lvl, category, msg, args)
+    _ring.append(record)
+    emit, suppressed = _admit(category, now)
+    if not emit:
+        return
+    line = _format(record)
+    if suppressed:
+        line += f" (+{suppressed} suprimidos)"
+    out = stream or sys.stderr
+    try:
+        out.write(line + '\n')
+    except Exception:
+        pass
+
+
+def debug(category, msg, *args):
+    if category in _debug_categories or _all_debug:
+        log(DEBUG, category, msg, *args)
+
+
+def info(category, msg, *args):
+    log(INFO, category, msg, *args)
+
+
+def warning(category, msg, *args):
+    log(WARNING, category, msg, *args)
+
+
+def error(category, msg, *args):
+    log(ERROR, category, msg, *args)
+
+
+def records():
+    # Copia de los registros del buffer circular (tuplas sin formatear)
+    return list(_ring)
+
+
+def dump(out=None):
+    # Vuelca el buffer circular (de más antiguo a más reciente) a `out`
+    out = out or stream or sys.stderr
+    for record in list(_ring):
+        out.write(_format(record) + '\n')
+    out.flush()
+
+
+def install_dump_signal(signum=getattr(signal, 'SIGUSR1', None)):
+    # `kill -USR1 <pid>` vuelca el buffer circular sin detener la aplicación
+    if signum is not None:
+        signal.signal(signum, lambda *_: dump())
+
+
+configure(os.environ.get('LINKCHAT_LOG'))
@@ -2,128 +2,184 @@ import sys
 import os
 import time
 import threading
-from queue import Queue, Empty
-import socket
-import fcntl
-import struct
-import tkinter.filedialog as fd
+import collections
+from queue import Queue, Empty, Full
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 INTERFACE_DIR = os.path.join(ROOT, 'interface')
 
-# Añadimos INTERFACE_DIR al sys.path para poder importar el módulo interface
-# que contiene los widgets de la GUI (root, entry, display, botones, etc).
-if INTERFACE_DIR not in sys.path:
-    sys.path.insert(0, INTERFACE_DIR)
+import engine
+import history
+import log
+import metrics
 
-import interface
-import protocolo
-import network
-import file_transfer
+# Módulo interface con los widgets de la GUI (root, entry, display, botones,
+# etc). Se importa y se construye en load_gui(): importar main (o el motor) no
+# carga tkinter ni crea la ventana.
+interface = None
 
-# Constantes y configuración global
-BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'  # dirección MAC de broadcast (todo el LAN)
+# El motor de red (transporte, hilo receptor, pipeline, discovery, prober) vive
+# en engine.py y lo comparte el demonio sin GUI (daemon.py); este módulo solo
+# conecta sus eventos y envíos con la interfaz Tkinter.
+mac_str_to_bytes = engine.mac_str_to_bytes
+mac_bytes_to_str = engine.mac_bytes_to_str
 
 # Flags de depuración 
-ENABLE_DEBUG_NEIGH_PRINTER = True  # si True, imprime vecinos periodicamente en consola
-DISCOVERY_WAIT_SECONDS = 0.6       # tiempo que espera la UI tras enviar un discovery
+ENABLE_DEBUG_NEIGH_PRINTER = True  # si True y la categoría 'discovery' está en DEBUG, imprime vecinos periodicamente
 
 
-def mac_str_to_bytes(mac_str: str) -> bytes:
+def format_link_stats(info) -> str:
     """
-    Convierte una MAC en formato 'aa:bb:cc:dd:ee:ff' a 6 bytes.
-    Útil para cuando el usuario introduce MACs en forma textual.
+    Texto breve con la calidad del enlace de un vecino (RTT, jitter, pérdida y
+    ancho de banda estimados por prober.LinkProber) para mostrarlo en la GUI.
+    Devuelve '' si el vecino aún no se ha medido.
     """
-    return bytes(int(x, 16) for x in mac_str.split(':'))
-
-def mac_bytes_to_str(mac_bytes: bytes) -> str:
+    if not info or info.get('rtt') is None:
+        return ''
+    text = f"  rtt={info['rtt'] * 1000:.1f}ms jitter={info.get('jitter', 0.0) * 1000:.1f}ms loss={info.get('loss', 0.0):.0%}"
+    if info.get('bw'):
+        text += f" bw={info['bw'] / 1e6:.2f}MB/s"
+    return text
+
+
+# Renderizado de la GUI: cada pasada del poller vacía como mucho GUI_BATCH
+# eventos y los pinta con una sola actualización del widget; el display guarda
+# como mucho SCROLLBACK_LINES líneas (lo recortado sigue en el historial)
+GUI_POLL_MS = 100
+GUI_BATCH = 2000
+GUI_QUEUE_SIZE = 5000
+SCROLLBACK_LINES = 4000
+GUI_DROPPED = metrics.counter('linkchat_gui_dropped_total', 'Eventos descartados con gui_queue llena', label='type')
+
+# Cola acotada para pasar eventos del hilo de red a la GUI (thread-safe). Se
+# escribe con gui_post: si está llena el evento se descarta y se cuenta, y la
+# GUI muestra una sola línea con el número de mensajes no mostrados
+gui_queue = Queue(GUI_QUEUE_SIZE)
+# Lock para proteger acceso concurrente a la lista 'neighbors'
+neighbors_lock = threading.Lock()
+# Vecinos conocidos por la GUI (MAC en bytes), en orden de llegada. Es un dict
+# usado como conjunto ordenado: altas y bajas en O(1). Lo actualiza gui_poller
+# con los eventos join/leave de discovery.
+neighbors = {}
+# Altas/bajas de vecinos pendientes de pintar, agrupadas por MAC (la última
+# gana): nunca se pierden aunque gui_queue esté llena. Protegido por neighbors_lock.
+pending_neighbors = {}
+# Eventos descartados desde la última pasada del poller
+gui_dropped = 0
+# Mensajes pintados en el display, del más antiguo al más nuevo: (líneas, hora).
+# Permite recortar por mensajes completos y saber desde qué hora recargar el historial
+shown = collections.deque()
+# Ventana del historial de chat mostrada en la GUI (history.HistoryWindow); las
+# páginas anteriores se cargan al desplazarse hasta arriba del todo
+history_window = None
+
+
+
+def load_gui():
     """
-    Convierte 6 bytes de MAC a su representación textual con ':'.
+    Importa tkinter y el módulo interface (desde INTERFACE_DIR) y construye la
+    ventana la primera vez que se llama. Devuelve el módulo interface.
     """
-    return ':'.join(f'{b:02x}' for b in mac_bytes)
-
-def get_interface_mac(iface: str) -> bytes:
+    global interface
+    if interface is None:
+        if INTERFACE_DIR not in sys.path:
+            sys.path.insert(0, INTERFACE_DIR)
+        import interface as gui
+        gui.build()
+        interface = gui
+    return interface
+
+def gui_post(item):
     """
-    Obtener la dirección MAC asociada a la interfaz `iface` en Linux.
-    - Crea un socket UDP solo para obtener un file descriptor (no envía UDP).
-    - Llama a ioctl(SIOCGIFHWADDR) para pedir al kernel la dirección hardware.
-    - Extrae los 6 bytes de la MAC del buffer devuelto (offset 18:24).
-    Nota: esta implementación asume Linux y layout del struct ifreq.
+    Encola un evento para gui_poller sin bloquear el hilo de red. Con la cola
+    llena el evento se descarta y se contabiliza (GUI_DROPPED y gui_dropped).
     """
-    # Creamos socket (AF_INET, SOCK_DGRAM) únicamente para usar su fileno()
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    # Preparar el buffer estilo ifreq con el nombre de la interfaz (max 15 chars)
-    # struct.pack('256s', ...) crea 256 bytes donde los primeros contienen el nombre.
-    info = fcntl.ioctl(s.fileno(), 0x8927, struct.pack('256s', bytes(iface[:15], 'utf-8')))
-    # Los 6 bytes de la MAC están en info[18:24] según layout de ifreq/ifr_hwaddr en Linux.
-    return info[18:24]
+    global gui_dropped
+    try:
+        gui_queue.put_nowait(item)
+    except Full:
+        GUI_DROPPED.inc(1, item[0])
+        with neighbors_lock:
+            gui_dropped += 1
 
-def detect_default_iface():
+def ui_add_message(text: str):
     """
-    Intentar detectar automáticamente una interfaz de red valida cuando no
-    se especifica por argumento. Estrategia:
-      1) Recorre /sys/class/net buscando la primera interfaz que no sea 'lo'
-         y cuyo archivo 'operstate' diga 'up'.
-      2) Si no encuentra ninguna 'up', devuelve la primera interfaz distinta
-         de 'lo' (fallback).
-      3) Si no hay interfaces válidas, lanza RuntimeError.
-    NOTA: esta función está orientada a entornos Linux que exponen /sys/class/net.
+    Inserta una línea en el display de la GUI de forma segura.
     """
-    # Intentamos detectar la primera interfaz 'up' (excluyendo loopback)
-    try:
-        for ifname in os.listdir('/sys/class/net'):
-            if ifname == 'lo':
-                continue
-            try:
-                with open(f'/sys/class/net/{ifname}/operstate', 'r') as f:
-                    if f.read().strip() != 'up':
-                        # si el estado no es 'up' seguimos buscando
-                        continue
-            except Exception:
-                # si hay cualquier problema leyendo el archivo (p. ej. permisos),
-                # saltamos esta interfaz
-                continue
-            # devolvemos la primera interfaz no-loopback que esté 'up'
-            return ifname
-    except Exception:
-        # si listar '/sys/class/net' falla (p. ej. no existe), caemos al fallback
-        pass
-
-    # fallback: devolvemos la primera interfaz que no sea 'lo' (aunque no esté 'up')
-    try:
-        for ifname in os.listdir('/sys/class/net'):
-            if ifname != 'lo':
-                return ifname
-    except Exception:
-        pass
-
-    # si todo falla, pedimos al usuario que especifique --iface
-    raise RuntimeError("No se pudo detectar interfaz automáticamente; usa --iface")
-
-
-# Cola para pasar eventos del hilo de red a la GUI (thread-safe)
-gui_queue = Queue()
-# Lock para proteger acceso concurrente a la lista 'neighbors'
-neighbors_lock = threading.Lock()
-# Lista mantenida por la GUI con las MACs de vecinos (bytes)
-neighbors = []
-# Lock para serializar accesos/temporalmente cambiar ft_s.dst_mac al enviar
-ft_sender_lock = threading.Lock()
+    ui_add_messages([text])
 
+def ui_add_messages(texts, times=None):
+    """
+    Inserta varios mensajes al final del display con una sola actualización:
+    - interface.display se asume un widget Text de Tkinter.
+    - Se cambia el estado una vez, se inserta todo el texto de golpe, se
+      recortan las líneas más antiguas que excedan SCROLLBACK_LINES y se
+      desplaza al final una sola vez.
+    `times` (opcional) son las horas de los mensajes; por defecto, ahora.
+    """
+    if not texts:
+        return
+    now = time.time()
+    disp = interface.display
+    disp.configure(state='normal')
+    disp.insert('end', ''.join('\n' + text.strip() + '\n' for text in texts))
+    for i, text in enumerate(texts):
+        shown.append((text.strip().count('\n') + 2, times[i] if times else now))
+    _trim_scrollback(disp)
+    disp.see('end')  # desplaza al final para ver los mensajes
+    disp.configure(state='disabled')
 
+def _trim_scrollback(disp):
+    """
+    Borra del principio del display los mensajes completos que sobren para no
+    pasar de SCROLLBACK_LINES, y sitúa la ventana del historial en el primer
+    mensaje que queda (al subir se recargará desde ahí).
+    """
+    excess = int(disp.index('end-1c').split('.')[0]) - SCROLLBACK_LINES
+    if excess <= 0:
+        return
+    cut = 0
+    while shown and cut < excess:
+        cut += shown.popleft()[0]
+    disp.delete('1.0', f"{cut + 1}.0")
+    if history_window is not None and shown:
+        history_window.skip_to(shown[0][1])
+
+def format_history(rec) -> str:
+    """
+    Línea de la GUI para un mensaje del historial (ver history.History).
+    """
+    stamp = time.strftime('%d/%m %H:%M', time.localtime(rec['t']))
+    if rec['dir'] == history.OUT:
+        return f"[{stamp}] Yo -> {rec['peer']}: {rec['text']}"
+    return f"[{stamp}] {rec['peer']}: {rec['text']}"
 
-def ui_add_message(text: str):
+def ui_prepend_messages(lines):
     """
-    Inserta una línea en el display de la GUI de forma segura.
-    - interface.display se asume un widget Text de Tkinter.
-    - Se cambia el estado temporalmente para permitir escritura.
+    Inserta mensajes (texto, hora) al principio del display (páginas antiguas
+    del historial) manteniendo visible el mensaje que el usuario estaba mirando.
     """
+    if not lines:
+        return
     disp = interface.display
     disp.configure(state='normal')
-    disp.insert('end', '\n' + text.strip() + '\n')
-    disp.see('end')  # desplaza al final para ver el mensaje
+    disp.insert('1.0', ''.join('\n' + text.strip() + '\n' for text, _ in lines))
+    for text, t in reversed(lines):
+        shown.appendleft((text.strip().count('\n') + 2, t))
+    disp.see(f"{sum(text.strip().count(chr(10)) + 2 for text, _ in lines) + 1}.0")
     disp.configure(state='disabled')
 
+def _load_older_history():
+    """
+    Si el usuario llegó arriba del display y hay mensajes más antiguos, carga la
+    página anterior del historial (solo esa página se lee del disco).
+    """
+    if history_window is None or not history_window.has_older():
+        return
+    top, bottom = interface.display.yview()
+    if top <= 0.0 and bottom < 1.0:
+        ui_prepend_messages([(format_history(r), r['t']) for r in history_window.older()])
+
 def find_widget_by_text(root_widget, text_to_find):
     """
     Busca recursivamente en la jerarquía de widgets un widget que contenga
@@ -147,193 +203,63 @@ def find_widget_by_text(root_widget, text_to_find):
             pass
     return None
 
-# Inicialización de la red y creación de objetos principales
-def start_network(iface):
+# Suscriptor del motor: convierte sus eventos en eventos de la GUI
+def on_engine_event(event):
     """
-    Inicializar la capa de enlace:
-      - crea un socket raw sobre la interfaz indicada
-      - obtiene la MAC local
-      - instancia Discovery (clase para buscar vecinos)
-      - instancia FileTransfer (emisor) y FileReceiver (receptor)
-    Devuelve: sock, src_mac, disc_obj, ft_sender, ft_receiver
+    Callback registrado con Engine.subscribe. Se ejecuta en los hilos de red
+    (receptor, discovery, notificación o envíos), así que solo encola el evento;
+    gui_poller actualiza la lista `neighbors` y la pantalla desde el hilo de Tkinter.
+    """
+    kind = event['event']
+    if kind == 'chat':
+        sender = f"#{event['group']} {event['from']}" if 'group' in event else event['from']
+        gui_post(('chat', sender, event['text']))
+    elif kind == 'file':
+        gui_post(('file', event['from'], event['path']))
+    elif kind == 'neighbor':
+        # Altas y bajas se agrupan por MAC fuera de la cola (no se descartan)
+        with neighbors_lock:
+            pending_neighbors[mac_str_to_bytes(event['mac'])] = event['action']
+    elif kind == 'error':
+        gui_post(('error', event['message']))
+    elif kind == 'transfer' and event['state'] == engine.FAILED:
+        gui_post(('error', f"Error enviando archivo a {event['to']}: {event.get('error', 'fragmentos sin confirmar')}"))
+
+
+def _connect_worker(eng):
+    """
+    Trabajo de red del botón Connect, fuera del hilo de la GUI:
+      - envía el DISCOVERY broadcast
+      - encola la lista de vecinos ya conocidos (mejor enlace primero) con sus
+        estadísticas; los que respondan después llegarán como eventos 'join'
     """
-    # Crear socket raw (AF_PACKET) para enviar/recibir tramas Ethernet
-    sock = network.create_raw_socket(iface)
-    # Obtener MAC de la interfaz local (6 bytes)
-    src_mac = get_interface_mac(iface)
-
-    # Intento opcional de cargar una clase Discovery desde tests (para automatización/test)
     try:
-        # añadimos la carpeta 'tests' temporalmente para poder importar test_auto.Discovery
-        sys.path.insert(0, os.path.join(ROOT, 'tests'))
-        from test_auto import Discovery as MyDiscovery
-        DiscClass = MyDiscovery
-        # removemos el path de tests para no ensuciar sys.path
-        try:
-            sys.path.remove(os.path.join(ROOT, 'tests'))
-        except Exception:
-            pass
-    except Exception:
-        # Si no existe test_auto, definimos una clase Discovery mínima localmente.
-        class DiscClass:
-            def __init__(self, sock, src_mac):
-                self.sock = sock
-                self.src_mac = src_mac
-                self.neighbors = {}
-
-            def send_discovery(self):
-                # Construye un header de tipo DISCOVERY sin payload y lo envía a broadcast
-                hdr = protocolo.pack_header(0, 0, 0, 0, protocolo.MSG_DISCOVERY, 0)
-                frame = network.build_ethernet_frame(BROADCAST_MAC, self.src_mac, network.ETH_P_CUSTOM, hdr)
-                network.send_frame(self.sock, frame)
-
-            def handle_packet(self, src_mac, payload):
-                # Procesa replies: si recibe MSG_REPLY registra el vecino con timestamp
-                hdr, _ = protocolo.unpack_header(payload)
-                if hdr['msg_type'] == protocolo.MSG_REPLY:
-                    self.neighbors[src_mac] = time.time()
-
-            def get_neighbors(self):
-                # Elimina vecinos no vistos en los últimos 300 segundos (5 minutos)
-                now = time.time()
-                self.neighbors = {mac: t for mac, t in self.neighbors.items() if now - t < 300}
-                return list(self.neighbors.keys())
-
-    # Instanciamos objetos de uso: discovery, file transfer sender y receptor
-    disc = DiscClass(sock, src_mac)
-    ft_s = file_transfer.FileTransfer(sock, BROADCAST_MAC, src_mac)
-    ft_r = file_transfer.FileReceiver(sock, None, src_mac)
-    return sock, src_mac, disc, ft_s, ft_r
-
-
-# Hilo receptor: lee tramas L2 y las despacha a módulos (discovery, chat, file)
-def receiver_thread_fn(sock, disc_obj, ft_s, ft_r, stop_event):
-    """
-    Bucle que corre en un hilo (daemon) y recibe tramas Ethernet:
-      - desempaqueta Ethernet (dst, src, ethertype, payload)
-      - filtra por ethertype del protocolo Link-Chat
-      - desempaqueta header del protocolo y despacha por tipo de mensaje:
-        DISCOVERY / REPLY -> disc_obj.handle_packet
-        CHAT -> enviar a GUI
-        FILE_CHUNK -> ft_r.receive_fragment (reensamblado)
-        ACK -> ft_s.receive_ack (confirmar fragmentos)
-    stop_event es un threading.Event que permite salir limpiamente.
-    """
-    while not stop_event.is_set():
-        try:
-            # Recibe una trama desde el socket raw; bloquea hasta que llegue algo
-            frame = network.receive_frame(sock)
-            if not frame:
-                # Si no hay datos (posible socket no bloqueante o timeout), repetir
-                continue
-            # Desempaquetado L2
-            try:
-                dst_mac, src_mac, ethertype, payload = network.unpack_ethernet_frame(frame)
-            except Exception as e:
-                # Si la trama está mal formada, la ignoramos y seguimos
-                print("[RX DEBUG] Error unpack_ethernet_frame:", e)
-                continue
-
-            # Debug L2: imprimir info legible (MACs en hex) si es posible
-            try:
-                print("[RX L2] dst:", mac_bytes_to_str(dst_mac),
-                      "src:", mac_bytes_to_str(src_mac),
-                      "etype:", hex(ethertype), "len:", len(frame))
-            except Exception:
-                print("[RX L2] (raw) len=", len(frame))
-
-            # Procesar solo tramas con el EtherType que usa Link-Chat
-            if ethertype != network.ETH_P_CUSTOM:
-                continue
-
-            # Desempaquetado del header del protocolo (capa Link-Chat)
-            try:
-                hdr, body = protocolo.unpack_header(payload)
-            except Exception as e:
-                print("[RX] Error unpacking header:", e)
-                continue
-
-            # Debug header: ver el tipo y metadatos básicos
-            print("[RX] hdr msg_type =", hdr.get('msg_type'),
-                  "file_id=", hdr.get('file_id'),
-                  "frag_index=", hdr.get('frag_index'))
-
-            # Dispatch por tipo de mensaje
-            if hdr['msg_type'] in (protocolo.MSG_DISCOVERY, protocolo.MSG_REPLY):
-                # Mensajes de descubrimiento: pasar al objeto discovery para que responda
-                try:
-                    disc_obj.handle_packet(src_mac, payload)
-                    print("[RX] discovery.handle_packet invoked for src", mac_bytes_to_str(src_mac))
-                except Exception as e:
-                    print("[RX] discovery.handle_packet error:", e)
-
-            elif hdr['msg_type'] == protocolo.MSG_CHAT:
-                # Mensaje de chat: decodificar texto y ponerlo en la cola GUI
-                try:
-                    text = body.decode('utf-8', errors='replace')
-                except Exception:
-                    text = repr(body)
-                gui_queue.put(('chat', mac_bytes_to_str(src_mac), text))
-
-            elif hdr['msg_type'] == protocolo.MSG_FILE_CHUNK:
-                # Fragmento de archivo: pasarlo al reensamblador (ft_r)
-                # ft_r.receive_fragment devuelve los datos completos si ya se reensamblaron todos los fragmentos
-                complete = ft_r.receive_fragment(payload, src_mac)
-                if complete:
-                    # Escrita del archivo recibido en disco con nombre simple basado en timestamp
-                    fname = f"received_{int(time.time())}.bin"
-                    filepath = os.path.join(os.getcwd(), fname)
-                    with open(filepath, 'wb') as f:
-                        f.write(complete)
-                    # Notificar a GUI que hemos recibido un archivo
-                    gui_queue.put(('file', mac_bytes_to_str(src_mac), filepath))
-
-            elif hdr['msg_type'] == protocolo.MSG_ACK:
-                # ACK de fragmento: notificar al emisor para que elimine fragmento pendiente
-                ft_s.receive_ack(payload)
-
-        except Exception as e:
-            # Capturamos excepciones de alto nivel para no matar el hilo; pequeño sleep evita bucle caliente.
-            print("[receiver_thread_fn exception]", e)
-            time.sleep(0.01)
+        eng.discover()
+        gui_post(('neighbors', eng.neighbors()))
+    except Exception as e:
+        gui_post(('error', f"Error en discovery: {e}"))
 
 
 # Callbacks conectados a botones de la GUI
-def on_connect_pressed(disc_obj):
+def on_connect_pressed(eng):
     """
     Acción ejecutada cuando el usuario pulsa 'Connect' en la GUI:
-      - Envía un discovery broadcast
-      - Espera un breve intervalo para recibir replies
-      - Actualiza la lista global `neighbors` con lo descubierto
-      - Muestra la lista en la GUI
+      - Lanza el discovery en un hilo y vuelve enseguida (la GUI no se bloquea)
+      - El hilo encola la lista de vecinos conocidos; gui_poller la muestra
+      - Los vecinos que respondan más tarde se añaden de forma incremental
+        a medida que discovery notifica cada alta
     """
     ui_add_message("Enviando discovery...")
-    disc_obj.send_discovery()               # broadcast DISCOVERY
-    time.sleep(DISCOVERY_WAIT_SECONDS)      # esperamos un poco para que lleguen replies
-    found = disc_obj.get_neighbors()        # obtenemos vecinos conocidos (filtrados por TTL)
+    threading.Thread(target=_connect_worker, args=(eng,), daemon=True).start()
 
-    # Actualizamos la lista global de vecinos de forma thread-safe
-    with neighbors_lock:
-        neighbors.clear()
-        neighbors.extend(found)
-
-    # Mostramos resultado en la GUI
-    ui_add_message("Neighbors:")
-    if not found:
-        ui_add_message("  (ninguno)")
-    else:
-        for m in found:
-            ui_add_message("  - " + mac_bytes_to_str(m))
-
-def on_send_text_pressed(ft_s):
+def on_send_text_pressed(eng):
     """
     Acción cuando el usuario pulsa el botón de enviar texto:
       - Lee el texto del entry de la GUI
-      - Para cada vecino conocido lanza un hilo que:
-        - ajusta temporalmente ft_s.dst_mac al destino
-        - llama a ft_s.send_chat_message(text)
-        - restaura ft_s.dst_mac original
-    Esta estrategia permite enviar en paralelo sin interferir con otros envíos.
+      - Lo envía a los vecinos conocidos con eng.send_chat (la GUI no se
+        bloquea); con varios vecinos va en broadcast fiable, una sola trama
+        para todos; los errores llegan como eventos
+      - "#grupo texto" lo envía solo a los miembros del grupo (ver LINKCHAT_GROUPS)
     """
     text = interface.entry.get().strip()
     if not text:
@@ -341,6 +267,12 @@ def on_send_text_pressed(ft_s):
     ui_add_message("Yo: " + text)
     interface.entry.delete(0, 'end')
 
+    if text.startswith('#') and ' ' in text:
+        group, text = text[1:].split(' ', 1)
+        if not eng.send_chat(text, group=group):
+            ui_add_message(f"(Nadie más en #{group})")
+        return
+
     # copia segura de la lista de vecinos
     with neighbors_lock:
         dests = list(neighbors)
@@ -348,87 +280,99 @@ def on_send_text_pressed(ft_s):
     if not dests:
         ui_add_message("(No hay vecinos: pulsa Connect)")
         return
+    eng.send_chat(text, dests, broadcast=len(dests) > 1)
 
-    def send_to(mac_bytes):
-        # Guardamos el dst_mac previo para restaurarlo al terminar
-        prev = getattr(ft_s, 'dst_mac', None)
-        with ft_sender_lock:
-            ft_s.dst_mac = mac_bytes
-            try:
-                ft_s.send_chat_message(text)
-            except Exception as e:
-                # Comunicamos errores a la GUI mediante la cola
-                gui_queue.put(('error', f"Error enviando a {mac_bytes_to_str(mac_bytes)}: {e}"))
-            finally:
-                # Restauramos el destino anterior (si lo había)
-                ft_s.dst_mac = prev
-
-    # Lanzamos un hilo por destino para no bloquear la GUI
-    for d in dests:
-        threading.Thread(target=lambda m=d: send_to(m), daemon=True).start()
-
-def on_send_file_pressed(ft_s):
+def on_send_file_pressed(eng):
     """
     Acción cuando el usuario pulsa el botón de enviar archivo:
       - Abre diálogo para seleccionar archivo
-      - Lee el archivo en memoria (data)
-      - Para cada vecino lanza un hilo que usa ft_s.send_file(data)
-    Nota: leer archivos grandes en memoria puede consumir RAM; para archivos muy grandes
-    podría implementarse lectura por streaming/fragmentos fuera de memoria.
+      - Lo envía a los vecinos con eng.send_file en segundo plano; con varios
+        vecinos es una sola transferencia broadcast fiable (cada fragmento sale
+        una vez para todos); las transferencias fallidas llegan como eventos
+    Nota: el archivo no se carga en RAM: se mapea en memoria (mmap) y el emisor
+    construye cada trama al enviar o reenviar su fragmento; por fragmento solo
+    guarda su estado (instante de envío, reintentos), no la trama.
     """
+    # El diálogo de archivos solo se carga la primera vez que se usa
+    import tkinter.filedialog as fd
     path = fd.askopenfilename()
     if not path:
         return
-    ui_add_message("Yo: enviando archivo " + os.path.basename(path))
-    with open(path, 'rb') as f:
-        data = f.read()
-
     with neighbors_lock:
         dests = list(neighbors)
 
     if not dests:
         ui_add_message("(No hay vecinos: pulsa Connect)")
         return
-
-    for d in dests:
-        def _send(mac=d, dat=data):
-            prev = getattr(ft_s, 'dst_mac', None)
-            with ft_sender_lock:
-                ft_s.dst_mac = mac
-                try:
-                    ft_s.send_file(dat)
-                except Exception as e:
-                    gui_queue.put(('error', f"Error enviando archivo a {mac_bytes_to_str(mac)}: {e}"))
-                finally:
-                    ft_s.dst_mac = prev
-        threading.Thread(target=_send, daemon=True).start()
+    ui_add_message("Yo: enviando archivo " + os.path.basename(path))
+    try:
+        eng.send_file(path, dests, broadcast=len(dests) > 1)
+    except OSError as e:
+        ui_add_message(f"[ERROR] No se pudo leer {path}: {e}")
 
 
 # Poller de la GUI: saca eventos de la cola gui_queue y actualiza la interfaz
 def gui_poller():
     """
     Ejecutado periódicamente desde el hilo principal de la GUI (Tkinter).
-    Lee eventos que los hilos de red han puesto en gui_queue y actualiza display.
-    Esto evita manipular widgets de Tkinter desde hilos secundarios.
+    Pinta los eventos que los hilos de red han encolado (render_pending) y se
+    vuelve a programar. Esto evita manipular widgets de Tkinter desde hilos secundarios.
+    """
+    render_pending()
+    # Volver a programar el poller dentro de GUI_POLL_MS
+    interface.root.after(GUI_POLL_MS, gui_poller)
+
+def render_pending():
+    """
+    Una pasada de renderizado: saca como mucho GUI_BATCH eventos de gui_queue,
+    aplica las altas/bajas de vecinos agrupadas y el aviso de descartes, y lo
+    pinta todo con una sola llamada a ui_add_messages. Lo que no quepa en la
+    pasada queda en la cola para la siguiente (la GUI nunca se bloquea).
+    Devuelve el número de mensajes pintados.
     """
+    global gui_dropped
+    texts = []
     try:
-        # Vaciar la cola hasta que esté vacía
-        while True:
+        for _ in range(GUI_BATCH):
             typ, *rest = gui_queue.get_nowait()
             if typ == 'chat':
                 macstr, text = rest
-                ui_add_message(f"{macstr}: {text}")
+                texts.append(f"{macstr}: {text}")
             elif typ == 'file':
                 macstr, filepath = rest
-                ui_add_message(f"{macstr}: archivo recibido -> {filepath}")
+                texts.append(f"{macstr}: archivo recibido -> {filepath}")
             elif typ == 'error':
                 (msg,) = rest
-                ui_add_message("[ERROR] " + msg)
+                texts.append("[ERROR] " + msg)
+            elif typ == 'neighbors':
+                # Resultado de Connect: vecinos conocidos con su calidad de enlace
+                (found,) = rest
+                texts.append("Neighbors:")
+                if not found:
+                    texts.append("  (ninguno)")
+                for info in found:
+                    texts.append("  - " + info['mac'] + format_link_stats(info))
     except Empty:
-        # Si la cola está vacía, no hacemos nada
+        # Si la cola está vacía, no hay más que sacar
         pass
-    # Volver a programar el poller dentro de 100 ms
-    interface.root.after(100, gui_poller)
+    # Alta o baja de vecinos: actualización incremental de la lista
+    with neighbors_lock:
+        changes = dict(pending_neighbors)
+        pending_neighbors.clear()
+        dropped, gui_dropped = gui_dropped, 0
+        for mac, event in changes.items():
+            if event == 'join':
+                neighbors[mac] = True
+            else:
+                neighbors.pop(mac, None)
+    for mac, event in changes.items():
+        sign = '+' if event == 'join' else '-'
+        texts.append(f"  {sign} {mac_bytes_to_str(mac)}")
+    if dropped:
+        texts.append(f"[{dropped} mensajes no mostrados: la GUI iba atrasada (los chats siguen en el historial)]")
+    ui_add_messages(texts)
+    _load_older_history()
+    return len(texts)
 
 # Hilo de debugging: imprime vecinos periódicamente 
 def _debug_neighbor_printer(disc_obj):
@@ -441,7 +385,7 @@ def _debug_neighbor_printer(disc_obj):
         try:
             found = disc_obj.get_neighbors()
             if found:
-                print("[DEBUG neighbors]", [mac_bytes_to_str(m) for m in found])
+                log.debug('discovery', "neighbors: %s", ' '.join(mac_bytes_to_str(m) for m in found))
         except Exception:
             pass
 
@@ -451,80 +395,111 @@ def main(argv):
     """
     Punto de entrada principal:
       - obtiene la interfaz a usar (argumento --iface o detect_default_iface)
-      - inicializa red y objetos
-      - lanza el hilo receptor
+      - arranca el motor de red (engine.Engine)
       - conecta callbacks a botones de la GUI
       - inicia loop principal de Tkinter
       - al cerrar, hace limpieza
     """
+    global history_window
     # Permitir pasar la interfaz por argumentos: python main.py --iface enp0s3
+    # Varias interfaces separadas por coma (--iface eth0,eth1) activan el modo
+    # bonding; --bond usa todas las interfaces que estén 'up'.
     iface = None
     if len(argv) > 1 and argv[1] == '--iface' and len(argv) > 2:
         iface = argv[2]
+    elif len(argv) > 1 and argv[1] == '--bond':
+        iface = ','.join(engine.detect_up_ifaces())
     # Si no se pasó por argumento, intentar detectar una interfaz por defecto
-    iface = iface or detect_default_iface()
-
-    print(f"[main] interface: {iface}")
-
-    # Inicializar red y obtener objetos (socket, mac local, discovery, file transfer sender/receiver)
-    sock, src_mac, disc_obj, ft_s, ft_r = start_network(iface)
-    print(f"[main] local MAC: {mac_bytes_to_str(src_mac)}")
-
-    # Evento para señalar al hilo receptor que debe parar cuando se cierre la app
-    stop_event = threading.Event()
-    # Arrancar hilo receptor (daemon para que no impida cerrar la app)
-    t = threading.Thread(target=receiver_thread_fn, args=(sock, disc_obj, ft_s, ft_r, stop_event), daemon=True)
-    t.start()
+    iface = iface or engine.detect_default_iface()
+
+    log.info('main', "interface: %s", iface)
+    # `kill -USR1 <pid>` vuelca los últimos registros del buffer circular
+    log.install_dump_signal()
+
+    # Motor de red (transporte, hilo receptor, pipeline de recepción, discovery
+    # continuo y sondas de eco); sus eventos llegan a la GUI por gui_queue
+    # Historial de chat persistente (LINKCHAT_HISTORY o ~/.local/share/linkchat/history)
+    chat_history = history.History()
+    # Con LINKCHAT_PSK o LINKCHAT_PASSWORD todas las tramas van autenticadas y
+    # cifradas (LINKCHAT_ENCRYPT=0 deja solo la autenticación). LINKCHAT_TX_RATE_MBIT
+    # (velocidad del enlace) hace que el planificador TX emita a ese ritmo
+    tx_rate = float(os.environ.get('LINKCHAT_TX_RATE_MBIT') or 0) * 1e6 or None
+    eng = engine.Engine(iface, out_dir=os.getcwd(), history=chat_history, key=engine.configured_key(),
+                        encrypt=os.environ.get('LINKCHAT_ENCRYPT', '1') != '0', tx_rate=tx_rate)
+    eng.subscribe(on_engine_event)
+    eng.start()
+    log.info('main', "local MAC: %s", log.mac(eng.src_mac))
+    # Grupos a los que se une el nodo (LINKCHAT_GROUPS=equipo,ops); en la GUI
+    # "#equipo texto" escribe al grupo
+    for group in filter(None, os.environ.get('LINKCHAT_GROUPS', '').split(',')):
+        log.info('main', "group #%s: %s", group, eng.join_group(group.strip()))
+
+    # Métricas leídas en el momento de la consulta y endpoint local (socket UNIX;
+    # consultar con `python src/lcstat.py`)
+    metrics.gauge('linkchat_queue_depth', 'Elementos en cola por etapa', label='stage',
+                  fn=lambda: dict(eng.queue_depths(), gui=gui_queue.qsize()))
+    metrics_server = None
+    try:
+        metrics_server = metrics.MetricsServer().start()
+        log.info('main', "metrics: %s", metrics_server.path)
+    except OSError as e:
+        log.warning('main', "metrics endpoint no disponible: %s", e)
 
     # Hilo opcional de debugging que imprime vecinos cada segundo
-    if ENABLE_DEBUG_NEIGH_PRINTER:
-        threading.Thread(target=_debug_neighbor_printer, args=(disc_obj,), daemon=True).start()
+    if ENABLE_DEBUG_NEIGH_PRINTER and log.enabled('discovery'):
+        threading.Thread(target=_debug_neighbor_printer, args=(eng.disc,), daemon=True).start()
 
+    # La ventana se construye después de arrancar el motor: el primer DISCOVERY
+    # sale sin esperar a Tk
+    load_gui()
+    # Solo la última página del historial; las anteriores se cargan al subir
+    history_window = history.HistoryWindow(chat_history)
+    recs = history_window.latest()
+    ui_add_messages([format_history(r) for r in recs], [r['t'] for r in recs])
 
     # Asociar acciones a botones de la GUI. Se intenta usar referencias directas
     # exportadas por el módulo interface; si no existen, se busca el botón por texto.
     try:
         if hasattr(interface, 'btn_connect'):
-            interface.btn_connect.configure(command=lambda: on_connect_pressed(disc_obj))
+            interface.btn_connect.configure(command=lambda: on_connect_pressed(eng))
         else:
             btn = find_widget_by_text(interface.root, "Connect")
             if btn:
-                btn.configure(command=lambda: on_connect_pressed(disc_obj))
+                btn.configure(command=lambda: on_connect_pressed(eng))
     except Exception:
         # Si algo falla al asociar evento, ignoramos (no crítico)
         pass
 
     try:
         if hasattr(interface, 'btn_sendfile'):
-            interface.btn_sendfile.configure(command=lambda: on_send_file_pressed(ft_s))
+            interface.btn_sendfile.configure(command=lambda: on_send_file_pressed(eng))
         else:
             btn = find_widget_by_text(interface.root, "Send file")
             if btn:
-                btn.configure(command=lambda: on_send_file_pressed(ft_s))
+                btn.configure(command=lambda: on_send_file_pressed(eng))
     except Exception:
         pass
 
     try:
         if hasattr(interface, 'btn_send'):
-            interface.btn_send.configure(command=lambda: on_send_text_pressed(ft_s))
+            interface.btn_send.configure(command=lambda: on_send_text_pressed(eng))
         else:
             btn = find_widget_by_text(interface.root, "➤")
             if btn:
-                btn.configure(command=lambda: on_send_text_pressed(ft_s))
+                btn.configure(command=lambda: on_send_text_pressed(eng))
     except Exception:
         pass
 
     # Iniciar el poller de la GUI y el bucle principal de Tkinter (bloqueante)
-    interface.root.after(100, gui_poller)
+    interface.root.after(GUI_POLL_MS, gui_poller)
     interface.root.mainloop()
 
     # Limpieza al cerrar
-    stop_event.set()  # avisar al hilo receptor que debe salir
-    try:
-        sock.close()
-    except Exception:
-        pass
-    print("[main] Finalizado correctamente.")
+    if metrics_server is not None:
+        metrics_server.stop()
+    eng.stop()
+    chat_history.close()
+    log.info('main', "Finalizado correctamente.")
 
 
 # Ejecutable directo
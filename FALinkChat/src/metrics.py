@@ -0,0 +1,273 @@
+# src/metrics.py
+# Este módulo implementa las métricas del motor de Link-Chat
+# Características:
+# - Contadores, gauges e histogramas con una etiqueta opcional (p. ej. type="chat")
+# - Registro global (REGISTRY): cada módulo declara sus métricas al importarse
+#   y las actualiza en el camino caliente con una sola operación protegida por lock
+# - Gauges calculados en el momento de la lectura (profundidad de colas, vecinos)
+# - Instantánea en formato de texto estable (formato de exposición de Prometheus):
+#     # HELP linkchat_frames_rx_total Tramas Link-Chat recibidas
+#     # TYPE linkchat_frames_rx_total counter
+#     linkchat_frames_rx_total{type="chat"} 12
+# - Servidor en un socket UNIX local que entrega la instantánea a cada conexión,
+#   y escritura atómica de la instantánea en un archivo
+# El CLI para consultarlo es src/lcstat.py.
+
+import bisect
+import os
+import socket
+import threading
+
+# Límites por defecto de los histogramas de tiempos (segundos)
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Límites por defecto de los histogramas de velocidad (bytes/s)
+RATE_BUCKETS = (1e4, 1e5, 1e6, 1e7, 1e8)
+
+
+def default_socket_path():
+    # Socket por defecto: LINKCHAT_METRICS o /tmp/linkchat-<uid>.metrics
+    # (tempfile se importa aquí: arrastra shutil, fnmatch y re, y el motor
+    # importa este módulo al arrancar aunque no abra el endpoint)
+    import tempfile
+    return os.environ.get('LINKCHAT_METRICS') or os.path.join(
+        tempfile.gettempdir(), f"linkchat-{os.getuid()}.metrics")
+
+
+def format_value(value):
+    # Valores enteros sin decimales; el resto con repr (precisión completa)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    # Contador monótono, opcionalmente con una etiqueta: inc(n, label)
+    kind = 'counter'
+
+    def __init__(self, name, help='', label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n=1, label=None):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + n
+
+    def value(self, label=None):
+        with self._lock:
+            return self._values.get(label, 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label, value in sorted(values.items(), key=lambda kv: str(kv[0])):
+            yield self.name, self._labels(label), value
+
+    def _labels(self, label):
+        if self.label is None or label is None:
+            return ''
+        return f'{{{self.label}="{label}"}}'
+
+
+class Gauge(Counter):
+    # Valor instantáneo: set(v, label), o una función `fn` que se evalúa al leer
+    # y devuelve un número o un dict etiqueta -> número
+    kind = 'gauge'
+
+    def __init__(self, name, help='', label=None, fn=None):
+        super().__init__(name, help, label)
+        self.fn = fn
+
+    def set(self, value, label=None):
+        with self._lock:
+            self._values[label] = value
+
+    def samples(self):
+        if self.fn is not None:
+            try:
+                result = self.fn()
+            except Exception:
+                return
+            values = result if isinstance(result, dict) else {None: result}
+            with self._lock:
+                self._values = dict(values)
+        yield from super().samples()
+
+
+class Histogram:
+    # Histograma de buckets fijos (acumulados al exportar) con suma y cuenta
+    kind = 'histogram'
+
+    def __init__(self, name, help='', buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self):
+        return self._count
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+    def samples(self):
+        with self._lock:
+            counts, total, n = list(self._counts), self._sum, self._count
+        acc = 0
+        for bound, c in zip(self.buckets + (float('inf'),), counts):
+            acc += c
+            le = '+Inf' if bound == float('inf') else format_value(bound)
+            yield self.name + '_bucket', f'{{le="{le}"}}', acc
+        yield self.name + '_sum', '', total
+        yield self.name + '_count', '', n
+
+
+class Registry:
+    # Conjunto ordenado de métricas por nombre. Registrar dos veces el mismo
+    # nombre devuelve la métrica existente (módulos reimportados, varias instancias)
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def reset(self):
+        # Pone a cero contadores e histogramas (para pruebas y benchmarks)
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def render(self):
+        # Instantánea en formato de texto: líneas HELP/TYPE y una muestra por línea
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help='', label=None):
+    return REGISTRY.register(Counter(name, help, label))
+
+
+def gauge(name, help='', label=None, fn=None):
+    metric = REGISTRY.register(Gauge(name, help, label, fn))
+    if fn is not None:
+        metric.fn = fn
+    return metric
+
+
+def histogram(name, help='', buckets=TIME_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, buckets))
+
+
+def render():
+    return REGISTRY.render()
+
+
+def write_snapshot(path, registry=REGISTRY):
+    # Escribe la instantánea en `path` de forma atómica (archivo temporal + rename)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+def fetch(path=None, timeout=2.0):
+    # Lee la instantánea servida por MetricsServer en el socket UNIX `path`
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        s.connect(path or default_socket_path())
+        chunks = []
+        while True:
+            data = s.recv(65536)
+            if not data:
+                break
+            chunks.append(data)
+    finally:
+        s.close()
+    return b''.join(chunks).decode('utf-8')
+
+
+class MetricsServer:
+    # Endpoint local: cada conexión al socket UNIX recibe la instantánea completa
+    # y se cierra. El socket se crea con permisos 0600 (solo el usuario actual).
+
+    def __init__(self, path=None, registry=REGISTRY):
+        self.path = path or default_socket_path()
+        self.registry = registry
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # El socket nace con permisos 0600: con chmod después del bind quedaría
+        # un momento abierto a otros usuarios
+        old = os.umask(0o177)
+        try:
+            self._sock.bind(self.path)
+        finally:
+            os.umask(old)
+        self._sock.listen(8)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            try:
+                conn.sendall(self.registry.render().encode('utf-8'))
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    def stop(self):
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -1,9 +1,33 @@
 import socket
 import struct
+import protocolo
+import metrics
 
 # Definimos un EtherType personalizado para Link-Chat,
 # que permite a la red identificar que esta trama pertenece a nuestro protocolo.
 ETH_P_CUSTOM = 0x88B5
+_ETYPE_BYTES = struct.pack('!H', ETH_P_CUSTOM)
+# MTU Ethernet estándar: la que se supone a un transporte o vecino que no anuncia otra
+ETH_MTU = 1500
+# Margen del buffer de recepción sobre la MTU (cabecera Ethernet y capas extra)
+RECV_MARGIN = 100
+# Posición del campo msg_type en la trama: 14 bytes Ethernet + 7 del header Link-Chat
+_MSG_TYPE_OFFSET = 14 + 7
+
+# Métricas de tramas por tipo de mensaje (se cuentan al enviar y recibir)
+FRAMES_TX = metrics.counter('linkchat_frames_tx_total', 'Tramas Link-Chat enviadas', label='type')
+BYTES_TX = metrics.counter('linkchat_bytes_tx_total', 'Bytes de tramas Link-Chat enviadas', label='type')
+FRAMES_RX = metrics.counter('linkchat_frames_rx_total', 'Tramas Link-Chat recibidas', label='type')
+BYTES_RX = metrics.counter('linkchat_bytes_rx_total', 'Bytes de tramas Link-Chat recibidas', label='type')
+
+
+def _count(frames, nbytes, frame):
+    # Cuenta la trama por tipo si es Link-Chat; coste: un slice y dos sumas
+    if len(frame) > _MSG_TYPE_OFFSET and frame[12:14] == _ETYPE_BYTES:
+        t = frame[_MSG_TYPE_OFFSET]
+        name = protocolo.MSG_NAMES.get(t) or str(t)
+        frames.inc(1, name)
+        nbytes.inc(len(frame), name)
 
 def create_raw_socket(iface):
     # Crea un socket raw en Linux para poder enviar y recibir tramas Ethernet directament
@@ -36,8 +60,13 @@ def unpack_ethernet_frame(frame):
 def send_frame(sock, frame):
     # Envía la trama completa por el socket raw abierto
     sock.send(frame)
+    _count(FRAMES_TX, BYTES_TX, frame)
 
 def receive_frame(sock, buffer_size=1600):
     # Recibe una trama desde el socket raw
-    # El tamaño por defecto del buffer corresponde al MTU Ethernet típico
-    return sock.recv(buffer_size)
+    # El tamaño por defecto del buffer corresponde al MTU Ethernet típico; con
+    # jumbo frames hay que pasar la MTU del transporte + RECV_MARGIN
+    frame = sock.recv(buffer_size)
+    if frame:
+        _count(FRAMES_RX, BYTES_RX, frame)
+    return frame
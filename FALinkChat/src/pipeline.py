@@ -0,0 +1,226 @@
+# src/pipeline.py
+# Este módulo divide la recepción en etapas conectadas por colas acotadas, para
+# que escribir un archivo grande en disco o actualizar la GUI nunca retrase los
+# ACKs de las demás transferencias
+# Etapas:
+# - Camino rápido (en el hilo receptor): parseo, CRC y ACK. Nada más.
+# - Reensamblado: un hilo dueño de los buffers de FileReceiver
+# - Escritura a disco: varios hilos, con política de fsync configurable
+# - Notificación: un hilo que entrega los eventos (chat, archivo) a la GUI
+# Cada etapa expone su profundidad de cola (actual y máxima), procesados,
+# descartados y errores mediante stats().
+
+import os
+import queue
+import threading
+import time
+import log
+
+# Tamaños de cola por defecto. La cola de escritura guarda archivos completos
+# en memoria, por eso es pequeña; la de reensamblado guarda fragmentos.
+REASSEMBLY_QUEUE = 4096
+WRITER_QUEUE = 8
+NOTIFY_QUEUE = 1024
+WRITER_THREADS = 2
+
+# Políticas de fsync para los archivos recibidos:
+# - 'always': fsync antes de renombrar y notificar (el archivo anunciado está en disco)
+# - 'never': se deja la escritura diferida al sistema operativo
+FSYNC_ALWAYS = 'always'
+FSYNC_NEVER = 'never'
+
+# Marca interna para detener a los trabajadores de una etapa
+_STOP = object()
+
+
+class Stage:
+    # Una etapa del pipeline: cola acotada + `workers` hilos que aplican
+    # `handler` a cada elemento. put() con block=False permite descartar en vez
+    # de esperar cuando la cola está llena (contrapresión hacia la etapa anterior).
+
+    def __init__(self, name, handler, workers=1, maxsize=1024):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        # Métricas de la etapa
+        self.max_depth = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def put(self, item, block=True, timeout=None):
+        # Encola un elemento; devuelve False si se descartó por cola llena
+        try:
+            self.queue.put(item, block, timeout)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            with self.lock:
+                self.max_depth = max(self.max_depth, depth)
+        return True
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            try:
+                self.handler(item)
+                with self.lock:
+                    self.processed += 1
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                log.error('pipeline', "error in stage %s: %s", self.name, e)
+
+    def stop(self, timeout=1.0):
+        # Los trabajadores terminan tras vaciar lo que ya estaba en cola
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        with self.lock:
+            return {'depth': self.queue.qsize(), 'max_depth': self.max_depth,
+                    'capacity': self.queue.maxsize, 'processed': self.processed,
+                    'dropped': self.dropped, 'errors': self.errors}
+
+
+class ReceivePipeline:
+    # Recepción de fragmentos en etapas:
+    # - submit_fragment (camino rápido, en el hilo receptor): valida con
+    #   receiver.accept_fragment, encola el fragmento para reensamblar y solo
+    #   entonces envía el ACK. Si la cola de reensamblado está llena el fragmento
+    #   se descarta SIN ACK: el emisor lo retransmitirá, nunca se pierde un
+    #   fragmento ya confirmado.
+    # - Control de flujo: los bytes en cola de reensamblado y los archivos que
+    #   esperan escritura se reservan en el receptor (reserve/release) y cada ACK
+    #   anuncia la ventana que queda. Con ventana cero el fragmento se rechaza con
+    #   receiver.reject_fragment y el emisor espera sin gastar reintentos.
+    # - _reassemble: receiver.store_fragment; los archivos completos pasan a escritura
+    #   (también los que llegan enteros por submit_file, p. ej. de broadcast.Broadcast)
+    # - _write: escribe en out_dir (archivo .part + rename) y pide notificar
+    # - notify(evento): se entrega a on_event en el hilo de notificación. Los
+    #   eventos son tuplas ('file', mac, ruta) o las que publique el receptor
+    #   con post() (p. ej. ('chat', mac, texto)).
+
+    def __init__(self, receiver, on_event, out_dir=None, writers=WRITER_THREADS,
+                 fsync=FSYNC_ALWAYS, reassembly_queue=REASSEMBLY_QUEUE,
+                 writer_queue=WRITER_QUEUE, notify_queue=NOTIFY_QUEUE):
+        if fsync not in (FSYNC_ALWAYS, FSYNC_NEVER):
+            raise ValueError(f"política de fsync desconocida: {fsync}")
+        self.receiver = receiver
+        self.out_dir = out_dir or os.getcwd()
+        self.fsync = fsync
+        self.reassembly = Stage('reassembly', self._reassemble, 1, reassembly_queue)
+        self.writer = Stage('writer', self._write, writers, writer_queue)
+        self.notify = Stage('notify', on_event, 1, notify_queue)
+        # Métricas del camino rápido
+        self.fast_accepted = 0
+        self.fast_rejected = 0
+        self.fast_dropped = 0
+        self.fast_throttled = 0
+
+    def start(self):
+        for stage in (self.notify, self.writer, self.reassembly):
+            stage.start()
+
+    def stop(self):
+        # Se detiene en el orden del flujo para no perder lo que ya está en cola
+        for stage in (self.reassembly, self.writer, self.notify):
+            stage.stop()
+
+    def submit_fragment(self, packet, src_mac):
+        # Camino rápido: parseo + CRC + ACK. Devuelve True si se aceptó.
+        frag = self.receiver.accept_fragment(packet, src_mac)
+        if frag is None:
+            self.fast_rejected += 1
+            return False
+        if self.receiver.window() == 0:
+            self.fast_throttled += 1
+            self.receiver.reject_fragment(frag[1], frag[2], src_mac)
+            return False
+        self.receiver.reserve(len(frag[4]))
+        if not self.reassembly.put(frag, block=False):
+            self.receiver.release(len(frag[4]))
+            self.fast_dropped += 1
+            return False
+        self.fast_accepted += 1
+        self.receiver.send_ack(frag[1], frag[2], src_mac)
+        return True
+
+    def post(self, event):
+        # Evento para la GUI desde el hilo receptor; no bloquea: si la etapa de
+        # notificación está saturada el evento se descarta y se contabiliza
+        return self.notify.put(event, block=False)
+
+    def submit_file(self, src_mac, file_id, data):
+        # Archivo ya completo (broadcast fiable) hacia la etapa de escritura, por
+        # la cola de reensamblado para no bloquear el hilo receptor. Devuelve
+        # False si la cola está llena (quien llama lo reintentará)
+        self.receiver.reserve(len(data))
+        if not self.reassembly.put((src_mac, file_id, data), block=False):
+            self.receiver.release(len(data))
+            return False
+        return True
+
+    def _reassemble(self, frag):
+        if len(frag) == 3:
+            self.writer.put(frag)
+            return
+        complete = self.receiver.store_fragment(*frag)
+        if complete is not None:
+            # El archivo completo sigue ocupando memoria hasta escribirse
+            self.receiver.reserve(len(complete))
+        self.receiver.release(len(frag[4]))
+        if complete is not None:
+            # Bloquea si los escritores van atrasados: la contrapresión llena la
+            # cola de reensamblado y el camino rápido deja de confirmar
+            self.writer.put((frag[0], frag[1], complete))
+
+    def _write(self, item):
+        src_mac, file_id, data = item
+        try:
+            self._save(src_mac, file_id, data)
+        finally:
+            self.receiver.release(len(data))
+
+    def _save(self, src_mac, file_id, data):
+        fname = f"received_{int(time.time())}_{src_mac.hex()}_{file_id}.bin"
+        filepath = os.path.join(self.out_dir, fname)
+        tmp = filepath + '.part'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            if self.fsync == FSYNC_ALWAYS:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, filepath)
+        self.notify.put(('file', src_mac, filepath))
+
+    def stats(self):
+        # Métricas por etapa: profundidad de cola actual y máxima, capacidad,
+        # elementos procesados, descartados y errores
+        return {
+            'fast': {'accepted': self.fast_accepted, 'rejected': self.fast_rejected,
+                     'dropped': self.fast_dropped, 'throttled': self.fast_throttled},
+            'reassembly': self.reassembly.stats(),
+            'writer': self.writer.stats(),
+            'notify': self.notify.stats(),
+        }
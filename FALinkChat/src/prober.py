@@ -0,0 +1,218 @@
+# src/prober.py
+# Este módulo mide la calidad del enlace con cada vecino mediante sondas de eco
+# Características:
+# - Mensajes MSG_ECHO_REQ / MSG_ECHO_REPLY ligeros (header de 10 bytes)
+# - RTT suavizado y su variación (SRTT/RTTVAR al estilo RFC 6298)
+# - Jitter como media móvil de la diferencia entre RTTs consecutivos (RFC 3550)
+# - Pérdida sobre las últimas LOSS_WINDOW sondas
+# - Ancho de banda estimado por pares de paquetes (packet-pair) y por el
+#   historial de transferencias reales (goodput de FileTransfer)
+# - Los resultados se guardan en la tabla de vecinos de Discovery, y FileTransfer
+#   los usa para elegir ventana y timeout iniciales de cada transferencia
+
+import collections
+import random
+import threading
+import time
+import protocolo
+import network
+import log
+
+# Cada cuánto se sondea a cada vecino (segundos, con jitter) y cuántas sondas por
+# segundo como máximo se envían en total (así escala a miles de vecinos)
+PROBE_INTERVAL = 10.0
+PROBE_BUDGET = 20
+# Tiempo tras el que una sonda sin respuesta cuenta como perdida
+ECHO_TIMEOUT = 2.0
+# Número de sondas recientes sobre las que se calcula la pérdida
+LOSS_WINDOW = 20
+# Una de cada PAIR_EVERY sondas a un vecino es un par de paquetes grandes
+PAIR_EVERY = 5
+PAIR_SIZE = 1400
+# Límites de los parámetros iniciales que se proponen a FileTransfer
+MIN_RTO = 0.2
+MIN_WINDOW = 4
+MAX_WINDOW = 256
+
+
+class LinkProber:
+    # Esta clase mantiene las estadísticas de enlace por vecino:
+    # - probe(mac) envía una sonda (o un par de sondas grandes) al vecino
+    # - handle_packet responde a las sondas ajenas y procesa las respuestas propias
+    # - tick() caduca las sondas sin respuesta y reparte las sondas periódicas
+    #   entre los vecinos en rondas, respetando PROBE_BUDGET
+    # - initial_params / record_transfer son la interfaz con FileTransfer
+
+    def __init__(self, transport, src_mac, disc, interval=PROBE_INTERVAL, clock=time.monotonic):
+        self.transport = transport
+        self.src_mac = src_mac
+        # Tabla de vecinos donde se publican las estadísticas (discovery.Discovery)
+        self.disc = disc
+        self.interval = interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._seq = 0
+        # Sondas en vuelo: seq (16 bits) -> (mac, instante de envío, marca de par)
+        self._pending = {}
+        # Estado de medición por vecino
+        self._peers = {}
+        # Vecinos pendientes de sondear en la ronda actual
+        self._round = collections.deque()
+        self._next_round = 0.0
+        self._rng = random.Random()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _peer(self, mac):
+        st = self._peers.get(mac)
+        if st is None:
+            st = {'srtt': None, 'rttvar': None, 'jitter': 0.0, 'last_rtt': None,
+                  'results': collections.deque(maxlen=LOSS_WINDOW), 'bw': None,
+                  'probes': 0, 'pair_t1': None}
+            self._peers[mac] = st
+        return st
+
+    def probe(self, mac, pair=False):
+        # Envía una sonda de eco al vecino. Con pair=True se envían dos sondas
+        # grandes seguidas; la separación entre sus respuestas estima el ancho de banda
+        now = self.clock()
+        markers = (1, 2) if pair else (0,)
+        pad = bytes(PAIR_SIZE) if pair else b''
+        frames = []
+        with self.lock:
+            self._peer(mac)['probes'] += 1
+            for marker in markers:
+                self._seq = (self._seq + 1) & 0xffff
+                self._pending[self._seq] = (mac, now, marker)
+                hdr = protocolo.pack_header(self._seq, 0, marker, 0, protocolo.MSG_ECHO_REQ, len(pad))
+                frames.append(network.build_ethernet_frame(mac, self.src_mac, network.ETH_P_CUSTOM, hdr + pad))
+        for frame in frames:
+            network.send_frame(self.transport, frame)
+
+    def handle_packet(self, src_mac, payload):
+        # Procesa MSG_ECHO_REQ (responder con el mismo contenido) y MSG_ECHO_REPLY
+        hdr, body = protocolo.unpack_header(payload)
+        if hdr['msg_type'] == protocolo.MSG_ECHO_REQ:
+            reply = protocolo.pack_header(hdr['file_id'], 0, hdr['frag_index'], 0,
+                                          protocolo.MSG_ECHO_REPLY, hdr['payload_len'])
+            frame = network.build_ethernet_frame(src_mac, self.src_mac, network.ETH_P_CUSTOM,
+                                                 reply + body[:hdr['payload_len']])
+            network.send_frame(self.transport, frame)
+            return
+        if hdr['msg_type'] != protocolo.MSG_ECHO_REPLY:
+            return
+        now = self.clock()
+        with self.lock:
+            entry = self._pending.get(hdr['file_id'])
+            if entry is None or entry[0] != src_mac:
+                return
+            del self._pending[hdr['file_id']]
+            mac, sent, marker = entry
+            st = self._peer(mac)
+            self._add_rtt(st, now - sent)
+            st['results'].append(True)
+            if marker == 1:
+                st['pair_t1'] = now
+            elif marker == 2 and st['pair_t1'] is not None:
+                dispersion = now - st['pair_t1']
+                st['pair_t1'] = None
+                if dispersion > 0:
+                    self._add_bw(st, (len(payload) + 14) / dispersion)
+            stats = self._summary(st)
+        self.disc.update_stats(mac, **stats)
+
+    def _add_rtt(self, st, rtt):
+        # SRTT/RTTVAR como en RFC 6298 y jitter como en RFC 3550
+        if st['srtt'] is None:
+            st['srtt'] = rtt
+            st['rttvar'] = rtt / 2.0
+        else:
+            st['rttvar'] = 0.75 * st['rttvar'] + 0.25 * abs(st['srtt'] - rtt)
+            st['srtt'] = 0.875 * st['srtt'] + 0.125 * rtt
+        if st['last_rtt'] is not None:
+            st['jitter'] += (abs(rtt - st['last_rtt']) - st['jitter']) / 16.0
+        st['last_rtt'] = rtt
+
+    def _add_bw(self, st, sample):
+        st['bw'] = sample if st['bw'] is None else 0.75 * st['bw'] + 0.25 * sample
+
+    def _summary(self, st):
+        results = st['results']
+        loss = (results.count(False) / float(len(results))) if results else 0.0
+        return {'rtt': st['srtt'], 'rttvar': st['rttvar'], 'jitter': st['jitter'],
+                'loss': loss, 'bw': st['bw']}
+
+    def stats(self, mac):
+        # Estadísticas actuales del vecino (None si nunca se ha medido)
+        with self.lock:
+            st = self._peers.get(mac)
+            return self._summary(st) if st is not None else None
+
+    def record_transfer(self, mac, nbytes, seconds):
+        # Historial de transferencias: el goodput observado también estima el ancho de banda
+        if seconds <= 0 or nbytes <= 0:
+            return
+        with self.lock:
+            st = self._peer(mac)
+            self._add_bw(st, nbytes / seconds)
+            stats = self._summary(st)
+        self.disc.update_stats(mac, **stats)
+
+    def initial_params(self, mac, frag_size, window, rto):
+        # Ventana y timeout iniciales para una transferencia hacia `mac`:
+        # - RTO = SRTT + 4*RTTVAR (mínimo MIN_RTO)
+        # - Ventana = 2 * producto ancho de banda x RTT en fragmentos
+        # Sin mediciones se devuelven los valores por defecto recibidos.
+        with self.lock:
+            st = self._peers.get(mac)
+            if st is None or st['srtt'] is None:
+                return window, rto
+            rto = max(MIN_RTO, st['srtt'] + 4 * st['rttvar'])
+            if st['bw']:
+                bdp = st['bw'] * st['srtt'] / float(frag_size)
+                window = int(min(MAX_WINDOW, max(MIN_WINDOW, 2 * bdp)))
+        return window, rto
+
+    def tick(self, now=None):
+        # Trabajo periódico:
+        # 1. Las sondas sin respuesta tras ECHO_TIMEOUT cuentan como perdidas
+        # 2. Al empezar una ronda se toman los vecinos actuales de discovery
+        # 3. Se envían como mucho PROBE_BUDGET sondas por llamada (una por segundo)
+        now = self.clock() if now is None else now
+        lost = []
+        with self.lock:
+            for seq, (mac, sent, marker) in list(self._pending.items()):
+                if now - sent > ECHO_TIMEOUT:
+                    del self._pending[seq]
+                    st = self._peer(mac)
+                    st['results'].append(False)
+                    if marker:
+                        st['pair_t1'] = None
+                    lost.append((mac, self._summary(st)))
+            if not self._round and now >= self._next_round:
+                self._round.extend(self.disc.get_neighbors())
+                self._next_round = now + self.interval * self._rng.uniform(0.75, 1.25)
+            batch = [self._round.popleft() for _ in range(min(PROBE_BUDGET, len(self._round)))]
+        for mac, stats in lost:
+            self.disc.update_stats(mac, **stats)
+        for mac in batch:
+            with self.lock:
+                pair = self._peer(mac)['probes'] % PAIR_EVERY == PAIR_EVERY - 1
+            try:
+                self.probe(mac, pair)
+            except Exception as e:
+                log.error('prober', "error probing: %s", e)
+        return 1.0
+
+    def start(self):
+        # Lanza el sondeo periódico en un hilo daemon
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.tick())
+
+    def stop(self):
+        self._stop.set()
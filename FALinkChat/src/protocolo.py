@@ -19,6 +19,10 @@ FLAG_IS_FIRST = 1 << 0      # Indica que el fragmento es el primero del mensaje.
 FLAG_IS_LAST = 1 << 1       # Indica que es el fragmento final del mensaje.
 FLAG_RETRANS = 1 << 2       # Indica que es una retransmisión de un fragmento.
 FLAG_COMPRESSED = 1 << 3    # Indica que el payload está comprimido (puede usarse en el futuro)
+FLAG_SOLICIT = 1 << 4       # DISCOVERY que pide REPLY a todos (sin él solo responden quienes no nos conocían)
+FLAG_WINDOW = 1 << 5        # ACK que solo anuncia ventana: NO confirma el fragmento indicado
+FLAG_TEXT = 1 << 6          # Envío broadcast fiable cuyo contenido es un mensaje de chat
+FLAG_RESET = 1 << 7         # ACK de stream que rechaza la apertura o corta un stream desconocido
 
 # Definimos los tipos de mensaje que permitirá el protocolo:
 MSG_CHAT = 1          # Mensaje de texto chat.
@@ -26,6 +30,26 @@ MSG_FILE_CHUNK = 2    # Fragmento de archivo en transferencia.
 MSG_ACK = 3           # Acknowledgement para confirmar recepción.
 MSG_DISCOVERY = 4     # Mensaje para descubrimiento de vecinos en la red.
 MSG_REPLY = 5         # Respuesta unicast a un broadcast de descubrimiento.
+MSG_ECHO_REQ = 6      # Sonda de eco (ping) para medir RTT, jitter, pérdida y ancho de banda.
+MSG_ECHO_REPLY = 7    # Respuesta a una sonda de eco (mismo header y payload).
+MSG_BCAST_DATA = 8    # Fragmento de un envío broadcast fiable (chat o archivo para todos).
+MSG_BCAST_POLL = 9    # El emisor pregunta a los receptores qué les falta de un envío broadcast.
+MSG_BCAST_NACK = 10   # Tramos que le faltan a un receptor (broadcast, para suprimir duplicados).
+MSG_BCAST_DONE = 11   # Un receptor confirma (unicast) que tiene el envío broadcast completo.
+MSG_STREAM_OPEN = 12  # Apertura de un stream de bytes (conexión ordenada, ver stream.py).
+MSG_STREAM_DATA = 13  # Segmento de un stream (número de secuencia + datos + CRC).
+MSG_STREAM_ACK = 14   # ACK acumulado de un stream con la ventana libre del receptor.
+MSG_SWARM_QUERY = 15  # Pregunta (broadcast) quién tiene el contenido con esta raíz Merkle.
+MSG_SWARM_HAVE = 16   # Anuncio de un contenido compartido: raíz, tamaño, tamaño de pieza y nombre.
+
+# Nombres legibles de los tipos (etiquetas de métricas y registros)
+MSG_NAMES = {MSG_CHAT: 'chat', MSG_FILE_CHUNK: 'file_chunk', MSG_ACK: 'ack',
+             MSG_DISCOVERY: 'discovery', MSG_REPLY: 'reply',
+             MSG_ECHO_REQ: 'echo_req', MSG_ECHO_REPLY: 'echo_reply',
+             MSG_BCAST_DATA: 'bcast_data', MSG_BCAST_POLL: 'bcast_poll',
+             MSG_BCAST_NACK: 'bcast_nack', MSG_BCAST_DONE: 'bcast_done',
+             MSG_STREAM_OPEN: 'stream_open', MSG_STREAM_DATA: 'stream_data', MSG_STREAM_ACK: 'stream_ack',
+             MSG_SWARM_QUERY: 'swarm_query', MSG_SWARM_HAVE: 'swarm_have'}
 
 # Función para calcular el CRC32 del array de bytes que reciba.
 # El CRC es una forma robusta de checksum que ayuda a detectar errores en los datos.
@@ -135,3 +159,52 @@ def unpack_message(data):
         raise ValueError("CRC inválido")
 
     return hdr, content
+
+# Ventana de recepción anunciada en el payload de los ACK: fragmentos que el
+# receptor puede aceptar todavía (4 bytes). Un ACK sin payload no anuncia
+# ventana (nodos antiguos) y el emisor conserva la que tenía.
+ACK_WINDOW_FMT = '!I'
+ACK_WINDOW_SIZE = struct.calcsize(ACK_WINDOW_FMT)
+# frag_index de una actualización de ventana que no se refiere a ningún fragmento
+NO_FRAGMENT = 0xffff
+
+# Empaqueta la ventana anunciada de un ACK.
+def pack_ack_window(window):
+    return struct.pack(ACK_WINDOW_FMT, max(0, min(window, 0xffffffff)))
+
+# Devuelve la ventana anunciada en el payload de un ACK o None si no trae.
+def unpack_ack_window(payload):
+    if len(payload) < ACK_WINDOW_SIZE:
+        return None
+    return struct.unpack(ACK_WINDOW_FMT, payload[:ACK_WINDOW_SIZE])[0]
+
+# Campos opcionales TLV (tipo, longitud, valor) para mensajes de control.
+# Cada campo ocupa 1 byte de tipo + 2 bytes de longitud + el valor; un nodo que
+# no conoce un tipo simplemente lo ignora, así el formato puede crecer.
+TLV_HDR_FMT = '!B H'
+TLV_HDR_SIZE = struct.calcsize(TLV_HDR_FMT)
+
+# Tipos TLV usados en DISCOVERY / REPLY
+TLV_MACS = 1          # Todas las MAC del nodo (modo bonding), la primera es la principal
+TLV_NEIGHBORS = 2     # REPLY agregado: MACs de vecinos recientes del que responde
+TLV_KNOWN_BLOOM = 3   # DISCOVERY: filtro de Bloom con los vecinos que ya conoce el emisor
+TLV_GROUPS = 4        # MACs multicast de los grupos a los que pertenece el emisor
+TLV_MTU = 5           # MTU del emisor ('!H'); también indica que entiende fragmentos con offset
+
+# Empaqueta una lista de (tipo, valor) como secuencia de TLVs.
+def pack_tlvs(items):
+    return b''.join(struct.pack(TLV_HDR_FMT, t, len(v)) + v for t, v in items)
+
+# Desempaqueta una secuencia de TLVs en una lista de (tipo, valor).
+# Si el último campo viene truncado se descarta.
+def unpack_tlvs(data):
+    items = []
+    pos = 0
+    while pos + TLV_HDR_SIZE <= len(data):
+        t, length = struct.unpack(TLV_HDR_FMT, data[pos:pos + TLV_HDR_SIZE])
+        pos += TLV_HDR_SIZE
+        if pos + length > len(data):
+            break
+        items.append((t, data[pos:pos + length]))
+        pos += length
+    return items
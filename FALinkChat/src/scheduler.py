@@ -0,0 +1,230 @@
+# src/scheduler.py
+# Este módulo implementa el planificador de transmisión (TX) de Link-Chat
+# Todas las tramas salientes (ACKs, sondas, chat, discovery y fragmentos de
+# archivo) pasan por un único hilo emisor que decide qué sale primero:
+# - Clases de prioridad estricta: CONTROL (ACK y sondas de eco) > CHAT >
+#   DISCOVERY > BULK (fragmentos de archivo). Un chat nunca espera detrás de
+#   una transferencia que ya está en cola, solo detrás de la trama en curso.
+# - Reparto justo entre flujos BULK (uno por destino y file_id) con Deficit
+#   Round Robin: cada flujo saca QUANTUM bytes por ronda multiplicados por el
+#   peso de su destino (set_weight), así una transferencia grande no acapara el
+#   enlace frente a otras más pequeñas.
+# - Lotes: el hilo saca hasta BATCH tramas por vuelta con una sola toma del
+#   candado y las emite seguidas.
+# - Ritmo opcional (rate_bps): si se conoce la velocidad del enlace, el hilo
+#   emite a ese ritmo para que la cola se forme aquí y no en el socket / qdisc,
+#   donde ya no se puede adelantar un chat. Sin ritmo la cola se forma aquí
+#   cuando el transporte interno bloquea (buffer del socket lleno, bonding).
+# - Contrapresión: send() de una trama BULK espera si ya hay BULK_LIMIT
+#   tramas BULK en cola; el resto de clases nunca bloquea.
+# TxScheduler es un envoltorio de transporte como transport.ImpairedTransport:
+# la recepción y los hooks de discovery se delegan sin cambios.
+
+import collections
+import threading
+import time
+import protocolo
+import network
+import transport
+import metrics
+
+CONTROL, CHAT, DISCOVERY, BULK = range(4)
+CLASS_NAMES = ('control', 'chat', 'discovery', 'bulk')
+
+# Clase de cada tipo de mensaje (los desconocidos van como CONTROL)
+MSG_CLASS = {
+    protocolo.MSG_ACK: CONTROL,
+    protocolo.MSG_ECHO_REQ: CONTROL,
+    protocolo.MSG_ECHO_REPLY: CONTROL,
+    protocolo.MSG_CHAT: CHAT,
+    protocolo.MSG_DISCOVERY: DISCOVERY,
+    protocolo.MSG_REPLY: DISCOVERY,
+    protocolo.MSG_SWARM_QUERY: DISCOVERY,
+    protocolo.MSG_SWARM_HAVE: DISCOVERY,
+    protocolo.MSG_FILE_CHUNK: BULK,
+    protocolo.MSG_BCAST_NACK: CONTROL,
+    protocolo.MSG_BCAST_DONE: CONTROL,
+    protocolo.MSG_STREAM_OPEN: CONTROL,
+    protocolo.MSG_STREAM_ACK: CONTROL,
+    # El POLL de broadcast fiable va en el mismo flujo que sus datos: no se
+    # adelanta a los fragmentos que aún están en cola
+    protocolo.MSG_BCAST_DATA: BULK,
+    protocolo.MSG_BCAST_POLL: BULK,
+    protocolo.MSG_STREAM_DATA: BULK,
+}
+# Posición del msg_type en la trama: cabecera Ethernet (14) + offset en el header
+_MSG_TYPE_AT = 14 + 7
+
+# Bytes por ronda de DRR de un flujo de peso 1 (una trama completa)
+QUANTUM = 1514
+# Tramas por vuelta del hilo emisor
+BATCH = 32
+# Con ritmo fijo: tiempo de enlace máximo que se emite de una vez (segundos)
+PACING_BURST = 0.002
+# Tramas BULK en cola antes de bloquear a los emisores
+BULK_LIMIT = 256
+# Tramas en cola por clase no BULK antes de descartar (no debería alcanzarse)
+QUEUE_LIMIT = 4096
+
+TX_FRAMES = metrics.counter('linkchat_tx_frames_total', 'Tramas emitidas por el planificador', label='class')
+TX_DROPPED = metrics.counter('linkchat_tx_dropped_total', 'Tramas descartadas por el planificador', label='class')
+TX_WAIT = metrics.histogram('linkchat_tx_queue_wait_seconds', 'Espera en cola de las tramas de chat')
+
+
+def classify(frame):
+    # Clase de prioridad de una trama Link-Chat según su msg_type
+    if len(frame) <= _MSG_TYPE_AT:
+        return CONTROL
+    return MSG_CLASS.get(frame[_MSG_TYPE_AT], CONTROL)
+
+
+class TxScheduler(transport.Transport):
+    # Envoltorio de transporte con un hilo emisor único:
+    # - send(frame): clasifica y encola (bloquea solo las BULK si la cola está llena)
+    # - el hilo saca por prioridad (DRR entre flujos BULK) y llama a inner.send
+    # - set_weight(mac, w): peso de los flujos BULK hacia ese destino
+    # - depth(): tramas en cola por clase (para linkchat_queue_depth)
+    # - close(): vacía la cola (espera hasta 1 s) y cierra el transporte interno
+
+    def __init__(self, inner, rate_bps=None, batch=BATCH, bulk_limit=BULK_LIMIT):
+        self.inner = inner
+        self.mac = inner.mac
+        self.overhead = getattr(inner, 'overhead', 0)
+        self.mtu = getattr(inner, 'mtu', network.ETH_MTU)
+        self.rate_bps = rate_bps
+        self.batch = batch
+        self.bulk_limit = bulk_limit
+        # Colas FIFO de CONTROL, CHAT y DISCOVERY: (instante de encolado, trama)
+        self._queues = [collections.deque() for _ in range(BULK)]
+        # Flujos BULK: (dst, file_id) -> deque de tramas; turno DRR y déficit
+        self._flows = {}
+        self._active = collections.deque()
+        self._deficit = {}
+        self._bulk = 0
+        self.weights = {}
+        # Instante a partir del cual el enlace queda libre (con rate_bps)
+        self._link_free = 0.0
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._tx_loop, name='tx-scheduler', daemon=True)
+        self._thread.start()
+
+    def set_weight(self, dst_mac, weight):
+        with self._cond:
+            self.weights[bytes(dst_mac)] = max(1, int(weight))
+
+    def send(self, frame):
+        frame = bytes(frame)
+        cls = classify(frame)
+        with self._cond:
+            if cls == BULK:
+                while self._running and self._bulk >= self.bulk_limit:
+                    self._cond.wait()
+                key = (frame[0:6], frame[14:16])
+                q = self._flows.get(key)
+                if q is None:
+                    q = self._flows[key] = collections.deque()
+                    self._deficit[key] = 0
+                    self._active.append(key)
+                q.append(frame)
+                self._bulk += 1
+            else:
+                q = self._queues[cls]
+                if len(q) >= QUEUE_LIMIT:
+                    TX_DROPPED.inc(1, CLASS_NAMES[cls])
+                    return
+                q.append((time.monotonic(), frame))
+            self._cond.notify_all()
+
+    def _dequeue(self, n):
+        # Hasta n tramas por orden de prioridad; llamar con self._cond tomado
+        out = []
+        for cls in (CONTROL, CHAT, DISCOVERY):
+            q = self._queues[cls]
+            while q and len(out) < n:
+                queued, frame = q.popleft()
+                if cls == CHAT:
+                    TX_WAIT.observe(time.monotonic() - queued)
+                out.append((cls, frame))
+        while self._active and len(out) < n:
+            key = self._active[0]
+            q = self._flows[key]
+            if self._deficit[key] < len(q[0]):
+                # Turno agotado: el flujo gana su cuanto y pasa al final de la ronda
+                self._deficit[key] += QUANTUM * self.weights.get(key[0], 1)
+                self._active.rotate(-1)
+                continue
+            frame = q.popleft()
+            self._deficit[key] -= len(frame)
+            self._bulk -= 1
+            if not q:
+                self._active.popleft()
+                del self._flows[key]
+                del self._deficit[key]
+            out.append((BULK, frame))
+        return out
+
+    def _batch_size(self):
+        # Con ritmo fijo, solo lo que cabe en PACING_BURST de enlace: una ráfaga
+        # larga de BULK retrasaría al chat que llegue mientras se emite
+        if not self.rate_bps:
+            return self.batch
+        return max(1, min(self.batch, int(self.rate_bps * PACING_BURST / (QUANTUM * 8))))
+
+    def _tx_loop(self):
+        n = self._batch_size()
+        while True:
+            with self._cond:
+                while self._running and not (self._bulk or any(self._queues)):
+                    self._cond.wait()
+                batch = self._dequeue(n)
+                if not batch and not self._running:
+                    return
+                # Hay hueco en BULK: despertar a los emisores bloqueados
+                self._cond.notify_all()
+            for cls, frame in batch:
+                if self.rate_bps:
+                    now = time.monotonic()
+                    if self._link_free > now:
+                        time.sleep(self._link_free - now)
+                    self._link_free = max(now, self._link_free) + len(frame) * 8.0 / self.rate_bps
+                try:
+                    self.inner.send(frame)
+                    TX_FRAMES.inc(1, CLASS_NAMES[cls])
+                except Exception:
+                    TX_DROPPED.inc(1, CLASS_NAMES[cls])
+
+    def depth(self):
+        with self._cond:
+            d = {CLASS_NAMES[cls]: len(q) for cls, q in enumerate(self._queues)}
+            d[CLASS_NAMES[BULK]] = self._bulk
+            return d
+
+    def recv(self, buffer_size=1600):
+        return self.inner.recv(buffer_size)
+
+    def settimeout(self, timeout):
+        self.inner.settimeout(timeout)
+
+    def fileno(self):
+        return self.inner.fileno()
+
+    def discovery_tlvs(self):
+        return self.inner.discovery_tlvs()
+
+    def learn_peer(self, src_mac, tlvs):
+        self.inner.learn_peer(src_mac, tlvs)
+
+    def join(self, mac):
+        self.inner.join(mac)
+
+    def leave(self, mac):
+        self.inner.leave(mac)
+
+    def close(self):
+        # Se emite lo que quede en cola antes de cerrar (p. ej. los últimos ACKs)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(1.0)
+        self.inner.close()
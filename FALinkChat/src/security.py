@@ -0,0 +1,242 @@
+# src/security.py
+# Este módulo implementa la capa de seguridad de Link-Chat (solo biblioteca estándar)
+# Características:
+# - Clave maestra compartida: una PSK de 32 bytes (hex) o derivada de una
+#   contraseña con PBKDF2-HMAC-SHA256 (derive_key / key_from_env)
+# - SecureTransport: envoltorio de cualquier transporte que autentica cada trama
+#   con BLAKE2b con clave (tag de 16 bytes sobre direcciones, EtherType,
+#   cabecera de seguridad y contenido) y opcionalmente la cifra
+# - Sesiones: cada nodo elige al arrancar un identificador de sesión (hora de
+#   arranque + 16 bits aleatorios) que viaja en la cabecera de cada trama. Las
+#   claves de la sesión (MAC y cifrado) se derivan UNA vez por (emisor, sesión)
+#   y se guardan como estados de hash ya inicializados: por trama solo se copia
+#   el estado y se procesa el contenido, sin derivar ni reinicializar claves
+# - Ventana anti-repetición por emisor y sesión (REPLAY_WINDOW números de
+#   secuencia, tolera el desorden del bonding) y rechazo de sesiones anteriores
+#   a la más reciente vista de ese emisor (repetición de una ejecución pasada)
+# - Confidencialidad: flujo de clave SHAKE-256(clave de cifrado, secuencia)
+#   combinado con XOR, y MAC sobre el texto cifrado (encrypt-then-MAC)
+# Formato en el cable (mismo EtherType; la cabecera Ethernet no se cifra):
+#   dst(6) src(6) ethertype(2) | flags(1) sesión(6) secuencia(6) | contenido | tag(16)
+# Sobrecarga por trama: OVERHEAD = 29 bytes; FileTransfer la descuenta del
+# tamaño de fragmento leyendo transport.overhead.
+# Todos los nodos de un segmento deben usar la misma clave: las tramas sin
+# autenticar o con otra clave se descartan y se cuentan en métricas.
+
+import hashlib
+import hmac
+import os
+import random
+import struct
+import threading
+import time
+import network
+import log
+import metrics
+
+# Tamaño de la clave maestra y coste de PBKDF2 para claves derivadas de contraseña
+KEY_SIZE = 32
+PBKDF2_ITERATIONS = 200000
+# Sal de PBKDF2 por defecto: todos los nodos con la misma contraseña y el mismo
+# realm obtienen la misma clave
+DEFAULT_REALM = 'linkchat'
+
+FLAG_ENCRYPTED = 0x01
+# flags(1) + sesión(6) + secuencia(6)
+_SEC_HDR = struct.Struct('!B6s6s')
+TAG_SIZE = 16
+ETH_HDR = 14
+OVERHEAD = _SEC_HDR.size + TAG_SIZE
+# Números de secuencia recientes aceptados fuera de orden por emisor
+REPLAY_WINDOW = 1024
+# Sesiones ajenas recordadas (emisor, sesión) antes de olvidar las más antiguas
+MAX_SESSIONS = 4096
+
+AUTH_FAILURES = metrics.counter('linkchat_auth_failures_total', 'Tramas descartadas por la capa de seguridad', label='reason')
+
+
+def derive_key(password, realm=DEFAULT_REALM, iterations=PBKDF2_ITERATIONS):
+    # Clave maestra a partir de una contraseña (PBKDF2-HMAC-SHA256)
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    return hashlib.pbkdf2_hmac('sha256', password, realm.encode('utf-8'), iterations, KEY_SIZE)
+
+
+def key_from_env(environ=os.environ):
+    # Clave configurada en el entorno: LINKCHAT_PSK (hex) o LINKCHAT_PASSWORD
+    # (con LINKCHAT_REALM opcional). Devuelve None si no hay ninguna.
+    psk = environ.get('LINKCHAT_PSK')
+    if psk:
+        key = bytes.fromhex(psk.strip())
+        if len(key) < 16:
+            raise ValueError("LINKCHAT_PSK debe tener al menos 16 bytes (32 dígitos hex)")
+        return key
+    password = environ.get('LINKCHAT_PASSWORD')
+    if password:
+        return derive_key(password, environ.get('LINKCHAT_REALM') or DEFAULT_REALM)
+    return None
+
+
+def _xor(data, stream):
+    # XOR de dos bloques de igual longitud a velocidad de C (enteros grandes)
+    n = len(data)
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(stream, 'big')).to_bytes(n, 'big')
+
+
+class _Session:
+    # Claves de un emisor en una sesión, con los estados de hash precalculados,
+    # y su ventana anti-repetición (máxima secuencia vista + bitmap)
+    __slots__ = ('mac', 'enc', 'top', 'bitmap')
+
+    def __init__(self, master, src_mac, session):
+        seed = src_mac + session
+        mac_key = hashlib.blake2b(seed, key=master, digest_size=32, person=b'lc-mac').digest()
+        enc_key = hashlib.blake2b(seed, key=master, digest_size=32, person=b'lc-enc').digest()
+        self.mac = hashlib.blake2b(key=mac_key, digest_size=TAG_SIZE)
+        self.enc = hashlib.shake_256(enc_key)
+        self.top = -1
+        self.bitmap = 0
+
+    def tag(self, data):
+        h = self.mac.copy()
+        h.update(data)
+        return h.digest()
+
+    def keystream(self, seq, n):
+        s = self.enc.copy()
+        s.update(seq)
+        return s.digest(n)
+
+    def accept(self, seq):
+        # Ventana deslizante: True si seq no se había visto y no es demasiado vieja
+        if seq > self.top:
+            shift = seq - self.top
+            self.bitmap = ((self.bitmap << shift) | 1) & ((1 << REPLAY_WINDOW) - 1)
+            self.top = seq
+            return True
+        offset = self.top - seq
+        if offset >= REPLAY_WINDOW or self.bitmap >> offset & 1:
+            return False
+        self.bitmap |= 1 << offset
+        return True
+
+
+class SecureTransport:
+    # Envoltorio de un transporte (RawTransport, BondedTransport, MemoryTransport...)
+    # que autentica y opcionalmente cifra todas las tramas:
+    # - send(frame): añade cabecera de seguridad y tag (y cifra el contenido)
+    # - recv(): verifica tag, ventana anti-repetición y sesión; las tramas que no
+    #   pasan se descartan (se devuelve b'' como en un timeout y se cuentan)
+    # El resto del motor no cambia: ve tramas Link-Chat normales.
+
+    def __init__(self, inner, key, encrypt=True, session=None):
+        if len(key) < 16:
+            raise ValueError("clave demasiado corta")
+        self.inner = inner
+        self.mac = inner.mac
+        self.encrypt = encrypt
+        self.overhead = getattr(inner, 'overhead', 0) + OVERHEAD
+        self.mtu = getattr(inner, 'mtu', network.ETH_MTU)
+        self._master = bytes(key)
+        # Sesión propia: hora de arranque (4 bytes) + 16 bits aleatorios
+        self.session = session or struct.pack('!IH', int(time.time()) & 0xffffffff, random.getrandbits(16))
+        self._tx = _Session(self._master, self.mac, self.session)
+        self._seq = 0
+        self._tx_lock = threading.Lock()
+        # Sesiones ajenas: (mac, sesión) -> _Session; y sesión más reciente por MAC
+        self._sessions = {}
+        self._latest = {}
+        self._rx_lock = threading.Lock()
+
+    def send(self, frame):
+        frame = bytes(frame)
+        with self._tx_lock:
+            self._seq += 1
+            seq = self._seq.to_bytes(6, 'big')
+        body = frame[ETH_HDR:]
+        flags = 0
+        if self.encrypt and body:
+            body = _xor(body, self._tx.keystream(seq, len(body)))
+            flags |= FLAG_ENCRYPTED
+        wire = frame[:ETH_HDR] + _SEC_HDR.pack(flags, self.session, seq) + body
+        self.inner.send(wire + self._tx.tag(wire))
+
+    def recv(self, buffer_size=1600):
+        frame = self.inner.recv(buffer_size + OVERHEAD)
+        if not frame:
+            return frame
+        if len(frame) < ETH_HDR + OVERHEAD:
+            AUTH_FAILURES.inc(1, 'short')
+            return b''
+        flags, session, seq = _SEC_HDR.unpack_from(frame, ETH_HDR)
+        src = bytes(frame[6:12])
+        sess, new = self._session(src, session)
+        if sess is None:
+            AUTH_FAILURES.inc(1, 'stale')
+            return b''
+        wire, tag = frame[:-TAG_SIZE], frame[-TAG_SIZE:]
+        if not hmac.compare_digest(sess.tag(wire), tag):
+            AUTH_FAILURES.inc(1, 'mac')
+            return b''
+        if new:
+            sess = self._adopt(src, session, sess)
+        with self._rx_lock:
+            fresh = sess.accept(int.from_bytes(seq, 'big'))
+        if not fresh:
+            AUTH_FAILURES.inc(1, 'replay')
+            return b''
+        body = wire[ETH_HDR + _SEC_HDR.size:]
+        if flags & FLAG_ENCRYPTED:
+            body = _xor(body, sess.keystream(seq, len(body)))
+        return wire[:ETH_HDR] + body
+
+    def _session(self, src, session):
+        # Claves del emisor en esa sesión -> (_Session, nueva). Una sesión
+        # nueva es solo candidata: no se guarda hasta que una trama suya pase
+        # el tag (_adopt), así una cabecera falsificada no altera el estado.
+        # Las sesiones anteriores a la más reciente del emisor se rechazan.
+        sess = self._sessions.get((src, session))
+        if sess is not None:
+            return sess, False
+        latest = self._latest.get(src)
+        if latest is not None and session[:4] < latest[:4]:
+            return None, False
+        return _Session(self._master, src, session), True
+
+    def _adopt(self, src, session, sess):
+        # Guarda una sesión ya autenticada y avanza la más reciente del emisor
+        key = (src, session)
+        with self._rx_lock:
+            current = self._sessions.get(key)
+            if current is not None:
+                return current
+            if len(self._sessions) >= MAX_SESSIONS:
+                self._sessions.pop(next(iter(self._sessions)))
+            self._sessions[key] = sess
+            latest = self._latest.get(src)
+            if latest is None or session[:4] >= latest[:4]:
+                if latest is not None and latest != session:
+                    log.info('security', "nueva sesión de %s", log.mac(src))
+                self._latest[src] = session
+            return sess
+
+    def settimeout(self, timeout):
+        self.inner.settimeout(timeout)
+
+    def fileno(self):
+        return self.inner.fileno()
+
+    def discovery_tlvs(self):
+        return self.inner.discovery_tlvs()
+
+    def learn_peer(self, src_mac, tlvs):
+        self.inner.learn_peer(src_mac, tlvs)
+
+    def join(self, mac):
+        self.inner.join(mac)
+
+    def leave(self, mac):
+        self.inner.leave(mac)
+
+    def close(self):
+        self.inner.close()
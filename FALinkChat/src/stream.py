@@ -0,0 +1,520 @@
+# src/stream.py
+# Este módulo implementa streams de bytes fiables entre dos nodos sobre el
+# protocolo Link-Chat, para tuberías continuas sin IP (envío de logs,
+# `tar | ...`, volcados de bases de datos) de tamaño desconocido de antemano
+# Funcionamiento:
+# - Conexión: open(mac, puerto) manda MSG_STREAM_OPEN hasta que el otro nodo
+#   contesta con un ACK; si no hay nadie escuchando en ese puerto, el ACK
+#   lleva FLAG_RESET (ConnectionRefusedError)
+# - Datos: cada send() se corta en segmentos (MSG_STREAM_DATA) numerados con
+#   un contador de 32 bits; el receptor los entrega en orden (guarda los que
+#   llegan adelantados) y confirma con un ACK acumulado (siguiente número que
+#   espera) y los bytes que aún le caben en el buffer
+# - Control de flujo: el emisor no tiene en vuelo más de WINDOW segmentos ni
+#   más bytes de los que el receptor anunció; send() bloquea mientras tanto
+#   (backpressure hasta quien escribe). Con ventana cero se envía un segmento
+#   como sonda cada RTO, y el receptor manda una actualización de ventana
+#   cuando la aplicación vacía el buffer
+# - Pérdidas: reenvío por timeout (RTO a partir del RTT suavizado, con
+#   backoff) y reenvío rápido del primer segmento sin confirmar tras
+#   DUP_ACKS ACK duplicados
+# - Cierre: shutdown() manda un segmento FIN (FLAG_IS_LAST) tras los datos;
+#   el otro lado lee b'' al llegar a él. close() espera a que se confirme todo
+# Campos del header: file_id = id del stream (lo elige quien abre) y
+# total_frags = puerto en OPEN o, en DATA/ACK, si la trama la manda quien
+# abrió el stream (así dos nodos pueden abrirse streams con el mismo id).
+# Los reenvíos y los timeouts los lleva un solo hilo para todos los streams.
+
+import collections
+import queue
+import random
+import struct
+import threading
+import time
+import protocolo
+import network
+import file_transfer
+import log
+import metrics
+
+# Puerto por defecto (lcat)
+DEFAULT_PORT = 1
+# Segmentos en vuelo como máximo por stream
+WINDOW = 128
+# Bytes que cada extremo acepta sin que la aplicación los lea
+RX_BUFFER = 4 * 1024 * 1024
+# Tras anunciar menos de esta fracción del buffer, se avisa al emisor cuando
+# la aplicación libera al menos esa fracción (actualización de ventana)
+WINDOW_UPDATE_FRACTION = 0.25
+# Timeouts de reenvío: inicial (sin RTT medido), mínimo y máximo con backoff
+INITIAL_RTO = 0.2
+MIN_RTO = 0.05
+MAX_RTO = 2.0
+# ACK duplicados que disparan el reenvío rápido
+DUP_ACKS = 3
+# Reenvíos de un mismo segmento sin respuesta antes de dar el stream por roto
+MAX_RETRIES = 12
+# Espera máxima de open() y de close()
+OPEN_TIMEOUT = 5.0
+LINGER = 10.0
+# Streams cerrados que se recuerdan para volver a confirmar un FIN repetido
+CLOSED_MEMORY = 256
+
+# Valores de total_frags en DATA/ACK
+FROM_ACCEPTOR, FROM_OPENER = 0, 1
+SEQ_FMT = '!I'
+SEQ_SIZE = struct.calcsize(SEQ_FMT)
+ACK_FMT = '!II'
+ACK_SIZE = struct.calcsize(ACK_FMT)
+
+STREAMS = metrics.counter('linkchat_streams_total', 'Streams abiertos, aceptados, rechazados o rotos', label='event')
+STREAM_RETRANSMISSIONS = metrics.counter('linkchat_stream_retransmissions_total', 'Segmentos de stream reenviados', label='reason')
+STREAM_BYTES = metrics.counter('linkchat_stream_bytes_total', 'Bytes de datos de streams', label='dir')
+
+# Estados de un stream
+OPENING, OPEN, CLOSED = 'opening', 'open', 'closed'
+
+
+class _Segment:
+    __slots__ = ('data', 'fin', 'sent_at', 'retries')
+
+    def __init__(self, data, fin, now):
+        self.data = data
+        self.fin = fin
+        self.sent_at = now
+        self.retries = 0
+
+
+class Stream:
+    # Un extremo de un stream (bidireccional):
+    # - send(data): bloquea hasta que todo cabe en la ventana; devuelve len(data)
+    # - recv(n, timeout): hasta n bytes en orden; b'' al final del stream
+    # - shutdown(): fin de escritura (el otro lado lee b''); se puede seguir leyendo
+    # - close(timeout): shutdown y espera a que se confirme todo
+    # Los errores (rechazo, corte, sin respuesta) se lanzan como OSError en la
+    # siguiente llamada.
+
+    def __init__(self, hub, peer, sid, opener, port, rwnd):
+        self.hub = hub
+        self.peer = peer
+        self.sid = sid
+        self.opener = opener
+        self.port = port
+        self.cond = threading.Condition()
+        self.state = OPENING if opener else OPEN
+        self.error = None
+        # Envío: segmentos sin confirmar en orden, ventana anunciada por el otro
+        # extremo y estimación de RTT
+        self._segs = collections.OrderedDict()
+        self._next_seq = 0
+        self._acked = 0
+        self._unacked_bytes = 0
+        self._rwnd = rwnd
+        self._dups = 0
+        self._fin_sent = False
+        self.srtt = None
+        self.rto = INITIAL_RTO
+        # Recepción: siguiente número esperado, adelantados, datos listos para
+        # la aplicación y última ventana anunciada
+        self._expected = 0
+        self._ooo = {}
+        self._ooo_bytes = 0
+        self._rx = collections.deque()
+        self._rx_bytes = 0
+        self._eof = False
+        self._advertised = hub.rx_buffer
+
+    @property
+    def key(self):
+        return (self.peer, self.sid, self.opener)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Envío
+
+    def send(self, data):
+        mv = memoryview(data).cast('B')
+        size = self.hub.max_segment()
+        for off in range(0, len(mv), size):
+            self._push(bytes(mv[off:off + size]), False)
+        return len(mv)
+
+    def shutdown(self):
+        self._push(b'', True)
+
+    def _push(self, data, fin):
+        with self.cond:
+            while True:
+                if fin and self._fin_sent:
+                    return
+                if self.error is not None:
+                    raise self.error
+                if self._fin_sent or self.state == CLOSED:
+                    raise BrokenPipeError("stream cerrado para escritura")
+                # Cabe en la ventana; sin nada en vuelo se envía igual (sonda
+                # de ventana cero: el receptor la descarta pero contesta)
+                if (self.state != OPENING and len(self._segs) < WINDOW
+                        and (not self._segs or self._unacked_bytes + len(data) <= self._rwnd)):
+                    break
+                self.cond.wait(0.5)
+            seq = self._next_seq
+            self._next_seq += 1
+            seg = self._segs[seq] = _Segment(data, fin, time.monotonic())
+            self._unacked_bytes += len(data)
+            self._fin_sent = fin
+        self.hub._send_data(self, seq, seg)
+
+    def _on_ack(self, flags, body):
+        if flags & protocolo.FLAG_RESET:
+            self._fail(ConnectionRefusedError("puerto sin escucha") if self.state == OPENING
+                       else ConnectionResetError("stream cortado por el otro extremo"))
+            return
+        if len(body) < ACK_SIZE:
+            return
+        nxt, window = struct.unpack_from(ACK_FMT, body)
+        now = time.monotonic()
+        resend = False
+        with self.cond:
+            if self.state == OPENING:
+                self.state = OPEN
+            self._rwnd = window
+            if nxt > self._acked:
+                while self._segs and next(iter(self._segs)) < nxt:
+                    _, seg = self._segs.popitem(last=False)
+                    self._unacked_bytes -= len(seg.data)
+                    # RTT solo de segmentos sin reenviar (algoritmo de Karn)
+                    if seg.retries == 0:
+                        rtt = now - seg.sent_at
+                        self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+                        self.rto = min(MAX_RTO, max(MIN_RTO, 2 * self.srtt))
+                self._acked = nxt
+                self._dups = 0
+            elif self._segs:
+                head = self._segs[next(iter(self._segs))]
+                if window < len(head.data):
+                    # El receptor está vivo pero lleno: la sonda no gasta reintentos
+                    head.retries = 0
+                else:
+                    self._dups += 1
+                    if self._dups == DUP_ACKS:
+                        # Reenvío rápido: lo hace el hilo del hub (el receptor no bloquea)
+                        head.sent_at = 0.0
+                        resend = True
+            self.cond.notify_all()
+        if resend:
+            self.hub._wakeup.set()
+
+    def _due(self, now):
+        # Segmentos cuyo RTO venció (se marcan como reenviados); llamar sin self.cond
+        out = []
+        with self.cond:
+            timed_out = False
+            for seq, seg in self._segs.items():
+                if now - seg.sent_at < self.rto:
+                    continue
+                if seg.retries >= MAX_RETRIES:
+                    self._segs.clear()
+                    self.error = TimeoutError("el otro extremo no responde")
+                    self.cond.notify_all()
+                    STREAMS.inc(1, 'timeout')
+                    return []
+                # sent_at == 0: reenvío rápido pedido por ACK duplicados
+                reason = 'timeout' if seg.sent_at > 0 else 'fast'
+                timed_out = timed_out or reason == 'timeout'
+                STREAM_RETRANSMISSIONS.inc(1, reason)
+                seg.retries += 1
+                seg.sent_at = now
+                out.append((seq, seg))
+            if timed_out:
+                self.rto = min(MAX_RTO, self.rto * 2)
+        return out
+
+    # Recepción
+
+    def _window(self):
+        return max(0, self.hub.rx_buffer - self._rx_bytes - self._ooo_bytes)
+
+    def _on_data(self, flags, body):
+        ok, rest = protocolo.verify_and_strip_crc(body)
+        if not ok or len(rest) < SEQ_SIZE:
+            return
+        (seq,) = struct.unpack_from(SEQ_FMT, rest)
+        data = bytes(rest[SEQ_SIZE:])
+        with self.cond:
+            if self.state == OPENING:
+                self.state = OPEN
+            if seq >= self._expected and seq not in self._ooo and not self._eof and len(data) <= self._window():
+                self._ooo[seq] = (data, flags & protocolo.FLAG_IS_LAST)
+                self._ooo_bytes += len(data)
+                while self._expected in self._ooo:
+                    chunk, fin = self._ooo.pop(self._expected)
+                    self._ooo_bytes -= len(chunk)
+                    self._expected += 1
+                    if chunk:
+                        self._rx.append(chunk)
+                        self._rx_bytes += len(chunk)
+                    if fin:
+                        self._eof = True
+                self.cond.notify_all()
+            nxt, window = self._expected, self._window()
+            self._advertised = window
+        self.hub._send_ack(self, nxt, window)
+
+    def recv(self, n=65536, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while not self._rx and not self._eof:
+                if self.error is not None:
+                    raise self.error
+                if self.state == CLOSED:
+                    return b''
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("sin datos en el stream")
+                self.cond.wait(0.5 if remaining is None else min(0.5, remaining))
+            out = bytearray()
+            while self._rx and len(out) < n:
+                chunk = self._rx.popleft()
+                take = n - len(out)
+                if len(chunk) > take:
+                    self._rx.appendleft(chunk[take:])
+                    chunk = chunk[:take]
+                out += chunk
+            self._rx_bytes -= len(out)
+            # Actualización de ventana si el emisor la vio casi cerrada
+            threshold = self.hub.rx_buffer * WINDOW_UPDATE_FRACTION
+            update = self._advertised < threshold <= self._window()
+            if update:
+                self._advertised = self._window()
+            nxt, window = self._expected, self._advertised
+        if update:
+            self.hub._send_ack(self, nxt, window)
+        STREAM_BYTES.inc(len(out), 'rx')
+        return bytes(out)
+
+    # Cierre
+
+    def _fail(self, error):
+        with self.cond:
+            if self.error is None and self.state != CLOSED:
+                self.error = error
+                self._segs.clear()
+            self.cond.notify_all()
+        self.hub._forget(self)
+
+    def close(self, timeout=LINGER):
+        try:
+            self.shutdown()
+        except OSError:
+            pass
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self._segs and self.error is None and time.monotonic() < deadline:
+                self.cond.wait(min(0.5, max(0.0, deadline - time.monotonic())))
+            self.state = CLOSED
+            self.cond.notify_all()
+        self.hub._forget(self, self._expected)
+
+
+class Listener:
+    # Streams entrantes en un puerto: accept(timeout) devuelve el siguiente
+    # (TimeoutError si no llega ninguno a tiempo); close() deja de aceptar
+    def __init__(self, hub, port):
+        self.hub = hub
+        self.port = port
+        self._queue = queue.Queue()
+
+    def accept(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("ningún stream entrante") from None
+
+    def close(self):
+        with self.hub.lock:
+            if self.hub._listeners.get(self.port) is self:
+                del self.hub._listeners[self.port]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamHub:
+    # Streams de un nodo sobre un transporte:
+    # - open(mac, puerto, timeout) -> Stream conectado
+    # - listen(puerto) -> Listener con accept()
+    # - handle_packet(src_mac, payload): MSG_STREAM_* desde el hilo receptor
+    # - start()/stop(): hilo de reenvíos por timeout y reenvíos rápidos
+
+    def __init__(self, transport, src_mac, rx_buffer=RX_BUFFER, rng=None):
+        self.transport = transport
+        self.src_mac = src_mac
+        self.rx_buffer = rx_buffer
+        self.lock = threading.Lock()
+        self._rng = rng or random.Random()
+        # (vecino, id, lo abrí yo) -> Stream
+        self._streams = {}
+        self._listeners = {}
+        # Streams cerrados: clave -> siguiente número esperado (re-ACK de FIN)
+        self._closed = collections.OrderedDict()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='stream-rto', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        with self.lock:
+            streams = list(self._streams.values())
+        for s in streams:
+            s._fail(ConnectionAbortedError("nodo detenido"))
+
+    def max_segment(self):
+        # Datos por segmento: payload de un fragmento menos el número de secuencia
+        return file_transfer.MAX_PAYLOAD - getattr(self.transport, 'overhead', 0) - SEQ_SIZE
+
+    # Apertura
+
+    def listen(self, port=DEFAULT_PORT):
+        with self.lock:
+            if port in self._listeners:
+                raise OSError(f"puerto {port} ya en escucha")
+            listener = self._listeners[port] = Listener(self, port)
+        return listener
+
+    def open(self, dst_mac, port=DEFAULT_PORT, timeout=OPEN_TIMEOUT):
+        with self.lock:
+            sid = self._rng.randrange(1, 0xffff)
+            while (dst_mac, sid, True) in self._streams:
+                sid = sid % 0xfffe + 1
+            s = self._streams[(dst_mac, sid, True)] = Stream(self, dst_mac, sid, True, port, self.rx_buffer)
+        deadline = time.monotonic() + timeout
+        interval = INITIAL_RTO
+        while True:
+            self._send(dst_mac, sid, port, 0, protocolo.MSG_STREAM_OPEN, struct.pack('!I', self.rx_buffer))
+            with s.cond:
+                s.cond.wait_for(lambda: s.state != OPENING or s.error is not None,
+                                min(interval, max(0.0, deadline - time.monotonic())))
+                if s.error is not None:
+                    STREAMS.inc(1, 'refused')
+                    raise s.error
+                if s.state == OPEN:
+                    STREAMS.inc(1, 'open')
+                    return s
+            if time.monotonic() >= deadline:
+                self._forget(s)
+                raise TimeoutError(f"sin respuesta de {log.mac(dst_mac)}")
+            interval = min(interval * 2, 1.0)
+
+    # Tramas
+
+    def _send(self, dst_mac, sid, field, flags, msg_type, payload):
+        header = protocolo.pack_header(sid, field, 0, flags, msg_type, len(payload))
+        try:
+            network.send_frame(self.transport, network.build_ethernet_frame(
+                dst_mac, self.src_mac, network.ETH_P_CUSTOM, header + payload))
+        except Exception as e:
+            log.error('stream', "error enviando a %s: %s", log.mac(dst_mac), e)
+
+    def _role(self, s):
+        return FROM_OPENER if s.opener else FROM_ACCEPTOR
+
+    def _send_data(self, s, seq, seg):
+        payload = protocolo.append_crc(struct.pack(SEQ_FMT, seq) + seg.data)
+        self._send(s.peer, s.sid, self._role(s), protocolo.FLAG_IS_LAST if seg.fin else 0,
+                   protocolo.MSG_STREAM_DATA, payload)
+        STREAM_BYTES.inc(len(seg.data), 'tx')
+
+    def _send_ack(self, s, nxt, window, flags=0):
+        self._send(s.peer, s.sid, self._role(s), flags, protocolo.MSG_STREAM_ACK, struct.pack(ACK_FMT, nxt, window))
+
+    def _reset(self, dst_mac, sid, role):
+        self._send(dst_mac, sid, role, protocolo.FLAG_RESET, protocolo.MSG_STREAM_ACK, struct.pack(ACK_FMT, 0, 0))
+
+    def handle_packet(self, src_mac, payload):
+        hdr, body = protocolo.unpack_header(payload)
+        body = body[:hdr['payload_len']]
+        sid, mt = hdr['file_id'], hdr['msg_type']
+        if mt == protocolo.MSG_STREAM_OPEN:
+            self._on_open(src_mac, sid, hdr['total_frags'], body)
+            return
+        # La trama la manda quien abrió el stream -> para nosotros es aceptado
+        key = (src_mac, sid, hdr['total_frags'] != FROM_OPENER)
+        with self.lock:
+            s = self._streams.get(key)
+            closed = self._closed.get(key) if s is None else None
+        reply_role = FROM_OPENER if key[2] else FROM_ACCEPTOR
+        if s is None:
+            if mt != protocolo.MSG_STREAM_DATA:
+                return
+            if closed is not None and len(body) >= SEQ_SIZE and struct.unpack_from(SEQ_FMT, body)[0] < closed:
+                # FIN (o datos) repetidos de un stream ya cerrado: se vuelve a confirmar
+                self._send(src_mac, sid, reply_role, 0, protocolo.MSG_STREAM_ACK, struct.pack(ACK_FMT, closed, 0))
+            else:
+                # Datos nuevos para un stream cerrado o desconocido: nadie los leerá
+                self._reset(src_mac, sid, reply_role)
+            return
+        if mt == protocolo.MSG_STREAM_ACK:
+            s._on_ack(hdr['flags'], body)
+        elif mt == protocolo.MSG_STREAM_DATA:
+            s._on_data(hdr['flags'], body)
+
+    def _on_open(self, src_mac, sid, port, body):
+        key = (src_mac, sid, False)
+        with self.lock:
+            s = self._streams.get(key)
+            if s is None:
+                listener = self._listeners.get(port)
+                if listener is not None:
+                    rwnd = struct.unpack_from('!I', body)[0] if len(body) >= 4 else self.rx_buffer
+                    s = self._streams[key] = Stream(self, src_mac, sid, False, port, rwnd)
+                    listener._queue.put(s)
+                    STREAMS.inc(1, 'accept')
+        if s is None:
+            self._reset(src_mac, sid, FROM_ACCEPTOR)
+            return
+        # OPEN nuevo o repetido (se perdió nuestro ACK)
+        with s.cond:
+            nxt, window = s._expected, s._window()
+        self._send_ack(s, nxt, window)
+
+    def _forget(self, s, expected=None):
+        with self.lock:
+            if self._streams.get(s.key) is s:
+                del self._streams[s.key]
+                if expected is not None:
+                    self._closed[s.key] = expected
+                    while len(self._closed) > CLOSED_MEMORY:
+                        self._closed.popitem(last=False)
+
+    # Reenvíos
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self.lock:
+                streams = list(self._streams.values())
+            shortest = MAX_RTO
+            for s in streams:
+                due = s._due(now)
+                if s.error is not None:
+                    self._forget(s)
+                    continue
+                for seq, seg in due:
+                    self._send_data(s, seq, seg)
+                shortest = min(shortest, s.rto)
+            self._wakeup.wait(shortest / 4)
+            self._wakeup.clear()
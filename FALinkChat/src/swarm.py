@@ -0,0 +1,473 @@
+# src/swarm.py
+# Este módulo implementa la descarga de un mismo archivo desde varios vecinos
+# a la vez (swarm), para no dejar ociosos los enlaces de los demás nodos que
+# ya lo tienen cuando se descarga de uno solo
+# Funcionamiento:
+# - Contenido: el archivo se corta en piezas de PIECE_SIZE y se identifica por
+#   la raíz de un árbol Merkle (SHA-256) sobre los hashes de las piezas. La
+#   raíz es todo lo que hace falta conocer para pedirlo y verificarlo
+# - Anuncio: share() guarda el contenido y manda un HAVE broadcast
+#   (MSG_SWARM_HAVE: raíz, tamaño, tamaño de pieza y nombre). Para descargar
+#   se manda un QUERY broadcast (MSG_SWARM_QUERY) y quien lo tiene contesta
+#   con un HAVE unicast. Los anuncios caducan a los HAVE_TTL segundos
+# - Piezas: a cada vecino que lo tiene se le abre un stream (stream.py,
+#   puerto SWARM_PORT) por el que se piden piezas (raíz + índice) y llegan con
+#   su prueba Merkle (hashes hermanos hasta la raíz), así cada pieza se
+#   verifica por separado en cuanto llega; una pieza que no verifica descarta
+#   a ese vecino y vuelve a la cola
+# - Reparto: las piezas se sacan de una cola común (cada vecino pide la
+#   siguiente cuando le queda hueco) y cada vecino tiene en curso tantas
+#   piezas como transfiere en PIPELINE_SECONDS según su throughput medido:
+#   los vecinos rápidos reciben más piezas y los lentos no retrasan la cola.
+#   Al final, las piezas que aún esperan a un vecino lento se piden también a
+#   los que quedan libres (gana la primera copia válida)
+# - Al terminar la descarga el nodo pasa a compartir el contenido
+
+import collections
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import protocolo
+import network
+import log
+import metrics
+
+# Dirección MAC de broadcast (todo el LAN)
+BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
+
+# Puerto de stream en el que cada nodo sirve piezas
+SWARM_PORT = 2
+PIECE_SIZE = 256 * 1024
+HASH_SIZE = 32
+# Validez de un anuncio HAVE y espera a las respuestas de un QUERY
+HAVE_TTL = 120.0
+QUERY_WAIT = 0.3
+# Segundos de datos pedidos por adelantado a cada vecino y límites en piezas
+PIPELINE_SECONDS = 0.25
+MIN_PIPELINE = 2
+MAX_PIPELINE = 16
+# Espera máxima de una pieza pedida antes de dar al vecino por perdido
+PIECE_TIMEOUT = 10.0
+# Bytes del nombre en un HAVE
+MAX_NAME = 200
+
+HAVE_FMT = '!QI'
+HAVE_SIZE = struct.calcsize(HAVE_FMT)
+# Petición por el stream: raíz + índice de pieza
+REQ_FMT = '!32sI'
+REQ_SIZE = struct.calcsize(REQ_FMT)
+# Respuesta: índice, longitud (NO_PIECE si no la tiene) y hashes de la prueba,
+# seguida de la prueba y de la pieza
+RESP_FMT = '!IIH'
+RESP_SIZE = struct.calcsize(RESP_FMT)
+NO_PIECE = 0xffffffff
+
+PIECES = metrics.counter('linkchat_swarm_pieces_total', 'Piezas de swarm servidas, recibidas, duplicadas o corruptas', label='result')
+SWARM_BYTES = metrics.counter('linkchat_swarm_bytes_total', 'Bytes de piezas verificadas recibidos')
+
+
+# Árbol Merkle (hojas y nodos con prefijos distintos para que una hoja no
+# pueda hacerse pasar por un nodo interno)
+
+def leaf_hash(piece):
+    h = hashlib.sha256(b'\x00')
+    h.update(piece)
+    return h.digest()
+
+
+def _node(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def piece_count(size, piece_size):
+    # Un archivo vacío es una sola pieza vacía
+    return max(1, -(-size // piece_size))
+
+
+def merkle_levels(leaves):
+    # Niveles del árbol, de las hojas a la raíz; un nodo sin pareja sube tal cual
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        prev = levels[-1]
+        levels.append([_node(prev[i], prev[i + 1]) if i + 1 < len(prev) else prev[i]
+                       for i in range(0, len(prev), 2)])
+    return levels
+
+
+def merkle_proof(levels, i):
+    # Hashes hermanos de la hoja i hasta la raíz
+    proof = []
+    for level in levels[:-1]:
+        if i ^ 1 < len(level):
+            proof.append(level[i ^ 1])
+        i //= 2
+    return proof
+
+
+def merkle_verify(root, count, i, leaf, proof):
+    # True si la hoja i de un árbol de `count` hojas lleva a `root` con `proof`
+    h, n, k = leaf, count, 0
+    while n > 1:
+        if i ^ 1 < n:
+            if k >= len(proof):
+                return False
+            h = _node(proof[k], h) if i & 1 else _node(h, proof[k])
+            k += 1
+        i //= 2
+        n = (n + 1) // 2
+    return k == len(proof) and h == root
+
+
+def _read_exact(s, n, timeout=None):
+    # n bytes del stream; None si el otro extremo cerró antes de empezar
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = s.recv(n - len(buf), timeout)
+        if not chunk:
+            if not buf:
+                return None
+            raise ConnectionError("stream cerrado a mitad de mensaje")
+        buf += chunk
+    return bytes(buf)
+
+
+def _map(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _Content:
+    # Contenido compartido: datos (bytes o mmap) y niveles del árbol Merkle
+    def __init__(self, data, piece_size, name):
+        self.data = memoryview(data).cast('B') if len(data) else b''
+        self.size = len(data)
+        self.piece_size = piece_size
+        self.name = name
+        self.count = piece_count(self.size, piece_size)
+        self.levels = merkle_levels(leaf_hash(self.piece(i)) for i in range(self.count))
+        self.root = self.levels[-1][0]
+
+    def piece(self, i):
+        return self.data[i * self.piece_size:(i + 1) * self.piece_size]
+
+
+class _Fetch:
+    # Estado de una descarga: cola común de piezas, quién tiene pedida cada una
+    # y destino de las piezas verificadas
+    def __init__(self, root, size, piece_size, write):
+        self.root = root
+        self.size = size
+        self.piece_size = piece_size
+        self.count = piece_count(size, piece_size)
+        self.write = write
+        self.pending = collections.deque(range(self.count))
+        self.requested = {}
+        self.done = bytearray(self.count)
+        self.left = self.count
+        self.workers = 0
+        self.received = collections.Counter()
+        self.cond = threading.Condition()
+
+    def finished(self):
+        return self.left == 0
+
+    def next_piece(self, peer):
+        # Siguiente pieza para `peer`, o None si no hay nada que pedirle
+        with self.cond:
+            while self.pending:
+                i = self.pending.popleft()
+                if not self.done[i]:
+                    self.requested.setdefault(i, set()).add(peer)
+                    return i
+            # Recta final: piezas que esperan a otro vecino
+            for i, who in self.requested.items():
+                if peer not in who:
+                    who.add(peer)
+                    return i
+            return None
+
+    def complete(self, i, data, peer):
+        # Guarda una pieza verificada; False si ya había llegado por otro vecino
+        with self.cond:
+            if self.done[i]:
+                return False
+            self.write(i, data)
+            self.done[i] = 1
+            self.left -= 1
+            self.received[peer] += len(data)
+            self.requested.pop(i, None)
+            self.cond.notify_all()
+        return True
+
+    def release(self, indices, peer):
+        # Piezas que `peer` ya no va a entregar: vuelven a la cola si nadie más las espera
+        with self.cond:
+            for i in indices:
+                who = self.requested.get(i)
+                if who is not None:
+                    who.discard(peer)
+                    if not who:
+                        del self.requested[i]
+                if not self.done[i] and i not in self.requested and i not in self.pending:
+                    self.pending.appendleft(i)
+            self.cond.notify_all()
+
+
+class Swarm:
+    # Compartición y descarga multi-origen de contenidos:
+    # - share(data, name) -> raíz (bytes); data puede ser bytes o un mmap
+    # - query(root): busca quién tiene el contenido (QUERY y espera a los HAVE)
+    # - fetch(root, path, peers, stats): descarga y devuelve los bytes (o la
+    #   ruta si se pasa path); stats (dict opcional) recibe bytes por vecino
+    # - catalog(): contenidos conocidos (propios y anunciados por vecinos)
+    # - handle_packet(src_mac, payload): MSG_SWARM_* desde el hilo receptor
+    # - start()/stop(): servidor de piezas en el puerto SWARM_PORT
+
+    def __init__(self, transport, src_mac, streams, piece_size=PIECE_SIZE, clock=time.monotonic):
+        self.transport = transport
+        self.src_mac = src_mac
+        self.streams = streams
+        self.piece_size = piece_size
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Raíz -> _Content compartido por este nodo
+        self._shared = {}
+        # Raíz -> (tamaño, tamaño de pieza, nombre) de lo anunciado por vecinos
+        self._known = {}
+        # Raíz -> {MAC: caducidad del anuncio}
+        self._holders = {}
+        self._listener = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._listener is None:
+            self._listener = self.streams.listen(SWARM_PORT)
+            threading.Thread(target=self._accept_loop, name='swarm-accept', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.close()
+
+    # Anuncios
+
+    def _send(self, dst_mac, msg_type, payload):
+        header = protocolo.pack_header(0, 0, 0, 0, msg_type, len(payload))
+        try:
+            network.send_frame(self.transport, network.build_ethernet_frame(
+                dst_mac, self.src_mac, network.ETH_P_CUSTOM, header + payload))
+        except Exception as e:
+            log.error('swarm', "error enviando a %s: %s", log.mac(dst_mac), e)
+
+    def share(self, data, name=''):
+        content = _Content(data, self.piece_size, name)
+        with self.lock:
+            self._shared[content.root] = content
+        self.announce(content.root)
+        return content.root
+
+    def announce(self, root, dst_mac=BROADCAST_MAC):
+        content = self._shared.get(root)
+        if content is not None:
+            self._send(dst_mac, protocolo.MSG_SWARM_HAVE, root + struct.pack(HAVE_FMT, content.size, content.piece_size)
+                       + content.name.encode('utf-8')[:MAX_NAME])
+
+    def handle_packet(self, src_mac, payload):
+        hdr, body = protocolo.unpack_header(payload)
+        body = bytes(body[:hdr['payload_len']])
+        if len(body) < HASH_SIZE:
+            return
+        root = body[:HASH_SIZE]
+        if hdr['msg_type'] == protocolo.MSG_SWARM_QUERY:
+            self.announce(root, src_mac)
+        elif hdr['msg_type'] == protocolo.MSG_SWARM_HAVE and len(body) >= HASH_SIZE + HAVE_SIZE:
+            size, piece_size = struct.unpack_from(HAVE_FMT, body, HASH_SIZE)
+            if not piece_size:
+                return
+            name = body[HASH_SIZE + HAVE_SIZE:].decode('utf-8', errors='replace')
+            with self.lock:
+                self._known[root] = (size, piece_size, name)
+                self._holders.setdefault(root, {})[src_mac] = self.clock() + HAVE_TTL
+
+    def query(self, root, wait=QUERY_WAIT):
+        # Pregunta al LAN quién tiene el contenido y devuelve los que contestan
+        self._send(BROADCAST_MAC, protocolo.MSG_SWARM_QUERY, root)
+        time.sleep(wait)
+        return self.holders(root)
+
+    def name(self, root):
+        content = self._shared.get(root)
+        if content is not None:
+            return content.name
+        info = self._known.get(root)
+        return info[2] if info else None
+
+    def holders(self, root):
+        # Vecinos con un anuncio vigente del contenido
+        now = self.clock()
+        with self.lock:
+            return sorted(mac for mac, expiry in self._holders.get(root, {}).items() if expiry > now)
+
+    def catalog(self):
+        with self.lock:
+            roots = set(self._known) | set(self._shared)
+            out = []
+            for root in sorted(roots):
+                content = self._shared.get(root)
+                size, _, name = (content.size, None, content.name) if content else self._known[root]
+                out.append({'root': root, 'size': size, 'name': name, 'shared': content is not None})
+        for entry in out:
+            entry['holders'] = self.holders(entry['root'])
+        return out
+
+    # Servidor de piezas
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                s = self._listener.accept(0.5)
+            except TimeoutError:
+                continue
+            threading.Thread(target=self._serve, args=(s,), name='swarm-serve', daemon=True).start()
+
+    def _piece(self, content, i):
+        return bytes(content.piece(i))
+
+    def _serve(self, s):
+        # Atiende las peticiones de un vecino en orden hasta que cierre el stream
+        try:
+            while not self._stop.is_set():
+                req = _read_exact(s, REQ_SIZE)
+                if req is None:
+                    break
+                root, i = struct.unpack(REQ_FMT, req)
+                content = self._shared.get(root)
+                if content is None or i >= content.count:
+                    s.send(struct.pack(RESP_FMT, i, NO_PIECE, 0))
+                    continue
+                piece = self._piece(content, i)
+                proof = merkle_proof(content.levels, i)
+                s.send(struct.pack(RESP_FMT, i, len(piece), len(proof)) + b''.join(proof) + piece)
+                PIECES.inc(1, 'served')
+        except OSError as e:
+            if not self._stop.is_set():
+                log.warning('swarm', "stream de %s: %s", log.mac(s.peer), e)
+        finally:
+            s.close()
+
+    # Descarga
+
+    def fetch(self, root, path=None, peers=None, stats=None):
+        if peers is None:
+            peers = self.query(root)
+        info = self._known.get(root)
+        if info is None or not peers:
+            raise RuntimeError("ningún vecino anuncia el contenido " + root.hex()[:16])
+        size, piece_size, name = info
+        if path is None:
+            buf = bytearray(size)
+            out = None
+
+            def write(i, data):
+                buf[i * piece_size:i * piece_size + len(data)] = data
+        else:
+            out = open(path, 'wb+')
+            out.truncate(size)
+
+            def write(i, data):
+                os.pwrite(out.fileno(), data, i * piece_size)
+
+        fetch = _Fetch(root, size, piece_size, write)
+        try:
+            threads = [threading.Thread(target=self._worker, args=(fetch, peer), name='swarm-fetch', daemon=True)
+                       for peer in peers]
+            fetch.workers = len(threads)
+            for t in threads:
+                t.start()
+            with fetch.cond:
+                while not fetch.finished() and fetch.workers:
+                    fetch.cond.wait(0.5)
+        finally:
+            if out is not None:
+                out.close()
+        if stats is not None:
+            stats.update(fetch.received)
+        if not fetch.finished():
+            if path is not None:
+                os.unlink(path)
+            raise RuntimeError(f"faltan {fetch.left} de {fetch.count} piezas")
+        # Descargado y verificado: a partir de ahora también lo servimos
+        self.share(bytes(buf) if path is None else _map(path), name)
+        return bytes(buf) if path is None else path
+
+    def _depth(self, fetch, rate):
+        # Piezas en curso para un vecino: las que transfiere en PIPELINE_SECONDS
+        if rate is None:
+            return MIN_PIPELINE
+        return max(MIN_PIPELINE, min(MAX_PIPELINE, int(rate * PIPELINE_SECONDS / fetch.piece_size) + 1))
+
+    def _worker(self, fetch, peer):
+        outstanding = collections.deque()
+        s = None
+        try:
+            s = self.streams.open(peer, SWARM_PORT)
+            rate, last = None, time.monotonic()
+            while not fetch.finished():
+                while len(outstanding) < self._depth(fetch, rate):
+                    i = fetch.next_piece(peer)
+                    if i is None:
+                        break
+                    s.send(struct.pack(REQ_FMT, fetch.root, i))
+                    outstanding.append(i)
+                if not outstanding:
+                    # Nada que pedir ahora: esperar a que termine la descarga o
+                    # a que otro vecino devuelva piezas a la cola
+                    with fetch.cond:
+                        if not fetch.pending and not fetch.finished():
+                            fetch.cond.wait(0.5)
+                    continue
+                hdr = _read_exact(s, RESP_SIZE, PIECE_TIMEOUT)
+                if hdr is None:
+                    raise ConnectionError("el vecino cerró el stream")
+                i, length, nproof = struct.unpack(RESP_FMT, hdr)
+                if i != outstanding[0]:
+                    raise ValueError(f"respuesta desordenada ({i})")
+                if length == NO_PIECE:
+                    raise LookupError("el vecino ya no tiene el contenido")
+                if length > fetch.piece_size:
+                    raise ValueError(f"pieza {i} demasiado grande")
+                proof = _read_exact(s, nproof * HASH_SIZE, PIECE_TIMEOUT) or b''
+                data = _read_exact(s, length, PIECE_TIMEOUT) or b''
+                if len(proof) != nproof * HASH_SIZE or len(data) != length:
+                    raise ConnectionError("stream cerrado a mitad de pieza")
+                hashes = [proof[k:k + HASH_SIZE] for k in range(0, len(proof), HASH_SIZE)]
+                if not merkle_verify(fetch.root, fetch.count, i, leaf_hash(data), hashes):
+                    PIECES.inc(1, 'corrupt')
+                    raise ValueError(f"la pieza {i} no verifica")
+                outstanding.popleft()
+                if fetch.complete(i, data, peer):
+                    PIECES.inc(1, 'received')
+                    SWARM_BYTES.inc(len(data))
+                else:
+                    PIECES.inc(1, 'duplicate')
+                # Throughput del vecino: bytes entre respuestas consecutivas
+                now = time.monotonic()
+                sample = len(data) / max(now - last, 1e-6)
+                rate = sample if rate is None else 0.7 * rate + 0.3 * sample
+                last = now
+        except (OSError, ValueError, LookupError) as e:
+            if not fetch.finished():
+                log.warning('swarm', "descarga de %s: %s", log.mac(peer), e)
+        finally:
+            fetch.release(list(outstanding), peer)
+            if s is not None:
+                s.close(1.0)
+            with fetch.cond:
+                fetch.workers -= 1
+                fetch.cond.notify_all()
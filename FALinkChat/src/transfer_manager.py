@@ -0,0 +1,156 @@
+# src/transfer_manager.py
+# Este módulo gestiona muchas transferencias de archivos a la vez sobre un solo
+# FileTransfer, sin un hilo por transferencia ni envíos en serie
+# Características:
+# - Cola de trabajos por vecino; los vecinos se atienden por turnos (round-robin),
+#   así 50 archivos a un vecino no retrasan el único archivo para otro
+# - Límite global de transferencias activas (MAX_ACTIVE hilos trabajadores) y
+#   límite por vecino (MAX_PER_PEER); el resto espera en cola
+# - Las transferencias activas se reparten el enlace en el planificador TX
+#   (scheduler.TxScheduler, DRR por destino y file_id), de modo que el
+#   throughput total se mantiene aunque haya cientos en cola
+# - Los datos se cargan (load()) solo al empezar cada transferencia: en cola
+#   no ocupan memoria
+# - progress(id): bytes confirmados, velocidad y ETA de cada transferencia activa
+
+import collections
+import threading
+import time
+import log
+
+# Transferencias simultáneas en total y hacia un mismo vecino
+MAX_ACTIVE = 8
+MAX_PER_PEER = 2
+# Peso de la última medida en la velocidad suavizada (media móvil exponencial)
+RATE_ALPHA = 0.3
+
+
+class TransferManager:
+    # Planificador de transferencias:
+    # - submit(id, mac, size, load, on_start, on_done, send): encola un envío;
+    #   load() devuelve los bytes, on_start(id) y on_done(id, ok, error) se llaman
+    #   desde el hilo trabajador; send(data, mac, progress) sustituye a
+    #   ft.send_file (p. ej. un envío broadcast fiable)
+    # - progress(id): {'sent', 'size', 'rate', 'eta'} o {'queued': posición}
+    # - stats(): transferencias en cola y activas
+    # - start()/stop(): hilos trabajadores
+
+    def __init__(self, ft, max_active=MAX_ACTIVE, max_per_peer=MAX_PER_PEER):
+        self.ft = ft
+        self.max_active = max_active
+        self.max_per_peer = max_per_peer
+        # Colas por vecino en orden de turno: mac -> deque de trabajos
+        self._queues = collections.OrderedDict()
+        # Transferencias activas por vecino y por id
+        self._per_peer = collections.Counter()
+        self._active = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        self._running = True
+        for i in range(self.max_active):
+            t = threading.Thread(target=self._worker, name=f"transfer-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def submit(self, job_id, mac, size, load, on_start=None, on_done=None, send=None):
+        job = {'id': job_id, 'mac': mac, 'size': size, 'load': load, 'send': send or self.ft.send_file,
+               'on_start': on_start, 'on_done': on_done, 'progress': {}}
+        with self._cond:
+            self._queues.setdefault(mac, collections.deque()).append(job)
+            self._cond.notify()
+
+    def _next_job(self):
+        # Siguiente trabajo por turnos entre vecinos con hueco; llamar con _cond tomado
+        for _ in range(len(self._queues)):
+            mac, q = next(iter(self._queues.items()))
+            self._queues.move_to_end(mac)
+            if self._per_peer[mac] < self.max_per_peer:
+                job = q.popleft()
+                if not q:
+                    del self._queues[mac]
+                self._per_peer[mac] += 1
+                self._active[job['id']] = job
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while self._running and job is None:
+                    job = self._next_job()
+                    if job is None:
+                        self._cond.wait()
+                if job is None:
+                    return
+            self._run(job)
+            with self._cond:
+                self._per_peer[job['mac']] -= 1
+                if not self._per_peer[job['mac']]:
+                    del self._per_peer[job['mac']]
+                self._active.pop(job['id'], None)
+                # Queda hueco para otro trabajo de este vecino
+                self._cond.notify_all()
+
+    def _run(self, job):
+        ok, error = False, None
+        try:
+            if job['on_start'] is not None:
+                job['on_start'](job['id'])
+            job['started'] = time.time()
+            data = job['load']()
+            ok = job['send'](data, job['mac'], progress=job['progress'])
+        except Exception as e:
+            error = str(e)
+            log.warning('transfer', "transferencia %s falló: %s", job['id'], e)
+        if job['on_done'] is not None:
+            job['on_done'](job['id'], ok, error)
+
+    def progress(self, job_id):
+        # Avance de una transferencia activa (o su posición si está en cola);
+        # None si no está en el gestor (terminada o desconocida)
+        with self._cond:
+            job = self._active.get(job_id)
+            if job is None:
+                for q in self._queues.values():
+                    for pos, queued in enumerate(q):
+                        if queued['id'] == job_id:
+                            return {'queued': pos}
+                return None
+            p = job['progress']
+            frags = p.get('frags')
+            if 'acked_bytes' in p:
+                # Emisores que cuentan bytes (fragmentos de tamaño variable)
+                sent = p['acked_bytes']
+            elif frags:
+                sent = job['size'] * p['acked'] // frags
+            else:
+                return {'sent': 0, 'size': job['size'], 'rate': None, 'eta': None}
+            now = time.time()
+            # Velocidad suavizada entre consultas (la media desde el inicio tarda
+            # demasiado en reflejar cambios de reparto del enlace)
+            last = p.get('_last')
+            if last is None:
+                elapsed = now - job['started']
+                rate = sent / elapsed if elapsed > 0 and sent else None
+            elif now > last[0]:
+                inst = (sent - last[1]) / (now - last[0])
+                rate = inst if p.get('_rate') is None else RATE_ALPHA * inst + (1 - RATE_ALPHA) * p['_rate']
+            else:
+                rate = p.get('_rate')
+            p['_last'], p['_rate'] = (now, sent), rate
+            eta = (job['size'] - sent) / rate if rate else None
+            return {'sent': sent, 'size': job['size'], 'rate': rate, 'eta': eta}
+
+    def stats(self):
+        with self._cond:
+            return {'queued': sum(len(q) for q in self._queues.values()), 'active': len(self._active)}
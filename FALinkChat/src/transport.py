@@ -0,0 +1,557 @@
+# src/transport.py
+# Este módulo define la capa de transporte intercambiable de Link-Chat
+# Todo el motor (FileTransfer, FileReceiver, Discovery y el hilo receptor) solo
+# necesita un objeto con send(frame) y recv(buffer_size); aquí están las variantes:
+# - RawTransport: socket AF_PACKET real sobre una interfaz (requiere root)
+# - MemoryBus / MemoryTransport: segmento Ethernet simulado en memoria (mismo proceso)
+# - UdpTransport: túnel de tramas Ethernet sobre UDP en loopback (varios procesos)
+# - ImpairedTransport: envoltorio que emula pérdida, retardo, jitter, reordenamiento
+#   y límite de ancho de banda sobre cualquiera de los anteriores
+# - BondedTransport: agrupa varios enlaces (varias NICs del mismo dominio L2) y
+#   reparte las tramas unicast entre ellos según el throughput de cada uno
+# Con esto se pueden medir y probar transferencias en CI sin privilegios ni NICs.
+# Grupos multicast: join(mac)/leave(mac) apuntan el transporte a una MAC de
+# grupo (group_mac(nombre)); la NIC (o el bus simulado) solo entrega las tramas
+# multicast de los grupos a los que se ha unido, más el broadcast.
+
+import hashlib
+import heapq
+import itertools
+import queue
+import random
+import socket
+import struct
+import threading
+import time
+import network
+import protocolo
+
+# Dirección MAC de broadcast: FF:FF:FF:FF:FF:FF
+BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
+
+
+def is_group_mac(mac):
+    # Una MAC es de grupo (broadcast o multicast) si el bit menos significativo
+    # del primer byte está activo; esas tramas las acepta más de un nodo
+    return bool(mac[0] & 0x01)
+
+
+def group_mac(name):
+    # MAC multicast administrada localmente (primer byte 0x03: bits de grupo y
+    # de administración local) derivada del nombre del grupo
+    return b'\x03' + hashlib.blake2b(name.encode('utf-8'), digest_size=5).digest()
+
+
+# Opciones de socket de Linux para apuntar una interfaz a una MAC multicast
+# (struct packet_mreq: ifindex, tipo, longitud de la dirección, dirección)
+SOL_PACKET = getattr(socket, 'SOL_PACKET', 263)
+PACKET_ADD_MEMBERSHIP = getattr(socket, 'PACKET_ADD_MEMBERSHIP', 1)
+PACKET_DROP_MEMBERSHIP = getattr(socket, 'PACKET_DROP_MEMBERSHIP', 2)
+PACKET_MR_MULTICAST = getattr(socket, 'PACKET_MR_MULTICAST', 0)
+PACKET_MREQ_FMT = '=iHH8s'
+
+
+class Transport:
+    # Interfaz común de todos los transportes:
+    # - mac: dirección MAC local con la que se emiten las tramas
+    # - mtu: payload máximo de una trama en el enlace (MTU de la interfaz; más
+    #   de 1500 con jumbo frames)
+    # - send(frame): envía una trama Ethernet completa
+    # - recv(buffer_size): devuelve la siguiente trama o b'' si venció el timeout
+    # - settimeout(t): tiempo máximo que bloquea recv (None = sin límite)
+    # - close(): libera los recursos
+    # - discovery_tlvs() / learn_peer(src_mac, tlvs): campos TLV que el transporte
+    #   quiere anunciar en DISCOVERY/REPLY y lo que aprende de los anuncios ajenos
+    # - join(mac) / leave(mac): recibir (o dejar de recibir) las tramas dirigidas
+    #   a una MAC multicast de grupo
+    # network.send_frame y network.receive_frame funcionan igual con un socket raw
+    # que con cualquier Transport, así que el resto del código no distingue.
+
+    mac = None
+    mtu = network.ETH_MTU
+
+    def send(self, frame):
+        raise NotImplementedError
+
+    def recv(self, buffer_size=1600):
+        raise NotImplementedError
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def discovery_tlvs(self):
+        return []
+
+    def learn_peer(self, src_mac, tlvs):
+        pass
+
+    def join(self, mac):
+        pass
+
+    def leave(self, mac):
+        pass
+
+    def close(self):
+        pass
+
+
+class RawTransport(Transport):
+    # Transporte real: socket raw AF_PACKET asociado a una interfaz física
+
+    def __init__(self, iface, mac=None):
+        self.iface = iface
+        self.sock = network.create_raw_socket(iface)
+        # Si no nos dan la MAC la leemos de sysfs (Linux)
+        self.mac = mac or read_iface_mac(iface)
+        self.mtu = read_iface_mtu(iface)
+
+    def send(self, frame):
+        self.sock.send(frame)
+
+    def recv(self, buffer_size=1600):
+        try:
+            return self.sock.recv(buffer_size)
+        except socket.timeout:
+            # Igual que el resto de transportes: timeout -> trama vacía
+            return b''
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def join(self, mac):
+        # Filtro en la NIC: solo las tramas multicast de los grupos unidos suben
+        # al sistema, los demás nodos no gastan CPU en el tráfico de un grupo
+        self._membership(PACKET_ADD_MEMBERSHIP, mac)
+
+    def leave(self, mac):
+        self._membership(PACKET_DROP_MEMBERSHIP, mac)
+
+    def _membership(self, op, mac):
+        mreq = struct.pack(PACKET_MREQ_FMT, socket.if_nametoindex(self.iface), PACKET_MR_MULTICAST, 6, mac)
+        self.sock.setsockopt(SOL_PACKET, op, mreq)
+
+    def close(self):
+        self.sock.close()
+
+
+def read_iface_mac(iface):
+    # Lee la MAC de la interfaz desde /sys/class/net/<iface>/address
+    with open(f'/sys/class/net/{iface}/address', 'r') as f:
+        return bytes(int(x, 16) for x in f.read().strip().split(':'))
+
+
+def read_iface_mtu(iface):
+    # MTU de la interfaz desde /sys/class/net/<iface>/mtu (1500 si no se puede leer)
+    try:
+        with open(f'/sys/class/net/{iface}/mtu', 'r') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return network.ETH_MTU
+
+
+class MemoryBus:
+    # Segmento Ethernet simulado dentro del proceso:
+    # - Cada nodo se conecta con attach(mac) y obtiene un MemoryTransport
+    # - Las tramas unicast se entregan solo al puerto con esa MAC destino
+    # - Las tramas broadcast se entregan a todos menos al emisor; las multicast
+    #   solo a los puertos unidos a ese grupo (join), como el filtro de una NIC
+    # - Si la cola de un puerto está llena la trama se descarta (como una NIC saturada)
+
+    def __init__(self):
+        self._ports = {}
+        self._lock = threading.Lock()
+
+    def attach(self, mac, maxsize=4096):
+        port = MemoryTransport(self, mac, maxsize)
+        with self._lock:
+            self._ports[mac] = port
+        return port
+
+    def detach(self, port):
+        with self._lock:
+            if self._ports.get(port.mac) is port:
+                del self._ports[port.mac]
+
+    def deliver(self, frame, sender):
+        dst = frame[0:6]
+        if dst == BROADCAST_MAC:
+            with self._lock:
+                targets = [p for p in self._ports.values() if p is not sender]
+        elif is_group_mac(dst):
+            with self._lock:
+                targets = [p for p in self._ports.values() if p is not sender and dst in p.groups]
+        else:
+            with self._lock:
+                p = self._ports.get(dst)
+            targets = [p] if p is not None else []
+        for p in targets:
+            p._enqueue(frame)
+
+
+class MemoryTransport(Transport):
+    # Puerto de un MemoryBus: una cola acotada de tramas recibidas
+
+    def __init__(self, bus, mac, maxsize=4096):
+        self.bus = bus
+        self.mac = mac
+        self.timeout = None
+        self._rx = queue.Queue(maxsize)
+        self.dropped = 0
+        self.groups = set()
+
+    def _enqueue(self, frame):
+        try:
+            self._rx.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+
+    def send(self, frame):
+        self.bus.deliver(bytes(frame), self)
+
+    def join(self, mac):
+        self.groups.add(bytes(mac))
+
+    def leave(self, mac):
+        self.groups.discard(bytes(mac))
+
+    def recv(self, buffer_size=1600):
+        try:
+            return self._rx.get(timeout=self.timeout)[:buffer_size]
+        except queue.Empty:
+            return b''
+
+    def close(self):
+        self.bus.detach(self)
+
+
+def queue_pair(mac_a, mac_b):
+    # Atajo para pruebas: dos transportes conectados entre sí por un bus privado
+    bus = MemoryBus()
+    return bus.attach(mac_a), bus.attach(mac_b)
+
+
+class UdpTransport(Transport):
+    # Túnel de tramas Ethernet sobre UDP (normalmente en 127.0.0.1):
+    # - Cada nodo escucha en su propio puerto UDP
+    # - peers es la lista de (host, puerto) que forman el "segmento"
+    # - Se comporta como un switch que aprende: cuando recibe una trama de una MAC
+    #   recuerda su dirección UDP y después le envía el unicast solo a ella;
+    #   las MAC desconocidas y el broadcast se inundan a todo el segmento
+    # - Como una NIC, descarta las tramas unicast que no van dirigidas a su MAC
+    #   y las multicast de grupos a los que no se ha unido
+
+    def __init__(self, mac, port, peers=(), host='127.0.0.1'):
+        self.mac = mac
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind((host, port))
+        self.addr = self.sock.getsockname()
+        self.peers = [tuple(p) for p in peers]
+        self._learned = {}
+        self.groups = set()
+
+    def add_peer(self, addr):
+        addr = tuple(addr)
+        if addr != self.addr and addr not in self.peers:
+            self.peers.append(addr)
+
+    def send(self, frame):
+        dst = bytes(frame[0:6])
+        addr = None if is_group_mac(dst) else self._learned.get(dst)
+        targets = [addr] if addr is not None else self.peers
+        for a in targets:
+            try:
+                self.sock.sendto(frame, a)
+            except OSError:
+                # Un peer caído no debe impedir entregar al resto
+                pass
+
+    def recv(self, buffer_size=1600):
+        while True:
+            try:
+                frame, addr = self.sock.recvfrom(buffer_size)
+            except socket.timeout:
+                return b''
+            if len(frame) < 14:
+                continue
+            self._learned[frame[6:12]] = addr
+            dst = frame[0:6]
+            if dst == self.mac or dst == BROADCAST_MAC or dst in self.groups:
+                return frame
+
+    def join(self, mac):
+        self.groups.add(bytes(mac))
+
+    def leave(self, mac):
+        self.groups.discard(bytes(mac))
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+
+class ImpairedTransport(Transport):
+    # Envoltorio que degrada el enlace de salida de otro transporte:
+    # - loss: probabilidad de descartar cada trama (0.0 - 1.0)
+    # - ber: probabilidad de error por bit; la trama ocupa el enlace pero se
+    #   descarta al llegar (como haría el FCS de la NIC) con probabilidad
+    #   1 - (1 - ber)^(8 * longitud): las tramas grandes se pierden más
+    # - delay: retardo fijo en segundos
+    # - jitter: variación aleatoria uniforme +/- jitter sobre el retardo
+    # - reorder: probabilidad de retrasar una trama para que llegue después de las siguientes
+    # - rate_bps: ancho de banda en bits/s (serialización FIFO); None = ilimitado
+    # - queue_limit: tramas máximas en cola por el límite de ancho de banda (drop-tail)
+    # - block: si es True, send() espera en lugar de descartar cuando la cola está llena,
+    #   como un socket bloqueante con el buffer de envío lleno
+    # Las tramas se programan en un heap por instante de salida y un hilo las emite.
+    # La recepción se delega sin cambios al transporte interno.
+
+    def __init__(self, inner, loss=0.0, delay=0.0, jitter=0.0, reorder=0.0,
+                 rate_bps=None, queue_limit=1000, block=False, seed=None, ber=0.0):
+        self.inner = inner
+        self.mac = inner.mac
+        self.mtu = getattr(inner, 'mtu', network.ETH_MTU)
+        self.loss = loss
+        self.ber = ber
+        self.delay = delay
+        self.jitter = jitter
+        self.reorder = reorder
+        self.rate_bps = rate_bps
+        self.queue_limit = queue_limit
+        self.block = block
+        self._rng = random.Random(seed)
+        # Estadísticas útiles para los benchmarks
+        self.sent = 0
+        self.dropped = 0
+        # Instante en que el "cable" queda libre (serialización por ancho de banda)
+        self._link_free = 0.0
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._emit_loop, daemon=True)
+        self._thread.start()
+
+    def send(self, frame):
+        now = time.monotonic()
+        with self._cond:
+            if self._rng.random() < self.loss:
+                self.dropped += 1
+                return
+            corrupt = self.ber and self._rng.random() >= (1.0 - self.ber) ** (8 * len(frame))
+            if self.rate_bps:
+                while self.block and self._running and len(self._heap) >= self.queue_limit:
+                    self._cond.wait()
+                if len(self._heap) >= self.queue_limit:
+                    self.dropped += 1
+                    return
+                self._link_free = max(now, self._link_free) + len(frame) * 8.0 / self.rate_bps
+                depart = self._link_free
+            else:
+                depart = now
+            due = depart + self.delay
+            if self.jitter:
+                due += self._rng.uniform(-self.jitter, self.jitter)
+            if self.reorder and self._rng.random() < self.reorder:
+                # Retraso extra suficiente para adelantarse a las tramas siguientes
+                due += self.delay + self.jitter + 0.002
+            heapq.heappush(self._heap, (max(due, depart), next(self._seq), None if corrupt else bytes(frame)))
+            self._cond.notify_all()
+
+    def _emit_loop(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    wait = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(wait)
+                if not self._running:
+                    return
+                _, _, frame = heapq.heappop(self._heap)
+                # Hay hueco en la cola: despertar a los emisores bloqueados
+                self._cond.notify_all()
+            if frame is None:
+                # Trama corrompida por errores de bit: ocupó el enlace y se pierde
+                self.dropped += 1
+                continue
+            try:
+                self.inner.send(frame)
+                self.sent += 1
+            except Exception:
+                self.dropped += 1
+
+    def recv(self, buffer_size=1600):
+        return self.inner.recv(buffer_size)
+
+    def settimeout(self, timeout):
+        self.inner.settimeout(timeout)
+
+    def fileno(self):
+        return self.inner.fileno()
+
+    def discovery_tlvs(self):
+        return self.inner.discovery_tlvs()
+
+    def learn_peer(self, src_mac, tlvs):
+        self.inner.learn_peer(src_mac, tlvs)
+
+    def join(self, mac):
+        self.inner.join(mac)
+
+    def leave(self, mac):
+        self.inner.leave(mac)
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self.inner.close()
+
+
+class BondedTransport(Transport):
+    # Agrupa varios enlaces hacia el mismo dominio L2 (modo bonding):
+    # - La MAC del primer enlace es la identidad del nodo (mac principal); el resto
+    #   del motor solo ve esa MAC, tanto la propia como la de cada vecino
+    # - En discovery se anuncian todas las MAC locales (TLV_MACS) y se aprenden las
+    #   de los vecinos, de modo que cada enlace sepa a qué MAC del vecino dirigirse
+    # - Las tramas unicast se encolan en una cola común y un hilo por enlace las
+    #   saca en cuanto su enlace queda libre: cada enlace transmite en proporción a
+    #   su throughput real y el agregado se acerca a la suma de los enlaces. Solo
+    #   se reparten las dirigidas a vecinos con bonding ya aprendido; el resto
+    #   (nodos sin bonding, o antes del discovery) sale por el enlace principal,
+    #   porque el receptor reensambla por MAC de origen
+    # - Broadcast/multicast salen solo por el enlace principal y solo se aceptan por
+    #   él, para no recibir duplicados de un mismo segmento
+    # - Al recibir se reescriben las MAC a las principales, así el reensamblado y los
+    #   ACKs son transparentes aunque los fragmentos lleguen por enlaces distintos
+
+    def __init__(self, links, queue_size=256):
+        self.links = list(links)
+        self.mac = self.links[0].mac
+        # Las tramas pueden salir por cualquier enlace: vale la MTU menor
+        self.mtu = min(getattr(link, 'mtu', network.ETH_MTU) for link in self.links)
+        self.timeout = None
+        # MAC principal del vecino -> lista de sus MAC (una por enlace)
+        self.peer_macs = {}
+        # Cualquier MAC de un vecino -> su MAC principal
+        self.alias = {}
+        # Bytes enviados y tiempo ocupado por enlace, para medir su throughput
+        self.tx_bytes = [0] * len(self.links)
+        self.tx_frames = [0] * len(self.links)
+        self._busy = [0.0] * len(self.links)
+        self._running = True
+        self._txq = queue.Queue(queue_size)
+        self._rxq = queue.Queue(4096)
+        self._threads = []
+        for i, link in enumerate(self.links):
+            link.settimeout(0.2)
+            for fn in (self._tx_loop, self._rx_loop):
+                t = threading.Thread(target=fn, args=(i,), daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def discovery_tlvs(self):
+        return [(protocolo.TLV_MACS, b''.join(link.mac for link in self.links))]
+
+    def learn_peer(self, src_mac, tlvs):
+        for t, value in tlvs:
+            if t != protocolo.TLV_MACS or len(value) < 6:
+                continue
+            macs = [value[i:i + 6] for i in range(0, len(value) - len(value) % 6, 6)]
+            self.peer_macs[macs[0]] = macs
+            for m in macs:
+                self.alias[m] = macs[0]
+
+    def join(self, mac):
+        # Las tramas de grupo solo se aceptan por el enlace principal
+        self.links[0].join(mac)
+
+    def leave(self, mac):
+        self.links[0].leave(mac)
+
+    def link_throughput(self):
+        # Throughput medido de cada enlace en bytes/s mientras estuvo transmitiendo
+        return [b / t if t > 0 else 0.0 for b, t in zip(self.tx_bytes, self._busy)]
+
+    def send(self, frame):
+        dst = bytes(frame[0:6])
+        if is_group_mac(dst) or self.alias.get(dst, dst) not in self.peer_macs:
+            self._send_on(0, frame)
+        else:
+            # Se bloquea si todos los enlaces van saturados (contrapresión al emisor)
+            self._txq.put(frame)
+
+    def _send_on(self, i, frame):
+        link = self.links[i]
+        dst = bytes(frame[0:6])
+        peers = self.peer_macs.get(self.alias.get(dst, dst))
+        if peers and not is_group_mac(dst):
+            dst = peers[i % len(peers)]
+        start = time.monotonic()
+        link.send(dst + link.mac + bytes(frame[12:]))
+        self._busy[i] += time.monotonic() - start
+        self.tx_bytes[i] += len(frame)
+        self.tx_frames[i] += 1
+
+    def _tx_loop(self, i):
+        while self._running:
+            try:
+                frame = self._txq.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                self._send_on(i, frame)
+            except Exception:
+                # Enlace caído: devolvemos la trama para que la saque otro enlace
+                # (y damos tiempo a que el resto tome la cola)
+                self._requeue(frame)
+                time.sleep(0.05)
+
+    def _requeue(self, frame):
+        try:
+            self._txq.put_nowait(frame)
+        except queue.Full:
+            pass
+
+    def _rx_loop(self, i):
+        link = self.links[i]
+        while self._running:
+            try:
+                frame = link.recv(65535)
+            except Exception:
+                if not self._running:
+                    return
+                time.sleep(0.05)
+                continue
+            if not frame:
+                continue
+            dst = frame[0:6]
+            if is_group_mac(dst):
+                if i != 0:
+                    continue
+            else:
+                dst = self.mac
+            src = frame[6:12]
+            src = self.alias.get(src, src)
+            try:
+                self._rxq.put_nowait(dst + src + frame[12:])
+            except queue.Full:
+                pass
+
+    def recv(self, buffer_size=1600):
+        try:
+            return self._rxq.get(timeout=self.timeout)[:buffer_size]
+        except queue.Empty:
+            return b''
+
+    def close(self):
+        self._running = False
+        for link in self.links:
+            link.close()
@@ -0,0 +1,133 @@
+import unittest
+import sys, os
+import random
+import threading
+import time
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import protocolo
+import broadcast
+import transport
+
+MAC_S = b'\x02\x00\x00\x00\x05\x00'
+
+
+class Counting(transport.Transport):
+    # Cuenta los fragmentos de datos que el emisor pone en el segmento
+    def __init__(self, inner):
+        self.inner = inner
+        self.mac = inner.mac
+        self.data_frames = {'broadcast': 0, 'unicast': 0}
+
+    def send(self, frame):
+        if frame[14 + 7] == protocolo.MSG_BCAST_DATA:
+            self.data_frames['broadcast' if frame[:6] == broadcast.BROADCAST_MAC else 'unicast'] += 1
+        self.inner.send(frame)
+
+    def recv(self, buffer_size=1600):
+        return self.inner.recv(buffer_size)
+
+
+def _pump(link, node, stop, loss=0.0, seed=0):
+    # Bucle receptor mínimo; `loss` descarta fragmentos de datos en este nodo
+    rng = random.Random(seed)
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        if hdr['msg_type'] == protocolo.MSG_BCAST_DATA and rng.random() < loss:
+            continue
+        node.handle_packet(src, payload)
+
+
+class TestReliableBroadcast(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = transport.MemoryBus()
+        self.stop = threading.Event()
+        port = self.bus.attach(MAC_S)
+        port.settimeout(0.05)
+        self.wire = Counting(port)
+        self.sender = broadcast.Broadcast(self.wire, MAC_S, lambda *a: True).start()
+        self.sender.poll_interval = 0.1
+        self.nodes = [self.sender]
+        threading.Thread(target=_pump, args=(port, self.sender, self.stop), daemon=True).start()
+
+    def tearDown(self):
+        self.stop.set()
+        for node in self.nodes:
+            node.stop()
+
+    def _receivers(self, losses):
+        got, macs = {}, []
+        for i, loss in enumerate(losses):
+            mac = bytes([2, 0, 0, 0, 5, i + 1])
+            link = self.bus.attach(mac)
+            link.settimeout(0.05)
+
+            def deliver(origin, bid, data, text, group, mac=mac):
+                got[mac] = (origin, data, text)
+                return True
+
+            node = broadcast.Broadcast(link, mac, deliver).start()
+            self.nodes.append(node)
+            threading.Thread(target=_pump, args=(link, node, self.stop, loss, i), daemon=True).start()
+            macs.append(mac)
+        return macs, got
+
+    def test_file_to_many_with_loss(self):
+        macs, got = self._receivers([0.1] * 6)
+        data = os.urandom(300 * 1000)
+        failed = self.sender.send(data, macs)
+        self.assertEqual(failed, [], "✅ Todos los receptores confirman")
+        self.assertEqual(sorted(got), sorted(macs))
+        self.assertTrue(all(d == (MAC_S, data, False) for d in got.values()), "✅ Contenido íntegro en todos")
+        frags = -(-len(data) // self.sender.max_payload())
+        sent = sum(self.wire.data_frames.values())
+        # Con 6 receptores y 10% de pérdida cada uno, el coste sigue cerca de 1x
+        self.assertLess(sent, 2 * frags, f"✅ Coste en el cable ~1x ({sent} tramas para {frags} fragmentos)")
+
+    def test_single_lossy_receiver_gets_unicast_repair(self):
+        macs, got = self._receivers([0.0, 0.0, 0.3])
+        failed = self.sender.send('hola a todos'.encode('utf-8') * 500, macs, text=True)
+        self.assertEqual(failed, [])
+        self.assertTrue(all(text for _, _, text in got.values()), "✅ Se marca como chat")
+        self.assertGreater(self.wire.data_frames['unicast'], 0, "✅ Reparación unicast al único receptor pendiente")
+
+    def test_missing_receiver_reported(self):
+        macs, _ = self._receivers([0.0])
+        self.sender.max_idle_rounds = 2
+        ghost = b'\x02\x00\x00\x00\x05\xee'
+        start = time.monotonic()
+        self.assertEqual(self.sender.send(b'x' * 5000, macs + [ghost]), [ghost],
+                         "✅ Los que no confirman se devuelven")
+        self.assertLess(time.monotonic() - start, 2.0)
+
+    def test_oversized_send_rejected_without_leak(self):
+        self.sender.max_size = lambda: 1000
+        with self.assertRaises(ValueError):
+            self.sender.send(b'x' * 1001, [])
+        self.assertEqual(self.sender._out, {}, "✅ El envío rechazado no queda registrado")
+
+    def test_abandoned_incoming_expires(self):
+        now = [0.0]
+        node = broadcast.Broadcast(self.bus.attach(b'\x02\x00\x00\x00\x05\x01'), b'\x02\x00\x00\x00\x05\x01',
+                                   lambda *a: True, clock=lambda: now[0])
+        out = broadcast._Outgoing(7, b'x' * 5000, self.sender.max_payload(), False, [], broadcast.BROADCAST_MAC)
+        _, src, _, payload = network.unpack_ethernet_frame(self.sender._frame(out, 0, broadcast.BROADCAST_MAC))
+        node.handle_packet(src, payload)
+        self.assertEqual(len(node._in), 1)
+        now[0] = node.incoming_idle / 2
+        node._expire(now[0])
+        self.assertEqual(len(node._in), 1, "✅ Una recepción activa se conserva")
+        now[0] = node.incoming_idle * 2
+        node._expire(now[0])
+        self.assertEqual(node._in, {}, "✅ La recepción abandonada se libera")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
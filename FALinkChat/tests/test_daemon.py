@@ -0,0 +1,154 @@
+import unittest
+import sys, os
+import json
+import shutil
+import socket
+import tempfile
+import time
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import engine
+import daemon
+import history
+import lcctl
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x01\x0a'
+MAC_B = b'\x02\x00\x00\x00\x01\x0b'
+MAC_C = b'\x02\x00\x00\x00\x01\x0c'
+
+
+def _wait(cond, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestDaemon(unittest.TestCase):
+    # Dos motores sin GUI en un bus en memoria; el A se maneja por su socket de control
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.bus = bus = transport.MemoryBus()
+        self.history = history.History(os.path.join(self.tmp, 'history'))
+        self.a = engine.Engine(sock=bus.attach(MAC_A), out_dir=self.tmp, history=self.history).start()
+        self.b = engine.Engine(sock=bus.attach(MAC_B), out_dir=self.tmp).start()
+        self.b_events = []
+        self.b.subscribe(self.b_events.append)
+        self.path = os.path.join(self.tmp, 'ctl.sock')
+        self.server = daemon.ControlServer(self.a, self.path).start()
+        lcctl.request(self.path, {'cmd': 'discover'})
+        self.assertTrue(_wait(lambda: lcctl.request(self.path, {'cmd': 'neighbors'})['neighbors']),
+                        "❌ A no descubrió a B")
+
+    def tearDown(self):
+        self.server.stop()
+        self.a.stop()
+        self.b.stop()
+        self.history.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_ping_neighbors_and_errors(self):
+        self.assertEqual(lcctl.request(self.path, {'cmd': 'ping'})['mac'], '02:00:00:00:01:0a')
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600, "✅ Socket solo para el usuario actual")
+        macs = [n['mac'] for n in lcctl.request(self.path, {'cmd': 'neighbors'})['neighbors']]
+        self.assertEqual(macs, ['02:00:00:00:01:0b'], "✅ vecinos por la API de control")
+        with self.assertRaises(RuntimeError):
+            lcctl.request(self.path, {'cmd': 'nope'})
+
+    def test_chat_and_file_transfer(self):
+        lcctl.request(self.path, {'cmd': 'chat', 'text': 'hola B'})
+        self.assertTrue(_wait(lambda: any(e.get('text') == 'hola B' for e in self.b_events)),
+                        "✅ chat entregado al otro motor")
+        messages = lcctl.request(self.path, {'cmd': 'history', 'query': 'hola'})['messages']
+        self.assertEqual([(m['peer'], m['dir']) for m in messages], [('02:00:00:00:01:0b', 'out')],
+                         "✅ chat enviado anotado en el historial")
+
+        src = os.path.join(self.tmp, 'datos.bin')
+        data = os.urandom(20000)
+        with open(src, 'wb') as f:
+            f.write(data)
+        ids = lcctl.request(self.path, {'cmd': 'send', 'path': src, 'to': ['02:00:00:00:01:0b']})['ids']
+        self.assertEqual(len(ids), 1)
+        done = lambda: lcctl.request(self.path, {'cmd': 'transfers', 'ids': ids})['transfers'][0]['state'] == 'done'
+        self.assertTrue(_wait(done), "✅ transferencia completada")
+        self.assertTrue(_wait(lambda: any(e['event'] == 'file' for e in self.b_events)))
+        path = next(e['path'] for e in self.b_events if e['event'] == 'file')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data, "✅ archivo recibido íntegro")
+
+    def test_broadcast_send(self):
+        src = os.path.join(self.tmp, 'todos.bin')
+        data = os.urandom(50000)
+        with open(src, 'wb') as f:
+            f.write(data)
+        ids = lcctl.request(self.path, {'cmd': 'send', 'path': src, 'broadcast': True})['ids']
+        self.assertEqual(len(ids), 1, "✅ una sola transferencia para todos")
+        t = lambda: lcctl.request(self.path, {'cmd': 'transfers', 'ids': ids})['transfers'][0]
+        self.assertTrue(_wait(lambda: t()['state'] == 'done'), "✅ broadcast confirmado por todos")
+        self.assertEqual(t()['to'], 'ff:ff:ff:ff:ff:ff')
+        self.assertTrue(_wait(lambda: any(e['event'] == 'file' for e in self.b_events)))
+        path = next(e['path'] for e in self.b_events if e['event'] == 'file')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data, "✅ archivo broadcast recibido íntegro")
+        lcctl.request(self.path, {'cmd': 'chat', 'text': 'hola a todos', 'broadcast': True})
+        self.assertTrue(_wait(lambda: any(e.get('text') == 'hola a todos' for e in self.b_events)),
+                        "✅ chat broadcast entregado")
+
+    def test_group_chat_reaches_members_only(self):
+        c = engine.Engine(sock=self.bus.attach(MAC_C), out_dir=self.tmp).start()
+        try:
+            c_events = []
+            c.subscribe(c_events.append)
+            self.b.join_group('equipo')
+            groups = lambda: lcctl.request(self.path, {'cmd': 'groups'})['groups']
+            lcctl.request(self.path, {'cmd': 'join', 'group': 'equipo'})
+            self.assertTrue(_wait(lambda: groups()[0]['members'] == ['02:00:00:00:01:0b']),
+                            "✅ Discovery anuncia los miembros del grupo")
+            reply = lcctl.request(self.path, {'cmd': 'chat', 'text': 'hola equipo', 'group': 'equipo'})
+            self.assertEqual(reply['to'], ['02:00:00:00:01:0b'])
+            self.assertTrue(_wait(lambda: any(e.get('text') == 'hola equipo' for e in self.b_events)))
+            event = next(e for e in self.b_events if e.get('text') == 'hola equipo')
+            self.assertEqual(event['group'], 'equipo', "✅ Chat de grupo entregado al miembro")
+            time.sleep(0.2)
+            self.assertFalse(any(e['event'] == 'chat' for e in c_events), "✅ El no miembro no lo ve")
+        finally:
+            c.stop()
+
+    def test_share_and_fetch(self):
+        src_dir = os.path.join(self.tmp, 'b')
+        os.mkdir(src_dir)
+        src = os.path.join(src_dir, 'imagen.iso')
+        data = os.urandom(300000)
+        with open(src, 'wb') as f:
+            f.write(data)
+        root = self.b.share(src)
+        path = lcctl.request(self.path, {'cmd': 'fetch', 'root': root}, None)['path']
+        self.assertEqual(path, os.path.join(self.tmp, 'imagen.iso'), "✅ guardado en out_dir con el nombre anunciado")
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data, "✅ contenido descargado por swarm")
+        content = lcctl.request(self.path, {'cmd': 'content'})['content']
+        self.assertEqual([(c['root'], c['shared'], c['holders']) for c in content],
+                         [(root, True, ['02:00:00:00:01:0b'])], "✅ A ya lo comparte y sabe quién más lo tiene")
+
+    def test_subscribe_streams_events(self):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(5)
+        s.connect(self.path)
+        f = s.makefile('rwb')
+        f.write(b'{"cmd": "subscribe"}\n')
+        f.flush()
+        self.assertTrue(json.loads(f.readline())['ok'])
+        self.b.send_chat('hola A', ['02:00:00:00:01:0a'])
+        event = json.loads(f.readline())
+        s.close()
+        self.assertEqual((event['event'], event['from'], event['text']),
+                         ('chat', '02:00:00:00:01:0b', 'hola A'), "✅ evento recibido por la suscripción")
+
+
+if __name__ == '__main__':
+    unittest.main()
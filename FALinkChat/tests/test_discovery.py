@@ -0,0 +1,227 @@
+import unittest
+import sys, os
+
+# Añadimos src/ al path para poder importar discovery
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import protocolo
+import discovery
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+
+
+class FakeClock:
+    # Reloj manual para simular el paso del tiempo sin esperar
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _mac(i):
+    return b'\x02\x00' + i.to_bytes(4, 'big')
+
+
+class TestNeighborTable(unittest.TestCase):
+    # Pruebas de la tabla de vecinos con caducidad por heap
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.a, self.b = transport.queue_pair(MAC_A, MAC_B)
+        self.b.settimeout(0.1)
+        self.disc = discovery.Discovery(self.a, MAC_A, ttl=10, interval=5, clock=self.clock)
+        self.events = []
+        self.disc.subscribe(lambda ev, mac: self.events.append((ev, mac)))
+
+    def test_join_refresh_and_leave(self):
+        self.disc.touch(MAC_B)
+        self.clock.now += 8
+        self.disc.touch(MAC_B)          # refresco: no debe generar evento nuevo
+        self.clock.now += 8
+        self.assertEqual(self.disc.get_neighbors(), [MAC_B], "✅ Un vecino refrescado no caduca")
+        self.clock.now += 3
+        self.assertEqual(self.disc.get_neighbors(), [], "✅ El vecino caduca tras ttl sin noticias")
+        self.assertEqual(self.events, [('join', MAC_B), ('leave', MAC_B)], "✅ Eventos join/leave emitidos")
+
+    def test_snapshot_reused_until_membership_changes(self):
+        self.disc.touch(MAC_B)
+        first = self.disc.get_neighbors()
+        self.disc.touch(MAC_B)
+        self.assertIs(self.disc.get_neighbors(), first, "✅ Sin cambios de membresía se reutiliza la lista")
+        self.disc.touch(_mac(7))
+        self.assertIsNot(self.disc.get_neighbors(), first, "✅ Un alta reconstruye la lista")
+
+    def test_periodic_discovery_with_jitter(self):
+        wait = self.disc.tick()
+        frame = self.b.recv()
+        _, _, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        self.assertEqual(hdr['msg_type'], protocolo.MSG_DISCOVERY, "✅ El primer tick envía DISCOVERY")
+        self.assertTrue(3.75 <= wait <= 6.25, "✅ Próximo DISCOVERY dentro del intervalo +/- jitter")
+        self.disc.tick()
+        self.assertEqual(self.b.recv(), b'', "✅ No se repite antes de tiempo")
+
+    def test_incremental_expiry_scales(self):
+        # Miles de vecinos: refrescar es O(1) y cada tick solo procesa lo caducado
+        for i in range(5000):
+            self.disc.touch(_mac(i))
+        self.clock.now += 5
+        for i in range(2500):
+            self.disc.touch(_mac(i))
+        self.clock.now += 6
+        gone = self.disc.expire()
+        self.assertEqual(len(gone), 2500, "✅ Caducan solo los vecinos no refrescados")
+        self.assertEqual(len(self.disc.get_neighbors()), 2500, "✅ Quedan los refrescados")
+        self.assertEqual(len(self.disc._expiry), 2500, "✅ Una sola entrada de heap por vecino")
+
+
+class TestGroupMembership(unittest.TestCase):
+    # Tabla de miembros de grupo aprendida de los anuncios de discovery
+
+    def test_members_learned_and_dropped(self):
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        a.settimeout(0.1)
+        b.settimeout(0.1)
+        clock = FakeClock()
+        disc_a = discovery.Discovery(a, MAC_A, ttl=10, clock=clock)
+        disc_b = discovery.Discovery(b, MAC_B, ttl=10, clock=clock)
+        group = transport.group_mac('equipo')
+
+        def deliver():
+            while True:
+                frame = a.recv()
+                if not frame:
+                    return
+                dst, src, _, payload = network.unpack_ethernet_frame(frame)
+                disc_a.handle_packet(src, payload, dst)
+
+        disc_b.join_group(group)
+        deliver()
+        self.assertEqual(disc_a.group_members(group), [MAC_B], "✅ El anuncio de B lo da de alta en el grupo")
+        disc_b.leave_group(group)
+        deliver()
+        self.assertEqual(disc_a.group_members(group), [], "✅ Al salir deja de figurar como miembro")
+        disc_b.join_group(group)
+        deliver()
+        clock.now += 11
+        disc_a.expire()
+        self.assertEqual(disc_a.group_members(group), [], "✅ Un vecino caducado sale de sus grupos")
+
+
+class TestPassiveLearning(unittest.TestCase):
+    # Aprendizaje pasivo y sondeo solo de vecinos callados
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.a, self.b = transport.queue_pair(MAC_A, MAC_B)
+        self.b.settimeout(0.1)
+        self.disc = discovery.Discovery(self.a, MAC_A, ttl=60, probe_after=20, clock=self.clock)
+
+    def _received_types(self):
+        types = []
+        while True:
+            frame = self.b.recv()
+            if not frame:
+                return types
+            _, _, _, payload = network.unpack_ethernet_frame(frame)
+            hdr, _ = protocolo.unpack_header(payload)
+            types.append((hdr['msg_type'], hdr['flags']))
+
+    def _discovery_from_b(self, flags):
+        hdr = protocolo.pack_header(0, 0, 0, flags, protocolo.MSG_DISCOVERY, 0)
+        self.disc.handle_packet(MAC_B, hdr)
+
+    def test_observe_learns_without_reply(self):
+        self.disc.observe(MAC_B)
+        self.disc.observe(transport.BROADCAST_MAC)
+        self.assertEqual(self.disc.get_neighbors(), [MAC_B], "✅ Cualquier trama válida registra al emisor")
+
+    def test_heartbeat_only_answered_when_unknown(self):
+        self._discovery_from_b(0)
+        self._discovery_from_b(0)
+        replies = [t for t, _ in self._received_types() if t == protocolo.MSG_REPLY]
+        self.assertEqual(len(replies), 1, "✅ Solo se responde al heartbeat de un nodo desconocido")
+        self.clock.now += discovery.REPLY_DEDUP_WINDOW
+        self._discovery_from_b(protocolo.FLAG_SOLICIT)
+        self.assertEqual(self._received_types(), [(protocolo.MSG_REPLY, 0)], "✅ FLAG_SOLICIT siempre obtiene REPLY")
+
+    def test_probe_only_silent_peers(self):
+        self.disc.observe(MAC_B)
+        self.clock.now += 15
+        self.disc.observe(MAC_B)
+        self.clock.now += 15
+        self.disc.expire()
+        self.assertEqual(self._received_types(), [], "✅ No se sondea a un vecino con tráfico reciente")
+        self.clock.now += 10
+        self.disc.expire()
+        self.assertEqual(self._received_types(), [(protocolo.MSG_DISCOVERY, protocolo.FLAG_SOLICIT)],
+                         "✅ Un vecino callado recibe un DISCOVERY unicast de sondeo")
+        self.assertEqual(self.disc.sent_probes, 1, "✅ Se contabiliza el sondeo")
+
+
+class TestStormSuppression(unittest.TestCase):
+    # Retardo aleatorio, deduplicación, filtro de conocidos y REPLY agregados
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.a, self.b = transport.queue_pair(MAC_A, MAC_B)
+        self.b.settimeout(0.1)
+        self.disc = discovery.Discovery(self.a, MAC_A, clock=self.clock)
+        # Población pequeña pero no trivial: siempre responde, con retardo
+        for i in range(10):
+            self.disc.touch(_mac(i))
+
+    def _solicit(self, bloom=None):
+        tlvs = [(protocolo.TLV_KNOWN_BLOOM, bloom)] if bloom else []
+        body = protocolo.pack_message(protocolo.MSG_DISCOVERY, 0, protocolo.pack_tlvs(tlvs),
+                                      flags=protocolo.FLAG_SOLICIT, total_frags=0)
+        self.disc.handle_packet(MAC_B, body, transport.BROADCAST_MAC)
+
+    def _replies(self):
+        out = []
+        while True:
+            frame = self.b.recv()
+            if not frame:
+                return out
+            _, _, _, payload = network.unpack_ethernet_frame(frame)
+            hdr, content = protocolo.unpack_message(payload)
+            if hdr['msg_type'] == protocolo.MSG_REPLY:
+                out.append(dict(protocolo.unpack_tlvs(content)))
+
+    def test_backoff_dedup_and_aggregation(self):
+        self._solicit()
+        self._solicit()
+        self.assertEqual(self._replies(), [], "✅ La respuesta espera su retardo aleatorio")
+        self.clock.now += discovery.REPLY_BACKOFF_MAX
+        self.disc.tick()
+        replies = self._replies()
+        self.assertEqual(len(replies), 1, "✅ Solicitudes duplicadas en la ventana: una sola respuesta")
+        listed = replies[0][protocolo.TLV_NEIGHBORS]
+        self.assertEqual(len(listed), 60, "✅ El REPLY lista a los 10 vecinos recientes")
+
+    def test_known_requester_bloom_suppresses_reply(self):
+        self._solicit(discovery.bloom_build([MAC_A, _mac(99)]))
+        self.clock.now += discovery.REPLY_BACKOFF_MAX
+        self.disc.tick()
+        self.assertEqual(self._replies(), [], "✅ Quien ya está en el filtro del solicitante no responde")
+
+    def test_aggregated_reply_teaches_neighbors(self):
+        listed = _mac(500) + _mac(501)
+        body = protocolo.pack_message(protocolo.MSG_REPLY, 0,
+                                      protocolo.pack_tlvs([(protocolo.TLV_NEIGHBORS, listed)]), total_frags=0)
+        self.disc.handle_packet(MAC_B, body)
+        known = set(self.disc.get_neighbors())
+        self.assertTrue({MAC_B, _mac(500), _mac(501)} <= known, "✅ Se aprenden los vecinos agregados")
+
+    def test_bloom_has_no_false_negatives(self):
+        macs = [_mac(i) for i in range(2000)]
+        bloom = discovery.bloom_build(macs)
+        self.assertTrue(all(discovery.bloom_contains(bloom, m) for m in macs), "✅ Sin falsos negativos")
+        self.assertLessEqual(len(bloom), discovery.BLOOM_MAX_BYTES, "✅ El filtro cabe en una trama")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
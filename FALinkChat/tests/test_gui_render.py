@@ -0,0 +1,113 @@
+import unittest
+import sys, os
+import threading
+import time
+import types
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import main
+
+
+class FakeText:
+    # Sustituto mínimo del widget Text de Tkinter (sin DISPLAY): guarda el
+    # contenido y cuenta las actualizaciones
+    def __init__(self):
+        self.text = ''
+        self.inserts = 0
+        self.flood = 0
+
+    def configure(self, **kwargs):
+        pass
+
+    def insert(self, index, s):
+        self.inserts += 1
+        self.flood += s.count('flood ')
+        self.text = self.text + s if index == 'end' else s + self.text
+
+    def index(self, index):
+        return f"{self.text.count(chr(10)) + 1}.0"
+
+    def delete(self, first, last):
+        pos = -1
+        for _ in range(int(last.split('.')[0]) - 1):
+            pos = self.text.index('\n', pos + 1)
+        self.text = self.text[pos + 1:]
+
+    def see(self, index):
+        pass
+
+    def yview(self):
+        return (0.0, 1.0)
+
+
+class TestGuiRender(unittest.TestCase):
+
+    def setUp(self):
+        self.display = FakeText()
+        main.interface = types.SimpleNamespace(display=self.display)
+        main.history_window = None
+        main.shown.clear()
+        main.gui_dropped = 0
+        main.pending_neighbors.clear()
+        main.neighbors.clear()
+        while not main.gui_queue.empty():
+            main.gui_queue.get_nowait()
+
+    def tearDown(self):
+        main.interface = None
+
+    def test_batch_is_one_widget_update(self):
+        for i in range(50):
+            main.on_engine_event({'event': 'chat', 'from': '02:00:00:00:00:0b', 'text': f"m{i}"})
+        self.assertEqual(main.render_pending(), 50)
+        self.assertEqual(self.display.inserts, 1, "✅ un solo insert por pasada")
+        self.assertEqual(self.display.text.count('02:00:00:00:00:0b: m'), 50)
+
+    def test_neighbor_events_coalesce(self):
+        mac = '02:00:00:00:00:0c'
+        for action in ('join', 'leave', 'join'):
+            main.on_engine_event({'event': 'neighbor', 'action': action, 'mac': mac})
+        main.render_pending()
+        self.assertEqual(list(main.neighbors), [bytes.fromhex('02000000000c')])
+        self.assertEqual(self.display.text.count(mac), 1, "✅ altas/bajas agrupadas por MAC")
+
+    def test_flood_10k_per_second(self):
+        # Inundación de chat a 10k mensajes/s durante 1 s mientras el "hilo de
+        # la GUI" hace una pasada cada GUI_POLL_MS
+        rate, seconds = 10000, 1.0
+        sent = [0]
+        dropped_before = main.GUI_DROPPED.value('chat')
+
+        def producer():
+            start = time.perf_counter()
+            total = int(rate * seconds)
+            for i in range(total):
+                # Ritmo fijo: no adelantarse al instante previsto del mensaje i
+                while time.perf_counter() - start < i / rate:
+                    time.sleep(0.0005)
+                main.on_engine_event({'event': 'chat', 'from': '02:00:00:00:00:0b', 'text': f"flood {i}"})
+                sent[0] += 1
+
+        t = threading.Thread(target=producer)
+        t.start()
+        worst = 0.0
+        while t.is_alive() or not main.gui_queue.empty():
+            t0 = time.perf_counter()
+            main.render_pending()
+            worst = max(worst, time.perf_counter() - t0)
+            self.assertLessEqual(main.gui_queue.qsize(), main.GUI_QUEUE_SIZE)
+            lines = self.display.text.count('\n') + 1
+            self.assertLessEqual(lines, main.SCROLLBACK_LINES, "✅ scrollback acotado")
+            time.sleep(main.GUI_POLL_MS / 1000.0)
+        t.join()
+        main.render_pending()
+        dropped = main.GUI_DROPPED.value('chat') - dropped_before
+        self.assertGreater(self.display.flood, 0)
+        self.assertLess(worst, 0.5, f"✅ pasada de renderizado acotada ({worst * 1000:.0f} ms)")
+        # Todo mensaje se pintó o se contó como descartado
+        self.assertEqual(self.display.flood + dropped, sent[0], "✅ sin pérdidas silenciosas")
+
+
+if __name__ == '__main__':
+    unittest.main()
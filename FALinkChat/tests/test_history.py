@@ -0,0 +1,69 @@
+import unittest
+import sys, os
+import shutil
+import tempfile
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import history
+
+PEER_A = '02:00:00:00:00:0a'
+PEER_B = '02:00:00:00:00:0b'
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        # Segmentos pequeños para forzar la rotación
+        self.h = history.History(self.tmp, segment_bytes=2048, flush_interval=60)
+        for i in range(200):
+            peer = PEER_A if i % 2 else PEER_B
+            self.h.append(peer, f"mensaje {i} {'hola' if i % 10 == 0 else 'adios'}",
+                          history.IN if i % 3 else history.OUT, t=1000.0 + i)
+
+    def tearDown(self):
+        self.h.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_rotation_seek_and_read(self):
+        self.assertEqual(self.h.count(), 200)
+        self.assertEqual(self.h.count(PEER_A), 100)
+        segs = [f for f in os.listdir(self.tmp) if f.endswith('.log')]
+        self.assertGreater(len(segs), 1, "✅ el registro rota en varios segmentos")
+        pos = self.h.seek(1150.0)
+        self.assertEqual(self.h.read(pos, 1)[0]['text'], "mensaje 150 hola")
+        pos = self.h.seek(1150.5, PEER_A)
+        self.assertEqual(self.h.read(pos, 1, PEER_A)[0]['t'], 1151.0, "✅ búsqueda por hora y vecino")
+        self.assertEqual([r['t'] for r in self.h.tail(3)], [1197.0, 1198.0, 1199.0])
+
+    def test_search(self):
+        hits = self.h.search('HOLA mensaje')
+        self.assertEqual([r['t'] for r in hits], [1000.0 + i for i in range(190, -1, -10)])
+        self.assertEqual(self.h.search('hola', PEER_A), [], "✅ los 'hola' son todos de B")
+        # El índice de palabras se mantiene con los anexados posteriores
+        self.h.append(PEER_A, "hola de nuevo", t=2000.0)
+        self.assertEqual(self.h.search('hola', PEER_A)[0]['text'], "hola de nuevo")
+
+    def test_reopen_rebuilds_missing_index(self):
+        self.h.flush()
+        last = sorted(f for f in os.listdir(self.tmp) if f.endswith('.idx'))[-1]
+        with open(os.path.join(self.tmp, last), 'r+b') as f:
+            f.truncate(5)  # índice perdido a medias (cierre brusco)
+        self.h.close()
+        self.h = history.History(self.tmp, segment_bytes=2048, flush_interval=60)
+        self.assertEqual(self.h.count(), 200, "✅ índice reconstruido desde el segmento")
+        self.assertEqual(self.h.tail(1)[0]['text'], "mensaje 199 adios")
+        self.h.append(PEER_B, "después de reabrir")
+        self.assertEqual(self.h.tail(1)[0]['text'], "después de reabrir")
+
+    def test_window_pages(self):
+        window = history.HistoryWindow(self.h, page=80)
+        self.assertEqual(len(window.latest()), 80)
+        self.assertEqual(window.older()[0]['t'], 1040.0)
+        self.assertEqual(len(window.older()), 40)
+        self.assertFalse(window.has_older(), "✅ páginas cargadas hasta el principio")
+
+
+if __name__ == '__main__':
+    unittest.main()
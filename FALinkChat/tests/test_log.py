@@ -0,0 +1,77 @@
+import unittest
+import sys, os
+import io
+
+# Añadimos src/ al path para poder importar log
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import log
+
+
+class Exploding:
+    # Falla si alguien intenta formatearlo
+    def __str__(self):
+        raise AssertionError("formateado con la categoría desactivada")
+
+
+class TestLog(unittest.TestCase):
+
+    def setUp(self):
+        self.out = io.StringIO()
+        log.stream = self.out
+        log.configure('info')
+        log._ring.clear()
+        log._buckets.clear()
+
+    def tearDown(self):
+        log.stream = None
+        log.configure('info')
+        log.set_rate('rx', None)
+        log.set_sampling('rx', None)
+
+    def test_disabled_debug_does_not_format(self):
+        log.debug('rx', "valor=%s", Exploding())
+        self.assertFalse(log.enabled('rx'), "✅ DEBUG desactivado por defecto")
+        self.assertEqual(self.out.getvalue(), "", "✅ Nada emitido")
+        self.assertEqual(log.records(), [], "✅ Nada guardado en el buffer circular")
+
+    def test_levels_and_categories(self):
+        log.configure('warning:rx')
+        log.info('main', "oculto")
+        log.warning('main', "visible %d", 1)
+        log.debug('rx', "rx %s", log.mac(b'\x02\x00\x00\x00\x00\x0a'))
+        log.debug('tx', "no")
+        text = self.out.getvalue()
+        self.assertNotIn("oculto", text, "✅ INFO filtrado por el umbral")
+        self.assertIn("[main] visible 1", text, "✅ WARNING emitido")
+        self.assertIn("rx 02:00:00:00:00:0a", text, "✅ DEBUG de la categoría activada, MAC formateada")
+        self.assertNotIn("[tx]", text, "✅ Categoría no activada")
+
+    def test_rate_limit_and_sampling(self):
+        log.enable('rx')
+        log.set_rate('rx', 5)
+        for i in range(100):
+            log.debug('rx', "frame %d", i)
+        lines = self.out.getvalue().splitlines()
+        self.assertEqual(len(lines), 5, "✅ Ráfaga limitada a la tasa configurada")
+        self.assertEqual(len(log.records()), 100, "✅ El buffer circular conserva todo lo aceptado")
+        log.set_rate('rx', None)
+        log.set_sampling('rx', 10)
+        self.out.truncate(0)
+        self.out.seek(0)
+        for i in range(100):
+            log.debug('rx', "frame %d", i)
+        self.assertEqual(len(self.out.getvalue().splitlines()), 10, "✅ Muestreo 1 de cada 10")
+        log.enable('rx', False)
+
+    def test_ring_dump(self):
+        for i in range(log.RING_SIZE + 10):
+            log.info('main', "evento %d", i)
+        dumped = io.StringIO()
+        log.dump(dumped)
+        lines = dumped.getvalue().splitlines()
+        self.assertEqual(len(lines), log.RING_SIZE, "✅ El buffer circular está acotado")
+        self.assertTrue(lines[-1].endswith(f"evento {log.RING_SIZE + 9}"), "✅ Se vuelca lo más reciente")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
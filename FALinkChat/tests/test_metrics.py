@@ -0,0 +1,112 @@
+import unittest
+import sys, os
+import io
+import contextlib
+import tempfile
+import threading
+import time
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import protocolo
+import file_transfer
+import metrics
+import lcstat
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+
+
+class TestMetricsFormat(unittest.TestCase):
+
+    def test_render_counter_gauge_histogram(self):
+        reg = metrics.Registry()
+        c = reg.register(metrics.Counter('t_frames_total', 'tramas', label='type'))
+        g = reg.register(metrics.Gauge('t_depth', 'cola', label='stage', fn=lambda: {'writer': 3}))
+        h = reg.register(metrics.Histogram('t_rtt_seconds', 'rtt', buckets=(0.01, 0.1)))
+        c.inc(2, 'chat')
+        c.inc(1, 'ack')
+        for v in (0.005, 0.05, 0.5):
+            h.observe(v)
+        text = reg.render()
+        self.assertIn('# TYPE t_frames_total counter\n', text, "✅ Línea TYPE")
+        self.assertIn('t_frames_total{type="chat"} 2\n', text, "✅ Contador con etiqueta")
+        self.assertIn('t_depth{stage="writer"} 3\n', text, "✅ Gauge evaluado al leer")
+        self.assertIn('t_rtt_seconds_bucket{le="0.1"} 2\n', text, "✅ Buckets acumulados")
+        self.assertIn('t_rtt_seconds_bucket{le="+Inf"} 3\n', text, "✅ Bucket +Inf")
+        self.assertIn('t_rtt_seconds_count 3\n', text, "✅ Cuenta del histograma")
+        self.assertIs(reg.register(metrics.Counter('t_frames_total')), c, "✅ Registro idempotente por nombre")
+
+    def test_unix_socket_endpoint_and_cli(self):
+        path = os.path.join(tempfile.mkdtemp(), 'node.metrics')
+        reg = metrics.Registry()
+        reg.register(metrics.Counter('t_up_total', 'x')).inc(5)
+        server = metrics.MetricsServer(path, reg).start()
+        try:
+            self.assertIn('t_up_total 5', metrics.fetch(path), "✅ Instantánea servida por el socket UNIX")
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600, "✅ Socket solo para el usuario actual")
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                rc = lcstat.main(['--socket', path, '--grep', 't_up'])
+            self.assertEqual((rc, out.getvalue()), (0, 't_up_total 5\n'), "✅ El CLI muestra la muestra filtrada")
+        finally:
+            server.stop()
+        self.assertFalse(os.path.exists(path), "✅ El socket se elimina al parar")
+
+
+class TestEngineInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        metrics.REGISTRY.reset()
+
+    def test_transfer_counters(self):
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        a.settimeout(0.05)
+        b.settimeout(0.05)
+        lossy = transport.ImpairedTransport(a, loss=0.2, seed=3)
+        ft_s = file_transfer.FileTransfer(lossy, MAC_B, MAC_A)
+        ft_s.timeout = 0.1
+        ft_r = file_transfer.FileReceiver(b, None, MAC_B)
+        done, stop = [], threading.Event()
+
+        def pump(link, handler):
+            while not stop.is_set():
+                frame = network.receive_frame(link)
+                if frame:
+                    handler(network.unpack_ethernet_frame(frame))
+
+        def to_receiver(parts):
+            _, src, _, payload = parts
+            if ft_r.receive_fragment(payload, src):
+                done.append(True)
+
+        threads = [threading.Thread(target=pump, args=(a, lambda p: ft_s.receive_ack(p[3])), daemon=True),
+                   threading.Thread(target=pump, args=(b, to_receiver), daemon=True)]
+        for t in threads:
+            t.start()
+        try:
+            ft_s.send_file(os.urandom(30000))
+            deadline = time.time() + 5
+            while not done and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            ft_s.stop()
+            lossy.close()
+        # Un fragmento corrupto
+        bad = protocolo.pack_header(99, 1, 0, 0, protocolo.MSG_FILE_CHUNK, 8) + b'xxxx\x00\x00\x00\x00'
+        self.assertIsNone(ft_r.receive_fragment(bad, MAC_A))
+
+        self.assertEqual(file_transfer.FILES_RECEIVED.value(), 1, "✅ Archivo recibido contabilizado")
+        self.assertGreater(file_transfer.RETRANSMISSIONS.value(), 0, "✅ Retransmisiones contabilizadas")
+        self.assertEqual(file_transfer.CRC_FAILURES.value(), 1, "✅ Fallo de CRC contabilizado")
+        self.assertGreater(file_transfer.ACK_RTT.count, 0, "✅ Histograma de RTT de ACK")
+        self.assertEqual(file_transfer.GOODPUT.count, 1, "✅ Goodput de la transferencia")
+        self.assertGreaterEqual(network.FRAMES_RX.value('file_chunk'), 21, "✅ Tramas recibidas por tipo")
+        self.assertGreaterEqual(network.FRAMES_TX.value('ack'), 21, "✅ Tramas enviadas por tipo")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,149 @@
+import unittest
+import sys, os
+import shutil
+import tempfile
+import threading
+import time
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import protocolo
+import file_transfer
+import pipeline
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+MAC_C = b'\x02\x00\x00\x00\x00\x0c'
+
+
+def _fragments(file_id, data, size=1000):
+    # Fragmentos Link-Chat (header + payload + CRC) como los genera FileTransfer
+    parts = file_transfer.fragment_data(data, size)
+    out = []
+    for i, part in enumerate(parts):
+        body = protocolo.append_crc(part)
+        out.append(protocolo.pack_header(file_id, len(parts), i, 0, protocolo.MSG_FILE_CHUNK, len(body)) + body)
+    return out
+
+
+class SlowWriterPipeline(pipeline.ReceivePipeline):
+    # Escritor bloqueado hasta que la prueba lo libere (disco lento)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def _write(self, item):
+        self.release.wait(5)
+        super()._write(item)
+
+
+class TestReceivePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.a, self.b = transport.queue_pair(MAC_A, MAC_B)
+        self.a.settimeout(0.1)
+        self.tmp = tempfile.mkdtemp()
+        self.events = []
+        self.receiver = file_transfer.FileReceiver(self.b, None, MAC_B)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _acks(self):
+        n = 0
+        while True:
+            frame = self.a.recv()
+            if not frame:
+                return n
+            _, _, _, payload = network.unpack_ethernet_frame(frame)
+            hdr, _ = protocolo.unpack_header(payload)
+            n += hdr['msg_type'] == protocolo.MSG_ACK
+
+    def test_acks_not_delayed_by_slow_writer(self):
+        pipe = SlowWriterPipeline(self.receiver, self.events.append, out_dir=self.tmp,
+                                  writers=1, fsync=pipeline.FSYNC_NEVER)
+        pipe.start()
+        first, second = os.urandom(5000), os.urandom(3000)
+        start = time.monotonic()
+        for frag in _fragments(1, first) + _fragments(2, second):
+            self.assertTrue(pipe.submit_fragment(frag, MAC_A))
+        self.assertEqual(self._acks(), 8, "✅ Todos los fragmentos confirmados con el escritor bloqueado")
+        self.assertLess(time.monotonic() - start, 1.0, "✅ El camino rápido no espera al disco")
+        self.assertEqual(self.events, [], "✅ Sin aviso hasta que el archivo está escrito")
+        pipe.release.set()
+        pipe.stop()
+        written = sorted(open(path, 'rb').read() for _, _, path in self.events)
+        self.assertEqual(written, sorted([first, second]), "✅ Archivos escritos íntegros")
+        self.assertEqual(pipe.stats()['writer']['processed'], 2, "✅ Métricas de la etapa de escritura")
+
+    def test_full_reassembly_queue_drops_without_ack(self):
+        # Etapas sin arrancar: la cola de reensamblado (capacidad 2) se llena
+        pipe = pipeline.ReceivePipeline(self.receiver, self.events.append, out_dir=self.tmp,
+                                        reassembly_queue=2)
+        frags = _fragments(1, os.urandom(4000))
+        accepted = [pipe.submit_fragment(f, MAC_A) for f in frags]
+        self.assertEqual(accepted, [True, True, False, False], "✅ Con la cola llena se descarta")
+        self.assertEqual(self._acks(), 2, "✅ Lo descartado no se confirma (el emisor lo reenviará)")
+        stats = pipe.stats()
+        self.assertEqual(stats['reassembly']['depth'], 2, "✅ Profundidad de cola expuesta")
+        self.assertEqual(stats['fast']['dropped'], 2, "✅ Descartes del camino rápido contabilizados")
+
+    def _windows(self):
+        # (flags, frag_index, ventana) de los ACK recibidos por el emisor
+        out = []
+        while True:
+            frame = self.a.recv()
+            if not frame:
+                return out
+            _, _, _, payload = network.unpack_ethernet_frame(frame)
+            hdr, body = protocolo.unpack_header(payload)
+            out.append((hdr['flags'], hdr['frag_index'], protocolo.unpack_ack_window(body[:hdr['payload_len']])))
+
+    def test_zero_window_and_window_update(self):
+        # Presupuesto de 3 fragmentos: un archivo de 3000 bytes esperando al
+        # escritor lo agota y el siguiente fragmento se rechaza con ventana cero
+        self.receiver.budget = 3 * file_transfer.MAX_PAYLOAD
+        pipe = SlowWriterPipeline(self.receiver, self.events.append, out_dir=self.tmp,
+                                  writers=1, fsync=pipeline.FSYNC_NEVER)
+        pipe.start()
+        try:
+            for frag in _fragments(1, os.urandom(3000)):
+                self.assertTrue(pipe.submit_fragment(frag, MAC_A))
+            deadline = time.time() + 2
+            while self.receiver.pending != 3000 and time.time() < deadline:
+                time.sleep(0.01)
+            acks = self._windows()
+            self.assertEqual([(f, i) for f, i, _ in acks[:3]], [(0, 0), (0, 1), (0, 2)])
+            self.assertTrue(all(w is not None for _, _, w in acks), "✅ Los ACK anuncian ventana")
+
+            self.assertFalse(pipe.submit_fragment(_fragments(2, os.urandom(1000))[0], MAC_A))
+            self.assertEqual(self._windows(), [(protocolo.FLAG_WINDOW, 0, 0)], "✅ Rechazo con ventana cero")
+            self.assertEqual(pipe.stats()['fast']['throttled'], 1)
+
+            pipe.release.set()
+            deadline = time.time() + 2
+            while self.receiver.pending and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self._windows(), [(protocolo.FLAG_WINDOW, protocolo.NO_FRAGMENT, 3)],
+                             "✅ Actualización de ventana al liberar memoria")
+        finally:
+            pipe.release.set()
+            pipe.stop()
+
+    def test_same_file_id_from_two_senders(self):
+        data_a, data_c = os.urandom(3000), os.urandom(3000)
+        out = []
+        for fa, fc in zip(_fragments(7, data_a), _fragments(7, data_c)):
+            out.append(self.receiver.receive_fragment(fa, MAC_A))
+            out.append(self.receiver.receive_fragment(fc, MAC_C))
+        self.assertEqual([d for d in out if d], [data_a, data_c],
+                         "✅ Buffers separados por emisor aunque coincida el file_id")
+        self.assertIsNone(self.receiver.receive_fragment(_fragments(7, data_a)[0], MAC_A),
+                          "✅ Un duplicado tardío no reabre la transferencia")
+        self.assertEqual(self.receiver.buffers, {}, "✅ Sin buffers huérfanos")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
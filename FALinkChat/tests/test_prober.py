@@ -0,0 +1,100 @@
+import unittest
+import sys, os
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import discovery
+import prober
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+MAC_C = b'\x02\x00\x00\x00\x00\x0c'
+
+
+class FakeClock:
+    # Reloj manual para simular el paso del tiempo sin esperar
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestLinkProber(unittest.TestCase):
+    # Sondas de eco entre dos nodos con reloj simulado
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.a, self.b = transport.queue_pair(MAC_A, MAC_B)
+        self.a.settimeout(0.1)
+        self.b.settimeout(0.1)
+        self.disc_a = discovery.Discovery(self.a, MAC_A, clock=self.clock)
+        self.disc_b = discovery.Discovery(self.b, MAC_B, clock=self.clock)
+        self.pa = prober.LinkProber(self.a, MAC_A, self.disc_a, clock=self.clock)
+        self.pb = prober.LinkProber(self.b, MAC_B, self.disc_b, clock=self.clock)
+        self.disc_a.touch(MAC_B)
+
+    def _deliver(self, link, node, delay=0.0):
+        # Entrega la siguiente trama de `link` a `node` tras `delay` segundos simulados
+        frame = link.recv()
+        self.assertTrue(frame)
+        self.clock.now += delay
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        node.handle_packet(src, payload)
+
+    def _roundtrip(self, rtt):
+        self.pa.probe(MAC_B)
+        self._deliver(self.b, self.pb, rtt / 2)
+        self._deliver(self.a, self.pa, rtt / 2)
+
+    def test_rtt_jitter_and_loss(self):
+        for rtt in (0.010, 0.012, 0.010, 0.012):
+            self._roundtrip(rtt)
+        self.pa.probe(MAC_B)
+        self.b.recv()                      # sonda perdida
+        self.clock.now += prober.ECHO_TIMEOUT + 1
+        self.pa.tick()
+        info = self.disc_a.get_info(MAC_B)
+        self.assertAlmostEqual(info['rtt'], 0.011, delta=0.001, msg="✅ RTT suavizado cercano a la media")
+        self.assertGreater(info['jitter'], 0.0, "✅ Variación de RTT reflejada en el jitter")
+        self.assertAlmostEqual(info['loss'], 0.2, msg="✅ 1 de 5 sondas perdida")
+
+    def test_packet_pair_bandwidth_and_initial_params(self):
+        self._roundtrip(0.010)
+        self.pa.probe(MAC_B, pair=True)
+        self._deliver(self.b, self.pb)
+        self._deliver(self.b, self.pb)
+        self.clock.now += 0.010
+        self._deliver(self.a, self.pa)
+        self._deliver(self.a, self.pa, 0.001)   # 1 ms de dispersión entre el par
+        bw = self.disc_a.get_info(MAC_B)['bw']
+        self.assertTrue(1.0e6 < bw < 2.0e6, f"✅ ~1.4 MB/s estimados por packet-pair (bw={bw:.0f})")
+        window, rto = self.pa.initial_params(MAC_B, 1472, 32, 2)
+        self.assertLess(rto, 2, "✅ El RTO inicial se ajusta al RTT medido")
+        self.assertTrue(prober.MIN_WINDOW <= window <= prober.MAX_WINDOW, "✅ Ventana acotada")
+        self.assertEqual(self.pa.initial_params(MAC_C, 1472, 32, 2), (32, 2),
+                         "✅ Vecino sin medir: valores por defecto")
+
+    def test_neighbors_sorted_by_quality(self):
+        self.disc_a.touch(MAC_C)
+        self.disc_a.touch(b'\x02\x00\x00\x00\x00\x0d')
+        self.disc_a.update_stats(MAC_B, rtt=0.050, loss=0.0, bw=1e6)
+        self.disc_a.update_stats(MAC_C, rtt=0.005, loss=0.0, bw=10e6)
+        order = self.disc_a.get_neighbors_by_quality()
+        self.assertEqual(order, [MAC_C, MAC_B, b'\x02\x00\x00\x00\x00\x0d'],
+                         "✅ Mejor enlace primero y vecinos sin medir al final")
+
+    def test_probe_budget_per_tick(self):
+        # Con muchos vecinos cada tick envía como mucho PROBE_BUDGET sondas
+        for i in range(100):
+            self.disc_a.touch(b'\x02\x01' + i.to_bytes(4, 'big'))
+        self.pa.tick()
+        self.assertEqual(len(self.pa._pending), prober.PROBE_BUDGET, "✅ Sondas por tick acotadas")
+        self.clock.now += 1
+        self.pa.tick()
+        self.assertEqual(len(self.pa._pending), 2 * prober.PROBE_BUDGET, "✅ La ronda continúa en el siguiente tick")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,102 @@
+import unittest
+import sys, os
+import threading
+import time
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import protocolo
+import scheduler
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x03\x0a'
+MAC_B = b'\x02\x00\x00\x00\x03\x0b'
+MAC_C = b'\x02\x00\x00\x00\x03\x0c'
+
+
+def frame(msg_type, dst=MAC_B, file_id=0, index=0, size=100):
+    hdr = protocolo.pack_header(file_id, 1, index, 0, msg_type, size)
+    return network.build_ethernet_frame(dst, MAC_A, network.ETH_P_CUSTOM, hdr + bytes(size))
+
+
+class GatedTransport(transport.Transport):
+    # Transporte que no emite hasta abrir la compuerta y guarda el orden de salida
+    def __init__(self):
+        self.mac = MAC_A
+        self.gate = threading.Event()
+        self.sent = []
+
+    def send(self, f):
+        self.gate.wait()
+        self.sent.append(f)
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.inner = GatedTransport()
+        self.tx = scheduler.TxScheduler(self.inner, batch=1)
+
+    def tearDown(self):
+        self.inner.gate.set()
+        self.tx.close()
+
+    def _hold_wire(self):
+        # Una trama queda retenida en el "cable"; lo siguiente espera en cola
+        self.tx.send(frame(protocolo.MSG_FILE_CHUNK, file_id=9))
+        deadline = time.time() + 5
+        while self.tx.depth()['bulk'] and time.time() < deadline:
+            time.sleep(0.005)
+
+    def _drain(self, n):
+        self.inner.gate.set()
+        deadline = time.time() + 5
+        while len(self.inner.sent) < n and time.time() < deadline:
+            time.sleep(0.01)
+        return self.inner.sent
+
+    def test_chat_preempts_bulk(self):
+        self._hold_wire()
+        for i in range(20):
+            self.tx.send(frame(protocolo.MSG_FILE_CHUNK, file_id=1, index=i))
+        self.tx.send(frame(protocolo.MSG_DISCOVERY))
+        self.tx.send(frame(protocolo.MSG_CHAT))
+        self.tx.send(frame(protocolo.MSG_ACK))
+        self.assertEqual(self.tx.depth()['chat'], 1)
+        sent = self._drain(24)
+        classes = [scheduler.classify(f) for f in sent]
+        self.assertEqual(classes[1:4], [scheduler.CONTROL, scheduler.CHAT, scheduler.DISCOVERY],
+                         "✅ ACK > chat > discovery por delante de los fragmentos en cola")
+        self.assertEqual(len(sent), 24)
+
+    def test_bulk_flows_share_fairly(self):
+        # Dos transferencias (a B y a C) encoladas una detrás de otra salen
+        # intercaladas; C con peso 2 saca el doble por ronda
+        self.tx.set_weight(MAC_C, 2)
+        self._hold_wire()
+        for i in range(30):
+            self.tx.send(frame(protocolo.MSG_FILE_CHUNK, dst=MAC_B, file_id=1, index=i, size=1400))
+        for i in range(30):
+            self.tx.send(frame(protocolo.MSG_FILE_CHUNK, dst=MAC_C, file_id=1, index=i, size=1400))
+        sent = self._drain(61)
+        first = [f[0:6] for f in sent[1:31]]
+        self.assertAlmostEqual(first.count(MAC_C) / float(first.count(MAC_B)), 2.0, delta=0.3,
+                               msg="✅ reparto DRR proporcional al peso")
+
+    def test_bulk_backpressure(self):
+        self.tx.bulk_limit = 4
+        self._hold_wire()
+        t = threading.Thread(target=lambda: [self.tx.send(frame(protocolo.MSG_FILE_CHUNK, index=i)) for i in range(10)])
+        t.start()
+        t.join(0.3)
+        self.assertTrue(t.is_alive(), "✅ el emisor BULK espera con la cola llena")
+        self.tx.send(frame(protocolo.MSG_CHAT))
+        self.assertEqual(self.tx.depth()['chat'], 1, "✅ el chat no se bloquea")
+        self._drain(12)
+        t.join(2)
+        self.assertFalse(t.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import sys, os
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import file_transfer
+import security
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x02\x0a'
+MAC_B = b'\x02\x00\x00\x00\x02\x0b'
+KEY = bytes(range(32))
+
+
+class TestSecurity(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = transport.MemoryBus()
+        self.raw_a = self.bus.attach(MAC_A)
+        self.raw_b = self.bus.attach(MAC_B)
+        for link in (self.raw_a, self.raw_b):
+            link.settimeout(0.2)
+        self.a = security.SecureTransport(self.raw_a, KEY)
+        self.b = security.SecureTransport(self.raw_b, KEY)
+        self.frame = MAC_B + MAC_A + b'\x88\xb5' + b'hola secreto' * 10
+
+    def _wire(self, frame):
+        # Envía por A y devuelve lo que viaja por el cable (antes de que B lo procese)
+        self.a.send(frame)
+        return self.raw_b.recv()
+
+    def test_round_trip_and_confidentiality(self):
+        wire = self._wire(self.frame)
+        self.assertEqual(len(wire), len(self.frame) + security.OVERHEAD)
+        self.assertNotIn(b'hola secreto', wire, "✅ contenido cifrado en el cable")
+        self.raw_a.send(wire)
+        self.assertEqual(self.b.recv(), self.frame, "✅ B recupera la trama original")
+
+    def test_auth_only_keeps_plaintext(self):
+        self.a.encrypt = False
+        self.a.send(self.frame)
+        self.assertEqual(self.b.recv(), self.frame)
+        self.a.send(self.frame)
+        self.assertIn(b'hola secreto', self.raw_b.recv(), "✅ sin cifrado el contenido va en claro")
+
+    def test_tamper_and_wrong_key_rejected(self):
+        before = security.AUTH_FAILURES.value('mac')
+        wire = bytearray(self._wire(self.frame))
+        wire[40] ^= 1
+        self.raw_a.send(bytes(wire))
+        self.assertEqual(self.b.recv(), b'', "✅ trama alterada descartada")
+        intruder = security.SecureTransport(self.bus.attach(b'\x02\x00\x00\x00\x02\x0c'), bytes(32))
+        intruder.send(MAC_B + intruder.mac + b'\x88\xb5' + b'x' * 40)
+        self.assertEqual(self.b.recv(), b'', "✅ clave distinta descartada")
+        self.assertEqual(security.AUTH_FAILURES.value('mac') - before, 2)
+
+    def test_replay_and_stale_session_rejected(self):
+        wire = self._wire(self.frame)
+        self.raw_a.send(wire)
+        self.assertEqual(self.b.recv(), self.frame)
+        self.raw_a.send(wire)
+        self.assertEqual(self.b.recv(), b'', "✅ repetición descartada")
+        # Desorden dentro de la ventana: se acepta una sola vez
+        older = self._wire(self.frame)
+        newer = self._wire(self.frame)
+        for w in (newer, older, older):
+            self.raw_a.send(w)
+        self.assertEqual([bool(self.b.recv()) for _ in range(3)], [True, True, False])
+        # A se reinicia con una sesión posterior: las tramas de la anterior ya no valen
+        restarted = security.SecureTransport(self.raw_a, KEY, session=b'\xff' * 6)
+        restarted.send(self.frame)
+        self.assertEqual(self.b.recv(), self.frame)
+        self.raw_a.send(older)
+        self.assertEqual(self.b.recv(), b'', "✅ sesión antigua rechazada")
+
+    def test_forged_session_does_not_lock_out_sender(self):
+        # Cabecera con sesión del futuro y tag falso: no debe cambiar el estado de B
+        forged = bytearray(self._wire(self.frame))
+        forged[14 + 1:14 + 5] = b'\xff' * 4
+        self.raw_a.send(bytes(forged))
+        self.assertEqual(self.b.recv(), b'', "✅ trama falsificada descartada")
+        self.assertEqual(len(self.b._sessions), 0, "✅ la sesión sin autenticar no se guarda")
+        restarted = security.SecureTransport(self.raw_a, KEY)
+        restarted.send(self.frame)
+        self.assertEqual(self.b.recv(), self.frame, "✅ la sesión real de A sigue valiendo")
+
+    def test_fragments_fit_mtu(self):
+        ft = file_transfer.FileTransfer(self.a, MAC_B, MAC_A)
+        try:
+            self.assertEqual(ft.max_payload(), file_transfer.MAX_PAYLOAD - security.OVERHEAD)
+        finally:
+            ft.stop()
+        self.assertEqual(security.derive_key('pw', iterations=1000), security.derive_key('pw', iterations=1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import sys, os
+import io
+import threading
+import time
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import stream
+import lcat
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x06\x0a'
+MAC_B = b'\x02\x00\x00\x00\x06\x0b'
+
+
+def _pump(link, hub, stop):
+    # Bucle receptor mínimo: todo lo que llega va al hub de streams
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hub.handle_packet(src, payload)
+
+
+class TestStream(unittest.TestCase):
+
+    def _pair(self, loss=0.0, rx_buffer=stream.RX_BUFFER):
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        a.settimeout(0.05)
+        b.settimeout(0.05)
+        links = [transport.ImpairedTransport(a, loss=loss, seed=1), transport.ImpairedTransport(b, loss=loss, seed=2)]
+        self.hubs = [stream.StreamHub(links[0], MAC_A, rx_buffer).start(),
+                     stream.StreamHub(links[1], MAC_B, rx_buffer).start()]
+        self.stop = threading.Event()
+        for link, hub in zip((a, b), self.hubs):
+            threading.Thread(target=_pump, args=(link, hub, self.stop), daemon=True).start()
+        self.addCleanup(self._close, links)
+        return self.hubs
+
+    def _close(self, links):
+        self.stop.set()
+        for hub in self.hubs:
+            hub.stop()
+        for link in links:
+            link.close()
+
+    def test_ordered_with_loss_and_half_close(self):
+        ha, hb = self._pair(loss=0.05)
+        listener = hb.listen(5)
+        data = os.urandom(400 * 1000)
+        got = []
+
+        def server():
+            s = listener.accept(5)
+            buf = bytearray()
+            while True:
+                chunk = s.recv(777)
+                if not chunk:
+                    break
+                buf += chunk
+            got.append(bytes(buf))
+            s.send(b'recibido')
+            s.close()
+
+        t = threading.Thread(target=server)
+        t.start()
+        c = ha.open(MAC_B, 5)
+        # Escrituras de tamaños variados: el stream no conserva los límites
+        for off in range(0, len(data), 10007):
+            c.send(data[off:off + 10007])
+        c.shutdown()
+        self.assertEqual(c.recv(100, timeout=10), b'recibido', "✅ Se sigue leyendo tras cerrar la escritura")
+        self.assertEqual(c.recv(timeout=10), b'', "✅ Fin del stream")
+        c.close()
+        t.join(10)
+        self.assertEqual(got, [data], "✅ Bytes íntegros y en orden a pesar de la pérdida")
+
+    def test_backpressure_until_reader_drains(self):
+        ha, hb = self._pair(rx_buffer=16 * 1024)
+        listener = hb.listen()
+        c = ha.open(MAC_B)
+        s = listener.accept(1)
+        sent = threading.Event()
+        data = os.urandom(200 * 1000)
+        threading.Thread(target=lambda: (c.send(data), sent.set()), daemon=True).start()
+        self.assertFalse(sent.wait(0.5), "✅ send() bloquea si el receptor no lee")
+        self.assertLessEqual(s._rx_bytes, 16 * 1024, "✅ El receptor no pasa de su buffer")
+        buf = bytearray()
+        while len(buf) < len(data):
+            buf += s.recv(timeout=5)
+        self.assertTrue(sent.wait(5), "✅ Al leer se libera al emisor (actualización de ventana)")
+        self.assertEqual(bytes(buf), data)
+
+    def test_refused_and_unreachable(self):
+        ha, hb = self._pair()
+        with self.assertRaises(ConnectionRefusedError):
+            ha.open(MAC_B, 9, timeout=2)
+        with self.assertRaises(TimeoutError):
+            ha.open(b'\x02\x00\x00\x00\x06\xee', timeout=0.3)
+
+    def test_lcat_pump(self):
+        ha, hb = self._pair()
+        listener = hb.listen()
+        data = os.urandom(100 * 1000)
+        out_b = io.BytesIO()
+        t = threading.Thread(target=lambda: lcat.pump(listener.accept(5), io.BytesIO(b'respuesta'), out_b))
+        t.start()
+        out_a = io.BytesIO()
+        self.assertEqual(lcat.pump(ha.open(MAC_B), io.BytesIO(data), out_a), len(b'respuesta'))
+        t.join(10)
+        self.assertEqual(out_b.getvalue(), data, "✅ stdin de un lado sale por el stdout del otro")
+        self.assertEqual(out_a.getvalue(), b'respuesta', "✅ Y en sentido contrario")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
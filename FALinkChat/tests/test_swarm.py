@@ -0,0 +1,115 @@
+import unittest
+import sys, os
+import tempfile
+import threading
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import protocolo
+import stream
+import swarm
+import transport
+
+MAC_FETCH = b'\x02\x00\x00\x00\x07\x00'
+PIECE = 16 * 1024
+
+
+def _pump(link, node, stop):
+    # Bucle receptor mínimo: anuncios al swarm y el resto al hub de streams
+    while not stop.is_set():
+        frame = network.receive_frame(link)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        if hdr['msg_type'] in (protocolo.MSG_SWARM_QUERY, protocolo.MSG_SWARM_HAVE):
+            node.handle_packet(src, payload)
+        else:
+            node.streams.handle_packet(src, payload)
+
+
+class _CorruptSwarm(swarm.Swarm):
+    # Vecino que sirve piezas alteradas (con la prueba correcta)
+    def _piece(self, content, i):
+        data = bytearray(content.piece(i))
+        data[0] ^= 0xff
+        return bytes(data)
+
+
+class TestMerkle(unittest.TestCase):
+
+    def test_proofs_verify_every_piece(self):
+        for count in range(1, 10):
+            leaves = [swarm.leaf_hash(bytes([i]) * 10) for i in range(count)]
+            levels = swarm.merkle_levels(leaves)
+            root = levels[-1][0]
+            for i in range(count):
+                proof = swarm.merkle_proof(levels, i)
+                self.assertTrue(swarm.merkle_verify(root, count, i, leaves[i], proof), "✅ Prueba válida")
+                self.assertFalse(swarm.merkle_verify(root, count, i, swarm.leaf_hash(b'otra'), proof),
+                                 "✅ Una pieza alterada no verifica")
+                if count > 1:
+                    self.assertFalse(swarm.merkle_verify(root, count, (i + 1) % count, leaves[i], proof),
+                                     "✅ La prueba es de una posición concreta")
+
+
+class TestSwarm(unittest.TestCase):
+
+    def _node(self, mac, cls=swarm.Swarm, rate_bps=None):
+        port = self.bus.attach(mac)
+        port.settimeout(0.05)
+        link = transport.ImpairedTransport(port, rate_bps=rate_bps, block=True) if rate_bps else port
+        node = cls(link, mac, stream.StreamHub(link, mac).start(), piece_size=PIECE).start()
+        threading.Thread(target=_pump, args=(port, node, self.stop), daemon=True).start()
+        self.nodes.append((node, link))
+        return node
+
+    def setUp(self):
+        self.bus = transport.MemoryBus()
+        self.stop = threading.Event()
+        self.nodes = []
+        self.addCleanup(self._close)
+
+    def _close(self):
+        self.stop.set()
+        for node, link in self.nodes:
+            node.stop()
+            node.streams.stop()
+            link.close()
+
+    def test_fetch_from_several_holders(self):
+        data = os.urandom(PIECE * 40 + 123)
+        rates = {b'\x02\x00\x00\x00\x07\x01': 40e6, b'\x02\x00\x00\x00\x07\x02': 10e6,
+                 b'\x02\x00\x00\x00\x07\x03': 10e6}
+        roots = {self._node(mac, rate_bps=rate).share(data, 'datos.bin') for mac, rate in rates.items()}
+        self.assertEqual(len(roots), 1, "✅ La raíz depende solo del contenido")
+        root = roots.pop()
+        fetcher = self._node(MAC_FETCH)
+        self.assertEqual(fetcher.query(root), sorted(rates), "✅ Los tres vecinos contestan al QUERY")
+        stats = {}
+        self.assertEqual(fetcher.fetch(root, stats=stats), data, "✅ Contenido íntegro desde varios orígenes")
+        self.assertEqual(set(stats), set(rates), "✅ Cada vecino aportó piezas")
+        fast = max(rates, key=rates.get)
+        self.assertEqual(max(stats, key=stats.get), fast, "✅ El vecino más rápido sirvió más piezas")
+        self.assertIn(root, [c['root'] for c in fetcher.catalog() if c['shared']],
+                      "✅ Al terminar, el contenido se comparte")
+
+    def test_corrupt_holder_is_dropped(self):
+        data = os.urandom(PIECE * 12)
+        good = self._node(b'\x02\x00\x00\x00\x07\x01')
+        root = good.share(data)
+        self._node(b'\x02\x00\x00\x00\x07\x02', cls=_CorruptSwarm).share(data)
+        fetcher = self._node(MAC_FETCH)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'out.bin')
+        stats = {}
+        self.assertEqual(fetcher.fetch(root, path, stats=stats), path)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data, "✅ Las piezas corruptas se descartan y se piden a otro vecino")
+        self.assertEqual(list(stats), [good.src_mac], "✅ Solo cuentan las piezas verificadas")
+
+
+if __name__ == '__main__':
+    unittest.main()
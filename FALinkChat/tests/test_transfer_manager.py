@@ -0,0 +1,94 @@
+import unittest
+import sys, os
+import threading
+import time
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import transfer_manager
+
+PEERS = [bytes([2, 0, 0, 0, 4, i]) for i in range(4)]
+
+
+class FakeSender:
+    # Sustituto de FileTransfer: cada envío tarda `duration` y confirma sus
+    # fragmentos poco a poco; registra la concurrencia alcanzada
+    def __init__(self, duration=0.05):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.active = {}
+        self.max_active = 0
+        self.max_per_peer = 0
+        self.order = []
+
+    def send_file(self, data, mac, progress=None):
+        with self.lock:
+            self.order.append((mac, data))
+            self.active[mac] = self.active.get(mac, 0) + 1
+            self.max_active = max(self.max_active, sum(self.active.values()))
+            self.max_per_peer = max(self.max_per_peer, self.active[mac])
+        progress.update(frags=10, acked=0)
+        for _ in range(10):
+            time.sleep(self.duration / 10)
+            progress['acked'] += 1
+        with self.lock:
+            self.active[mac] -= 1
+        return True
+
+
+class TestTransferManager(unittest.TestCase):
+
+    def setUp(self):
+        self.ft = FakeSender()
+        self.mgr = transfer_manager.TransferManager(self.ft, max_active=3, max_per_peer=1).start()
+        self.done = []
+        self.all_done = threading.Event()
+
+    def tearDown(self):
+        self.mgr.stop()
+
+    def _submit(self, n_per_peer, peers):
+        total = n_per_peer * len(peers)
+
+        def on_done(tid, ok, error):
+            self.done.append((tid, ok))
+            if len(self.done) == total:
+                self.all_done.set()
+
+        tid = 0
+        for mac in peers:
+            for i in range(n_per_peer):
+                tid += 1
+                self.mgr.submit(tid, mac, 1000, lambda i=i: i, on_done=on_done)
+        return total
+
+    def test_limits_and_round_robin(self):
+        # Todos los trabajos del primer vecino se encolan antes que los demás,
+        # y aun así los vecinos se atienden por turnos
+        total = self._submit(5, PEERS)
+        self.assertTrue(self.all_done.wait(10))
+        self.assertEqual(len(self.done), total)
+        self.assertLessEqual(self.ft.max_active, 3, "✅ límite global")
+        self.assertEqual(self.ft.max_per_peer, 1, "✅ límite por vecino")
+        first = [mac for mac, _ in self.ft.order[:4]]
+        self.assertEqual(sorted(first), sorted(PEERS), "✅ turnos entre vecinos")
+        # Dentro de un vecino se respeta el orden de llegada
+        mine = [data for mac, data in self.ft.order if mac == PEERS[0]]
+        self.assertEqual(mine, list(range(5)))
+
+    def test_progress_and_eta(self):
+        self.ft.duration = 1.0
+        self._submit(2, PEERS[:1])
+        time.sleep(0.5)
+        p = self.mgr.progress(1)
+        self.assertGreater(p['sent'], 0)
+        self.assertLess(p['sent'], 1000)
+        self.assertIsNotNone(p['eta'], "✅ ETA de la transferencia activa")
+        self.assertEqual(self.mgr.progress(2), {'queued': 0})
+        self.assertEqual(self.mgr.stats(), {'queued': 1, 'active': 1})
+        self.assertTrue(self.all_done.wait(5))
+        self.assertIsNone(self.mgr.progress(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
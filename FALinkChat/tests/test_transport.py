@@ -0,0 +1,508 @@
+import unittest
+import sys, os
+import mmap
+import tempfile
+import threading
+import time
+
+# Añadimos src/ al path para poder importar los módulos del motor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import network
+import protocolo
+import file_transfer
+import discovery
+import transport
+
+MAC_A = b'\x02\x00\x00\x00\x00\x0a'
+MAC_B = b'\x02\x00\x00\x00\x00\x0b'
+MAC_C = b'\x02\x00\x00\x00\x00\x0c'
+
+
+def _frame(dst, src, payload=b'hola'):
+    return network.build_ethernet_frame(dst, src, network.ETH_P_CUSTOM, payload)
+
+
+def _pump(link, ft_s, ft_r, out, stop, sizes=None):
+    # Bucle receptor mínimo para las pruebas: ACKs al emisor, fragmentos al
+    # receptor (y, con `sizes`, la longitud de cada fragmento recibido)
+    while not stop.is_set():
+        frame = network.receive_frame(link, link.mtu + network.RECV_MARGIN)
+        if not frame:
+            continue
+        _, src, _, payload = network.unpack_ethernet_frame(frame)
+        hdr, _ = protocolo.unpack_header(payload)
+        if hdr['msg_type'] == protocolo.MSG_ACK and ft_s is not None:
+            ft_s.receive_ack(payload)
+        elif hdr['msg_type'] == protocolo.MSG_FILE_CHUNK and ft_r is not None:
+            if sizes is not None:
+                sizes.append(hdr['payload_len'])
+            complete = ft_r.receive_fragment(payload, src)
+            if complete:
+                out.append(complete)
+
+
+class TestMemoryTransport(unittest.TestCase):
+    # Pruebas del segmento simulado en memoria
+
+    def test_unicast_and_broadcast(self):
+        bus = transport.MemoryBus()
+        a, b, c = bus.attach(MAC_A), bus.attach(MAC_B), bus.attach(MAC_C)
+        for t in (a, b, c):
+            t.settimeout(0.1)
+
+        network.send_frame(a, _frame(MAC_B, MAC_A))
+        self.assertEqual(network.receive_frame(b)[:6], MAC_B, "✅ Unicast entregado al destino")
+        self.assertEqual(network.receive_frame(c), b'', "✅ Unicast no llega a terceros")
+
+        network.send_frame(a, _frame(transport.BROADCAST_MAC, MAC_A))
+        self.assertTrue(network.receive_frame(b), "✅ Broadcast llega a B")
+        self.assertTrue(network.receive_frame(c), "✅ Broadcast llega a C")
+        self.assertEqual(network.receive_frame(a), b'', "✅ El emisor no recibe su propio broadcast")
+
+    def test_multicast_only_to_members(self):
+        bus = transport.MemoryBus()
+        a, b, c = bus.attach(MAC_A), bus.attach(MAC_B), bus.attach(MAC_C)
+        for t in (a, b, c):
+            t.settimeout(0.1)
+        group = transport.group_mac('equipo')
+        self.assertEqual(group[0] & 0x03, 0x03, "✅ MAC de grupo multicast y administrada localmente")
+        self.assertEqual(group, transport.group_mac('equipo'), "✅ Mismo nombre, misma MAC en todos los nodos")
+        b.join(group)
+        network.send_frame(a, _frame(group, MAC_A))
+        self.assertEqual(network.receive_frame(b)[:6], group, "✅ Multicast entregado al miembro")
+        self.assertEqual(network.receive_frame(c), b'', "✅ Un no miembro no recibe nada")
+        b.leave(group)
+        network.send_frame(a, _frame(group, MAC_A))
+        self.assertEqual(network.receive_frame(b), b'', "✅ Tras salir del grupo deja de recibir")
+
+
+class TestImpairedTransport(unittest.TestCase):
+    # Pruebas de la emulación de enlace degradado
+
+    def test_total_loss(self):
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        b.settimeout(0.1)
+        lossy = transport.ImpairedTransport(a, loss=1.0, seed=1)
+        for _ in range(10):
+            lossy.send(_frame(MAC_B, MAC_A))
+        self.assertEqual(b.recv(), b'', "✅ Con loss=1.0 no llega ninguna trama")
+        self.assertEqual(lossy.dropped, 10, "✅ Se contabilizan las tramas descartadas")
+        lossy.close()
+
+    def test_delay_and_rate(self):
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        b.settimeout(1.0)
+        # 10 tramas de 1000 bytes a 800 kbit/s = 0.1 s de serialización + 50 ms de retardo
+        slow = transport.ImpairedTransport(a, delay=0.05, rate_bps=800000)
+        start = time.monotonic()
+        for i in range(10):
+            slow.send(_frame(MAC_B, MAC_A, bytes([i]) * 986))
+        got = [b.recv()[14] for _ in range(10)]
+        elapsed = time.monotonic() - start
+        self.assertEqual(got, list(range(10)), "✅ Sin reordenamiento se conserva el orden")
+        self.assertGreaterEqual(elapsed, 0.14, "✅ Se respetan retardo y ancho de banda")
+        slow.close()
+
+
+class TestUdpTransport(unittest.TestCase):
+    # Pruebas del túnel UDP en loopback
+
+    def test_roundtrip_and_learning(self):
+        a = transport.UdpTransport(MAC_A, 0)
+        b = transport.UdpTransport(MAC_B, 0, peers=[a.addr])
+        a.add_peer(b.addr)
+        a.settimeout(1.0)
+        b.settimeout(1.0)
+        try:
+            b.send(_frame(transport.BROADCAST_MAC, MAC_B))
+            self.assertTrue(a.recv(), "✅ Broadcast recibido por el túnel UDP")
+            a.send(_frame(MAC_B, MAC_A, b'respuesta'))
+            self.assertEqual(b.recv()[14:], b'respuesta', "✅ Unicast por la dirección aprendida")
+        finally:
+            a.close()
+            b.close()
+
+
+class TestTransferOverTransport(unittest.TestCase):
+    # Transferencia completa con FileTransfer/FileReceiver sin socket raw
+
+    def test_file_transfer_with_loss(self):
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        a.settimeout(0.05)
+        b.settimeout(0.05)
+        lossy_a = transport.ImpairedTransport(a, loss=0.1, seed=7)
+        ft_s = file_transfer.FileTransfer(lossy_a, MAC_B, MAC_A)
+        ft_s.timeout = 0.1
+        ft_r = file_transfer.FileReceiver(b, None, MAC_B)
+        out, stop = [], threading.Event()
+        threads = [threading.Thread(target=_pump, args=(a, ft_s, None, out, stop), daemon=True),
+                   threading.Thread(target=_pump, args=(b, None, ft_r, out, stop), daemon=True)]
+        for t in threads:
+            t.start()
+        data = os.urandom(20000)
+        try:
+            ft_s.send_file(data)
+            deadline = time.time() + 5
+            while not out and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            ft_s.stop()
+            lossy_a.close()
+        self.assertEqual(out, [data], "✅ Archivo reensamblado íntegro a pesar de la pérdida")
+
+    def test_sender_restart_reuses_no_done_key(self):
+        # Un emisor que se reinicia (nuevo FileTransfer) no debe chocar con las
+        # transferencias que el receptor recuerda como terminadas
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        a.settimeout(0.05)
+        b.settimeout(0.05)
+        ft_r = file_transfer.FileReceiver(b, None, MAC_B)
+        out, stop = [], threading.Event()
+        threading.Thread(target=_pump, args=(b, None, ft_r, out, stop), daemon=True).start()
+        payloads = [os.urandom(5000) for _ in range(3)]
+        try:
+            for n, data in enumerate(payloads):
+                ft_s = file_transfer.FileTransfer(a, MAC_B, MAC_A)
+                ft_s.timeout = 0.1
+                if n == 2:
+                    # Mismo id que el envío anterior: solo vale tras DONE_TTL
+                    ft_s.next_file_id = last_id
+                    ft_r.DONE_TTL = 0.0
+                last_id = ft_s.next_file_id
+                # Bucle de ACKs propio de cada emisor (se para con él)
+                done = threading.Event()
+                pump = threading.Thread(target=_pump, args=(a, ft_s, None, out, done), daemon=True)
+                pump.start()
+                try:
+                    self.assertTrue(ft_s.send_file(data))
+                finally:
+                    ft_s.stop()
+                deadline = time.time() + 5
+                while len(out) <= n and time.time() < deadline:
+                    time.sleep(0.01)
+                done.set()
+                pump.join()
+        finally:
+            stop.set()
+        self.assertEqual(out, payloads, "✅ Cada envío tras un reinicio se entrega")
+
+    def test_retransmit_rebuilds_frame_from_mmap(self):
+        # Sin ACKs, el emisor reenvía los fragmentos reconstruyéndolos desde el
+        # archivo mapeado: la trama reenviada es idéntica a la original
+        sent = []
+
+        class Recorder(transport.Transport):
+            mac = MAC_A
+
+            def send(self, frame):
+                sent.append(frame)
+
+        with tempfile.TemporaryFile() as f:
+            data = os.urandom(5000)
+            f.write(data)
+            f.flush()
+            src = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            ft_s = file_transfer.FileTransfer(Recorder(), MAC_B, MAC_A)
+            ft_s.timeout = 0.05
+            ft_s.max_retransmissions = 1
+            try:
+                self.assertFalse(ft_s.send_file(src), "✅ sin ACKs la transferencia falla")
+            finally:
+                ft_s.stop()
+        frags = -(-len(data) // ft_s.max_payload())
+        self.assertEqual(len(sent), 2 * frags)
+        self.assertEqual(sorted(sent[:frags]), sorted(sent[frags:]), "✅ reenvíos idénticos a los originales")
+
+    def test_fanout_encodes_each_fragment_once(self):
+        # Mismo archivo a tres destinos por unicast con pérdida: cada uno lo
+        # recibe entero con su propia fiabilidad y la parte común de cada
+        # fragmento se monta una sola vez
+        bus = transport.MemoryBus()
+        port = bus.attach(MAC_A)
+        port.settimeout(0.05)
+        lossy = transport.ImpairedTransport(port, loss=0.1, seed=3)
+        ft_s = file_transfer.FileTransfer(lossy, None, MAC_A)
+        ft_s.timeout = 0.1
+        stop = threading.Event()
+        threading.Thread(target=_pump, args=(port, ft_s, None, [], stop), daemon=True).start()
+        macs, outs = [MAC_B, MAC_C, b'\x02\x00\x00\x00\x00\x0d'], {}
+        for mac in macs:
+            link = bus.attach(mac)
+            link.settimeout(0.05)
+            outs[mac] = []
+            ft_r = file_transfer.FileReceiver(link, None, mac)
+            threading.Thread(target=_pump, args=(link, None, ft_r, outs[mac], stop), daemon=True).start()
+        data = os.urandom(60000)
+        shared = file_transfer.SharedFrames(len(macs))
+        results = []
+        try:
+            threads = [threading.Thread(target=lambda m=m: results.append(ft_s.send_file(data, m, shared=shared)))
+                       for m in macs]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(10)
+            self.assertEqual(ft_s.send_fanout(b'hola' * 1000, macs[:2]), [], "✅ send_fanout confirma ambos")
+        finally:
+            stop.set()
+            ft_s.stop()
+            lossy.close()
+        frags = -(-len(data) // ft_s.max_payload())
+        self.assertEqual(results, [True] * 3)
+        self.assertTrue(all(outs[m][0] == data for m in macs), "✅ Cada destino reensambla el archivo íntegro")
+        self.assertLess(shared.encoded, frags * 1.5, "✅ Parte común codificada ~una vez por fragmento")
+        self.assertEqual(shared._tails, {}, "✅ Partes comunes liberadas al enviarlas todos")
+
+    def _adaptive(self, data, mtu, loss):
+        # Envío con fragmentos de tamaño variable a un vecino con MTU `mtu`;
+        # devuelve (reensamblados, longitudes de los fragmentos recibidos, emisor)
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        a.settimeout(0.05)
+        b.settimeout(0.05)
+        a.mtu = b.mtu = mtu
+        link = transport.ImpairedTransport(a, loss=loss, seed=5)
+        ft_s = file_transfer.FileTransfer(link, MAC_B, MAC_A)
+        ft_s.timeout = 0.1
+        ft_s.max_retransmissions = 20
+        ft_s.peer_mtu = lambda mac: mtu
+        ft_r = file_transfer.FileReceiver(b, None, MAC_B)
+        out, sizes, stop = [], [], threading.Event()
+        threads = [threading.Thread(target=_pump, args=(a, ft_s, None, out, stop), daemon=True),
+                   threading.Thread(target=_pump, args=(b, None, ft_r, out, stop, sizes), daemon=True)]
+        for t in threads:
+            t.start()
+        try:
+            self.assertTrue(ft_s.send_file(data))
+            deadline = time.time() + 5
+            while not out and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            ft_s.stop()
+            link.close()
+        return out, sizes, ft_s
+
+    def test_adaptive_fragments_use_jumbo_mtu(self):
+        data = os.urandom(100000)
+        out, sizes, _ = self._adaptive(data, 9000, 0.0)
+        self.assertEqual(out, [data], "✅ Archivo íntegro con fragmentos jumbo")
+        # payload_len = offset + datos + CRC
+        limit = file_transfer.payload_for_mtu(9000) - file_transfer.OFFSET_SIZE
+        self.assertEqual(max(sizes), limit + file_transfer.OFFSET_SIZE + 4, "✅ Sin pérdida se usa toda la MTU")
+        self.assertEqual(len(sizes), -(-len(data) // limit))
+
+    def test_adaptive_fragments_shrink_under_loss(self):
+        data = os.urandom(300000)
+        out, sizes, ft_s = self._adaptive(data, network.ETH_MTU, 0.25)
+        self.assertEqual(out, [data], "✅ Tamaños mezclados colocados por offset")
+        self.assertEqual(max(sizes), file_transfer.MAX_PAYLOAD + 4, "✅ Empieza con el máximo")
+        self.assertLess(min(sizes[-50:]), 900, "✅ Con pérdida los fragmentos se encogen")
+        # Enlace limpio otra vez: el tamaño vuelve al máximo
+        for _ in range(500):
+            ft_s.sizer.record(MAC_B, 600, False)
+        self.assertEqual(ft_s.sizer.size(MAC_B, 1464), 1464, "✅ Sin pérdida vuelve a crecer")
+
+    def test_receiver_places_mixed_sizes_by_offset(self):
+        # Fragmentos de tamaños distintos en orden aleatorio y con duplicados
+        data = os.urandom(20000)
+        flight = file_transfer._Flight(9, MAC_B, MAC_A, data, None, protocolo.MSG_FILE_CHUNK, 1.0)
+        sizes = [1464, 300, 700, 9000]
+        i = 0
+        while flight.more(i):
+            flight.cut(sizes[i % len(sizes)])
+            i += 1
+        frames = [flight.frame(i)[14:] for i in range(flight.total)]
+        frames = frames[::-1] + frames[:3]
+        ft_r = file_transfer.FileReceiver(None, None, MAC_B)
+        ft_r.send_ack = lambda *args: None
+        out = [d for d in (ft_r.receive_fragment(f, MAC_A) for f in frames) if d]
+        self.assertEqual(out, [data], "✅ Reensamblado por posición, una sola vez")
+
+    def test_stuck_head_blocks_index_wrap(self):
+        # Con tamaño variable el índice va en 16 bits: si el primer fragmento no
+        # se confirma, el emisor no puede adelantarse 65535 fragmentos (el ACK
+        # de un índice repetido se atribuiría al fragmento equivocado)
+        held = [True]
+
+        class AckAll(transport.Transport):
+            # Confirma al instante todo menos el índice 0 mientras `held`
+            mac = MAC_A
+
+            def send(self, frame):
+                hdr, _ = protocolo.unpack_header(frame[14:])
+                if hdr['frag_index'] == 0 and held[0]:
+                    return
+                ft_s.receive_ack(protocolo.pack_header(hdr['file_id'], 0, hdr['frag_index'], 0,
+                                                       protocolo.MSG_ACK, 0))
+
+        ft_s = file_transfer.FileTransfer(AckAll(), MAC_B, MAC_A)
+        ft_s.timeout = 30
+        ft_s.window = 256
+        ft_s.peer_mtu = lambda mac: network.ETH_MTU
+        ft_s.sizer.size = lambda mac, limit: 1
+        data = os.urandom(0xffff + 100)
+        result = []
+        sender = threading.Thread(target=lambda: result.append(ft_s.send_file(data)), daemon=True)
+        sender.start()
+        try:
+            deadline = time.time() + 30
+            while time.time() < deadline:
+                flight = next(iter(ft_s._flights.values()), None)
+                if flight is not None and flight.next >= 0xffff:
+                    break
+                time.sleep(0.05)
+            time.sleep(0.2)
+            self.assertEqual(flight.next, 0xffff, "✅ El emisor se detiene antes de repetir el índice")
+            held[0] = False
+            ft_s.receive_ack(protocolo.pack_header(flight.file_id, 0, 0, 0, protocolo.MSG_ACK, 0))
+            sender.join(30)
+        finally:
+            ft_s.stop()
+        self.assertEqual(result, [True], "✅ Al confirmarse el primero, la transferencia termina")
+        self.assertEqual(flight.lost, 0)
+        self.assertTrue(all(s == file_transfer._DONE for s in flight.state), "✅ Todos los fragmentos confirmados")
+
+    def test_sender_respects_receiver_window(self):
+        # Receptor con presupuesto de 4 fragmentos y un consumidor lento que
+        # libera la memoria fragmento a fragmento: el emisor nunca tiene más
+        # en vuelo que lo anunciado y la transferencia termina igual
+        a, b = transport.queue_pair(MAC_A, MAC_B)
+        a.settimeout(0.05)
+        b.settimeout(0.05)
+        ft_s = file_transfer.FileTransfer(a, MAC_B, MAC_A)
+        ft_s.timeout = 0.2
+        ft_r = file_transfer.FileReceiver(b, None, MAC_B, budget=4 * file_transfer.MAX_PAYLOAD)
+        peak, out, stop = [0], [], threading.Event()
+
+        def consume():
+            while not stop.is_set():
+                frame = network.receive_frame(b)
+                if not frame:
+                    continue
+                _, src, _, payload = network.unpack_ethernet_frame(frame)
+                frag = ft_r.accept_fragment(payload, src)
+                if frag is None:
+                    continue
+                if ft_r.window() == 0:
+                    ft_r.reject_fragment(frag[1], frag[2], src)
+                    continue
+                ft_r.reserve(len(frag[4]))
+                peak[0] = max(peak[0], ft_r.pending)
+                ft_r.send_ack(frag[1], frag[2], src)
+                time.sleep(0.01)
+                complete = ft_r.store_fragment(*frag)
+                ft_r.release(len(frag[4]))
+                if complete:
+                    out.append(complete)
+
+        threads = [threading.Thread(target=_pump, args=(a, ft_s, None, out, stop), daemon=True),
+                   threading.Thread(target=consume, daemon=True)]
+        for t in threads:
+            t.start()
+        data = os.urandom(40000)
+        try:
+            self.assertTrue(ft_s.send_file(data), "✅ La transferencia termina con ventana pequeña")
+            deadline = time.time() + 5
+            while not out and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            ft_s.stop()
+        self.assertEqual(out, [data])
+        self.assertLessEqual(peak[0], 4 * file_transfer.MAX_PAYLOAD, "✅ Nunca se supera el presupuesto")
+
+
+class TestBondedTransport(unittest.TestCase):
+    # Reparto de una transferencia entre dos enlaces del mismo dominio L2
+
+    def _bond(self, buses, macs, rates):
+        links = [transport.ImpairedTransport(bus.attach(m), rate_bps=r, queue_limit=8, block=True)
+                 for bus, m, r in zip(buses, macs, rates)]
+        return transport.BondedTransport(links)
+
+    def test_discovery_learns_aliases(self):
+        buses = [transport.MemoryBus(), transport.MemoryBus()]
+        a = transport.BondedTransport([buses[0].attach(MAC_A), buses[1].attach(b'\x02\x00\x00\x00\x01\x0a')])
+        b = transport.BondedTransport([buses[0].attach(MAC_B), buses[1].attach(b'\x02\x00\x00\x00\x01\x0b')])
+        a.settimeout(1.0)
+        b.settimeout(1.0)
+        disc_a, disc_b = discovery.Discovery(a, MAC_A), discovery.Discovery(b, MAC_B)
+        try:
+            disc_a.send_discovery()
+            _, src, _, payload = network.unpack_ethernet_frame(b.recv())
+            disc_b.handle_packet(src, payload)
+            _, src, _, payload = network.unpack_ethernet_frame(a.recv())
+            disc_a.handle_packet(src, payload)
+        finally:
+            a.close()
+            b.close()
+        self.assertEqual(disc_a.get_neighbors(), [MAC_B], "✅ El vecino se identifica por su MAC principal")
+        self.assertEqual(len(a.peer_macs[MAC_B]), 2, "✅ Se aprenden las dos MAC del vecino")
+        self.assertEqual(len(b.peer_macs[MAC_A]), 2, "✅ El vecino aprende nuestras dos MAC")
+
+    def test_striping_proportional_to_throughput(self):
+        buses = [transport.MemoryBus(), transport.MemoryBus()]
+        macs_a = [MAC_A, b'\x02\x00\x00\x00\x01\x0a']
+        macs_b = [MAC_B, b'\x02\x00\x00\x00\x01\x0b']
+        # Enlace principal al doble de velocidad que el secundario
+        a = self._bond(buses, macs_a, [8e6, 4e6])
+        b = self._bond(buses, macs_b, [8e6, 4e6])
+        a.learn_peer(MAC_B, b.discovery_tlvs())
+        b.learn_peer(MAC_A, a.discovery_tlvs())
+        a.settimeout(0.05)
+        b.settimeout(0.05)
+        ft_s = file_transfer.FileTransfer(a, MAC_B, MAC_A)
+        ft_s.timeout = 0.5
+        ft_r = file_transfer.FileReceiver(b, None, MAC_B)
+        out, stop = [], threading.Event()
+        threads = [threading.Thread(target=_pump, args=(a, ft_s, None, out, stop), daemon=True),
+                   threading.Thread(target=_pump, args=(b, None, ft_r, out, stop), daemon=True)]
+        for t in threads:
+            t.start()
+        data = os.urandom(300000)
+        try:
+            ft_s.send_file(data)
+            deadline = time.time() + 5
+            while not out and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            ft_s.stop()
+            a.close()
+            b.close()
+        self.assertEqual(out, [data], "✅ Reensamblado transparente con fragmentos por dos enlaces")
+        share = a.tx_bytes[0] / float(sum(a.tx_bytes))
+        self.assertTrue(0.5 < share < 0.8, f"✅ El enlace rápido lleva ~2/3 del tráfico (share={share:.2f})")
+
+    def test_unknown_peer_uses_primary_link(self):
+        # Vecino sin bonding (o aún no descubierto): todo sale con la MAC principal
+        buses = [transport.MemoryBus(), transport.MemoryBus()]
+        a = self._bond(buses, [MAC_A, b'\x02\x00\x00\x00\x01\x0a'], [8e6, 8e6])
+        b = buses[0].attach(MAC_B)
+        a.settimeout(0.05)
+        b.settimeout(0.05)
+        ft_s = file_transfer.FileTransfer(a, MAC_B, MAC_A)
+        ft_s.timeout = 0.5
+        ft_r = file_transfer.FileReceiver(b, None, MAC_B)
+        out, stop = [], threading.Event()
+        threads = [threading.Thread(target=_pump, args=(a, ft_s, None, out, stop), daemon=True),
+                   threading.Thread(target=_pump, args=(b, None, ft_r, out, stop), daemon=True)]
+        for t in threads:
+            t.start()
+        data = os.urandom(100000)
+        try:
+            self.assertTrue(ft_s.send_file(data))
+            deadline = time.time() + 5
+            while not out and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            ft_s.stop()
+            a.close()
+        self.assertEqual(out, [data], "✅ El vecino sin bonding recibe el archivo completo")
+        self.assertEqual(a.tx_frames[1], 0, "✅ El enlace secundario no se usa")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)